@@ -1,4 +1,72 @@
-from server import app
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""AWS Lambda entry point: the FastAPI app from ``server.py`` behind Mangum.
+
+Mangum runs with ``lifespan="off"``, so nothing in ``server.lifespan`` runs
+here. Startup is lean by default: ``server`` imports only FastAPI and the
+small modules its HTTP routes need, and the pipecat pipeline, transports,
+STT/TTS/LLM service modules and the VAD are imported by the first session
+(``server.session_modules``).
+
+Work listed in ``LAMBDA_PREWARM`` is done here at module level instead, in
+the Lambda init phase, and is then reused by every invocation of the
+execution environment. This suits functions with provisioned concurrency or
+SnapStart, where init time is not on the request path:
+
+- ``session``: import the transport, the bot and the provider modules;
+- ``vad``: load the Silero VAD sessions (vad_pool.py);
+- ``nodes``: build the flow's node templates (node_registry.py);
+- ``all``: all of the above.
+
+``python -m benchmarks.cold_start`` measures import time, the first
+invocation and peak memory for each setting.
+
+Configuration:
+    LAMBDA_PREWARM: Comma-separated prewarm steps (default: none).
+"""
+
+import os
+import time
+
+from loguru import logger
 from mangum import Mangum
 
+from server import app, session_modules
+
+PREWARM_STEPS = ("session", "vad", "nodes")
+
+
+def prewarm_steps() -> list:
+    """Return the LAMBDA_PREWARM steps, in execution order."""
+    requested = {s.strip().lower() for s in os.getenv("LAMBDA_PREWARM", "").split(",") if s.strip()}
+    if "all" in requested:
+        return list(PREWARM_STEPS)
+    unknown = requested - set(PREWARM_STEPS)
+    if unknown:
+        raise ValueError(f"Unknown LAMBDA_PREWARM steps: {', '.join(sorted(unknown))}")
+    return [step for step in PREWARM_STEPS if step in requested]
+
+
+def prewarm(steps) -> None:
+    """Run prewarm ``steps`` ("session", "vad", "nodes")."""
+    for step in steps:
+        started = time.perf_counter()
+        if step == "session":
+            session_modules()
+        elif step == "vad":
+            from vad_pool import VAD_POOL
+
+            VAD_POOL.prewarm()
+        elif step == "nodes":
+            from nivest_bot import NODES
+
+            NODES.prebuild()
+        logger.info(f"Lambda prewarm: {step} in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+prewarm(prewarm_steps())
+
 handler = Mangum(app, lifespan="off")
@@ -0,0 +1,272 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Barge-in: stop talking as soon as the caller interrupts, and only remember
+what was actually said.
+
+Pipecat handles an ``InterruptionFrame`` by cancelling every processor's
+pending work: the LLM stream stops, the TTS text aggregator is reset and the
+output transport drops its queued audio. The output transport passes a
+sentence's ``TTSTextFrame`` on to the assistant aggregator only after writing
+the audio in front of it, so with TTS that returns audio from ``run_tts``
+the context keeps only sentences that were played. Streaming TTS (Sarvam's
+WebSocket) delivers audio out of band, and two things leak past that:
+
+- ``SarvamTTSService`` reconnects on an interruption only when the bot is
+  already speaking, so a caller who cuts in while the first sentence is being
+  synthesized hears that sentence once it arrives.
+- ``TTSService`` pushes a sentence's ``TTSTextFrame`` right after sending it
+  for synthesis, before any of its audio, so the whole reply reaches the
+  context even when the caller interrupted the first word.
+
+``StreamingTTSMixin`` fixes both for a streaming service: it drops the
+provider's pending audio on every interruption with a stream in flight
+(``drop_pending_audio``), and holds each sentence's text until the audio
+stream reaches it, so text the caller never heard is rolled back with the
+rest of the interrupted reply. The stream does not mark where sentences
+start, so that point is estimated from the text ahead of the sentence at the
+fastest speaking rate seen recently. The estimate errs early: text a caller
+heard is kept, at the cost of sometimes keeping a sentence that had barely
+started.
+
+``BargeInMonitor`` sits after the output transport and measures how long the
+caller keeps hearing the bot after an interruption. The client's playback
+position comes from a ``PlaybackClock``: audio is assumed to play as soon as
+it is written, back to back. Pipecat's output transports pace writes in real
+time (the FastAPI WebSocket keeps about two 40 ms chunks ahead of the
+client), so the clock is close to what the caller hears. The raw PCM /ws
+protocol has no message to tell a client to drop audio it already buffered;
+what it holds plays out and is part of the measured time. The framed
+protocol (``pcm_serializer.py``) sends such a message, so its clients stop
+sooner than measured.
+
+``python -m benchmarks.barge_in`` measures interrupt-to-silence time and the
+text kept in the context, with and without this module.
+
+Configuration:
+    BARGE_IN: Set to 0 to go back to Pipecat's stock interruption handling.
+
+Metrics:
+    nivest_barge_in_silence_seconds: time from an interruption until the
+        client has played the last audio of the interrupted reply.
+    nivest_barge_in_stale_audio_seconds_total: audio of an interrupted reply
+        written after the interruption.
+    nivest_barge_in_rollback_chars_total: unspoken streaming TTS text dropped
+        before it reached the assistant context.
+"""
+
+import os
+import time
+from collections import deque
+from typing import AsyncGenerator, Deque, Optional, Tuple
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    CancelFrame,
+    EndFrame,
+    Frame,
+    InterruptionFrame,
+    LLMFullResponseStartFrame,
+    OutputAudioRawFrame,
+    SystemFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+    TTSTextFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from metrics import counter, histogram
+
+SILENCE = histogram(
+    "nivest_barge_in_silence_seconds",
+    "Time from an interruption until the client has played the interrupted reply's last audio.",
+    buckets=(0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0),
+)
+STALE_AUDIO = counter(
+    "nivest_barge_in_stale_audio_seconds_total",
+    "Audio of an interrupted reply written after the interruption.",
+)
+ROLLBACK_CHARS = counter(
+    "nivest_barge_in_rollback_chars_total",
+    "Unspoken reply text dropped from the assistant context.",
+)
+
+
+def barge_in_enabled() -> bool:
+    return os.getenv("BARGE_IN", "1") != "0"
+
+
+def audio_secs(frame: OutputAudioRawFrame) -> float:
+    """Duration of a 16-bit PCM audio frame."""
+    return len(frame.audio) / (2 * frame.num_channels * frame.sample_rate)
+
+
+class PlaybackClock:
+    """Tracks when a client that plays audio as it arrives runs out of it."""
+
+    def __init__(self):
+        self.played_until = 0.0
+
+    def add(self, secs: float, now: Optional[float] = None) -> float:
+        """Account for ``secs`` of audio written at ``now``; return the new end."""
+        now = time.monotonic() if now is None else now
+        self.played_until = max(now, self.played_until) + secs
+        return self.played_until
+
+    def buffered(self, now: Optional[float] = None) -> float:
+        """Audio the client has received but not played yet."""
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.played_until - now)
+
+
+# --------------------------------------------------------------------
+# Monitoring
+# --------------------------------------------------------------------
+
+
+class BargeInMonitor(FrameProcessor):
+    """Measures interrupt-to-silence time from the audio the transport writes.
+
+    Place it right after ``transport.output()``, which pushes every audio
+    frame downstream once it has been written.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._playback = PlaybackClock()
+        self._interrupted_at: Optional[float] = None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if direction == FrameDirection.DOWNSTREAM:
+            if isinstance(frame, OutputAudioRawFrame):
+                secs = audio_secs(frame)
+                self._playback.add(secs)
+                if self._interrupted_at is not None:
+                    STALE_AUDIO.inc(secs)
+            elif isinstance(frame, InterruptionFrame):
+                self._settle()
+                self._interrupted_at = time.monotonic()
+            elif isinstance(frame, (TTSStartedFrame, LLMFullResponseStartFrame, EndFrame, CancelFrame)):
+                self._settle()
+
+        await self.push_frame(frame, direction)
+
+    def _settle(self):
+        """Record how long the last interrupted reply kept playing."""
+        if self._interrupted_at is None:
+            return
+        silence = max(0.0, self._playback.played_until - self._interrupted_at)
+        SILENCE.observe(silence)
+        logger.debug(f"{self}: silent {silence * 1000:.0f} ms after the interruption")
+        self._interrupted_at = None
+
+
+# --------------------------------------------------------------------
+# Streaming TTS
+# --------------------------------------------------------------------
+
+
+class StreamingTTSMixin:
+    """Barge-in support for TTS services whose audio arrives out of band.
+
+    Mix in before a ``TTSService`` subclass. A sentence whose ``run_tts``
+    yields no audio is being streamed by the provider, after the sentences
+    already sent. The stream carries no sentence boundaries, so each
+    sentence's start is estimated from the characters ahead of it at
+    ``secs_per_char``, and its ``TTSTextFrame`` (with anything pushed behind
+    it) is held until that much audio has arrived. ``secs_per_char`` is a
+    lower bound: ``RATE_MARGIN`` times the fastest rate of the last
+    ``RATE_HISTORY`` finished streams. An interruption while a stream is in
+    flight drops the held text and calls ``drop_pending_audio``.
+    """
+
+    # Spoken duration per character before any stream has been measured
+    # (Sarvam speaks about 0.06 s per character at pace 1.0)
+    DEFAULT_SECS_PER_CHAR = 0.045
+    # Finished streams whose speaking rate is remembered
+    RATE_HISTORY = 8
+    # Applied to the fastest remembered rate, so sentence starts are
+    # estimated early rather than late
+    RATE_MARGIN = 0.85
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.secs_per_char = self.DEFAULT_SECS_PER_CHAR
+        self._rates: Deque[float] = deque(maxlen=self.RATE_HISTORY)
+        self._stream_active = False
+        self._stream_chars = 0
+        self._stream_audio_secs = 0.0
+        self._unvoiced: Deque[Tuple[float, Frame]] = deque()
+
+    async def drop_pending_audio(self):
+        """Discard audio the provider is still producing for cancelled text."""
+        pass
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        inline = False
+        async for frame in super().run_tts(text):
+            inline = inline or isinstance(frame, TTSAudioRawFrame)
+            yield frame
+        if not inline:
+            self._stream_active = True
+
+    async def _handle_interruption(self, frame: InterruptionFrame, direction: FrameDirection):
+        streaming = self._stream_active
+        await super()._handle_interruption(frame, direction)
+        if streaming and barge_in_enabled():
+            logger.debug(f"{self}: interrupted with audio still streaming, dropping it")
+            await self.drop_pending_audio()
+
+    async def push_frame(self, frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM):
+        if direction == FrameDirection.DOWNSTREAM and barge_in_enabled():
+            if isinstance(frame, InterruptionFrame):
+                self._rollback()
+            elif isinstance(frame, (EndFrame, CancelFrame)):
+                await self._release_unvoiced(float("inf"))
+            elif isinstance(frame, TTSTextFrame) and self._stream_active:
+                self._unvoiced.append((self._stream_chars * self.secs_per_char, frame))
+                self._stream_chars += len(frame.text)
+                await self._release_unvoiced(self._stream_audio_secs)
+                return
+            elif self._unvoiced and not isinstance(frame, (SystemFrame, TTSAudioRawFrame, TTSStoppedFrame)):
+                self._unvoiced.append((self._unvoiced[-1][0], frame))
+                return
+
+        await super().push_frame(frame, direction)
+
+        if isinstance(frame, TTSAudioRawFrame) and self._stream_active:
+            self._stream_audio_secs += audio_secs(frame)
+            await self._release_unvoiced(self._stream_audio_secs)
+        elif isinstance(frame, TTSStoppedFrame):
+            if self._stream_active and self._stream_chars and not self._unvoiced:
+                self._rates.append(self._stream_audio_secs / self._stream_chars)
+                self.secs_per_char = self.RATE_MARGIN * min(self._rates)
+            await self._release_unvoiced(float("inf"))
+            self._end_stream()
+        elif isinstance(frame, InterruptionFrame):
+            self._end_stream()
+
+    def _rollback(self):
+        dropped = [frame.text for _, frame in self._unvoiced if isinstance(frame, TTSTextFrame)]
+        self._unvoiced.clear()
+        if dropped:
+            chars = sum(len(text) for text in dropped)
+            ROLLBACK_CHARS.inc(chars)
+            logger.debug(f"{self}: rolled back {chars} unspoken characters")
+
+    def _end_stream(self):
+        self._stream_active = False
+        self._stream_chars = 0
+        self._stream_audio_secs = 0.0
+
+    async def _release_unvoiced(self, audio_secs_received: float):
+        """Push held frames whose sentence has started arriving."""
+        while self._unvoiced and self._unvoiced[0][0] < audio_secs_received:
+            _, frame = self._unvoiced.popleft()
+            await super().push_frame(frame)
@@ -0,0 +1,6 @@
+"""Offline benchmarks for the financial coach bot.
+
+Run a benchmark as a module from the repository root, for example::
+
+    python -m benchmarks.turn_latency --iterations 5
+"""
@@ -0,0 +1,216 @@
+"""Interrupt-to-silence time and context rollback, with and without barge_in.py.
+
+Each trial runs a small pipeline with the production pieces that handle an
+interruption: a streaming LLM, ``SpeechChunker``, a TTS service, the output transport paced in
+real time like the FastAPI WebSocket (``InMemoryOutputTransport`` with
+``realtime=True``) and the assistant context aggregator. The LLM starts a three-sentence reply; after
+``--at`` seconds the caller interrupts (an ``InterruptionFrame``, as the
+pipeline task sends when the VAD hears the caller).
+
+Two TTS services are compared:
+
+- ``inline``: audio is produced inside ``run_tts`` (offline FakeTTSService,
+  like a cache hit or an HTTP TTS);
+- ``streaming``: audio arrives out of band (FakeStreamingTTSService, which
+  behaves like Sarvam's WebSocket service and has ``StreamingTTSMixin``).
+
+Reported per run:
+
+- ``silence``: interruption -> the client has played the reply's last audio;
+- ``stale``: reply audio written after the interruption;
+- ``llm tok``: LLM tokens pushed after the interruption;
+- ``heard`` / ``kept``: characters of the reply the caller heard (from the
+  audio played, at the TTS speaking rate) and characters the assistant
+  message in the context ended up with.
+
+Usage:
+    python -m benchmarks.barge_in
+    python -m benchmarks.barge_in --at 0.6 1.5 3 --trials 5 --json
+    python -m benchmarks.barge_in --tts streaming --secs-per-char 0.04 --at 3
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import sys
+import time
+
+from loguru import logger
+
+from benchmarks.harness import summarize
+from offline_services import FakeStreamingTTSService, FakeTTSService, InMemoryTransport, LatencyProfile, _Delays
+from speech_chunker import SpeechChunker
+
+from pipecat.frames.frames import (
+    InterruptionFrame,
+    LLMContextFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+)
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineParams, PipelineTask
+from pipecat.processors.aggregators.llm_context import LLMContext
+from pipecat.processors.aggregators.llm_response_universal import LLMContextAggregatorPair
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+REPLY = (
+    "After petrol you have fourteen hundred left today. "
+    "Try to keep aside two hundred and eighty in your savings pocket. "
+    "Small amounts every day add up to a bike faster than you think."
+)
+
+
+class ReplyLLM(FrameProcessor):
+    """Streams ``REPLY`` word by word for every context frame."""
+
+    def __init__(self, profile: LatencyProfile, **kwargs):
+        super().__init__(**kwargs)
+        self._profile = profile
+        self.interrupted_at = None
+        self.tokens_after = 0
+
+    async def process_frame(self, frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, InterruptionFrame):
+            self.interrupted_at = time.perf_counter()
+            await self.push_frame(frame, direction)
+        elif isinstance(frame, LLMContextFrame):
+            await self.push_frame(LLMFullResponseStartFrame())
+            await asyncio.sleep(self._profile.llm_ttft_secs)
+            for i, word in enumerate(REPLY.split()):
+                if i:
+                    await asyncio.sleep(self._profile.llm_token_interval_secs)
+                if self.interrupted_at is not None:
+                    self.tokens_after += 1
+                await self.push_frame(LLMTextFrame(f" {word}" if i else word))
+            await self.push_frame(LLMFullResponseEndFrame())
+        else:
+            await self.push_frame(frame, direction)
+
+
+async def trial(tts_kind: str, at: float, profile: LatencyProfile, settle: float) -> dict:
+    transport = InMemoryTransport(profile, realtime_output=True)
+    output = transport.output()
+    delays = _Delays(profile)
+    tts_class = FakeStreamingTTSService if tts_kind == "streaming" else FakeTTSService
+    tts = tts_class(profile, delays, aggregate_sentences=False)
+    llm = ReplyLLM(profile)
+    context = LLMContext([{"role": "user", "content": "Aaj eighteen hundred kamaye."}])
+    aggregator = LLMContextAggregatorPair(context)
+
+    task = PipelineTask(
+        Pipeline([llm, SpeechChunker(), tts, output, aggregator.assistant()]),
+        params=PipelineParams(allow_interruptions=True),
+    )
+    runner = asyncio.create_task(PipelineRunner(handle_sigint=False).run(task))
+    await asyncio.sleep(0.1)
+
+    await task.queue_frame(LLMContextFrame(context))
+    await asyncio.sleep(at)
+    interrupted_at = time.perf_counter()
+    written_before = output.audio_bytes
+    heard_secs = written_before / (2 * output.sample_rate) - output.clock.buffered(interrupted_at)
+    await task.queue_frame(InterruptionFrame())
+
+    # Wait for stale audio to stop
+    while True:
+        await asyncio.sleep(0.1)
+        now = time.perf_counter()
+        last = output.audio_times[-1] if output.audio_times else 0.0
+        if now - interrupted_at >= settle and now - last >= settle:
+            break
+
+    await task.cancel()
+    await runner
+
+    kept = "".join(
+        m["content"] for m in context.get_messages() if isinstance(m, dict) and m.get("role") == "assistant"
+    )
+    return {
+        "silence": max(0.0, output.clock.played_until - interrupted_at),
+        "stale": (output.audio_bytes - written_before) / (2 * output.sample_rate),
+        "llm_tokens": llm.tokens_after,
+        "heard": min(len(REPLY), max(0.0, heard_secs) / profile.tts_secs_per_char),
+        "kept": len(kept),
+    }
+
+
+async def run(tts_kind: str, at: float, profile: LatencyProfile, trials: int, settle: float) -> dict:
+    results = await asyncio.gather(
+        *(
+            trial(tts_kind, at, dataclasses.replace(profile, seed=profile.seed + i), settle)
+            for i in range(trials)
+        )
+    )
+    mean = lambda key: sum(r[key] for r in results) / len(results)  # noqa: E731
+    return {
+        "silence": summarize([r["silence"] for r in results]),
+        "stale_secs": mean("stale"),
+        "llm_tokens": mean("llm_tokens"),
+        "heard_chars": mean("heard"),
+        "kept_chars": mean("kept"),
+    }
+
+
+def main(argv=None):
+    defaults = LatencyProfile()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--at",
+        type=float,
+        nargs="+",
+        default=[0.6, 2.0],
+        help="Seconds after the LLM request at which the caller interrupts",
+    )
+    parser.add_argument("--trials", type=int, default=3, help="Concurrent trials per run")
+    parser.add_argument("--tts", nargs="+", choices=["inline", "streaming"], default=["inline", "streaming"])
+    parser.add_argument("--tts-ttfb", type=float, default=defaults.tts_ttfb_secs)
+    parser.add_argument("--llm-ttft", type=float, default=defaults.llm_ttft_secs)
+    parser.add_argument(
+        "--secs-per-char",
+        type=float,
+        default=defaults.tts_secs_per_char,
+        help="Speaking rate of the fake TTS (lower is a faster speaker)",
+    )
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--settle", type=float, default=1.0, help="Quiet time that ends a trial")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    profile = LatencyProfile(
+        tts_ttfb_secs=args.tts_ttfb,
+        llm_ttft_secs=args.llm_ttft,
+        tts_secs_per_char=args.secs_per_char,
+        jitter=args.jitter,
+    )
+    results = {}
+    for tts_kind in args.tts:
+        for at in args.at:
+            for enabled in (False, True):
+                os.environ["BARGE_IN"] = "1" if enabled else "0"
+                name = f"{tts_kind}@{at:g}s/{'barge-in' if enabled else 'baseline'}"
+                results[name] = asyncio.run(run(tts_kind, at, profile, args.trials, args.settle))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{'run':<28} {'silence p50':>12} {'silence max':>12} {'stale':>8} "
+        f"{'llm tok':>8} {'heard':>6} {'kept':>6}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:<28} {r['silence']['p50'] * 1000:>10.0f}ms {r['silence']['max'] * 1000:>10.0f}ms "
+            f"{r['stale_secs']:>7.2f}s {r['llm_tokens']:>8.1f} {r['heard_chars']:>6.0f} {r['kept_chars']:>6.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Lambda cold start: import cost per module, first invocation and peak memory.
+
+For each ``LAMBDA_PREWARM`` setting (see ``aws_lambda_handler.py``) this
+starts fresh interpreters that import the handler and invoke it with a
+synthetic API Gateway HTTP API (payload 2.0) event, the way the Lambda
+runtime does. Reported per setting:
+
+- ``import``: importing ``aws_lambda_handler``, prewarm steps included (the
+  Lambda init phase);
+- ``first``/``warm``: the first and second invocation;
+- ``process``: interpreter start to exit;
+- ``rss``: peak resident memory of the process.
+
+``--profile`` also runs ``python -X importtime`` for each setting and lists
+the modules and top-level packages with the largest import cost, which is
+where to look when cold starts grow.
+
+``--prewarm session`` does at import what the handler did before startup was
+made lean (server.py imported the bot and the transports at module level).
+
+Usage:
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --prewarm "" session all --runs 5 --profile
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def http_event(path: str) -> dict:
+    """API Gateway HTTP API (payload format 2.0) event for ``GET path``."""
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": "",
+        "headers": {"host": "localhost", "user-agent": "cold-start-benchmark"},
+        "requestContext": {
+            "accountId": "000000000000",
+            "apiId": "local",
+            "domainName": "localhost",
+            "http": {
+                "method": "GET",
+                "path": path,
+                "protocol": "HTTP/1.1",
+                "sourceIp": "127.0.0.1",
+                "userAgent": "cold-start-benchmark",
+            },
+            "requestId": "cold-start",
+            "routeKey": "$default",
+            "stage": "$default",
+            "timeEpoch": int(time.time() * 1000),
+        },
+        "isBase64Encoded": False,
+    }
+
+
+class LambdaContext:
+    """The attributes of the Lambda context object that Mangum reads."""
+
+    function_name = "nivest-cold-start"
+    memory_limit_in_mb = 1024
+    aws_request_id = "cold-start"
+    invoked_function_arn = "arn:aws:lambda:local:000000000000:function:nivest-cold-start"
+
+    def get_remaining_time_in_millis(self) -> int:
+        return 30000
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB.
+
+    Read from /proc where available: ``ru_maxrss`` survives ``exec`` and
+    would include the parent's footprint at fork time.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_child(path: str) -> dict:
+    started = time.perf_counter()
+    import aws_lambda_handler
+
+    imported = time.perf_counter()
+    response = aws_lambda_handler.handler(http_event(path), LambdaContext())
+    first = time.perf_counter()
+    aws_lambda_handler.handler(http_event(path), LambdaContext())
+    warm = time.perf_counter()
+    return {
+        "status": response["statusCode"],
+        "import": imported - started,
+        "first": first - imported,
+        "warm": warm - first,
+        "rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def _env(prewarm: str) -> dict:
+    return dict(os.environ, LAMBDA_PREWARM=prewarm)
+
+
+def cold_start(prewarm: str, path: str) -> dict:
+    """One fresh-process cold start with ``LAMBDA_PREWARM=prewarm``."""
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start", "--child", path],
+        cwd=ROOT,
+        env=_env(prewarm),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process"] = time.perf_counter() - started
+    return result
+
+
+def import_profile(prewarm: str) -> list:
+    """``-X importtime`` of the handler: ``[(module, self_s, cumulative_s)]``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import aws_lambda_handler"],
+        cwd=ROOT,
+        env=_env(prewarm),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        try:
+            own, cumulative = int(fields[0]), int(fields[1])
+        except ValueError:  # the header line
+            continue
+        modules.append((fields[2].strip(), own / 1e6, cumulative / 1e6))
+    return modules
+
+
+def package_costs(modules: list) -> list:
+    """Import time per top-level package (sum of its modules' own time)."""
+    totals = {}
+    for name, own, _ in modules:
+        package = name.split(".", 1)[0]
+        totals[package] = totals.get(package, 0.0) + own
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--prewarm", nargs="+", default=["", "session", "all"], help="LAMBDA_PREWARM settings to compare"
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per setting")
+    parser.add_argument("--path", default="/healthz", help="Path of the test event")
+    parser.add_argument("--profile", action="store_true", help="Also list import cost per module")
+    parser.add_argument("--top", type=int, default=15, help="Modules/packages listed by --profile")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--child", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        # Measured cold, so nothing beyond the standard library is imported
+        # before the handler
+        print(json.dumps(_run_child(args.child)))
+        return
+
+    from loguru import logger
+
+    from benchmarks.harness import summarize
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    results = {}
+    profiles = {}
+    for prewarm in args.prewarm:
+        runs = [cold_start(prewarm, args.path) for _ in range(args.runs)]
+        results[prewarm] = {
+            "status": runs[-1]["status"],
+            "rss_mb": max(r["rss_mb"] for r in runs),
+            **{key: summarize([r[key] for r in runs]) for key in ("import", "first", "warm", "process")},
+        }
+        if args.profile:
+            profiles[prewarm] = import_profile(prewarm)
+
+    if args.json:
+        print(json.dumps({"cold_start": results, "import_profile": profiles}, indent=2))
+        return
+
+    print(f"GET {args.path}, {args.runs} fresh processes per setting (p50)")
+    print(f"{'LAMBDA_PREWARM':<16} {'import ms':>10} {'first ms':>9} {'warm ms':>8} {'process ms':>11} {'rss MB':>7}")
+    for prewarm, r in results.items():
+        print(
+            f"{prewarm or '(none)':<16} {r['import']['p50'] * 1000:>10.0f} {r['first']['p50'] * 1000:>9.1f} "
+            f"{r['warm']['p50'] * 1000:>8.1f} {r['process']['p50'] * 1000:>11.0f} {r['rss_mb']:>7.1f}"
+        )
+
+    for prewarm, modules in profiles.items():
+        print()
+        print(f"LAMBDA_PREWARM={prewarm!r}: {len(modules)} modules")
+        print(f"  {'package':<40} {'self ms':>9}")
+        for package, own in package_costs(modules)[: args.top]:
+            print(f"  {package:<40} {own * 1000:>9.1f}")
+        print(f"  {'module':<40} {'self ms':>9} {'cumul. ms':>10}")
+        for name, own, cumulative in sorted(modules, key=lambda m: m[1], reverse=True)[: args.top]:
+            print(f"  {name[:40]:<40} {own * 1000:>9.1f} {cumulative * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,790 @@
+"""Batch text-only evaluation of the coaching flow's routing and function calls.
+
+Replays a corpus of conversations (``flow_eval_corpus.jsonl`` next to this
+file by default) through the real ``FlowManager`` graph of ``nivest_bot``.
+Only text is involved: user turns are appended to the context directly, and
+no STT, TTS or transport runs. The pipeline is the bot's text path:
+context aggregators, context budget, local intent router and the LLM. Edits to
+the node prompts, function schemas or routing are therefore measured the way
+they run in production. Conversations run concurrently, each with its own
+pipeline, bounded by ``--concurrency``.
+
+LLM backends (``--llm``):
+
+- ``rules`` (default): a deterministic local LLM. It routes with the intent
+  router's keyword model and pulls amounts, goals and topics out of the
+  transcript with regular expressions. Use it to check the harness and the
+  graph, and for token counts, which follow the prompts more than the model.
+- ``replay``: answers from recorded responses (``--store``). Responses are
+  keyed by the node's functions and the conversation so far. Requests with
+  no recording count as misses and get an empty reply.
+- ``live``: the configured provider (``utils.create_llm``), which needs API
+  keys and network. With ``--record`` its responses are saved to the store,
+  so later runs can replay them offline.
+
+Every corpus line is one conversation::
+
+    {"id": "daily-1", "turns": [{"user": "Aaj 1500 kamaye, 300 kharch",
+      "node": "daily_advice",
+      "calls": {"compute_savings_advice": {"income": 1500, "expenses": 300}}}]}
+
+``node`` is the skill node the turn should reach, or "entry" if it should
+stay at entry. ``calls`` lists the functions expected in the turn, with the
+arguments to check. Both are optional, so unlabelled recorded transcripts
+still give token counts.
+
+Reported per run:
+
+- routing accuracy: turns whose first node past entry is the expected ``node``;
+- function-call accuracy: expected calls that were made, and correct argument
+  values per argument name (income, expenses, amount, goal, ...). Numbers
+  must be within 1%; strings must have overlapping words;
+- tokens per conversation: prompt and completion tokens of every LLM request,
+  greeting included. The provider's usage metrics are used when available,
+  otherwise the ``context_budget.estimate_tokens`` heuristic over the messages
+  and tool schemas;
+- LLM requests per turn and time per LLM request.
+
+Usage:
+    python -m benchmarks.flow_eval
+    python -m benchmarks.flow_eval --llm live --record flow_eval_store.json
+    python -m benchmarks.flow_eval --llm replay --store flow_eval_store.json --json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import string
+import sys
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    Frame,
+    FunctionCallFromLLM,
+    FunctionCallsStartedFrame,
+    LLMContextFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMMessagesAppendFrame,
+    LLMTextFrame,
+    MetricsFrame,
+)
+from pipecat.metrics.metrics import LLMTokenUsage, LLMUsageMetricsData
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineParams, PipelineTask
+from pipecat.processors.aggregators.llm_context import LLMContext
+from pipecat.processors.aggregators.llm_response_universal import LLMContextAggregatorPair
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.llm_service import LLMService
+
+from benchmarks.harness import summarize
+from concept_cache import TOPICS, normalize_topic
+from context_budget import CHARS_PER_TOKEN, ContextBudget, estimate_tokens
+from intent_router import ENTRY_NODE, IntentRouter, classify
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "flow_eval_corpus.jsonl")
+
+# --------------------------------------------------------------------
+# Corpus
+# --------------------------------------------------------------------
+
+
+@dataclass
+class EvalTurn:
+    user: str
+    node: Optional[str] = None
+    calls: Dict[str, dict] = field(default_factory=dict)
+
+
+@dataclass
+class EvalConversation:
+    id: str
+    turns: List[EvalTurn]
+
+
+def load_corpus(path: str) -> List[EvalConversation]:
+    """Read a JSONL corpus; blank lines and lines starting with # are skipped."""
+    conversations = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            data = json.loads(line)
+            turns = [
+                EvalTurn(user=t["user"], node=t.get("node"), calls=t.get("calls") or {})
+                for t in data["turns"]
+            ]
+            conversations.append(EvalConversation(id=str(data.get("id", number)), turns=turns))
+    return conversations
+
+
+# --------------------------------------------------------------------
+# Recorded responses
+# --------------------------------------------------------------------
+
+
+def _content(message: dict) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+    return content
+
+
+def _tools(context) -> list:
+    return list(getattr(context.tools, "standard_tools", []) or [])
+
+
+def request_key(context) -> str:
+    """Replay key of one LLM request: the node's functions and the conversation.
+
+    Tool results and call ids are left out, so handlers whose results change
+    between runs (timestamps, Monte Carlo plans) still replay.
+    """
+    conversation = []
+    for message in context.get_messages():
+        if not isinstance(message, dict) or message.get("role") == "tool":
+            continue
+        calls = [c.get("function", {}).get("name") for c in message.get("tool_calls") or []]
+        conversation.append([message.get("role"), _content(message), calls])
+    names = sorted(t.name for t in _tools(context))
+    payload = json.dumps([names, conversation], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ReplayStore:
+    """Recorded LLM responses keyed by ``request_key``, in one JSON file."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.responses: Dict[str, dict] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.responses = json.load(f)
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.responses.get(key)
+
+    def put(self, key: str, text: str, calls: List[dict], usage: Optional[dict] = None):
+        self.responses[key] = {"text": text, "calls": calls, "usage": usage}
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.responses, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+
+# --------------------------------------------------------------------
+# Offline LLMs
+# --------------------------------------------------------------------
+
+
+class _TextLLM(LLMService):
+    """Base of the offline LLMs: answers every context frame with ``_respond``."""
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, LLMContextFrame):
+            await self.push_frame(LLMFullResponseStartFrame())
+            try:
+                await self._respond(frame.context)
+            finally:
+                await self.push_frame(LLMFullResponseEndFrame())
+        else:
+            await self.push_frame(frame, direction)
+
+    async def run_inference(self, context) -> Optional[str]:
+        # Context compaction falls back to its extractive summary
+        return None
+
+    async def _respond(self, context):
+        raise NotImplementedError
+
+    async def _call(self, context, calls: List[Tuple[str, dict]]):
+        await self.run_function_calls(
+            [
+                FunctionCallFromLLM(
+                    function_name=name,
+                    tool_call_id=f"call_{uuid.uuid4().hex[:12]}",
+                    arguments=arguments,
+                    context=context,
+                )
+                for name, arguments in calls
+            ]
+        )
+
+
+# Amounts: "1800", "2,200", "2 hazaar", "80k", "2 lakh"; counts such as
+# "12 rides" are skipped
+_AMOUNT = re.compile(
+    r"(?<![\w.])(\d[\d,]*(?:\.\d+)?)(?:\s*(k|hazaa?r|thousand|lakh|lac|हज़ार|हजार|लाख))?(?![\w])"
+)
+_MULTIPLIERS = {"k": 1e3, "hazar": 1e3, "hazaar": 1e3, "thousand": 1e3, "हज़ार": 1e3, "हजार": 1e3}
+_MULTIPLIERS.update({"lakh": 1e5, "lac": 1e5, "लाख": 1e5})
+_COUNT = re.compile(
+    r"\s*(rides?|trips?|orders?|deliveries|hours?|ghante|km|days?|din|months?|mahine|saal|years?)\b"
+)
+_CLAUSE = re.compile(r"[;.?!।]|,\s|\s(?:and|aur|but|par|lekin|और|पर)\s")
+_EXPENSE_WORDS = re.compile(
+    r"spen[dt]|spent|kharch|petrol|diesel|fuel|cng|food|khana|emi|rent|kiraya|bill|paid|cost|"
+    r"gaye|gaya|lage|laga|खर्च|पेट्रोल|किराया"
+)
+_INCOME_WORDS = re.compile(r"earn|made|make|kama|income|aaye|mile|कमा|कमाई")
+_GOAL_NOUNS = [
+    "school fees", "bike loan", "emergency fund", "loan", "phone", "bike", "scooter", "auto",
+    "car", "house", "ghar", "shaadi", "wedding", "fees", "बाइक", "स्कूटर", "घर", "फोन",
+]
+_NEW = re.compile(r"(?<![\w])(new|nayi|naya|nai)(?![\w])|नया|नई")
+_TOPIC_QUESTION = [
+    re.compile(r"(?:what is|what's|what are|explain)\s+(?:an?\s+|the\s+)?([\w ]+?)\s*(?:[?,.]|$)"),
+    re.compile(r"([\w ]+?)\s+(?:kya hota hai|kya hai|ka matlab|samjhao)"),
+]
+
+
+def amounts(text: str) -> List[float]:
+    """Money amounts in a transcript, in order."""
+    found = []
+    for match in _AMOUNT.finditer(text.lower()):
+        if not match.group(2) and _COUNT.match(text.lower(), match.end()):
+            continue
+        value = float(match.group(1).replace(",", ""))
+        found.append(value * _MULTIPLIERS.get(match.group(2) or "", 1.0))
+    return found
+
+
+def _income_expenses(text: str) -> Tuple[Optional[float], Optional[float]]:
+    income, expenses = None, None
+    for clause in _CLAUSE.split(text.lower()):
+        for value in amounts(clause):
+            if _EXPENSE_WORDS.search(clause) and not _INCOME_WORDS.search(clause):
+                expenses = (expenses or 0.0) + value
+            elif income is None:
+                income = value
+            else:
+                expenses = (expenses or 0.0) + value
+    return income, expenses
+
+
+def savings_arguments(texts: List[str]) -> Optional[dict]:
+    income, expenses = _income_expenses(texts[-1])
+    # Income mentioned in an earlier turn, as in "1900 aaye" ... "550 kharcha"
+    for text in reversed(texts[:-1]):
+        if income is not None:
+            break
+        income = _income_expenses(text)[0]
+    if income is None:
+        return None
+    args = {"income": income}
+    if expenses is not None:
+        args["expenses"] = expenses
+    return args
+
+
+def goal_arguments(texts: List[str]) -> Optional[dict]:
+    text = texts[-1].lower()
+    noun = next((n for n in _GOAL_NOUNS if re.search(rf"(?<![\w]){n}(?![\w])" if n.isascii() else n, text)), None)
+    if noun is None:
+        return None
+    args = {"goal": f"new {noun}" if _NEW.search(text) else noun}
+    values = amounts(text)
+    if values:
+        args["target_amount"] = max(values)
+    return args
+
+
+def concept_arguments(texts: List[str]) -> Optional[dict]:
+    text = texts[-1]
+    topic = normalize_topic(text)
+    if topic is not None:
+        return {"topic": TOPICS[topic][0]}
+    for pattern in _TOPIC_QUESTION:
+        match = pattern.search(text.lower())
+        if match and match.group(1).strip():
+            return {"topic": match.group(1).strip()}
+    return {"topic": " ".join(text.split()[:6])}
+
+
+class RuleLLM(_TextLLM):
+    """Deterministic local LLM: keyword routing and regex arguments.
+
+    - At entry, a new user message is routed with ``intent_router.classify``.
+    - In a skill node, the node's function is called with arguments taken from
+      the user's messages, or a question is asked if a required one is missing.
+    - Otherwise it says something short and the turn is over.
+    """
+
+    # Node function -> (argument builder, question when it returns None)
+    SKILLS: Dict[str, Tuple[Callable[[List[str]], Optional[dict]], str]] = {
+        "compute_savings_advice": (savings_arguments, "How much did you earn today?"),
+        "register_concept": (concept_arguments, ""),
+        "acknowledge_stress": (lambda texts: {}, ""),
+        "store_goal": (goal_arguments, "What would you like to save for?"),
+    }
+
+    async def _respond(self, context):
+        names = [t.name for t in _tools(context)]
+        messages = [m for m in context.get_messages() if isinstance(m, dict)]
+        texts = [_content(m) for m in messages if m.get("role") == "user"]
+        last_role = messages[-1].get("role") if messages else None
+
+        routes = [name for name in names if name.startswith("route_to_")]
+        if routes:
+            if last_role == "user":
+                route = classify(texts[-1]).route
+                if route in routes:
+                    await self._call(context, [(route, {})])
+                    return
+                await self.push_frame(LLMTextFrame("Is this about today's money, a goal, or something else?"))
+            else:
+                await self.push_frame(LLMTextFrame("Namaste! How did your day go?" if not texts else "Anything else?"))
+            return
+
+        for name in names:
+            if name not in self.SKILLS or not texts:
+                continue
+            build, question = self.SKILLS[name]
+            arguments = build(texts)
+            if arguments is None:
+                await self.push_frame(LLMTextFrame(question))
+                return
+            await self.push_frame(LLMTextFrame("Okay, let us look at that together."))
+            await self._call(context, [(name, arguments)])
+            return
+        await self.push_frame(LLMTextFrame("Okay."))
+
+
+class ReplayLLM(_TextLLM):
+    """Answers from a ``ReplayStore``; requests without a recording get no reply."""
+
+    def __init__(self, store: ReplayStore, **kwargs):
+        super().__init__(**kwargs)
+        self._store = store
+        self.misses = 0
+
+    async def _respond(self, context):
+        response = self._store.get(request_key(context))
+        if response is None:
+            self.misses += 1
+            return
+        if response.get("usage"):
+            usage = LLMTokenUsage(**response["usage"])
+            await self.push_frame(MetricsFrame(data=[LLMUsageMetricsData(processor=self.name, value=usage)]))
+        if response.get("text"):
+            await self.push_frame(LLMTextFrame(response["text"]))
+        if response.get("calls"):
+            await self._call(context, [(c["name"], c["arguments"]) for c in response["calls"]])
+
+
+# --------------------------------------------------------------------
+# Probe
+# --------------------------------------------------------------------
+
+
+@dataclass
+class TurnRecord:
+    nodes: List[str] = field(default_factory=list)
+    calls: List[Tuple[str, dict]] = field(default_factory=list)
+
+
+class EvalProbe(FrameProcessor):
+    """Measures the LLM's requests; place it right before the LLM.
+
+    ``responses()`` returns the companion processor that goes right after the
+    LLM. A response without function calls completes the turn.
+    """
+
+    def __init__(self, flow_manager: Callable[[], Any], store: Optional[ReplayStore] = None, **kwargs):
+        """Initialize the probe.
+
+        Args:
+            flow_manager: Returns the conversation's FlowManager.
+            store: Where to record responses, if recording.
+        """
+        super().__init__(**kwargs)
+        self._flow_manager = flow_manager
+        self._store = store
+        self._pending: deque = deque()
+        self.turn = TurnRecord()
+        self.turn_done = asyncio.Event()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.request_secs: List[float] = []
+
+    def start_turn(self) -> TurnRecord:
+        self.turn = TurnRecord()
+        self.turn_done.clear()
+        return self.turn
+
+    def responses(self) -> "_ResponseProbe":
+        return _ResponseProbe(self)
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, LLMContextFrame) and direction == FrameDirection.DOWNSTREAM:
+            context = frame.context
+            self.turn.nodes.append(self._flow_manager().current_node or ENTRY_NODE)
+            tools = json.dumps([t.to_default_dict() for t in _tools(context)], ensure_ascii=False)
+            estimate = estimate_tokens(context.get_messages()) + len(tools) // CHARS_PER_TOKEN
+            key = request_key(context) if self._store is not None else None
+            self._pending.append((time.perf_counter(), estimate, key))
+        await self.push_frame(frame, direction)
+
+    def _finish(self, text: str, calls: List[Tuple[str, dict]], usage: Optional[LLMTokenUsage]):
+        if not self._pending:
+            return
+        started, estimate, key = self._pending.popleft()
+        self.request_secs.append(time.perf_counter() - started)
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens
+            self.completion_tokens += usage.completion_tokens
+        else:
+            self.prompt_tokens += estimate
+            self.completion_tokens += (len(text) + len(json.dumps([c[1] for c in calls]))) // CHARS_PER_TOKEN
+        if key is not None:
+            self._store.put(
+                key,
+                text,
+                [{"name": name, "arguments": arguments} for name, arguments in calls],
+                usage.model_dump(exclude_none=True) if usage is not None else None,
+            )
+        self.turn.calls.extend(calls)
+        if not calls:
+            self.turn_done.set()
+
+
+class _ResponseProbe(FrameProcessor):
+    """Collects one LLM response at a time for ``EvalProbe``."""
+
+    def __init__(self, probe: EvalProbe, **kwargs):
+        super().__init__(**kwargs)
+        self._probe = probe
+        self._text: List[str] = []
+        self._calls: List[Tuple[str, dict]] = []
+        self._usage: Optional[LLMTokenUsage] = None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        # Function call and metrics frames are system frames and can overtake
+        # the response start, so a response is collected until its end
+        if direction == FrameDirection.DOWNSTREAM:
+            if isinstance(frame, LLMTextFrame):
+                self._text.append(frame.text)
+            elif isinstance(frame, FunctionCallsStartedFrame):
+                self._calls.extend((c.function_name, dict(c.arguments or {})) for c in frame.function_calls)
+            elif isinstance(frame, MetricsFrame):
+                for data in frame.data:
+                    if isinstance(data, LLMUsageMetricsData):
+                        self._usage = data.value
+            elif isinstance(frame, LLMFullResponseEndFrame):
+                self._probe._finish("".join(self._text), self._calls, self._usage)
+                self._text, self._calls, self._usage = [], [], None
+        await self.push_frame(frame, direction)
+
+
+# --------------------------------------------------------------------
+# Runner
+# --------------------------------------------------------------------
+
+
+@dataclass
+class TurnScore:
+    expected_node: Optional[str]
+    node: str
+    calls_expected: int
+    calls_made: int
+    # (argument name, correct) for every expected argument
+    arguments: List[Tuple[str, bool]] = field(default_factory=list)
+
+
+@dataclass
+class ConversationOutcome:
+    id: str
+    turns: List[TurnScore] = field(default_factory=list)
+    llm_requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    request_secs: List[float] = field(default_factory=list)
+    wall_secs: float = 0.0
+    replay_misses: int = 0
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "turns": len(self.turns),
+            "routed": [t.node for t in self.turns],
+            "llm_requests": self.llm_requests,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "wall_secs": round(self.wall_secs, 3),
+            "replay_misses": self.replay_misses,
+            "error": self.error,
+        }
+
+
+_STOPWORDS = {"a", "an", "the", "my", "for", "to", "of"}
+
+
+def _words(value: Any) -> set:
+    words = (w.strip(string.punctuation + "।") for w in str(value).lower().split())
+    return {w for w in words if w and w not in _STOPWORDS}
+
+
+def argument_matches(expected: Any, observed: Any) -> bool:
+    """Numbers within 1% (or 1 rupee); strings when one's words contain the other's."""
+    if observed is None:
+        return False
+    if isinstance(expected, (int, float)) and not isinstance(expected, bool):
+        try:
+            observed = float(observed)
+        except (TypeError, ValueError):
+            return False
+        return abs(observed - expected) <= max(1.0, abs(expected) * 0.01)
+    want, got = _words(expected), _words(observed)
+    return bool(want and got) and (want <= got or got <= want)
+
+
+def score_turn(turn: EvalTurn, record: TurnRecord) -> TurnScore:
+    node = next((n for n in record.nodes if n != ENTRY_NODE), ENTRY_NODE)
+    made = dict(record.calls)  # the last call of each function counts
+    score = TurnScore(
+        expected_node=turn.node,
+        node=node,
+        calls_expected=len(turn.calls),
+        calls_made=sum(1 for name in turn.calls if name in made),
+    )
+    for name, expected in turn.calls.items():
+        observed = made.get(name, {})
+        for key, value in expected.items():
+            score.arguments.append((key, argument_matches(value, observed.get(key))))
+    return score
+
+
+async def run_conversation(
+    conversation: EvalConversation,
+    llm_factory: Callable[[], LLMService],
+    record_to: Optional[ReplayStore] = None,
+    router: Optional[str] = None,
+    turn_timeout: float = 30.0,
+) -> ConversationOutcome:
+    """Replay one conversation through the flow graph, text only."""
+    import nivest_bot
+    from pipecat_flows import FlowManager
+
+    outcome = ConversationOutcome(id=conversation.id)
+    started = time.perf_counter()
+    llm = llm_factory()
+    context = LLMContext()
+    context_aggregator = LLMContextAggregatorPair(context)
+    flow_manager = None
+    probe = EvalProbe(flow_manager=lambda: flow_manager, store=record_to)
+
+    pipeline = Pipeline(
+        [
+            context_aggregator.user(),
+            ContextBudget(context=context, llm=llm, state=lambda: flow_manager.state),
+            IntentRouter(routes=nivest_bot.INTENT_ROUTES, flow_manager=lambda: flow_manager, mode=router),
+            probe,
+            llm,
+            probe.responses(),
+            context_aggregator.assistant(),
+        ]
+    )
+    task = PipelineTask(pipeline, params=PipelineParams(enable_usage_metrics=True))
+    flow_manager = FlowManager(
+        task=task,
+        llm=llm,
+        context_aggregator=context_aggregator,
+        global_functions=list(nivest_bot.GLOBAL_FUNCTIONS),
+    )
+
+    @task.event_handler("on_pipeline_started")
+    async def on_pipeline_started(task, frame):
+        await flow_manager.initialize(nivest_bot.create_entry_node())
+
+    runner = PipelineRunner(handle_sigint=False)
+    running = asyncio.create_task(runner.run(task))
+    try:
+        await asyncio.wait_for(probe.turn_done.wait(), turn_timeout)  # greeting
+        for turn in conversation.turns:
+            record = probe.start_turn()
+            if outcome.error is None:
+                await task.queue_frame(
+                    LLMMessagesAppendFrame([{"role": "user", "content": turn.user}], run_llm=True)
+                )
+                try:
+                    await asyncio.wait_for(probe.turn_done.wait(), turn_timeout)
+                except asyncio.TimeoutError:
+                    outcome.error = f"turn {len(outcome.turns) + 1} timed out"
+            # Turns after a timeout count as missed
+            outcome.turns.append(score_turn(turn, record))
+    except asyncio.TimeoutError:
+        outcome.error = "greeting timed out"
+        outcome.turns = [score_turn(turn, TurnRecord()) for turn in conversation.turns]
+    finally:
+        await task.cancel()
+        await running
+
+    outcome.llm_requests = len(probe.request_secs)
+    outcome.prompt_tokens = probe.prompt_tokens
+    outcome.completion_tokens = probe.completion_tokens
+    outcome.request_secs = probe.request_secs
+    outcome.replay_misses = getattr(llm, "misses", 0)
+    outcome.wall_secs = time.perf_counter() - started
+    return outcome
+
+
+async def run_eval(
+    conversations: List[EvalConversation],
+    llm_factory: Callable[[], LLMService],
+    concurrency: int = 8,
+    record_to: Optional[ReplayStore] = None,
+    router: Optional[str] = None,
+    turn_timeout: float = 30.0,
+) -> List[ConversationOutcome]:
+    """Run every conversation, at most ``concurrency`` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(conversation: EvalConversation) -> ConversationOutcome:
+        async with semaphore:
+            return await run_conversation(conversation, llm_factory, record_to, router, turn_timeout)
+
+    return await asyncio.gather(*(one(c) for c in conversations))
+
+
+# --------------------------------------------------------------------
+# Report
+# --------------------------------------------------------------------
+
+
+def _ratio(hits: int, total: int) -> Optional[float]:
+    return round(hits / total, 3) if total else None
+
+
+def report(outcomes: List[ConversationOutcome]) -> Dict[str, Any]:
+    """Aggregate accuracy, token and latency figures over all conversations."""
+    turns = [t for o in outcomes for t in o.turns]
+    labelled = [t for t in turns if t.expected_node]
+    arguments = [a for t in turns for a in t.arguments]
+
+    routing = {"all": _ratio(sum(t.node == t.expected_node for t in labelled), len(labelled))}
+    for node in sorted({t.expected_node for t in labelled}):
+        group = [t for t in labelled if t.expected_node == node]
+        routing[node] = _ratio(sum(t.node == node for t in group), len(group))
+
+    argument_accuracy = {"all": _ratio(sum(ok for _, ok in arguments), len(arguments))}
+    for name in sorted({name for name, _ in arguments}):
+        group = [ok for n, ok in arguments if n == name]
+        argument_accuracy[name] = _ratio(sum(group), len(group))
+
+    return {
+        "conversations": len(outcomes),
+        "turns": len(turns),
+        "errors": sum(1 for o in outcomes if o.error),
+        "replay_misses": sum(o.replay_misses for o in outcomes),
+        "routing_accuracy": routing,
+        "call_recall": _ratio(sum(t.calls_made for t in turns), sum(t.calls_expected for t in turns)),
+        "argument_accuracy": argument_accuracy,
+        "llm_requests_per_turn": _ratio(sum(o.llm_requests for o in outcomes), len(turns)),
+        "prompt_tokens": summarize([o.prompt_tokens for o in outcomes]),
+        "completion_tokens": summarize([o.completion_tokens for o in outcomes]),
+        "total_tokens": sum(o.prompt_tokens + o.completion_tokens for o in outcomes),
+        "llm_request_secs": summarize([s for o in outcomes for s in o.request_secs]),
+        "conversation_secs": summarize([o.wall_secs for o in outcomes]),
+    }
+
+
+def format_report(summary: Dict[str, Any]) -> str:
+    def pct(value):
+        return "-" if value is None else f"{value * 100:.1f}%"
+
+    lines = [
+        f"{summary['conversations']} conversations, {summary['turns']} turns, "
+        f"{summary['errors']} errors, {summary['replay_misses']} replay misses",
+        "",
+        "routing accuracy:",
+    ]
+    lines += [f"  {node:<18} {pct(value):>7}" for node, value in summary["routing_accuracy"].items()]
+    lines += ["", f"call recall:           {pct(summary['call_recall'])}", "argument accuracy:"]
+    lines += [f"  {name:<18} {pct(value):>7}" for name, value in summary["argument_accuracy"].items()]
+    lines += [
+        "",
+        f"LLM requests per turn: {summary['llm_requests_per_turn']}",
+        f"total tokens:          {summary['total_tokens']}",
+        f"{'per conversation':<18} {'p50':>8} {'p95':>8} {'max':>8}",
+    ]
+    for name in ("prompt_tokens", "completion_tokens"):
+        s = summary[name]
+        lines.append(f"  {name:<16} {s['p50']:>8.0f} {s['p95']:>8.0f} {s['max']:>8.0f}")
+    for name in ("llm_request_secs", "conversation_secs"):
+        s = summary[name]
+        lines.append(
+            f"  {name.replace('_secs', ' ms'):<16} {s['p50'] * 1000:>8.1f} {s['p95'] * 1000:>8.1f} "
+            f"{s['max'] * 1000:>8.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS, help="JSONL corpus of conversations")
+    parser.add_argument("--llm", choices=("rules", "replay", "live"), default="rules")
+    parser.add_argument("--store", help="Recorded responses for --llm replay")
+    parser.add_argument("--record", help="Save --llm live responses to this store")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--router", choices=("on", "shadow", "off"), help="Intent router mode (default INTENT_ROUTER)")
+    parser.add_argument("--turn-timeout", type=float, default=30.0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    conversations = load_corpus(args.corpus)
+    record_to = None
+    if args.llm == "replay":
+        if not args.store:
+            parser.error("--llm replay needs --store")
+        store = ReplayStore(args.store)
+        llm_factory = lambda: ReplayLLM(store)  # noqa: E731
+    elif args.llm == "live":
+        from utils import create_llm
+
+        llm_factory = create_llm
+        record_to = ReplayStore(args.record) if args.record else None
+    else:
+        llm_factory = RuleLLM
+
+    outcomes = asyncio.run(
+        run_eval(conversations, llm_factory, args.concurrency, record_to, args.router, args.turn_timeout)
+    )
+    if record_to is not None:
+        record_to.save()
+
+    summary = report(outcomes)
+    if args.json:
+        print(json.dumps({"summary": summary, "conversations": [o.to_dict() for o in outcomes]}, indent=2))
+        return
+    print(format_report(summary))
+    failed = [o for o in outcomes if o.error]
+    for outcome in failed:
+        print(f"  {outcome.id}: {outcome.error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Drives ``nivest_bot.run_bot`` through scripted conversations and times each turn.
+
+Every conversation uses a fresh set of offline services (see
+``offline_services``) and the in-memory transport. For each user turn we record:
+
+- time-to-first-audio (TTFA): end of user speech -> first bot audio written
+- turn time: end of user speech -> last bot audio written for the turn
+- node-transition overhead: LLM function call -> next LLM request, i.e. the time
+  Pipecat Flows spends running the handler and switching nodes
+"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from pipecat.runner.types import RunnerArguments
+
+from offline_services import (
+    DEFAULT_SCRIPT,
+    InMemoryTransport,
+    LatencyProfile,
+    OfflineServices,
+    ScriptedTurn,
+    scripted_interims,
+    use_offline_services,
+)
+
+# --------------------------------------------------------------------
+# Results
+# --------------------------------------------------------------------
+
+
+@dataclass
+class TurnTiming:
+    node: str
+    ttfa_secs: float
+    turn_secs: float
+
+
+@dataclass
+class ConversationResult:
+    turns: List[TurnTiming] = field(default_factory=list)
+    transitions: List[tuple[str, str, float]] = field(default_factory=list)
+    nodes_seen: List[str] = field(default_factory=list)
+    wall_secs: float = 0.0
+
+
+def percentile(values: Iterable[float], pct: float) -> float:
+    """Linear-interpolated percentile (same definition as numpy's default)."""
+    ordered = sorted(values)
+    if not ordered:
+        return math.nan
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return ordered[low]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else math.nan,
+    }
+
+
+# --------------------------------------------------------------------
+# Runner
+# --------------------------------------------------------------------
+
+
+async def run_conversation(
+    script: Optional[List[ScriptedTurn]] = None,
+    profile: Optional[LatencyProfile] = None,
+    turn_timeout: float = 30.0,
+) -> ConversationResult:
+    """Run one scripted conversation through ``run_bot`` and time every turn."""
+    import nivest_bot
+
+    script = list(script or DEFAULT_SCRIPT)
+    services = OfflineServices(script, profile)
+    transport = InMemoryTransport(services.profile)
+    output = transport.output()
+    result = ConversationResult()
+    started = time.perf_counter()
+
+    with use_offline_services(services):
+        bot = asyncio.create_task(
+            nivest_bot.run_bot(transport, RunnerArguments())
+        )
+        try:
+            # Greeting
+            await asyncio.wait_for(services.llm.turn_done.wait(), turn_timeout)
+            await output.wait_until_quiet(timeout=turn_timeout)
+
+            for turn in script:
+                services.llm.turn_done.clear()
+                services.stt.queue_transcript(
+                    turn.user_text, scripted_interims(turn, services.profile.stt_interim_secs)
+                )
+                first_index = len(output.audio_times)
+                speech_end = await transport.input().say(turn.speech_secs)
+                await asyncio.wait_for(services.llm.turn_done.wait(), turn_timeout)
+                await output.wait_until_quiet(timeout=turn_timeout)
+
+                audio = [t for t in output.audio_times[first_index:] if t >= speech_end]
+                if not audio:
+                    raise RuntimeError(f"no bot audio for turn {turn.user_text!r}")
+                result.turns.append(
+                    TurnTiming(
+                        node=turn.node,
+                        ttfa_secs=audio[0] - speech_end,
+                        turn_secs=audio[-1] - speech_end,
+                    )
+                )
+        finally:
+            await transport.disconnect()
+            await asyncio.wait_for(bot, turn_timeout)
+
+    result.transitions = list(services.llm.transitions)
+    result.nodes_seen = list(services.llm.nodes_seen)
+    result.wall_secs = time.perf_counter() - started
+    return result
+
+
+async def run_benchmark(
+    iterations: int = 3,
+    script: Optional[List[ScriptedTurn]] = None,
+    profile: Optional[LatencyProfile] = None,
+) -> List[ConversationResult]:
+    """Run ``iterations`` conversations back to back."""
+    results = []
+    for i in range(iterations):
+        if profile is not None:
+            profile = LatencyProfile(**{**profile.__dict__, "seed": profile.seed + i})
+        results.append(await run_conversation(script, profile))
+    return results
+
+
+def report(results: List[ConversationResult]) -> Dict[str, Dict[str, float]]:
+    """Aggregate conversation results into percentile summaries."""
+    turns = [t for r in results for t in r.turns]
+    transitions = [t for r in results for t in r.transitions]
+
+    summary = {
+        "ttfa": summarize([t.ttfa_secs for t in turns]),
+        "turn": summarize([t.turn_secs for t in turns]),
+        "transition": summarize([secs for _, _, secs in transitions]),
+    }
+    for node in sorted({t.node for t in turns}):
+        summary[f"ttfa[{node}]"] = summarize([t.ttfa_secs for t in turns if t.node == node])
+    for source, target in sorted({(s, d) for s, d, _ in transitions}):
+        summary[f"transition[{source}->{target}]"] = summarize(
+            [secs for s, d, secs in transitions if (s, d) == (source, target)]
+        )
+    return summary
+
+
+def format_report(summary: Dict[str, Dict[str, float]]) -> str:
+    width = max(len(name) for name in summary)
+    lines = [f"{'metric':<{width}}  {'n':>4}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}"]
+    for name, stats in summary.items():
+        lines.append(
+            f"{name:<{width}}  {stats['count']:>4}  {stats['p50'] * 1000:>8.1f}  "
+            f"{stats['p95'] * 1000:>8.1f}  {stats['p99'] * 1000:>8.1f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,156 @@
+"""Time-to-first-token with and without provider failover / hedging.
+
+Two fake providers (``offline_services.FakeProviderLLM``) model a fast primary
+with a slow tail and occasional errors, and a somewhat slower backup. The same
+sequence of requests is sent through a real Pipecat pipeline for:
+
+- ``primary``: the primary provider alone (what ``create_llm`` gives today)
+- ``failover``: primary then backup, abandoning an attempt after ``--timeout``
+- ``hedged``: as failover, plus a backup request after ``--hedge-after``
+- ``adaptive``: hedged, with providers ordered by measured latency
+
+Usage:
+    python -m benchmarks.llm_failover
+    python -m benchmarks.llm_failover --requests 100 --tail-prob 0.2 --json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    Frame,
+    LLMContextFrame,
+    LLMFullResponseEndFrame,
+    LLMTextFrame,
+    StartFrame,
+)
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineTask
+from pipecat.processors.aggregators.llm_context import LLMContext
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from benchmarks.harness import summarize
+from llm_failover import FailoverLLMService
+from offline_services import FakeProviderLLM
+
+
+class _Collector(FrameProcessor):
+    """Records when the first token and the end of each response arrive."""
+
+    def __init__(self):
+        super().__init__()
+        self.started = asyncio.Event()
+        self.done = asyncio.Event()
+        self.first_text = None
+
+    def reset(self):
+        self.done.clear()
+        self.first_text = None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, StartFrame):
+            self.started.set()
+        elif isinstance(frame, LLMTextFrame) and self.first_text is None:
+            self.first_text = time.monotonic()
+        elif isinstance(frame, LLMFullResponseEndFrame):
+            self.done.set()
+        await self.push_frame(frame, direction)
+
+
+async def run_scenario(llm, requests: int, timeout: float) -> dict:
+    collector = _Collector()
+    task = PipelineTask(Pipeline([llm, collector]))
+    runner = asyncio.create_task(PipelineRunner(handle_sigint=False).run(task))
+    await asyncio.wait_for(collector.started.wait(), 10)
+
+    ttfts, failed = [], 0
+    for i in range(requests):
+        collector.reset()
+        context = LLMContext(messages=[{"role": "user", "content": f"Request {i}"}])
+        started = time.monotonic()
+        await task.queue_frame(LLMContextFrame(context))
+        await asyncio.wait_for(collector.done.wait(), timeout)
+        if collector.first_text is None:
+            failed += 1
+        else:
+            ttfts.append(collector.first_text - started)
+
+    await task.cancel()
+    await runner
+    return {**summarize(ttfts), "failed": failed}
+
+
+def _providers(args):
+    primary = FakeProviderLLM(
+        "primary",
+        ttft_secs=args.primary_ttft,
+        tail_prob=args.tail_prob,
+        tail_secs=args.tail_secs,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    backup = FakeProviderLLM(
+        "backup",
+        ttft_secs=args.backup_ttft,
+        tail_prob=args.tail_prob / 2,
+        tail_secs=args.tail_secs,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    return {"primary": primary, "backup": backup}
+
+
+def build(name: str, args):
+    providers = _providers(args)
+    if name == "primary":
+        return providers["primary"]
+    return FailoverLLMService(
+        providers,
+        ttft_timeout=args.timeout,
+        hedge_after=args.hedge_after if name in ("hedged", "adaptive") else None,
+        adaptive=name == "adaptive",
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--primary-ttft", type=float, default=0.35)
+    parser.add_argument("--backup-ttft", type=float, default=0.5)
+    parser.add_argument("--tail-prob", type=float, default=0.1, help="Chance of a slow primary response")
+    parser.add_argument("--tail-secs", type=float, default=3.0)
+    parser.add_argument("--error-rate", type=float, default=0.03)
+    parser.add_argument("--timeout", type=float, default=1.5, help="First-token timeout per attempt")
+    parser.add_argument("--hedge-after", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+    logger.remove()
+    logger.add(sys.stderr, level="CRITICAL")  # expected provider errors are noisy
+
+    results = {}
+    for name in ("primary", "failover", "hedged", "adaptive"):
+        results[name] = asyncio.run(
+            run_scenario(build(name, args), args.requests, timeout=args.tail_secs * 3)
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scenario':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'failed':>7}")
+    for name, r in results.items():
+        print(
+            f"{name:<10} {r['p50'] * 1000:>8.0f} {r['p95'] * 1000:>8.0f} "
+            f"{r['p99'] * 1000:>8.0f} {r['max'] * 1000:>8.0f} {r['failed']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
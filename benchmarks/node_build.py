@@ -0,0 +1,89 @@
+"""Microbenchmark: building node configs from scratch vs. the node registry.
+
+Before the registry every transition rebuilt the target node: nested handler
+closures, ``FlowsFunctionSchema`` objects and the prompt dicts. The
+``_build_*_node`` builders still do exactly that work (minus the closures), so
+calling them directly is the "rebuild" baseline; ``create_*_node`` is what a
+transition costs now.
+
+Usage:
+    python -m benchmarks.node_build
+    python -m benchmarks.node_build --number 20000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+from loguru import logger
+
+os.environ.setdefault("DEEPGRAM_API_KEY", "offline")
+os.environ.setdefault("SARVAM_API_KEY", "offline")
+
+import nivest_bot  # noqa: E402
+
+NODES = [
+    ("entry", nivest_bot._build_entry_node, nivest_bot.create_entry_node),
+    ("daily_advice", nivest_bot._build_daily_advice_node, nivest_bot.create_daily_advice_node),
+    ("concept_teaching", nivest_bot._build_concept_node, nivest_bot.create_concept_node),
+    ("stress_support", nivest_bot._build_stress_node, nivest_bot.create_stress_node),
+    ("goal_setting", nivest_bot._build_goal_node, nivest_bot.create_goal_node),
+]
+
+
+def time_per_call(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def bytes_per_call(func, number: int) -> float:
+    """Return the bytes retained per returned instance."""
+    keep = []
+    func()  # warm caches so we only measure steady state
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    for _ in range(number):
+        keep.append(func())
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (current - base) / number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=5000, help="Calls per measurement")
+    args = parser.parse_args(argv)
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    nivest_bot.NODES.prebuild()
+
+    header = f"{'node':<18} {'rebuild us':>11} {'registry us':>12} {'rebuild B':>10} {'registry B':>11} {'speedup':>8}"
+    print(header)
+    for name, build, create in NODES:
+        t_build = time_per_call(build, args.number)
+        t_cached = time_per_call(create, args.number)
+        b_build = bytes_per_call(build, min(args.number, 2000))
+        b_cached = bytes_per_call(create, min(args.number, 2000))
+        print(
+            f"{name:<18} {t_build * 1e6:>11.2f} {t_cached * 1e6:>12.2f} "
+            f"{b_build:>10.0f} {b_cached:>11.0f} {t_build / t_cached:>7.1f}x"
+        )
+
+    # A typical turn transitions entry -> skill -> entry.
+    per_turn_build = time_per_call(
+        lambda: (nivest_bot._build_daily_advice_node(), nivest_bot._build_entry_node()), args.number
+    )
+    per_turn_cached = time_per_call(
+        lambda: (nivest_bot.create_daily_advice_node(), nivest_bot.create_entry_node()), args.number
+    )
+    print()
+    print(
+        f"per turn (skill + entry): rebuild {per_turn_build * 1e6:.2f} us, "
+        f"registry {per_turn_cached * 1e6:.2f} us, saved {(per_turn_build - per_turn_cached) * 1e6:.2f} us"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Savings planner latency: cold plans, cached plans and a day-by-day baseline.
+
+Builds a ledger with a year of synthetic gig-worker history (variable
+earnings, about one day off a week, daily petrol/food spends) and three goals,
+then times ``SavingsPlanner.plan``:
+
+- ``weekly``: the planner as shipped (7-day block bootstrap, one cumulative
+  sum per simulated week).
+- ``daily``: the same model drawn one day at a time, the straightforward
+  NumPy version, for comparison.
+- ``cached``: a repeated call while the ledger is unchanged.
+
+A plan has to fit inside a voice turn; the budget is 20 ms.
+
+Usage:
+    python -m benchmarks.savings_planner
+    python -m benchmarks.savings_planner --paths 1000 2000 5000 10000 --json
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.harness import summarize
+from ledger import Ledger
+from savings_planner import SavingsPlanner
+
+GOALS = [
+    {"goal": "Emergency fund", "target_amount": 15000},
+    {"goal": "New phone", "target_amount": 12000},
+    {"goal": "Bike down payment", "target_amount": 40000},
+]
+BUDGET_MS = 20.0
+
+
+def build_ledger(days: int, seed: int = 1) -> Ledger:
+    rng = np.random.default_rng(seed)
+    ledger = Ledger()
+    start = time.time() - days * 86400
+    for day in range(days):
+        ts = start + day * 86400 + 12 * 3600
+        if rng.random() > 0.15:
+            for _ in range(rng.integers(1, 4)):
+                ledger.record("earning", round(float(rng.lognormal(6.3, 0.45)), 0), "rides", ts)
+            ledger.record("expense", round(float(rng.uniform(150, 350)), 0), "petrol", ts)
+        ledger.record("expense", round(float(rng.uniform(80, 200)), 0), "food", ts)
+    return ledger
+
+
+class DailyPlanner(SavingsPlanner):
+    """Baseline: bootstrap single days instead of 7-day blocks."""
+
+    def _simulate(self, income, expenses, goals):
+        plan = super()._simulate(income, expenses, ())
+        if plan is None:
+            return None
+        surplus = np.maximum(income - expenses, 0.0)
+        saved = np.minimum(surplus, plan.recommended_daily).astype(np.float32)
+        samples = saved[self._rng.integers(0, saved.size, size=(self.horizon_days, self.paths))]
+        cumulative = np.cumsum(samples, axis=0)
+        remaining = np.sort([g["target_amount"] for g in goals]).astype(np.float64)
+        count = remaining.size
+        thresholds = np.cumsum(remaining) - remaining + remaining * (count - np.arange(count))
+        for threshold in thresholds:
+            days = np.count_nonzero(cumulative < threshold, axis=0).astype(np.float64)
+            days[days >= self.horizon_days] = np.inf
+            self._percentile(days, 0.5)
+            self._percentile(days, self.confidence)
+        return plan
+
+
+def time_plans(planner: SavingsPlanner, ledger: Ledger, repeat: int, cached: bool = False) -> dict:
+    samples = []
+    for i in range(repeat):
+        if not cached:
+            planner._cache.clear()
+        started = time.perf_counter()
+        planner.plan(ledger, GOALS)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365, help="Days of ledger history")
+    parser.add_argument("--paths", type=int, nargs="+", default=[1000, 2000, 5000])
+    parser.add_argument("--horizon", type=int, default=730)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    ledger = build_ledger(args.days)
+    results = {}
+    for paths in args.paths:
+        weekly = SavingsPlanner(paths=paths, horizon_days=args.horizon, seed=7)
+        daily = DailyPlanner(paths=paths, horizon_days=args.horizon, seed=7)
+        weekly.plan(ledger, GOALS)  # warm up NumPy
+        results[paths] = {
+            "weekly": time_plans(weekly, ledger, args.repeat),
+            "daily": time_plans(daily, ledger, args.repeat),
+            "cached": time_plans(weekly, ledger, args.repeat, cached=True),
+        }
+
+    plan = SavingsPlanner(paths=args.paths[0], horizon_days=args.horizon, seed=7).plan(ledger, GOALS)
+    if args.json:
+        print(json.dumps({"plan": plan.to_dict(), "timings": results}, indent=2))
+        return
+
+    print(f"{len(ledger)} ledger entries over {args.days} days; horizon {args.horizon} days")
+    print(f"recommended daily saving: {plan.recommended_daily:.0f} (expected {plan.expected_daily_saving:.0f}/day)")
+    for g in plan.goals:
+        print(f"  {g.goal:<18} {g.target_amount:>8.0f}  median {g.days_median} days, safe {g.days_safe} days")
+    print()
+    print(f"{'paths':>6} {'scenario':<8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for paths, scenarios in results.items():
+        for name, r in scenarios.items():
+            flag = "" if r["p95"] * 1000 <= BUDGET_MS else "  over budget"
+            print(
+                f"{paths:>6} {name:<8} {r['p50'] * 1000:>8.2f} {r['p95'] * 1000:>8.2f} "
+                f"{r['max'] * 1000:>8.2f}{flag}"
+            )
+
+
+if __name__ == "__main__":
+    main()
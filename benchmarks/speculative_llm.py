@@ -0,0 +1,138 @@
+"""Time to first audio with and without speculative LLM requests.
+
+Runs the scripted conversation (``benchmarks.harness``) with interim STT
+results turned on, once as shipped and once with ``SPECULATIVE_LLM=1``
+(speculative_llm.py), for two kinds of callers:
+
+- ``fluent``: interims are growing prefixes of the final transcript, so
+  speculation starts on the final segment, before the VAD closes the turn.
+- ``hesitant``: each utterance pauses halfway. The interim stalls on the
+  first half long enough to look stable, then the caller goes on. The first
+  speculation is discarded and a second one starts on the full text.
+
+Reported per run: time-to-first-audio percentiles, speculation hit rate,
+discarded requests, wasted tokens and the mean LLM latency saved per hit.
+
+The local intent router answers most entry turns without the LLM, which
+would hide the effect; it is off here unless ``--intent-router`` says
+otherwise.
+
+Usage:
+    python -m benchmarks.speculative_llm
+    python -m benchmarks.speculative_llm --iterations 5 --vad-stop 0.5 --json
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import sys
+
+from loguru import logger
+
+# The bot module reads provider keys at import/construct time; none are used here.
+os.environ.setdefault("DEEPGRAM_API_KEY", "offline")
+os.environ.setdefault("SARVAM_API_KEY", "offline")
+
+from benchmarks.harness import report, run_benchmark  # noqa: E402
+from offline_services import DEFAULT_SCRIPT, LatencyProfile, scripted_interims  # noqa: E402
+from speculative_llm import REQUESTS, SAVED_SECONDS, TURNS, WASTED_TOKENS  # noqa: E402
+
+
+def hesitant_script(interval: float) -> list:
+    """DEFAULT_SCRIPT with a pause after the first half of every utterance."""
+    script = []
+    for turn in DEFAULT_SCRIPT:
+        words = turn.user_text.split()
+        half = " ".join(words[: max(2, len(words) // 2)])
+        fluent = scripted_interims(turn, interval)
+        pause = [half] * 4
+        script.append(
+            dataclasses.replace(
+                turn,
+                interims=[t for t in fluent if len(t) < len(half)] + pause + [t for t in fluent if len(t) > len(half)],
+                speech_secs=turn.speech_secs + len(pause) * interval,
+            )
+        )
+    return script
+
+
+def _speculation_counts() -> dict:
+    return {
+        "hit": TURNS.value(result="hit"),
+        "miss": TURNS.value(result="miss"),
+        "none": TURNS.value(result="none"),
+        "discarded": sum(REQUESTS.value(outcome=o) for o in ("mismatch", "superseded", "abandoned")),
+        "wasted_tokens": WASTED_TOKENS.value(kind="prompt") + WASTED_TOKENS.value(kind="completion"),
+        "saved_count": SAVED_SECONDS.count(),
+        "saved_sum": SAVED_SECONDS.sum(),
+    }
+
+
+def run(script, profile: LatencyProfile, iterations: int, speculative: bool) -> dict:
+    os.environ["SPECULATIVE_LLM"] = "1" if speculative else "0"
+    before = _speculation_counts()
+    results = asyncio.run(run_benchmark(iterations, script=script, profile=profile))
+    after = _speculation_counts()
+    delta = {key: after[key] - before[key] for key in after}
+    speculated = delta["hit"] + delta["miss"]
+    return {
+        "ttfa": report(results)["ttfa"],
+        "turns": delta["hit"] + delta["miss"] + delta["none"],
+        "hit_rate": delta["hit"] / speculated if speculated else None,
+        "discarded": int(delta["discarded"]),
+        "wasted_tokens": int(delta["wasted_tokens"]),
+        "saved_mean": delta["saved_sum"] / delta["saved_count"] if delta["saved_count"] else None,
+    }
+
+
+def main(argv=None):
+    defaults = LatencyProfile()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2, help="Conversations per run")
+    parser.add_argument("--interim-interval", type=float, default=0.25, help="Seconds between interim results")
+    parser.add_argument("--stt-latency", type=float, default=defaults.stt_latency_secs)
+    parser.add_argument("--llm-ttft", type=float, default=defaults.llm_ttft_secs)
+    parser.add_argument("--vad-stop", type=float, default=defaults.vad_stop_secs)
+    parser.add_argument("--intent-router", choices=["on", "shadow", "off"], default="off")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+    os.environ["INTENT_ROUTER"] = args.intent_router
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    profile = LatencyProfile(
+        stt_latency_secs=args.stt_latency,
+        stt_interim_secs=args.interim_interval,
+        llm_ttft_secs=args.llm_ttft,
+        vad_stop_secs=args.vad_stop,
+    )
+    scripts = {"fluent": DEFAULT_SCRIPT, "hesitant": hesitant_script(args.interim_interval)}
+    results = {
+        f"{caller}/{'speculative' if speculative else 'baseline'}": run(
+            script, profile, args.iterations, speculative
+        )
+        for caller, script in scripts.items()
+        for speculative in (False, True)
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{'run':<22} {'ttfa p50':>9} {'ttfa p95':>9} {'hit rate':>9} "
+        f"{'discarded':>10} {'wasted tok':>11} {'saved/hit':>10}"
+    )
+    for name, r in results.items():
+        hit_rate = f"{r['hit_rate']:.0%}" if r["hit_rate"] is not None else "-"
+        saved = f"{r['saved_mean'] * 1000:.0f} ms" if r["saved_mean"] is not None else "-"
+        print(
+            f"{name:<22} {r['ttfa']['p50'] * 1000:>7.0f}ms {r['ttfa']['p95'] * 1000:>7.0f}ms {hit_rate:>9} "
+            f"{r['discarded']:>10} {r['wasted_tokens']:>11} {saved:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
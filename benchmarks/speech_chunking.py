@@ -0,0 +1,185 @@
+"""First-audio latency with sentence aggregation vs. ``SpeechChunker``.
+
+A scripted LLM streams typical coach replies (English, Hinglish, Hindi with
+dandas, markdown lists) token by token into the offline TTS
+(``offline_services.FakeTTSService``). Time to first audio is measured from
+the LLM request to the first TTS audio frame for:
+
+- ``sentence``: the TTS service aggregating whole sentences (today's
+  behaviour). Uses Pipecat's NLTK-based aggregator when the punkt data is
+  installed, otherwise the chunker with clause splitting off, which splits at
+  the same sentence boundaries.
+- ``chunked``: ``SpeechChunker`` in front of the TTS service with the default
+  minimum-chunk policy.
+
+Usage:
+    python -m benchmarks.speech_chunking
+    python -m benchmarks.speech_chunking --token-interval 0.05 --first-min-words 4 --json
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    Frame,
+    LLMContextFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    StartFrame,
+    TTSAudioRawFrame,
+)
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineTask
+from pipecat.processors.aggregators.llm_context import LLMContext
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.llm_service import LLMService
+
+from benchmarks.harness import summarize
+from offline_services import FakeTTSService, LatencyProfile, _Delays
+from speech_chunker import SpeechChunker
+
+REPLIES = [
+    "Aaj aapne achha kamaya, toh thoda bachat kar lo aur petrol ka kharcha note kar lo. Kal phir baat karte hain!",
+    "Bilkul, main samajh sakti hoon ki aaj ka din mushkil tha lekin aap akele nahi ho. Chaliye ek chhota step lete hain.",
+    "आज आपने अच्छा कमाया। क्योंकि खर्च कम था, इसलिए आप थोड़ा और बचा सकते हैं।",
+    "Here are two quick tips:\n1. Keep a small amount aside every evening.\n2. Track your **petrol** expenses for a week.",
+    "An emergency fund is money you keep aside only for surprises, like a bike repair or a hospital visit, so you don't have to borrow.",
+    "Got it. Your goal is to save for a new phone, and if you put a little aside each day you will get there in a few months.",
+    "Compound interest means you earn interest on your interest too, which is why starting early matters more than starting big.",
+    "Thank you for chatting with me today. You can come back any day to talk about money again.",
+]
+
+
+def _tokens(text: str):
+    """Split into word-sized tokens with leading whitespace, like LLM streaming."""
+    return re.findall(r"\s*\S+", text)
+
+
+class _ScriptedLLM(LLMService):
+    """Streams the next scripted reply after a fixed time to first token."""
+
+    def __init__(self, replies, ttft_secs: float, token_interval_secs: float):
+        super().__init__()
+        self._replies = list(replies)
+        self._ttft_secs = ttft_secs
+        self._token_interval_secs = token_interval_secs
+        self._reply_index = 0
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if not isinstance(frame, LLMContextFrame):
+            await self.push_frame(frame, direction)
+            return
+        reply = self._replies[self._reply_index % len(self._replies)]
+        self._reply_index += 1
+        await self.push_frame(LLMFullResponseStartFrame())
+        await asyncio.sleep(self._ttft_secs)
+        for i, token in enumerate(_tokens(reply)):
+            if i:
+                await asyncio.sleep(self._token_interval_secs)
+            await self.push_frame(LLMTextFrame(token))
+        await self.push_frame(LLMFullResponseEndFrame())
+
+
+class _Collector(FrameProcessor):
+    """Records the first audio of a reply and when the reply is fully spoken."""
+
+    def __init__(self):
+        super().__init__()
+        self.started = asyncio.Event()
+        self.done = asyncio.Event()
+        self.first_audio = None
+
+    def reset(self):
+        self.done.clear()
+        self.first_audio = None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, StartFrame):
+            self.started.set()
+        elif isinstance(frame, TTSAudioRawFrame) and self.first_audio is None:
+            self.first_audio = time.monotonic()
+        elif isinstance(frame, LLMFullResponseEndFrame):
+            # The TTS service passes this on after synthesizing the whole reply
+            self.done.set()
+        await self.push_frame(frame, direction)
+
+
+def _punkt_available() -> bool:
+    try:
+        from pipecat.utils.string import match_endofsentence
+
+        match_endofsentence("One. Two")
+        return True
+    except LookupError:
+        return False
+
+
+async def run_scenario(name: str, args) -> dict:
+    profile = LatencyProfile(tts_ttfb_secs=args.tts_ttfb, jitter=0.0)
+    llm = _ScriptedLLM(REPLIES, args.llm_ttft, args.token_interval)
+    collector = _Collector()
+    if name == "sentence" and _punkt_available():
+        processors = [llm, FakeTTSService(profile, _Delays(profile)), collector]
+    else:
+        chunker = SpeechChunker(
+            first_min_words=args.first_min_words,
+            min_words=args.min_words,
+            clauses=name == "chunked",
+        )
+        tts = FakeTTSService(profile, _Delays(profile), aggregate_sentences=False)
+        processors = [llm, chunker, tts, collector]
+
+    task = PipelineTask(Pipeline(processors))
+    runner = asyncio.create_task(PipelineRunner(handle_sigint=False).run(task))
+    await asyncio.wait_for(collector.started.wait(), 10)
+
+    ttfa = []
+    for _ in range(args.iterations):
+        for _ in REPLIES:
+            collector.reset()
+            started = time.monotonic()
+            await task.queue_frame(LLMContextFrame(LLMContext(messages=[])))
+            await asyncio.wait_for(collector.done.wait(), 30)
+            ttfa.append(collector.first_audio - started)
+
+    await task.cancel()
+    await runner
+    return summarize(ttfa)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2, help="Passes over the reply set")
+    parser.add_argument("--llm-ttft", type=float, default=0.35)
+    parser.add_argument("--token-interval", type=float, default=0.03, help="Seconds between streamed tokens")
+    parser.add_argument("--tts-ttfb", type=float, default=0.15)
+    parser.add_argument("--first-min-words", type=int, default=3)
+    parser.add_argument("--min-words", type=int, default=8)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    results = {name: asyncio.run(run_scenario(name, args)) for name in ("sentence", "chunked")}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    baseline = "NLTK sentences" if _punkt_available() else "sentence boundaries (punkt data not installed)"
+    print(f"sentence = {baseline}")
+    print(f"{'scenario':<10} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for name, r in results.items():
+        print(f"{name:<10} {r['p50'] * 1000:>8.0f} {r['p95'] * 1000:>8.0f} {r['max'] * 1000:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""End-of-turn detection: response gap and cut-offs, fixed VAD vs adaptive.
+
+Replays recordings frame by frame (20 ms) through a VAD and, for the
+adaptive detector, ``turn_detector.AdaptiveTurnAnalyzer``, the way
+``BaseInputTransport`` drives them. The replay runs on audio time, so a
+corpus plays back much faster than real time. Transcript events are fed in at
+their recorded arrival times. Each end-of-turn decision is scored against the
+annotated user turns:
+
+- ``gap``: from the end of the user's speech to the decision (the part of the
+  response time the detector is responsible for);
+- ``cut-offs``: decisions inside a turn, in a pause before the user went on;
+- ``missed``: turns that ran into the next one without a decision;
+- ``spurious``: extra decisions after a turn ended (noise taken for speech).
+
+A corpus is a JSONL file, one recording per line::
+
+    {"audio": "call1.wav",
+     "turns": [[0.5, 3.2], [7.9, 9.4]],
+     "transcripts": [{"t": 1.4, "text": "Aaj maine", "final": false},
+                     {"t": 3.7, "text": "eighteen hundred kamaye.", "final": true,
+                      "speech_final": true}]}
+
+``audio`` is a 16-bit mono WAV (8 or 16 kHz) relative to the corpus file.
+``turns`` are the user's turns as [start, end of speech] in seconds.
+``transcripts`` are STT results with their arrival time. Recorded corpora
+use the Silero VAD by default.
+
+Without ``--corpus`` a synthetic corpus is generated and run with the energy
+VAD from offline_services.py. It has bursty and steady callers, quiet and
+road-noise (with horns) backgrounds, and Hinglish utterances split where the
+callers pause. Deepgram-style transcript timing is simulated: interims after
+each burst, and ``speech_final`` results after the endpointing silence.
+
+Usage:
+    python -m benchmarks.turn_detection
+    python -m benchmarks.turn_detection --sessions 40 --fixed 0.8 0.5 0.3
+    python -m benchmarks.turn_detection --corpus recordings/turns.jsonl --json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import wave
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+from loguru import logger
+
+from benchmarks.harness import summarize
+
+FRAME_SECS = 0.02
+SAMPLE_RATE = 16000
+
+# Utterances with "|" where callers pause, punctuated the way Deepgram
+# returns them
+UTTERANCES = [
+    "Aaj maine | eighteen hundred kamaye, | petrol mein | four hundred gaye.",
+    "Emergency fund kya hota hai?",
+    "Bahut thak gaya hoon yaar, | paise bachte hi nahi.",
+    "Mujhe nayi bike leni hai, | around eighty thousand.",
+    "Kal | do hazaar mile | aur kharcha | paanch sau rupaye.",
+    "Main | Swiggy pe delivery karta hoon.",
+    "Kitna bachana chahiye | roz?",
+    "Umm | SIP kya hota hai?",
+    "Ghar ka rent | aur | bike ki EMI | dono dene hain.",
+    "Okay, thanks.",
+    "Aaj sirf | six hundred mile, | baarish thi.",
+    "What should I do | with my savings?",
+]
+
+# Seconds per word and in-turn pause range per caller
+PACES = {"bursty": (0.22, (0.25, 0.55)), "steady": (0.32, (0.4, 0.75))}
+NOISE = {"quiet": (80.0, 0.0), "road": (220.0, 0.08)}  # noise sigma, horns per second
+
+
+@dataclass
+class Recording:
+    name: str
+    audio: bytes
+    sample_rate: int
+    turns: List[tuple]
+    transcripts: List[dict]
+    condition: str = "recorded"
+
+
+@dataclass
+class Score:
+    gaps: List[float] = field(default_factory=list)
+    turns: int = 0
+    cutoffs: int = 0
+    missed: int = 0
+    spurious: int = 0
+
+
+# --------------------------------------------------------------------
+# Corpus
+# --------------------------------------------------------------------
+
+
+def load_corpus(path: str) -> List[Recording]:
+    """Read a JSONL corpus (see the module docstring)."""
+    base = os.path.dirname(os.path.abspath(path))
+    recordings = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            with wave.open(os.path.join(base, entry["audio"]), "rb") as w:
+                if w.getsampwidth() != 2 or w.getnchannels() != 1:
+                    raise ValueError(f"{entry['audio']}: expected 16-bit mono audio")
+                audio, rate = w.readframes(w.getnframes()), w.getframerate()
+            recordings.append(
+                Recording(entry["audio"], audio, rate, [tuple(t) for t in entry["turns"]], entry["transcripts"])
+            )
+    return recordings
+
+
+def synthetic_session(
+    rng: random.Random, pace: str, noise: str, turns: int, stt_latency: float, endpointing: float
+) -> Recording:
+    """One synthetic call: user turns separated by the bot's replies."""
+    secs_per_word, pause_range = PACES[pace]
+    sigma, horns_per_sec = NOISE[noise]
+    pieces, spans, transcripts = [], [], []
+    t = 1.0
+    pieces.append(("silence", t))
+    for _ in range(turns):
+        segments = [s.strip() for s in rng.choice(UTTERANCES).split("|")]
+        start = t
+        for i, segment in enumerate(segments):
+            speech = len(segment.split()) * secs_per_word * rng.uniform(0.85, 1.15)
+            pieces.append(("speech", speech))
+            t += speech
+            last = i == len(segments) - 1
+            pause = rng.uniform(2.5, 4.0) if last else rng.uniform(*pause_range)
+            # A thinking pause now and then, longer than most fixed thresholds
+            if not last and rng.random() < 0.08:
+                pause = rng.uniform(0.8, 1.1)
+            transcripts.append({"t": t + stt_latency, "text": segment, "final": False})
+            if pause >= endpointing:
+                transcripts.append(
+                    {"t": t + endpointing + stt_latency, "text": segment, "final": True, "speech_final": True}
+                )
+            if last:
+                spans.append((start, t))
+            pieces.append(("silence", pause))
+            t += pause
+
+    noise_rng = np.random.default_rng(rng.randrange(1 << 30))
+    audio = noise_rng.normal(0.0, sigma, int(t * SAMPLE_RATE))
+    position = 0
+    for kind, secs in pieces:
+        count = int(secs * SAMPLE_RATE)
+        if kind == "speech":
+            ts = np.arange(count) / SAMPLE_RATE
+            audio[position : position + count] += 6000 * np.sin(2 * np.pi * 180 * ts)
+        position += count
+    # Horns: loud, short and anywhere, including inside pauses
+    for _ in range(noise_rng.poisson(horns_per_sec * t)):
+        at = int(rng.uniform(0, t - 0.5) * SAMPLE_RATE)
+        count = int(rng.uniform(0.15, 0.4) * SAMPLE_RATE)
+        ts = np.arange(count) / SAMPLE_RATE
+        audio[at : at + count] += 3000 * np.sin(2 * np.pi * 420 * ts)
+    pcm = np.clip(audio, -32768, 32767).astype(np.int16).tobytes()
+    return Recording(f"{pace}/{noise}", pcm, SAMPLE_RATE, spans, transcripts, condition=f"{pace}/{noise}")
+
+
+def synthetic_corpus(sessions: int, turns: int, seed: int, stt_latency: float, endpointing: float):
+    rng = random.Random(seed)
+    conditions = [(pace, noise) for pace in PACES for noise in NOISE]
+    return [
+        synthetic_session(rng, *conditions[i % len(conditions)], turns, stt_latency, endpointing)
+        for i in range(sessions)
+    ]
+
+
+# --------------------------------------------------------------------
+# Replay
+# --------------------------------------------------------------------
+
+
+async def replay(recording: Recording, vad, analyzer=None) -> List[float]:
+    """End-of-turn decision times, driving ``vad``/``analyzer`` as the transport does."""
+    from pipecat.audio.turn.base_turn_analyzer import EndOfTurnState
+    from pipecat.audio.vad.vad_analyzer import VADState
+
+    vad.set_sample_rate(recording.sample_rate)
+    if analyzer is not None:
+        analyzer.set_sample_rate(recording.sample_rate)
+    frame_bytes = int(recording.sample_rate * FRAME_SECS) * 2
+    events = sorted(recording.transcripts, key=lambda e: e["t"])
+    next_event = 0
+    state = VADState.QUIET
+    decisions = []
+    for offset in range(0, len(recording.audio) - frame_bytes + 1, frame_bytes):
+        now = (offset + frame_bytes) / (2 * recording.sample_rate)
+        while analyzer is not None and next_event < len(events) and events[next_event]["t"] <= now:
+            event = events[next_event]
+            analyzer.on_transcript(event["text"], event.get("final", False), event.get("speech_final", False))
+            next_event += 1
+
+        previous = state
+        new_state = await vad.analyze_audio(recording.audio[offset : offset + frame_bytes])
+        if new_state != state and new_state in (VADState.QUIET, VADState.SPEAKING):
+            state = new_state
+            if analyzer is None and state == VADState.QUIET:
+                decisions.append(now)
+        if analyzer is not None:
+            result = analyzer.append_audio(recording.audio[offset : offset + frame_bytes], state == VADState.SPEAKING)
+            if result == EndOfTurnState.INCOMPLETE and state == VADState.QUIET and previous != state:
+                result, _ = await analyzer.analyze_end_of_turn()
+            if result == EndOfTurnState.COMPLETE:
+                decisions.append(now)
+    return decisions
+
+
+def score(turns: List[tuple], decisions: List[float], into: Score):
+    """Match decisions to the annotated turns."""
+    answered = set()
+    for d in decisions:
+        if any(start < d < end for start, end in turns):
+            into.cutoffs += 1
+            continue
+        ended = [i for i, (_, end) in enumerate(turns) if end <= d]
+        if not ended or ended[-1] in answered:
+            into.spurious += 1
+        else:
+            answered.add(ended[-1])
+            into.gaps.append(d - turns[ended[-1]][1])
+    into.turns += len(turns)
+    into.missed += len(turns) - len(answered)
+
+
+# --------------------------------------------------------------------
+# Main
+# --------------------------------------------------------------------
+
+
+def make_vad(kind: str, stop_secs: float):
+    from pipecat.audio.vad.vad_analyzer import VADParams
+
+    params = VADParams(stop_secs=stop_secs)
+    if kind == "energy":
+        from offline_services import EnergyVADAnalyzer
+
+        return EnergyVADAnalyzer(params=params)
+    from vad_pool import create_vad_analyzer
+
+    return create_vad_analyzer(params=params)
+
+
+async def evaluate(recordings: List[Recording], method: str, vad_kind: str, vad_stop: float) -> dict:
+    from turn_detector import AdaptiveTurnAnalyzer
+
+    by_condition = {}
+    for recording in recordings:
+        if method == "adaptive":
+            vad = make_vad(vad_kind, vad_stop)
+            decisions = await replay(recording, vad, AdaptiveTurnAnalyzer(vad=vad))
+        else:
+            decisions = await replay(recording, make_vad(vad_kind, float(method.split("-", 1)[1])))
+        for key in ("all", recording.condition):
+            score(recording.turns, decisions, by_condition.setdefault(key, Score()))
+    return {
+        condition: {
+            "turns": s.turns,
+            "gap": summarize(s.gaps),
+            "cutoff_rate": s.cutoffs / s.turns if s.turns else 0.0,
+            "cutoffs": s.cutoffs,
+            "missed": s.missed,
+            "spurious": s.spurious,
+        }
+        for condition, s in by_condition.items()
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="JSONL corpus of recordings (default: synthetic)")
+    parser.add_argument("--vad", choices=["silero", "energy"], help="Default: silero for --corpus, else energy")
+    parser.add_argument("--fixed", type=float, nargs="+", default=[0.8, 0.5], help="Fixed VAD stop_secs to compare")
+    parser.add_argument("--vad-stop", type=float, default=float(os.getenv("TURN_VAD_STOP_SECS", "0.2")))
+    parser.add_argument("--sessions", type=int, default=20, help="Synthetic calls")
+    parser.add_argument("--turns", type=int, default=12, help="User turns per synthetic call")
+    parser.add_argument("--stt-latency", type=float, default=0.15, help="Synthetic STT result delay")
+    parser.add_argument("--endpointing", type=float, default=0.3, help="Synthetic Deepgram endpointing")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    if args.corpus:
+        recordings = load_corpus(args.corpus)
+    else:
+        recordings = synthetic_corpus(args.sessions, args.turns, args.seed, args.stt_latency, args.endpointing)
+    vad_kind = args.vad or ("silero" if args.corpus else "energy")
+    methods = [f"vad-{stop:g}" for stop in args.fixed] + ["adaptive"]
+
+    async def run_all():
+        return {method: await evaluate(recordings, method, vad_kind, args.vad_stop) for method in methods}
+
+    results = asyncio.run(run_all())
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{len(recordings)} recordings, {vad_kind} VAD")
+    print(
+        f"{'method':<10} {'condition':<14} {'turns':>6} {'gap p50':>8} {'gap p95':>8} "
+        f"{'cut-offs':>9} {'missed':>7} {'spurious':>9}"
+    )
+    for method, conditions in results.items():
+        for condition, r in sorted(conditions.items(), key=lambda item: item[0] != "all"):
+            print(
+                f"{method:<10} {condition:<14} {r['turns']:>6} {r['gap']['p50'] * 1000:>6.0f}ms "
+                f"{r['gap']['p95'] * 1000:>6.0f}ms {r['cutoff_rate']:>8.1%} {r['missed']:>7} {r['spurious']:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
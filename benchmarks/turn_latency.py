@@ -0,0 +1,76 @@
+"""End-to-end turn latency benchmark using offline services.
+
+Usage:
+    python -m benchmarks.turn_latency --iterations 5
+    python -m benchmarks.turn_latency --llm-ttft 0.6 --jitter 0.2 --json
+    python -m benchmarks.turn_latency --intent-router off
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+from loguru import logger
+
+# The bot module reads provider keys at import/construct time; none are used here.
+os.environ.setdefault("DEEPGRAM_API_KEY", "offline")
+os.environ.setdefault("SARVAM_API_KEY", "offline")
+
+from benchmarks.harness import format_report, report, run_benchmark  # noqa: E402
+from offline_services import LatencyProfile  # noqa: E402
+
+
+def parse_args(argv=None):
+    defaults = LatencyProfile()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=3, help="Conversations to run")
+    parser.add_argument("--stt-latency", type=float, default=defaults.stt_latency_secs)
+    parser.add_argument("--llm-ttft", type=float, default=defaults.llm_ttft_secs)
+    parser.add_argument("--llm-token-interval", type=float, default=defaults.llm_token_interval_secs)
+    parser.add_argument("--tts-ttfb", type=float, default=defaults.tts_ttfb_secs)
+    parser.add_argument("--tts-rtf", type=float, default=defaults.tts_rtf)
+    parser.add_argument("--vad-stop", type=float, default=defaults.vad_stop_secs)
+    parser.add_argument("--jitter", type=float, default=defaults.jitter)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument(
+        "--intent-router",
+        choices=["on", "shadow", "off"],
+        default=os.getenv("INTENT_ROUTER", "on"),
+        help="Local entry-node routing mode (see intent_router.py)",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline debug logs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ["INTENT_ROUTER"] = args.intent_router
+    logger.remove()
+    logger.add(sys.stderr, level="DEBUG" if args.verbose else "WARNING")
+
+    profile = LatencyProfile(
+        stt_latency_secs=args.stt_latency,
+        llm_ttft_secs=args.llm_ttft,
+        llm_token_interval_secs=args.llm_token_interval,
+        tts_ttfb_secs=args.tts_ttfb,
+        tts_rtf=args.tts_rtf,
+        vad_stop_secs=args.vad_stop,
+        jitter=args.jitter,
+        seed=args.seed,
+    )
+    results = asyncio.run(run_benchmark(args.iterations, profile=profile))
+    summary = report(results)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        nodes = sorted({n for r in results for n in r.nodes_seen})
+        print(f"conversations: {len(results)}  nodes visited: {', '.join(nodes)}")
+        print(format_report(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Benchmark: per-connection Silero VAD vs. the shared VAD model pool.
+
+For 1, 10 and 100 concurrent sessions this opens every session at once on one
+event loop, the way ``server.websocket_endpoint`` does: build the analyzer,
+set the sample rate and analyze the first 32 ms of audio. Reported per mode:
+
+- connect-to-ready latency (p50 / p95 / max) per session
+- process RSS once all sessions are alive, and the growth over the baseline
+
+Each (mode, sessions) point runs in a fresh subprocess so RSS numbers do not
+leak between runs. The pooled mode prewarms the pool before the clock starts,
+as the server does at startup.
+
+Usage:
+    python -m benchmarks.vad_sessions
+    python -m benchmarks.vad_sessions --sessions 1 10 --pool-size 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from loguru import logger
+
+from benchmarks.harness import summarize
+
+# One 32 ms frame of silence at 16 kHz.
+FIRST_AUDIO = b"\x00\x00" * 512
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB (Linux /proc)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _open_session(make_analyzer, started: float) -> tuple:
+    await asyncio.sleep(0)
+    analyzer = make_analyzer()
+    analyzer.set_sample_rate(16000)
+    await analyzer.analyze_audio(FIRST_AUDIO)
+    return analyzer, time.perf_counter() - started
+
+
+async def _run_child(mode: str, sessions: int) -> dict:
+    from pipecat.audio.vad.silero import SileroVADAnalyzer
+
+    from vad_pool import VAD_POOL, create_vad_analyzer
+
+    if mode == "pooled":
+        VAD_POOL.prewarm()
+        make_analyzer = create_vad_analyzer
+    else:
+        make_analyzer = SileroVADAnalyzer
+
+    baseline = rss_mb()
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(_open_session(make_analyzer, started) for _ in range(sessions))
+    )
+    rss = rss_mb()
+
+    latencies = [latency for _, latency in results]
+    return {
+        "mode": mode,
+        "sessions": sessions,
+        "ready": summarize(latencies),
+        "rss_mb": round(rss, 1),
+        "rss_growth_mb": round(rss - baseline, 1),
+    }
+
+
+def _run_point(mode: str, sessions: int, pool_size: int) -> dict:
+    env = dict(os.environ, VAD_POOL_SIZE=str(pool_size))
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.vad_sessions", "--child", mode, str(sessions)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--pool-size", type=int, default=int(os.getenv("VAD_POOL_SIZE", "1")))
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "SESSIONS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    if args.child:
+        mode, sessions = args.child
+        print(json.dumps(asyncio.run(_run_child(mode, int(sessions)))))
+        return
+
+    results = [
+        _run_point(mode, sessions, args.pool_size)
+        for sessions in args.sessions
+        for mode in ("per_session", "pooled")
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"pool size: {args.pool_size}")
+    print(
+        f"{'mode':<12} {'sessions':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} "
+        f"{'rss MB':>8} {'+rss MB':>8}"
+    )
+    for r in results:
+        ready = r["ready"]
+        print(
+            f"{r['mode']:<12} {r['sessions']:>8} {ready['p50'] * 1000:>8.1f} "
+            f"{ready['p95'] * 1000:>8.1f} {ready['max'] * 1000:>8.1f} "
+            f"{r['rss_mb']:>8.1f} {r['rss_growth_mb']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Sessions-per-core scaling of ``server.py --workers N`` with offline services.
+
+For each worker count this starts ``server.py --offline --workers N`` (fake
+STT/LLM/TTS, energy VAD, no network) and ramps up the number of concurrent
+``/ws`` sessions. Every session is a simulated caller that streams 16 kHz PCM
+in real time over the raw PCM protocol: a tone while "speaking", silence
+otherwise. For each utterance it records time-to-first-audio (end of speech to
+the first bot audio message).
+
+A load step passes when no session failed and p95 time-to-first-audio stays
+within ``--slo``. The summary lists, per worker count, the largest passing
+session count and the server's CPU use (cores) at that step.
+
+Callers are spread over ``--client-procs`` processes so the load generator is
+not the bottleneck; on a many-core box keep it well below the core count left
+over after the workers.
+
+Usage:
+    python -m benchmarks.worker_scaling
+    python -m benchmarks.worker_scaling --workers 1 2 4 8 --sessions 10 20 40 80 160
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from loguru import logger
+
+from benchmarks.harness import summarize
+
+SAMPLE_RATE = 16000
+CHUNK_SECS = 0.02
+CHUNK_SAMPLES = int(SAMPLE_RATE * CHUNK_SECS)
+SILENCE = b"\x00\x00" * CHUNK_SAMPLES
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _tone_chunk(amplitude: int = 8000, freq: float = 220.0) -> bytes:
+    import numpy as np
+
+    t = np.arange(CHUNK_SAMPLES) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype("<i2").tobytes()
+
+
+# --------------------------------------------------------------------
+# Simulated caller
+# --------------------------------------------------------------------
+
+
+class Caller:
+    """One websocket session streaming PCM in real time."""
+
+    def __init__(self, url: str, turns: int, speech_secs: float, timeout: float):
+        self.url = url
+        self.turns = turns
+        self.speech_secs = speech_secs
+        self.timeout = timeout
+        self.speaking = False
+        self.audio_times = []
+        self.ttfa = []
+        self.error = None
+
+    async def run(self):
+        from websockets.asyncio.client import connect
+
+        try:
+            async with connect(self.url, max_size=None, open_timeout=self.timeout) as ws:
+                receiver = asyncio.create_task(self._receive(ws))
+                sender = asyncio.create_task(self._send(ws))
+                try:
+                    await self._wait_quiet(since=0.0)  # greeting
+                    for _ in range(self.turns):
+                        self.speaking = True
+                        await asyncio.sleep(self.speech_secs)
+                        self.speaking = False
+                        speech_end = time.monotonic()
+                        first = await self._wait_quiet(since=speech_end)
+                        self.ttfa.append(first - speech_end)
+                finally:
+                    sender.cancel()
+                    receiver.cancel()
+        except Exception as e:
+            code = getattr(getattr(e, "rcvd", None), "code", None)
+            self.error = f"{type(e).__name__}" + (f" ({code})" if code else "")
+
+    async def _send(self, ws):
+        tone = _tone_chunk()
+        next_send = time.monotonic()
+        while True:
+            await ws.send(tone if self.speaking else SILENCE)
+            next_send += CHUNK_SECS
+            await asyncio.sleep(max(0.0, next_send - time.monotonic()))
+
+    async def _receive(self, ws):
+        async for message in ws:
+            if isinstance(message, bytes):
+                self.audio_times.append(time.monotonic())
+
+    async def _wait_quiet(self, since: float, quiet_secs: float = 0.6) -> float:
+        """Wait for bot audio after ``since`` and then for it to stop.
+
+        Returns:
+            Arrival time of the first audio message after ``since``.
+        """
+        deadline = time.monotonic() + self.timeout
+        first = None
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+            if first is None:
+                first = next((t for t in self.audio_times if t > since), None)
+            elif time.monotonic() - self.audio_times[-1] >= quiet_secs:
+                return first
+        raise TimeoutError("no bot audio")
+
+
+async def _run_callers(url: str, count: int, turns: int, speech_secs: float, ramp_secs: float, timeout: float):
+    callers = [Caller(url, turns, speech_secs, timeout) for _ in range(count)]
+
+    async def start(i, caller):
+        await asyncio.sleep(ramp_secs * i / max(1, count))
+        await caller.run()
+
+    await asyncio.gather(*(start(i, c) for i, c in enumerate(callers)))
+    return [{"ttfa": c.ttfa, "error": c.error} for c in callers]
+
+
+def _client_proc(args) -> list:
+    return asyncio.run(_run_callers(*args))
+
+
+# --------------------------------------------------------------------
+# Server control
+# --------------------------------------------------------------------
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _cpu_secs(pid: int) -> float:
+    """User + system CPU seconds of ``pid`` and its children (Linux /proc)."""
+    ticks = os.sysconf("SC_CLK_TCK")
+    total = 0.0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        ppid = int(fields[1])
+        if int(entry) == pid or ppid == pid:
+            total += (int(fields[11]) + int(fields[12])) / ticks
+    return total
+
+
+def start_server(workers: int, port: int, max_sessions: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        MAX_SESSIONS=str(max_sessions),
+        LOGURU_LEVEL=os.getenv("LOGURU_LEVEL", "WARNING"),
+        DEEPGRAM_API_KEY="offline",
+        SARVAM_API_KEY="offline",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "server.py", "--offline", "--workers", str(workers), "--port", str(port)],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1)
+            return proc
+        except OSError:
+            time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError("server did not become ready")
+
+
+def run_step(port: int, pid: int, sessions: int, args) -> dict:
+    url = f"ws://127.0.0.1:{port}/ws"
+    procs = max(1, min(args.client_procs, sessions))
+    shares = [sessions // procs + (1 if i < sessions % procs else 0) for i in range(procs)]
+    jobs = [(url, n, args.turns, args.speech_secs, args.ramp_secs, args.timeout) for n in shares]
+
+    cpu_start, wall_start = _cpu_secs(pid), time.monotonic()
+    with multiprocessing.Pool(procs) as pool:
+        results = [r for chunk in pool.map(_client_proc, jobs) for r in chunk]
+    cpu = (_cpu_secs(pid) - cpu_start) / (time.monotonic() - wall_start)
+
+    ttfa = [t for r in results for t in r["ttfa"]]
+    errors = [r["error"] for r in results if r["error"]]
+    summary = summarize(ttfa)
+    return {
+        "sessions": sessions,
+        "ttfa_p50": summary["p50"],
+        "ttfa_p95": summary["p95"],
+        "failed": len(errors),
+        "errors": sorted(set(errors)),
+        "server_cores": round(cpu, 2),
+        "passed": not errors and bool(ttfa) and summary["p95"] <= args.slo,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[5, 10, 20, 40, 80])
+    parser.add_argument("--turns", type=int, default=3, help="Utterances per session")
+    parser.add_argument("--speech-secs", type=float, default=1.2)
+    parser.add_argument("--ramp-secs", type=float, default=2.0, help="Spread session starts over this long")
+    parser.add_argument("--slo", type=float, default=2.5, help="p95 time-to-first-audio limit (s)")
+    parser.add_argument("--timeout", type=float, default=15.0)
+    parser.add_argument("--client-procs", type=int, default=max(1, (os.cpu_count() or 2) // 4))
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    rows = []
+    for workers in args.workers:
+        port = _free_port()
+        server = start_server(workers, port, max_sessions=max(args.sessions))
+        try:
+            for sessions in args.sessions:
+                row = {"workers": workers, **run_step(port, server.pid, sessions, args)}
+                rows.append(row)
+                if not args.json:
+                    print(
+                        f"workers={workers:<3} sessions={sessions:<5} "
+                        f"ttfa p50={row['ttfa_p50']:.2f}s p95={row['ttfa_p95']:.2f}s "
+                        f"failed={row['failed']:<3} server cores={row['server_cores']:.2f}"
+                        + ("" if row["passed"] else "  FAIL")
+                    )
+                if not row["passed"]:
+                    break
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"\ncores on this host: {os.cpu_count()}, slo: p95 ttfa <= {args.slo}s")
+    for workers in args.workers:
+        passing = [r for r in rows if r["workers"] == workers and r["passed"]]
+        best = passing[-1] if passing else None
+        if best:
+            per_core = best["sessions"] / max(best["server_cores"], 1e-9)
+            print(
+                f"workers={workers:<3} max sessions={best['sessions']:<5} "
+                f"sessions/worker={best['sessions'] / workers:.1f} "
+                f"sessions/busy core={per_core:.1f}"
+            )
+        else:
+            print(f"workers={workers:<3} no passing step")
+
+
+if __name__ == "__main__":
+    main()
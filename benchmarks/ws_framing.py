@@ -0,0 +1,229 @@
+"""CPU time and allocations of the /ws wire formats, with many streams at once.
+
+Every stream gets its own serializer, as every /ws connection does, and the
+streams are driven round-robin from one loop the way one server process
+interleaves its sessions: per 20 ms of caller audio each stream parses one
+client message, and per 40 ms it serializes one chunk of bot audio (the
+FastAPI transport's output chunk). Client messages are encoded up front, so
+only the server side is measured.
+
+Formats compared:
+
+- ``raw``: ``RawPCMSerializer``, bare 16-bit PCM both ways. The received
+  message becomes the frame's audio and bot audio is sent as is, so there is
+  nothing to copy; this is the floor for any protocol;
+- ``framed``: ``FramedPCMSerializer`` with 16-bit mono at the pipeline rates,
+  i.e. no conversion (input audio is copied out of the message once, bot
+  audio is copied once into the output ring behind its header);
+- ``framed-mulaw8k``: telephony-style mu-law at 8 kHz both ways, converted
+  with the serializer's lookup tables and resampler;
+- ``pipecat-mulaw8k``: the same conversion done the way Pipecat's telephony
+  serializers do it (``ulaw_to_pcm`` / ``pcm_to_ulaw`` with the soxr stream
+  resampler), for reference;
+- ``framed-float48k``: 32-bit float stereo at 48 kHz in, float mono at 48 kHz
+  out, as a browser's Web Audio graph produces and plays.
+
+Reported per format:
+
+- ``cpu ms/s``: process CPU time per second of call audio (per stream,
+  both directions), and the streams one core could carry at that rate;
+- ``alloc B/frame``: bytes allocated while handling one message, i.e. the
+  rise of ``tracemalloc``'s peak over the memory in use before the message,
+  averaged over every message of a shorter traced run.
+
+Usage:
+    python -m benchmarks.ws_framing
+    python -m benchmarks.ws_framing --streams 128 512 --secs 5 --json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from loguru import logger
+
+from pcm_serializer import (
+    ENCODING_FLOAT32,
+    ENCODING_MULAW,
+    ENCODING_PCM16,
+    KIND_AUDIO,
+    FramedPCMSerializer,
+    RawPCMSerializer,
+    encode_frame,
+)
+
+from pipecat.audio.utils import create_stream_resampler, pcm_to_ulaw, ulaw_to_pcm
+from pipecat.frames.frames import InputAudioRawFrame, OutputAudioRawFrame, StartFrame
+from pipecat.serializers.base_serializer import FrameSerializer, FrameSerializerType
+
+IN_CHUNK_SECS = 0.02
+OUT_CHUNK_SECS = 0.04
+# Pipecat's default pipeline rates, which the bot uses
+PIPELINE_IN_RATE = 16000
+PIPELINE_OUT_RATE = 24000
+
+
+class PipecatMulawSerializer(FrameSerializer):
+    """Mu-law <-> PCM the way Pipecat's telephony serializers convert it."""
+
+    def __init__(self, rate: int):
+        super().__init__()
+        self._rate = rate
+        self._in_resampler = create_stream_resampler()
+        self._out_resampler = create_stream_resampler()
+
+    @property
+    def type(self) -> FrameSerializerType:
+        return FrameSerializerType.BINARY
+
+    async def serialize(self, frame):
+        return await pcm_to_ulaw(frame.audio, frame.sample_rate, self._rate, self._out_resampler)
+
+    async def deserialize(self, data):
+        audio = await ulaw_to_pcm(bytes(data), self._rate, PIPELINE_IN_RATE, self._in_resampler)
+        return InputAudioRawFrame(audio=audio, sample_rate=PIPELINE_IN_RATE, num_channels=1)
+
+
+def _tone(rate: int, secs: float, channels: int = 1) -> np.ndarray:
+    t = np.arange(int(rate * secs)) / rate
+    mono = 0.3 * np.sin(2 * np.pi * 220 * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    return np.repeat(mono, channels).astype(np.float32)
+
+
+def _client_messages(fmt: str) -> list:
+    """One second of the caller's messages in the format's wire encoding."""
+    if fmt == "framed-mulaw8k" or fmt == "pipecat-mulaw8k":
+        rate, channels, encoding = 8000, 1, ENCODING_MULAW
+        pcm = (_tone(rate, 1.0) * 32767).astype("<i2")
+        import audioop
+
+        samples = np.frombuffer(audioop.lin2ulaw(pcm.tobytes(), 2), dtype=np.uint8)
+    elif fmt == "framed-float48k":
+        rate, channels, encoding = 48000, 2, ENCODING_FLOAT32
+        samples = _tone(rate, 1.0, channels).astype("<f4")
+    else:
+        rate, channels, encoding = PIPELINE_IN_RATE, 1, ENCODING_PCM16
+        samples = (_tone(rate, 1.0) * 32767).astype("<i2")
+
+    step = int(rate * IN_CHUNK_SECS) * channels
+    chunks = [samples[i : i + step].tobytes() for i in range(0, len(samples), step)]
+    if fmt.startswith("framed"):
+        return [
+            encode_frame(KIND_AUDIO, chunk, seq, int(seq * IN_CHUNK_SECS * 1000), rate, encoding, channels)
+            for seq, chunk in enumerate(chunks)
+        ]
+    return chunks
+
+
+def _bot_frames() -> list:
+    pcm = (_tone(PIPELINE_OUT_RATE, 1.0) * 32767).astype("<i2").tobytes()
+    step = int(PIPELINE_OUT_RATE * OUT_CHUNK_SECS) * 2
+    return [OutputAudioRawFrame(pcm[i : i + step], PIPELINE_OUT_RATE, 1) for i in range(0, len(pcm), step)]
+
+
+async def _serializers(fmt: str, streams: int) -> list:
+    if fmt == "raw":
+        make = RawPCMSerializer
+    elif fmt == "framed":
+        make = FramedPCMSerializer
+    elif fmt == "framed-mulaw8k":
+        make = lambda: FramedPCMSerializer(out_rate=8000, out_encoding=ENCODING_MULAW)  # noqa: E731
+    elif fmt == "pipecat-mulaw8k":
+        make = lambda: PipecatMulawSerializer(8000)  # noqa: E731
+    else:
+        make = lambda: FramedPCMSerializer(out_rate=48000, out_encoding=ENCODING_FLOAT32)  # noqa: E731
+
+    start = StartFrame(audio_in_sample_rate=PIPELINE_IN_RATE, audio_out_sample_rate=PIPELINE_OUT_RATE)
+    serializers = [make() for _ in range(streams)]
+    for serializer in serializers:
+        await serializer.setup(start)
+    return serializers
+
+
+async def _drive(serializers: list, messages: list, frames: list, secs: float, traced: bool = False) -> list:
+    """Push ``secs`` of audio through every serializer, round-robin.
+
+    Returns:
+        With ``traced``, the bytes allocated per handled message.
+    """
+    allocated = []
+    out_every = round(OUT_CHUNK_SECS / IN_CHUNK_SECS)
+    for i in range(round(secs / IN_CHUNK_SECS)):
+        message = messages[i % len(messages)]
+        frame = frames[(i // out_every) % len(frames)] if i % out_every == 0 else None
+        for serializer in serializers:
+            if traced:
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+            await serializer.deserialize(message)
+            if frame is not None:
+                await serializer.serialize(frame)
+            if traced:
+                _, peak = tracemalloc.get_traced_memory()
+                allocated.append((peak - before) / (2 if frame is not None else 1))
+    return allocated
+
+
+async def run(fmt: str, streams: int, secs: float, traced_secs: float) -> dict:
+    messages = _client_messages(fmt)
+    frames = _bot_frames()
+    serializers = await _serializers(fmt, streams)
+
+    await _drive(serializers, messages, frames, 1.0)  # warm up rings, resamplers, caches
+    started = time.process_time()
+    await _drive(serializers, messages, frames, secs)
+    cpu = time.process_time() - started
+    cpu_per_audio_sec = cpu / (streams * secs)
+
+    tracemalloc.start()
+    try:
+        allocated = await _drive(serializers, messages, frames, traced_secs, traced=True)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "format": fmt,
+        "streams": streams,
+        "cpu_ms_per_audio_sec": cpu_per_audio_sec * 1000,
+        "streams_per_core": 1 / cpu_per_audio_sec if cpu_per_audio_sec else float("inf"),
+        "alloc_bytes_per_frame": sum(allocated) / len(allocated),
+    }
+
+
+FORMATS = ["raw", "framed", "framed-mulaw8k", "pipecat-mulaw8k", "framed-float48k"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, nargs="+", default=[128])
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS)
+    parser.add_argument("--secs", type=float, default=10.0, help="Seconds of audio per stream for the CPU run")
+    parser.add_argument("--traced-secs", type=float, default=1.0, help="Seconds of audio per stream under tracemalloc")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    results = [
+        asyncio.run(run(fmt, streams, args.secs, args.traced_secs))
+        for streams in args.streams
+        for fmt in args.formats
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'format':<18} {'streams':>8} {'cpu ms/s':>9} {'streams/core':>13} {'alloc B/frame':>14}")
+    for r in results:
+        print(
+            f"{r['format']:<18} {r['streams']:>8} {r['cpu_ms_per_audio_sec']:>9.3f} "
+            f"{r['streams_per_core']:>13.0f} {r['alloc_bytes_per_frame']:>14.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,493 @@
+"""Capacity curve for /ws: concurrent callers streaming PCM in real time.
+
+Starts ``server.py --offline`` (fake STT/LLM/TTS, energy VAD, no network) or
+targets a running server (``--url``), then ramps up the number of concurrent
+``/ws`` sessions. Every session is a caller that streams utterances in real
+time, 20 ms per message, with silence in between. It waits for the bot's
+reply to each utterance and then for the bot to go quiet before speaking
+again. Utterances are WAV recordings (``--audio``, 16-bit mono, resampled to
+16 kHz) or, by default, synthetic voiced speech that the energy VAD and
+offline STT treat as talking.
+
+Sessions use the framed protocol from pcm_serializer.py by default. Its
+headers give each reply message's exact duration and a sequence number.
+``--client-format`` picks what the caller sends and plays: 16-bit PCM at
+16 kHz, mu-law at 8 kHz (telephony) or 32-bit float stereo at 48 kHz
+(browser). ``--protocol raw`` uses bare PCM instead.
+
+Reply audio is played out by a simulated client with a ``--playout-ms``
+jitter buffer. Reported per load step:
+
+- ``turn p50/p95``: end of the caller's utterance -> first reply audio;
+- ``jitter p95``: spread of reply message arrivals around real-time pacing
+  (inter-arrival time minus the previous message's duration);
+- ``late``: reply messages that arrived after the client needed them, i.e.
+  audible gaps inside a reply (gaps longer than ``--gap-ms`` are pauses
+  between replies, not losses);
+- ``lost``: reply messages missing from the sequence numbers (framed only);
+- ``rtf``: arrival time span / audio duration of each reply burst (1.0 is
+  real time, above 1 the server falls behind);
+- ``server cores``: CPU used by the server and its workers;
+- ``client lag``: how far the slowest caller's sender fell behind its
+  real-time schedule. If it is large, the load generator, not the server,
+  is the bottleneck; add ``--client-procs``.
+
+A step passes when no session failed, p95 turn latency is within ``--slo``
+and at most ``--max-late`` of reply messages were late. Steps stop after the
+first failing one; the largest passing step is the capacity.
+
+``--quick`` runs 2 and 4 sessions with one turn each, for CI. It exits with
+status 1 if a step fails.
+
+Usage:
+    python -m benchmarks.ws_load
+    python -m benchmarks.ws_load --sessions 50 100 200 400 --workers 2 --client-procs 4
+    python -m benchmarks.ws_load --audio recordings/*.wav --client-format mulaw8k --json
+    python -m benchmarks.ws_load --quick
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import wave
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+from loguru import logger
+
+from benchmarks.harness import summarize
+from benchmarks.worker_scaling import _cpu_secs, _free_port, start_server
+from pcm_serializer import (
+    ENCODING_FLOAT32,
+    ENCODING_MULAW,
+    ENCODING_PCM16,
+    KIND_AUDIO,
+    KIND_CONTROL,
+    SAMPLE_WIDTH,
+    Scratch,
+    StreamResampler,
+    decode_frame,
+    encode_frame,
+    encode_samples,
+)
+
+SAMPLE_RATE = 16000
+CHUNK_SECS = 0.02
+# Output rate of the raw protocol (Pipecat's default pipeline output rate)
+RAW_OUT_RATE = 24000
+
+
+@dataclass(frozen=True)
+class ClientFormat:
+    """What a caller sends, and asks to receive, over the framed protocol."""
+
+    encoding: int
+    rate: int
+    channels: int
+    query: str
+
+
+CLIENT_FORMATS = {
+    "pcm16": ClientFormat(ENCODING_PCM16, 16000, 1, ""),
+    "mulaw8k": ClientFormat(ENCODING_MULAW, 8000, 1, "&out_rate=8000&out_encoding=mulaw"),
+    "float48k": ClientFormat(ENCODING_FLOAT32, 48000, 2, "&out_rate=48000&out_encoding=float32"),
+}
+
+
+# --------------------------------------------------------------------
+# Utterances
+# --------------------------------------------------------------------
+
+
+def load_utterances(paths: List[str]) -> List[np.ndarray]:
+    """Read 16-bit mono WAV files as 16 kHz samples."""
+    utterances = []
+    for path in paths:
+        with wave.open(path, "rb") as w:
+            if w.getsampwidth() != 2 or w.getnchannels() != 1:
+                raise ValueError(f"{path}: expected 16-bit mono audio")
+            samples = np.frombuffer(w.readframes(w.getnframes()), dtype="<i2")
+            rate = w.getframerate()
+        if rate != SAMPLE_RATE:
+            samples = StreamResampler(rate, SAMPLE_RATE).process(samples.astype(np.float32)).astype(np.int16)
+        utterances.append(samples)
+    return utterances
+
+
+def synthetic_utterances(count: int, seed: int = 7) -> List[np.ndarray]:
+    """Voiced, syllable-modulated utterances of 0.8-2.4 s at 16 kHz.
+
+    The modulation never drops the level below the offline services' energy
+    threshold, so each utterance is one turn for the energy VAD and the fake
+    STT.
+    """
+    rng = np.random.default_rng(seed)
+    utterances = []
+    for _ in range(count):
+        t = np.arange(int(rng.uniform(0.8, 2.4) * SAMPLE_RATE)) / SAMPLE_RATE
+        pitch = rng.uniform(110.0, 220.0)
+        voice = sum(np.sin(2 * np.pi * pitch * h * t) / h for h in (1, 2, 3)) / 1.8
+        syllables = 0.65 + 0.35 * np.sin(2 * np.pi * rng.uniform(3.0, 5.0) * t)
+        audio = 6000 * syllables * voice + rng.normal(0.0, 60.0, len(t))
+        utterances.append(np.clip(audio, -32768, 32767).astype(np.int16))
+    return utterances
+
+
+def encode_chunks(samples: np.ndarray, fmt: ClientFormat) -> List[bytes]:
+    """Split 16 kHz samples into 20 ms payloads in the client's format."""
+    resampled = StreamResampler(SAMPLE_RATE, fmt.rate).process(samples.astype(np.float32))
+    if fmt.channels > 1:
+        resampled = np.repeat(resampled, fmt.channels)
+    payload = bytearray(len(resampled) * SAMPLE_WIDTH[fmt.encoding])
+    encode_samples(resampled.astype(np.float32), fmt.encoding, memoryview(payload), Scratch())
+    step = int(fmt.rate * CHUNK_SECS) * fmt.channels * SAMPLE_WIDTH[fmt.encoding]
+    return [bytes(payload[i : i + step]) for i in range(0, len(payload) - step + 1, step)]
+
+
+# --------------------------------------------------------------------
+# Simulated caller
+# --------------------------------------------------------------------
+
+
+class LoadCaller:
+    """One /ws session that talks in real time and records the replies."""
+
+    def __init__(
+        self,
+        url: str,
+        utterances: List[List[bytes]],
+        silence: bytes,
+        fmt: Optional[ClientFormat],
+        turns: int,
+        quiet_secs: float,
+        timeout: float,
+    ):
+        self.url = url
+        self.utterances = utterances
+        self.silence = silence
+        self.fmt = fmt
+        self.turns = turns
+        self.quiet_secs = quiet_secs
+        self.timeout = timeout
+        # Reply audio as (arrival, duration) plus the arrival times alone
+        self.audio: List[tuple] = []
+        self.arrivals: List[float] = []
+        self.turn_latency: List[float] = []
+        self.lost = 0
+        self.clears = 0
+        self.max_send_lag = 0.0
+        self.error = None
+        self._speech = None
+        self._seq = None
+
+    async def run(self):
+        from websockets.asyncio.client import connect
+
+        try:
+            async with connect(self.url, max_size=None, open_timeout=self.timeout) as ws:
+                receiver = asyncio.create_task(self._receive(ws))
+                sender = asyncio.create_task(self._send(ws))
+                try:
+                    await self._wait_quiet(since=0.0)  # greeting
+                    for turn in range(self.turns):
+                        done = asyncio.get_running_loop().create_future()
+                        self._speech = (iter(self.utterances[turn % len(self.utterances)]), done)
+                        speech_end = await done
+                        first = await self._wait_quiet(since=speech_end)
+                        self.turn_latency.append(first - speech_end)
+                finally:
+                    sender.cancel()
+                    receiver.cancel()
+        except Exception as e:
+            code = getattr(getattr(e, "rcvd", None), "code", None)
+            self.error = f"{type(e).__name__}" + (f" ({code})" if code else "")
+
+    async def _send(self, ws):
+        seq = 0
+        next_send = time.monotonic()
+        while True:
+            chunk = self.silence
+            if self._speech:
+                chunks, done = self._speech
+                chunk = next(chunks, None)
+                if chunk is None:
+                    # The last speech chunk has just finished playing
+                    self._speech = None
+                    done.set_result(time.monotonic())
+                    chunk = self.silence
+            if self.fmt:
+                fmt = self.fmt
+                chunk = encode_frame(
+                    KIND_AUDIO, chunk, seq, round(seq * CHUNK_SECS * 1000), fmt.rate, fmt.encoding, fmt.channels
+                )
+            await ws.send(chunk)
+            seq += 1
+            next_send += CHUNK_SECS
+            now = time.monotonic()
+            self.max_send_lag = max(self.max_send_lag, now - next_send)
+            await asyncio.sleep(max(0.0, next_send - now))
+
+    async def _receive(self, ws):
+        async for message in ws:
+            now = time.monotonic()
+            if not isinstance(message, bytes):
+                continue
+            if not self.fmt:
+                duration = len(message) / (2 * RAW_OUT_RATE)
+            else:
+                frame = decode_frame(message)
+                if self._seq is not None:
+                    self.lost += (frame.seq - self._seq - 1) & 0xFFFFFFFF
+                self._seq = frame.seq
+                if frame.kind == KIND_CONTROL:
+                    self.clears += json.loads(bytes(frame.payload)).get("type") == "clear"
+                    continue
+                width = SAMPLE_WIDTH[frame.encoding] * frame.channels
+                duration = len(frame.payload) / (width * frame.sample_rate)
+            self.audio.append((now, duration))
+            self.arrivals.append(now)
+
+    async def _wait_quiet(self, since: float) -> float:
+        """Wait for reply audio after ``since`` and then for the bot to go quiet.
+
+        Returns:
+            Arrival time of the first reply message after ``since``.
+        """
+        deadline = time.monotonic() + self.timeout
+        first = None
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+            if first is None:
+                index = bisect.bisect_right(self.arrivals, since)
+                if index < len(self.arrivals):
+                    first = self.arrivals[index]
+            elif time.monotonic() - self.arrivals[-1] >= self.quiet_secs:
+                return first
+        raise TimeoutError("no bot audio" if first is None else "bot did not go quiet")
+
+
+def playout(audio: List[tuple], buffer_secs: float, gap_secs: float) -> dict:
+    """Play reply audio through a jitter buffer and score its delivery.
+
+    Returns:
+        Late messages, inter-arrival jitter (s) and per-burst real-time factors.
+    """
+    late, jitter, rtf = 0, [], []
+    burst: List[tuple] = []
+    play_until = None
+
+    def close_burst():
+        if len(burst) >= 3:
+            span = burst[-1][0] - burst[0][0]
+            rtf.append(span / sum(duration for _, duration in burst[:-1]))
+
+    for arrival, duration in audio:
+        if play_until is None or arrival > play_until + gap_secs:
+            # The client ran dry long ago: a new reply, not a loss
+            close_burst()
+            burst = [(arrival, duration)]
+            play_until = arrival + buffer_secs + duration
+            continue
+        previous_arrival, previous_duration = burst[-1]
+        jitter.append(abs(arrival - previous_arrival - previous_duration))
+        if arrival > play_until:
+            late += 1
+            play_until = arrival
+        play_until += duration
+        burst.append((arrival, duration))
+    close_burst()
+    return {"late": late, "jitter": jitter, "rtf": rtf}
+
+
+async def _run_callers(job: dict) -> dict:
+    fmt = CLIENT_FORMATS[job["client_format"]] if job["protocol"] == "framed" else None
+    if job["audio"]:
+        samples = load_utterances(job["audio"])
+    else:
+        samples = synthetic_utterances(8, seed=job["seed"])
+    wire = fmt or ClientFormat(ENCODING_PCM16, SAMPLE_RATE, 1, "")
+    utterances = [encode_chunks(s, wire) for s in samples]
+    # More than one chunk, as resampling may leave the first one short
+    silence = encode_chunks(np.zeros(int(SAMPLE_RATE * CHUNK_SECS) * 4, dtype=np.int16), wire)[0]
+
+    url = job["url"] + ("?protocol=framed" + fmt.query if fmt else "?protocol=raw")
+    callers = []
+    for i in range(job["count"]):
+        # Every caller starts at a different utterance
+        order = utterances[i % len(utterances) :] + utterances[: i % len(utterances)]
+        callers.append(LoadCaller(url, order, silence, fmt, job["turns"], job["quiet_secs"], job["timeout"]))
+
+    async def start(i, caller):
+        await asyncio.sleep(job["ramp_secs"] * i / max(1, job["count"]))
+        await caller.run()
+
+    cpu_start = time.process_time()
+    await asyncio.gather(*(start(i, c) for i, c in enumerate(callers)))
+
+    results = []
+    for caller in callers:
+        scores = playout(caller.audio, job["playout_secs"], job["gap_secs"])
+        results.append(
+            {
+                "turn_latency": caller.turn_latency,
+                "messages": len(caller.audio),
+                "late": scores["late"],
+                "jitter": scores["jitter"],
+                "rtf": scores["rtf"],
+                "lost": caller.lost,
+                "max_send_lag": caller.max_send_lag,
+                "error": caller.error,
+            }
+        )
+    return {"sessions": results, "cpu_secs": time.process_time() - cpu_start}
+
+
+def _client_proc(job: dict) -> dict:
+    logger.remove()
+    return asyncio.run(_run_callers(job))
+
+
+# --------------------------------------------------------------------
+# Load steps
+# --------------------------------------------------------------------
+
+
+def run_step(url: str, pid: Optional[int], sessions: int, args) -> dict:
+    procs = max(1, min(args.client_procs, sessions))
+    shares = [sessions // procs + (1 if i < sessions % procs else 0) for i in range(procs)]
+    jobs = [
+        {
+            "url": url,
+            "count": count,
+            "seed": i,
+            "protocol": args.protocol,
+            "client_format": args.client_format,
+            "audio": args.audio,
+            "turns": args.turns,
+            "quiet_secs": args.quiet_secs,
+            "timeout": args.timeout,
+            "ramp_secs": args.ramp_secs,
+            "playout_secs": args.playout_ms / 1000,
+            "gap_secs": args.gap_ms / 1000,
+        }
+        for i, count in enumerate(shares)
+    ]
+
+    cpu_start, wall_start = (_cpu_secs(pid) if pid else 0.0), time.monotonic()
+    with multiprocessing.Pool(procs) as pool:
+        chunks = pool.map(_client_proc, jobs)
+    wall = time.monotonic() - wall_start
+    server_cores = (_cpu_secs(pid) - cpu_start) / wall if pid else float("nan")
+
+    results = [r for chunk in chunks for r in chunk["sessions"]]
+    latency = summarize([t for r in results for t in r["turn_latency"]])
+    jitter = summarize([j for r in results for j in r["jitter"]])
+    rtf = summarize([x for r in results for x in r["rtf"]])
+    messages = sum(r["messages"] for r in results)
+    late = sum(r["late"] for r in results)
+    errors = [r["error"] for r in results if r["error"]]
+    late_fraction = late / messages if messages else 0.0
+    return {
+        "sessions": sessions,
+        "turn_p50": latency["p50"],
+        "turn_p95": latency["p95"],
+        "jitter_p95_ms": jitter["p95"] * 1000,
+        "late_pct": late_fraction * 100,
+        "lost": sum(r["lost"] for r in results),
+        "rtf_p50": rtf["p50"],
+        "rtf_max": rtf["max"],
+        "server_cores": round(server_cores, 2),
+        "client_cores": round(sum(chunk["cpu_secs"] for chunk in chunks) / wall, 2),
+        "client_lag_max_ms": max(r["max_send_lag"] for r in results) * 1000,
+        "failed": len(errors),
+        "errors": sorted(set(errors)),
+        "passed": not errors and latency["count"] > 0 and latency["p95"] <= args.slo and late_fraction <= args.max_late,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[25, 50, 100, 200, 400])
+    parser.add_argument("--url", help="ws:// URL of a running server's /ws (default: start server.py --offline)")
+    parser.add_argument("--server-pid", type=int, help="PID of the --url server, for its CPU use")
+    parser.add_argument("--workers", type=int, default=1, help="Server worker processes")
+    parser.add_argument("--protocol", choices=["framed", "raw"], default="framed")
+    parser.add_argument("--client-format", choices=sorted(CLIENT_FORMATS), default="pcm16")
+    parser.add_argument("--audio", nargs="+", help="16-bit mono WAV utterances (default: synthetic speech)")
+    parser.add_argument("--turns", type=int, default=3, help="Utterances per session")
+    parser.add_argument("--quiet-secs", type=float, default=1.0, help="Bot silence that ends a reply")
+    parser.add_argument("--ramp-secs", type=float, default=5.0, help="Spread session starts over this long")
+    parser.add_argument("--playout-ms", type=float, default=100.0, help="Client jitter buffer")
+    parser.add_argument("--gap-ms", type=float, default=250.0, help="Longer reply gaps are pauses, not late audio")
+    parser.add_argument("--slo", type=float, default=2.5, help="p95 turn latency limit (s)")
+    parser.add_argument("--max-late", type=float, default=0.01, help="Late reply message fraction limit")
+    parser.add_argument("--timeout", type=float, default=20.0)
+    parser.add_argument("--client-procs", type=int, default=max(1, (os.cpu_count() or 2) // 4))
+    parser.add_argument("--quick", action="store_true", help="Two small steps with one turn each, for CI")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    if args.quick:
+        args.sessions, args.turns, args.ramp_secs, args.client_procs = [2, 4], 1, 0.5, 1
+
+    server = None
+    if args.url:
+        url, pid = args.url, args.server_pid
+    else:
+        port = _free_port()
+        server = start_server(args.workers, port, max_sessions=max(args.sessions))
+        url, pid = f"ws://127.0.0.1:{port}/ws", server.pid
+
+    rows = []
+    try:
+        for sessions in args.sessions:
+            row = run_step(url, pid, sessions, args)
+            rows.append(row)
+            if not args.json:
+                print(
+                    f"sessions={sessions:<5} turn p50={row['turn_p50']:.2f}s p95={row['turn_p95']:.2f}s "
+                    f"jitter p95={row['jitter_p95_ms']:.1f}ms late={row['late_pct']:.2f}% lost={row['lost']} "
+                    f"rtf p50={row['rtf_p50']:.3f} max={row['rtf_max']:.3f} "
+                    f"server cores={row['server_cores']:.2f} client lag={row['client_lag_max_ms']:.0f}ms "
+                    f"failed={row['failed']}"
+                    + ("" if row["passed"] else "  FAIL")
+                    + (f" {row['errors']}" if row["errors"] else "")
+                )
+            if not row["passed"]:
+                break
+    finally:
+        if server:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                # An overloaded server may not finish its sessions in time
+                server.kill()
+                server.wait()
+
+    passing = [row for row in rows if row["passed"]]
+    capacity = max((row["sessions"] for row in passing), default=0)
+    if args.json:
+        print(json.dumps({"capacity": capacity, "steps": rows}, indent=2))
+    else:
+        best = next((row for row in passing if row["sessions"] == capacity), None)
+        per_core = capacity / best["server_cores"] if best and best["server_cores"] > 0 else float("nan")
+        print(
+            f"capacity: {capacity} sessions with p95 turn latency <= {args.slo:g}s "
+            f"({per_core:.1f} sessions per server core, {args.workers} worker(s))"
+        )
+    if args.quick and len(passing) < len(args.sessions):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
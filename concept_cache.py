@@ -0,0 +1,514 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Response cache for concept explanations.
+
+Most ``concept_teaching`` turns ask about the same handful of topics
+("emergency fund kya hota hai?", "what is compounding?"), and each one costs a
+full LLM response. ``ConceptCache`` sits between the intent router and the
+LLM. When the concept node is about to answer a generic question on a known
+topic, it serves a cached explanation instead:
+
+- The topic is normalized with a small alias lexicon (English, Hinglish and
+  Devanagari), and the same lexicon maps the ``topic`` argument the LLM passes
+  to ``register_concept``. Entries are keyed by topic and reply language
+  ("en", "hinglish", "hi").
+- Each key holds a pool of explanations written by the LLM. Cached answers are
+  only served once the pool is full, and a session never hears the same
+  variant twice in a row. Variants expire after a TTL and keys are evicted
+  least-recently-used.
+- On a hit the explanation is handed to the LLM service, which plays it as if
+  it had been generated (llm_replay.py), and ``register_concept`` runs
+  through the LLM's normal function call path, so flow state, the context and
+  the transition back to ``entry`` are unchanged.
+- Questions that carry numbers or are longer than a short question are
+  answered by the LLM as before, since those usually need a personalized
+  answer.
+
+The recorder half (``ConceptCache.recorder()``) sits right after the LLM and
+stores explanations the LLM produced for cache misses. The cache is shared by
+every session, and the LLM writes explanations with the caller's data in its
+context, so explanations that mention numbers, amounts or anything recorded
+in ``flow_manager.state`` (goals, spending categories) are not stored. Served
+text is pinned
+in the TTS phrase cache (tts_cache.py), so the audio of repeated explanations
+is replayed from there as well.
+
+Configuration:
+    CONCEPT_CACHE: Set to 0 to disable the cache.
+    CONCEPT_CACHE_VARIANTS: Explanations kept per topic and language before
+        cached answers are served (default 3).
+    CONCEPT_CACHE_TTL: Seconds a cached explanation stays valid (default 604800).
+    CONCEPT_CACHE_MAX_KEYS: Topic/language keys kept (default 64).
+    CONCEPT_CACHE_MAX_WORDS: Longest question still answered from the cache
+        (default 12).
+
+Metrics:
+    nivest_concept_cache_requests_total{result}: concept turns served from the
+        cache ("hit"), answered by the LLM and recorded ("miss"), or not
+        cacheable ("bypass").
+    nivest_concept_cache_saved_seconds_total: LLM time to first token avoided
+        by hits, from the measured time of the recorded misses.
+    nivest_concept_cache_llm_ttft_seconds: LLM time to first token of misses.
+    nivest_concept_cache_variants: cached explanations.
+"""
+
+import os
+import random
+import re
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    Frame,
+    FunctionCallFromLLM,
+    FunctionCallsStartedFrame,
+    InterruptionFrame,
+    LLMContextFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from intent_router import compile_keyword
+from llm_replay import ReplayLLMMixin, ReplayedResponseFrame
+from metrics import counter, gauge, histogram
+from tts_cache import TTS_CACHE
+
+CONCEPT_NODE = "concept_teaching"
+CONCEPT_FUNCTION = "register_concept"
+
+REQUESTS = counter(
+    "nivest_concept_cache_requests_total",
+    "Concept explanations served from the cache, recorded from the LLM, or bypassed.",
+    ["result"],
+)
+SAVED_SECONDS = counter(
+    "nivest_concept_cache_saved_seconds_total",
+    "Estimated LLM time to first token avoided by concept cache hits.",
+)
+LLM_TTFT = histogram(
+    "nivest_concept_cache_llm_ttft_seconds",
+    "LLM time to first token for concept explanations that missed the cache.",
+    buckets=(0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0),
+)
+VARIANTS = gauge("nivest_concept_cache_variants", "Cached concept explanations.")
+
+# --------------------------------------------------------------------
+# Topic and language normalization
+# --------------------------------------------------------------------
+
+# Canonical topic -> (label passed to register_concept, alias patterns).
+# ASCII patterns are anchored on word boundaries, Devanagari ones are plain
+# substring matches, as in intent_router.LEXICON.
+TOPICS: Dict[str, Tuple[str, List[str]]] = {
+    "emergency_fund": (
+        "emergency fund",
+        [
+            r"emergency (fund|savings?|money|paisa)",
+            r"rainy day (fund|savings?)",
+            r"safety net",
+            r"aapat(kalin)?( fund)?",
+            "इमरजेंसी",
+            "आपातकाल",
+        ],
+    ),
+    "daily_saving": (
+        "daily saving habits",
+        [
+            r"(daily|small|chhot(i|e)) sav(e|ing|ings)( habits?)?",
+            r"saving habits?",
+            r"(roz|rozana|daily|har din)( ki)? bachat",
+            r"bachat (ki )?aadat",
+            "रोज़ बचत",
+            "रोज बचत",
+            "बचत की आदत",
+        ],
+    ),
+    "budgeting": (
+        "budgeting",
+        [
+            r"budget(ing|s)?",
+            r"fixed (vs\.? |and |or )?flexible",
+            r"(fixed|flexible) (costs?|kharch(a|e)?|expenses?)",
+            "बजट",
+        ],
+    ),
+    "compounding": (
+        "compounding",
+        [
+            r"compound(ing|ed)?( interest)?",
+            r"byaaj (par|pe) byaaj",
+            r"interest on interest",
+            r"chakravriddhi",
+            "चक्रवृद्धि",
+            "ब्याज पर ब्याज",
+        ],
+    ),
+}
+
+
+_TOPIC_PATTERNS = {
+    topic: [compile_keyword(p) for p in patterns] for topic, (_, patterns) in TOPICS.items()
+}
+_DEVANAGARI = re.compile(r"[ऀ-ॿ]")
+_DIGIT = re.compile(r"\d")
+# Amounts written out in words, in any of the reply languages
+_AMOUNTS = [
+    compile_keyword(r"rs|rupa?ye|rupees?|rupiya|paise|hazaa?r|thousands?|hundreds?|lakhs?|crores?"),
+    re.compile("₹|रुपय|रुपए|रुपये|पैसे|हज़ार|हजार|सौ|लाख|करोड़"),
+]
+_HINGLISH = re.compile(
+    r"(?<![\w])(kya|kaise|kyun|hai|hota|hoti|hain|mujhe|mera|meri|batao|samjha(o|iye)?|"
+    r"matlab|kaam|karta|karti|karna|paisa|paise|bachat|byaaj|aur|nahi|thoda)(?![\w])"
+)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def normalize_topic(text: str) -> Optional[str]:
+    """Map a question or a ``register_concept`` topic to a canonical topic.
+
+    Returns:
+        The TOPICS key, or None if no topic (or more than one) matches.
+    """
+    normalized = _normalize(text)
+    matches = [
+        topic
+        for topic, patterns in _TOPIC_PATTERNS.items()
+        if any(p.search(normalized) for p in patterns)
+    ]
+    return matches[0] if len(matches) == 1 else None
+
+
+def detect_language(text: str) -> str:
+    """Guess the reply language of a user message: "hi", "hinglish" or "en"."""
+    if _DEVANAGARI.search(text):
+        return "hi"
+    if _HINGLISH.search(_normalize(text)):
+        return "hinglish"
+    return "en"
+
+
+def _session_facts(state: dict) -> List[str]:
+    # Names the caller gave during this or earlier calls
+    facts = set()
+    history = state.get("history") or {}
+    for goal in (state.get("goals") or []) + (history.get("goals") or []):
+        if goal.get("goal"):
+            facts.add(goal["goal"])
+    ledger = (state.get("finance") or {}).get("ledger")
+    if ledger is not None and not isinstance(ledger, dict):
+        facts.update(entry["category"] for entry in ledger.entries() if entry["category"])
+    for key in ("user_id", "user_phone"):
+        if state.get(key):
+            facts.add(str(state[key]))
+    return [_normalize(fact) for fact in facts if len(fact.strip()) >= 3]
+
+
+def is_personal(text: str, state: Optional[dict]) -> bool:
+    """Whether an explanation may depend on the caller it was written for.
+
+    The LLM writes explanations with the caller's finance state in its
+    context, so one that mentions a number, an amount or anything the
+    session recorded (goals, spending categories, the caller's id) is not
+    replayed to other callers.
+    """
+    if _DIGIT.search(text) or any(p.search(text) for p in _AMOUNTS):
+        return True
+    normalized = _normalize(text)
+    return any(compile_keyword(re.escape(fact)).search(normalized) for fact in _session_facts(state or {}))
+
+
+def _user_text(context) -> Optional[str]:
+    # The concept node's task message follows the user turn, so search back
+    for message in reversed(context.get_messages()):
+        if not isinstance(message, dict) or message.get("role") != "user":
+            continue
+        content = message.get("content")
+        if isinstance(content, list):
+            content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+        return content or None
+    return None
+
+
+# --------------------------------------------------------------------
+# Cache store
+# --------------------------------------------------------------------
+
+
+@dataclass
+class _Entry:
+    variants: List[Tuple[str, float]] = field(default_factory=list)  # (text, created)
+    ttft: Optional[float] = None  # EWMA of the LLM time to first token
+
+
+class ConceptResponseCache:
+    """Pools of cached explanations keyed by (topic, language)."""
+
+    def __init__(
+        self,
+        variants: Optional[int] = None,
+        ttl: Optional[float] = None,
+        max_keys: Optional[int] = None,
+    ):
+        """Initialize the cache.
+
+        Args:
+            variants: Explanations per key. Defaults to CONCEPT_CACHE_VARIANTS.
+            ttl: Lifetime of an explanation in seconds. Defaults to
+                CONCEPT_CACHE_TTL.
+            max_keys: Keys kept before LRU eviction. Defaults to
+                CONCEPT_CACHE_MAX_KEYS.
+        """
+        self.variants = variants or int(os.getenv("CONCEPT_CACHE_VARIANTS", "3"))
+        self.ttl = ttl or float(os.getenv("CONCEPT_CACHE_TTL", str(7 * 24 * 3600)))
+        self.max_keys = max_keys or int(os.getenv("CONCEPT_CACHE_MAX_KEYS", "64"))
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._saved = 0.0
+
+    def choose(self, topic: str, language: str, exclude: Optional[str] = None) -> Optional[str]:
+        """Pick a cached explanation, or None until the pool is full.
+
+        Args:
+            topic: Canonical topic.
+            language: Reply language.
+            exclude: Variant to avoid, normally the one this session heard last.
+        """
+        entry = self._entries.get((topic, language))
+        if entry is None:
+            return None
+        self._expire(entry)
+        if len(entry.variants) < self.variants:
+            return None
+        self._entries.move_to_end((topic, language))
+        candidates = [text for text, _ in entry.variants if text != exclude]
+        return random.choice(candidates or [text for text, _ in entry.variants])
+
+    def add(self, topic: str, language: str, text: str, ttft: Optional[float] = None):
+        """Store an explanation produced by the LLM, replacing the oldest one."""
+        entry = self._entries.pop((topic, language), None) or _Entry()
+        self._entries[(topic, language)] = entry
+        self._expire(entry)
+        if all(text != existing for existing, _ in entry.variants):
+            entry.variants.append((text, time.time()))
+            del entry.variants[: -self.variants]
+        if ttft is not None:
+            entry.ttft = ttft if entry.ttft is None else 0.8 * entry.ttft + 0.2 * ttft
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+        self._update_gauge()
+
+    def record_hit(self, topic: str, language: str):
+        entry = self._entries.get((topic, language))
+        saved = entry.ttft if entry is not None and entry.ttft is not None else 0.0
+        self._hits += 1
+        self._saved += saved
+        REQUESTS.inc(result="hit")
+        SAVED_SECONDS.inc(saved)
+
+    def record_miss(self):
+        self._misses += 1
+        REQUESTS.inc(result="miss")
+
+    def stats(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "keys": len(self._entries),
+            "variants": sum(len(e.variants) for e in self._entries.values()),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            "saved_seconds": round(self._saved, 3),
+        }
+
+    def _expire(self, entry: _Entry):
+        cutoff = time.time() - self.ttl
+        entry.variants[:] = [(text, created) for text, created in entry.variants if created >= cutoff]
+
+    def _update_gauge(self):
+        VARIANTS.set(sum(len(e.variants) for e in self._entries.values()))
+
+
+CONCEPT_CACHE = ConceptResponseCache()
+
+
+def concept_cache_enabled() -> bool:
+    return os.getenv("CONCEPT_CACHE", "1") != "0"
+
+
+# --------------------------------------------------------------------
+# Pipeline processors
+# --------------------------------------------------------------------
+
+
+class ConceptCache(FrameProcessor):
+    """Answers generic concept questions from ``ConceptResponseCache``.
+
+    Place it between the intent router and the LLM, and the processor returned
+    by ``recorder()`` directly after the LLM.
+    """
+
+    def __init__(
+        self,
+        llm,
+        flow_manager: Callable[[], object],
+        cache: Optional[ConceptResponseCache] = None,
+        max_words: Optional[int] = None,
+        **kwargs,
+    ):
+        """Initialize the cache processor.
+
+        Args:
+            llm: The session's LLM service, next in the pipeline. Hits are
+                played out of it (``ReplayLLMMixin``) so the rest of the
+                pipeline sees a normal LLM response; an LLM without the mixin
+                answers every turn itself.
+            flow_manager: Returns the session's FlowManager (created after the
+                pipeline, hence a callable).
+            cache: Explanation store. Defaults to the process-wide CONCEPT_CACHE.
+            max_words: Longest cacheable question. Defaults to
+                CONCEPT_CACHE_MAX_WORDS.
+        """
+        super().__init__(**kwargs)
+        self._llm = llm
+        if not isinstance(llm, ReplayLLMMixin):
+            logger.warning(f"{self}: {llm} can't play cached responses, concept cache disabled")
+        self._flow_manager = flow_manager
+        self._cache = cache or CONCEPT_CACHE
+        self._max_words = max_words or int(os.getenv("CONCEPT_CACHE_MAX_WORDS", "12"))
+        self._last_served: Dict[Tuple[str, str], str] = {}
+        # Set on a miss and consumed by the recorder
+        self._pending: Optional[Tuple[str, float]] = None
+
+    def recorder(self) -> "ConceptCacheRecorder":
+        return ConceptCacheRecorder(self)
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, LLMContextFrame) and direction == FrameDirection.DOWNSTREAM:
+            if await self._maybe_serve(frame):
+                return
+
+        await self.push_frame(frame, direction)
+
+    async def _maybe_serve(self, frame: LLMContextFrame) -> bool:
+        self._pending = None
+        flow_manager = self._flow_manager()
+        if (
+            flow_manager is None
+            or flow_manager.current_node != CONCEPT_NODE
+            or not isinstance(self._llm, ReplayLLMMixin)
+        ):
+            return False
+
+        text = _user_text(frame.context)
+        topic = normalize_topic(text) if text else None
+        if (
+            topic is None
+            or _DIGIT.search(text)
+            or len(text.split()) > self._max_words
+        ):
+            REQUESTS.inc(result="bypass")
+            return False
+
+        language = detect_language(text)
+        explanation = self._cache.choose(
+            topic, language, exclude=self._last_served.get((topic, language))
+        )
+        if explanation is None:
+            self._cache.record_miss()
+            self._pending = (language, time.monotonic())
+            return False
+
+        self._cache.record_hit(topic, language)
+        self._last_served[(topic, language)] = explanation
+        logger.debug("Concept cache hit: {} ({}) for {!r}", topic, language, text)
+        await self._serve(frame, topic, explanation)
+        return True
+
+    async def _serve(self, frame: LLMContextFrame, topic: str, explanation: str):
+        TTS_CACHE.pin(explanation)
+        # The LLM (next in the pipeline) plays it as its own response
+        await self.push_frame(
+            ReplayedResponseFrame(
+                text=explanation,
+                function_calls=[
+                    FunctionCallFromLLM(
+                        function_name=CONCEPT_FUNCTION,
+                        tool_call_id=f"concept-cache-{uuid.uuid4().hex[:12]}",
+                        arguments={"topic": TOPICS[topic][0]},
+                        context=frame.context,
+                    )
+                ],
+            )
+        )
+
+
+class ConceptCacheRecorder(FrameProcessor):
+    """Stores concept explanations the LLM produced for cache misses."""
+
+    def __init__(self, cache: ConceptCache, **kwargs):
+        super().__init__(**kwargs)
+        self._owner = cache
+        self._text = ""
+        self._topic: Optional[str] = None
+        self._ttft: Optional[float] = None
+        self._recording = False
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, LLMFullResponseStartFrame):
+            self._reset()
+            self._recording = self._owner._pending is not None
+        elif self._recording:
+            if isinstance(frame, LLMTextFrame) and not frame.skip_tts:
+                if self._ttft is None:
+                    self._ttft = time.monotonic() - self._owner._pending[1]
+                    LLM_TTFT.observe(self._ttft)
+                self._text += frame.text
+            elif isinstance(frame, FunctionCallsStartedFrame):
+                for call in frame.function_calls:
+                    if call.function_name == CONCEPT_FUNCTION:
+                        self._topic = normalize_topic(str(call.arguments.get("topic", "")))
+            elif isinstance(frame, LLMFullResponseEndFrame):
+                self._store()
+            elif isinstance(frame, InterruptionFrame):
+                # Never cache an explanation the user talked over
+                self._reset()
+
+        await self.push_frame(frame, direction)
+
+    def _store(self):
+        text = self._text.strip()
+        pending = self._owner._pending
+        flow_manager = self._owner._flow_manager()
+        if text and self._topic and pending and is_personal(text, getattr(flow_manager, "state", None)):
+            logger.debug("Concept cache skipped a {} explanation written for this caller", self._topic)
+        elif text and self._topic and pending:
+            language = pending[0]
+            self._owner._cache.add(self._topic, language, text, ttft=self._ttft)
+            TTS_CACHE.pin(text)
+            logger.debug("Concept cache stored a {} ({}) explanation", self._topic, language)
+        self._owner._pending = None
+        self._reset()
+
+    def _reset(self):
+        self._text = ""
+        self._topic = None
+        self._ttft = None
+        self._recording = False
@@ -0,0 +1,340 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Bounded conversation context with a rolling summary.
+
+The session keeps a single ``LLMContext`` for the whole call, and flows appends
+the entry node's prompts again every time the conversation loops back. Long
+calls would therefore grow the prompt without limit. ``ContextBudget`` keeps it
+bounded:
+
+- Every context frame on its way to the LLM is measured (message count and an
+  approximate token count). The frame itself is passed on untouched.
+- Once either budget is exceeded, a background task summarizes the older part
+  of the conversation with the session's LLM (``run_inference``), falling back
+  to an extractive summary if the call fails or times out.
+- When the summary is ready, the compacted messages are replaced by one summary
+  message plus a pinned message holding the session's finance, goals and mood
+  data from ``flow_manager.state``, so those facts survive any compaction.
+
+The cut is always placed just before a user or system message, so function
+calls are never separated from their results, and the most recent messages as
+well as the current node's task prompt are always kept. If the context was
+rewritten while the summary was being generated (e.g. a context reset), the
+result is dropped.
+
+Configuration:
+    CONTEXT_MAX_MESSAGES: Message budget (default 40).
+    CONTEXT_MAX_TOKENS: Approximate token budget (default 4000).
+    CONTEXT_KEEP_RECENT: Messages always kept verbatim (default 12).
+    CONTEXT_SUMMARY_TIMEOUT: Seconds to wait for the LLM summary (default 8).
+
+Metrics:
+    nivest_context_compactions_total{method}: applied ("llm" / "extractive")
+        and discarded compactions.
+    nivest_context_messages: context size seen by the LLM, per turn.
+"""
+
+import asyncio
+import json
+import os
+from typing import Callable, List, Optional
+
+from loguru import logger
+
+from pipecat.frames.frames import CancelFrame, EndFrame, Frame, LLMContextFrame
+from pipecat.processors.aggregators.llm_context import LLMContext
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.llm_service import LLMService
+
+from metrics import counter, histogram
+
+COMPACTIONS = counter(
+    "nivest_context_compactions_total",
+    "Context compactions by summary method, plus discarded ones.",
+    ["method"],
+)
+CONTEXT_MESSAGES = histogram(
+    "nivest_context_messages",
+    "Number of context messages sent to the LLM per turn.",
+    buckets=(5, 10, 20, 40, 60, 80, 120, 200),
+)
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+PINNED_PREFIX = "Saved user data (always keep using this):"
+
+SUMMARY_PROMPT = (
+    "You compress a voice conversation between a financial coach and a gig worker. "
+    "Summarize it in at most 5 short sentences, in English. Keep every amount, goal, "
+    "concept already explained and how the user was feeling. If a previous summary is "
+    "included, merge it in. Reply with the summary only."
+)
+
+# Rough characters-per-token ratio; good enough for a budget check.
+CHARS_PER_TOKEN = 4
+# Below this many messages to compact, summarizing is not worth an LLM call.
+MIN_COMPACT_MESSAGES = 4
+# Longest excerpt kept per message in the extractive fallback.
+EXTRACT_CHARS = 160
+
+
+# --------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------
+
+
+def _text(message) -> str:
+    if not isinstance(message, dict):
+        return ""
+    content = message.get("content")
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def estimate_tokens(messages: List) -> int:
+    """Approximate the prompt size of ``messages`` in tokens."""
+    chars = 0
+    for message in messages:
+        chars += len(_text(message))
+        if isinstance(message, dict) and message.get("tool_calls"):
+            chars += len(json.dumps(message["tool_calls"], default=str))
+    return chars // CHARS_PER_TOKEN
+
+
+def _role(message) -> Optional[str]:
+    return message.get("role") if isinstance(message, dict) else None
+
+
+def pinned_facts(state: dict) -> Optional[str]:
+    """Render the session data that must survive compaction.
+
+    Args:
+        state: ``flow_manager.state``.
+
+    Returns:
+        A compact text block, or None if there is nothing to pin yet.
+    """
+    facts = {}
+
+    finance = state.get("finance") or {}
+    latest = {k: v for k, v in finance.items() if k.startswith("last_")}
+    if latest:
+        facts["latest_day"] = latest
+    ledger = finance.get("ledger")
+    if ledger is not None:
+        facts.update(ledger.summary())
+
+    goals = state.get("goals") or []
+    if goals:
+        facts["goals"] = [
+            {"goal": g.get("goal"), "target_amount": g.get("target_amount")} for g in goals
+        ]
+
+    mood_log = state.get("mood_log") or []
+    if mood_log:
+        facts["mood"] = {
+            "stressful_moments": sum(1 for m in mood_log if m.get("type") == "stress"),
+            "last": mood_log[-1].get("timestamp"),
+        }
+
+    concepts = state.get("concepts_explained") or []
+    if concepts:
+        facts["concepts_explained"] = sorted({c.get("topic") for c in concepts if c.get("topic")})
+
+    # Profile of a returning user (user_state.py)
+    history = state.get("history")
+    if history:
+        facts["earlier_calls"] = history
+
+    if not facts:
+        return None
+    return f"{PINNED_PREFIX} {json.dumps(facts, ensure_ascii=False, separators=(',', ':'))}"
+
+
+def extractive_summary(messages: List) -> str:
+    """Summarize without an LLM: keep short excerpts of each spoken turn."""
+    lines = []
+    for message in messages:
+        role = _role(message)
+        text = " ".join(_text(message).split())
+        if not text:
+            continue
+        if role == "system":
+            # Earlier summaries carry over; node prompts are dropped.
+            if text.startswith(SUMMARY_PREFIX):
+                lines.append(text[len(SUMMARY_PREFIX):].strip())
+            continue
+        if role in ("user", "assistant"):
+            speaker = "User" if role == "user" else "Coach"
+            lines.append(f"{speaker}: {text[:EXTRACT_CHARS]}")
+    return " ".join(lines)
+
+
+def _transcript(messages: List) -> str:
+    lines = []
+    for message in messages:
+        role = _role(message)
+        text = _text(message)
+        if not text:
+            continue
+        if role == "system":
+            if text.startswith(SUMMARY_PREFIX):
+                lines.append(f"Previous summary: {text[len(SUMMARY_PREFIX):].strip()}")
+        elif role == "tool":
+            lines.append(f"Tool result: {text}")
+        elif role in ("user", "assistant"):
+            lines.append(f"{'User' if role == 'user' else 'Coach'}: {text}")
+    return "\n".join(lines)
+
+
+# --------------------------------------------------------------------
+# Pipeline processor
+# --------------------------------------------------------------------
+
+
+class ContextBudget(FrameProcessor):
+    """Keeps the shared LLM context within a message and token budget.
+
+    Place it between ``context_aggregator.user()`` and the LLM.
+    """
+
+    def __init__(
+        self,
+        context: LLMContext,
+        llm: LLMService,
+        state: Callable[[], Optional[dict]],
+        max_messages: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        keep_recent: Optional[int] = None,
+        summary_timeout: Optional[float] = None,
+        **kwargs,
+    ):
+        """Initialize the budget.
+
+        Args:
+            context: The session's LLM context (shared with the aggregators).
+            llm: LLM used for out-of-band summaries.
+            state: Returns ``flow_manager.state`` (the flow manager is created
+                after the pipeline, hence a callable).
+            max_messages: Message budget. Defaults to CONTEXT_MAX_MESSAGES.
+            max_tokens: Approximate token budget. Defaults to CONTEXT_MAX_TOKENS.
+            keep_recent: Messages never compacted. Defaults to CONTEXT_KEEP_RECENT.
+            summary_timeout: Seconds to wait for the LLM summary. Defaults to
+                CONTEXT_SUMMARY_TIMEOUT.
+        """
+        super().__init__(**kwargs)
+        self._context = context
+        self._llm = llm
+        self._state = state
+        self._max_messages = max_messages or int(os.getenv("CONTEXT_MAX_MESSAGES", "40"))
+        self._max_tokens = max_tokens or int(os.getenv("CONTEXT_MAX_TOKENS", "4000"))
+        self._keep_recent = keep_recent or int(os.getenv("CONTEXT_KEEP_RECENT", "12"))
+        self._summary_timeout = summary_timeout or float(os.getenv("CONTEXT_SUMMARY_TIMEOUT", "8"))
+        self._task: Optional[asyncio.Task] = None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, LLMContextFrame) and direction == FrameDirection.DOWNSTREAM:
+            self._check_budget()
+        elif isinstance(frame, (EndFrame, CancelFrame)):
+            await self._stop()
+
+        await self.push_frame(frame, direction)
+
+    async def cleanup(self):
+        await super().cleanup()
+        await self._stop()
+
+    async def _stop(self):
+        if self._task:
+            await self.cancel_task(self._task)
+            self._task = None
+
+    def _check_budget(self):
+        messages = self._context.get_messages()
+        CONTEXT_MESSAGES.observe(len(messages))
+        if self._task:
+            return
+        if len(messages) <= self._max_messages and estimate_tokens(messages) <= self._max_tokens:
+            return
+
+        span = self._compaction_span(messages)
+        if span is None:
+            return
+        start, end = span
+        self._task = self.create_task(self._compact(start, messages[start:end]))
+
+    def _compaction_span(self, messages: List) -> Optional[tuple]:
+        """Pick the ``[start, end)`` slice of messages to compact.
+
+        The leading system message (persona) is kept, as are the last
+        ``keep_recent`` messages and the latest system message (the current
+        node's task). ``end`` is moved back until it sits on a user or system
+        message.
+        """
+        start = 1 if _role(messages[0]) == "system" else 0
+        end = len(messages) - self._keep_recent
+        for i in range(len(messages) - 1, start - 1, -1):
+            if _role(messages[i]) == "system" and not _text(messages[i]).startswith(
+                (SUMMARY_PREFIX, PINNED_PREFIX)
+            ):
+                end = min(end, i)
+                break
+        while end > start and _role(messages[end]) not in ("user", "system"):
+            end -= 1
+        if end - start < MIN_COMPACT_MESSAGES:
+            return None
+        return start, end
+
+    async def _compact(self, start: int, old: List):
+        try:
+            method = "llm"
+            try:
+                summary = await asyncio.wait_for(self._summarize(old), self._summary_timeout)
+            except Exception as e:
+                logger.warning(f"{self}: LLM summary failed ({e!r}), using extractive summary")
+                summary = None
+            if not summary:
+                method = "extractive"
+                summary = extractive_summary(old)
+            self._apply(start, old, summary, method)
+        finally:
+            self._task = None
+
+    async def _summarize(self, old: List) -> Optional[str]:
+        transcript = _transcript(old)
+        if not transcript:
+            return None
+        summary_context = LLMContext(
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": transcript},
+            ]
+        )
+        summary = await self._llm.run_inference(summary_context)
+        return summary.strip() if summary else None
+
+    def _apply(self, start: int, old: List, summary: str, method: str):
+        messages = self._context.get_messages()
+        current = messages[start : start + len(old)]
+        if len(current) != len(old) or any(a is not b for a, b in zip(current, old)):
+            COMPACTIONS.inc(method="discarded")
+            logger.debug(f"{self}: context changed during summarization, dropping summary")
+            return
+
+        replacement = [{"role": "system", "content": f"{SUMMARY_PREFIX} {summary}"}]
+        state = self._state() or {}
+        pinned = pinned_facts(state)
+        if pinned:
+            replacement.append({"role": "system", "content": pinned})
+
+        self._context.set_messages(messages[:start] + replacement + messages[start + len(old) :])
+        COMPACTIONS.inc(method=method)
+        logger.debug(
+            f"{self}: compacted {len(old)} messages ({method}); "
+            f"context now {len(self._context.get_messages())} messages"
+        )
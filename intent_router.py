@@ -0,0 +1,296 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Local intent router for the entry node.
+
+At the ``entry`` node the LLM's only job is to pick one of the four
+``route_to_*`` functions, and a second LLM call then produces the actual reply.
+``IntentRouter`` sits between the user context aggregator and the LLM and
+classifies the latest user transcript with a small keyword model (English,
+Hinglish and Devanagari). When it is confident it moves the flow to the target
+node itself and the routing LLM call is skipped; otherwise the context frame is
+passed through and the LLM routes as before.
+
+Configuration:
+    INTENT_ROUTER: "on" (default) routes locally when confident, "shadow" only
+        classifies and records metrics, "off" disables the router.
+    INTENT_ROUTER_THRESHOLD: Minimum confidence to route locally (default 0.7).
+
+Metrics:
+    nivest_intent_router_confidence{route}: classifier confidence per decision.
+    nivest_intent_router_decisions_total{decision, route}: routed / fallback /
+        shadow counts.
+    nivest_intent_router_agreement_total{agree, route}: whether the classifier
+        matched the route the LLM chose, whenever the LLM did the routing.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from pipecat.frames.frames import Frame, FunctionCallsStartedFrame, LLMContextFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from metrics import counter, histogram
+
+ENTRY_NODE = "entry"
+
+CONFIDENCE = histogram(
+    "nivest_intent_router_confidence",
+    "Confidence of the local intent classifier for each entry-node turn.",
+    ["route"],
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+)
+DECISIONS = counter(
+    "nivest_intent_router_decisions_total",
+    "Entry-node turns routed locally, passed to the LLM, or classified in shadow mode.",
+    ["decision", "route"],
+)
+AGREEMENT = counter(
+    "nivest_intent_router_agreement_total",
+    "Classifier prediction vs. the route picked by the LLM.",
+    ["agree", "route"],
+)
+
+# --------------------------------------------------------------------
+# Keyword model
+# --------------------------------------------------------------------
+
+# (pattern, weight) per route. Patterns are matched against the lower-cased
+# transcript; ASCII patterns are anchored on word boundaries, Devanagari ones
+# are plain substring matches since \b does not work well with matras.
+LEXICON: Dict[str, List[Tuple[str, float]]] = {
+    "route_to_daily_advice": [
+        (r"kama(a)?(ya|yi|ye|i)", 2.0),
+        (r"kamai", 2.0),
+        (r"earn(ed|ing|ings)?", 2.0),
+        (r"income", 2.0),
+        (r"kharch(a|e)?", 1.5),
+        (r"spen(t|d)", 1.5),
+        (r"petrol|diesel|cng|toll", 1.0),
+        (r"trips?|rides?|orders?|deliver(y|ies)", 1.0),
+        (r"rupa?ye|rupees?|rs", 0.5),
+        (r"aaj|today", 0.5),
+        (r"\d+", 0.5),
+        ("कमा", 2.0),
+        ("खर्च", 1.5),
+        ("पेट्रोल", 1.0),
+        ("आज", 0.5),
+    ],
+    "route_to_concept_teaching": [
+        (r"kya hota hai|kya hai|kaise kaam", 2.0),
+        (r"what is|what's|what are|how does|how do", 2.0),
+        (r"explain|samjha(o|iye|na)?|matlab|meaning", 2.0),
+        (r"emergency fund|compound(ing)?|interest|byaaj|budget(ing)?", 1.5),
+        (r"sip|mutual funds?|fd|fixed deposit|insurance|bima", 1.5),
+        ("क्या होता", 2.0),
+        ("समझा", 2.0),
+        ("मतलब", 2.0),
+        ("ब्याज", 1.5),
+    ],
+    "route_to_stress_support": [
+        (r"thak(a|i|e)?( gaya| gayi| gaye)?", 2.0),
+        (r"tired|exhausted|stress(ed)?|tension|worried|anxious", 2.0),
+        (r"pareshan|dukhi|udaas|sad|frustrated|fed up", 2.0),
+        (r"bura din|bad day|ho nahi raha|nahi bachte|bachte (hi )?nahi|kuch nahi bachta", 1.5),
+        (r"darr?|ghabra(hat)?", 1.0),
+        ("थक", 2.0),
+        ("परेशान", 2.0),
+        ("टेंशन", 2.0),
+        ("चिंता", 2.0),
+    ],
+    "route_to_goal_setting": [
+        (r"goal|target|sapna|dream", 2.0),
+        (r"(lena|leni|lene|kharidna|kharidni) hai", 2.0),
+        (r"buy|purchase|save (up )?for|pay off|chukana|chukani", 2.0),
+        (r"bike|scooter|gaadi|car|auto|ghar|house|shaadi|wedding", 1.0),
+        (r"school fees?|padhai|bachche|bachchon|kids?|child(ren)?", 1.0),
+        ("लक्ष्य", 2.0),
+        ("सपना", 2.0),
+        ("खरीद", 2.0),
+        ("लेनी है", 2.0),
+    ],
+}
+
+# Pseudo-count added to the denominator so that a single weak keyword does not
+# produce a confident decision.
+SMOOTHING = 0.75
+
+
+def compile_keyword(pattern: str) -> re.Pattern:
+    """Compile a lexicon pattern: whole words if ASCII, a substring otherwise."""
+    if pattern.isascii():
+        return re.compile(rf"(?<![\w])(?:{pattern})(?![\w])")
+    return re.compile(pattern)
+
+
+_COMPILED = {
+    route: [(compile_keyword(pattern), weight) for pattern, weight in entries]
+    for route, entries in LEXICON.items()
+}
+
+
+@dataclass
+class IntentDecision:
+    """Result of classifying one transcript."""
+
+    route: Optional[str]
+    confidence: float
+    scores: Dict[str, float] = field(default_factory=dict)
+
+
+def classify(text: str) -> IntentDecision:
+    """Score a transcript against the routing lexicon.
+
+    Args:
+        text: User transcript (any mix of English, Hinglish and Devanagari).
+
+    Returns:
+        The best route and a confidence in [0, 1]: the winning score divided by
+        the total score plus ``SMOOTHING``.
+    """
+    normalized = " ".join(text.lower().split())
+    scores = {}
+    for route, entries in _COMPILED.items():
+        score = sum(weight for pattern, weight in entries if pattern.search(normalized))
+        if score:
+            scores[route] = score
+
+    if not scores:
+        return IntentDecision(route=None, confidence=0.0, scores=scores)
+
+    route = max(scores, key=scores.get)
+    confidence = scores[route] / (sum(scores.values()) + SMOOTHING)
+    return IntentDecision(route=route, confidence=round(confidence, 3), scores=scores)
+
+
+def _last_user_text(context) -> Optional[str]:
+    messages = context.get_messages()
+    if not messages or not isinstance(messages[-1], dict):
+        return None
+    message = messages[-1]
+    if message.get("role") != "user":
+        return None
+    content = message.get("content")
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or None
+
+
+# --------------------------------------------------------------------
+# Pipeline processor
+# --------------------------------------------------------------------
+
+
+class IntentRouter(FrameProcessor):
+    """Routes entry-node turns locally when the classifier is confident.
+
+    Place it between ``context_aggregator.user()`` and the LLM.
+    """
+
+    def __init__(
+        self,
+        routes: Dict[str, Callable[[], dict]],
+        flow_manager: Callable[[], object],
+        mode: Optional[str] = None,
+        threshold: Optional[float] = None,
+        **kwargs,
+    ):
+        """Initialize the router.
+
+        Args:
+            routes: Routing function name -> node factory for its target node.
+            flow_manager: Returns the session's FlowManager (created after the
+                pipeline, hence a callable).
+            mode: "on", "shadow" or "off". Defaults to INTENT_ROUTER.
+            threshold: Confidence needed to route locally. Defaults to
+                INTENT_ROUTER_THRESHOLD.
+        """
+        super().__init__(**kwargs)
+        self._routes = routes
+        self._flow_manager = flow_manager
+        self._mode = (mode or os.getenv("INTENT_ROUTER", "on")).lower()
+        self._threshold = (
+            threshold
+            if threshold is not None
+            else float(os.getenv("INTENT_ROUTER_THRESHOLD", "0.7"))
+        )
+        self._prediction: Optional[IntentDecision] = None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if self._mode != "off":
+            if isinstance(frame, LLMContextFrame) and direction == FrameDirection.DOWNSTREAM:
+                if await self._maybe_route(frame):
+                    return
+            elif isinstance(frame, FunctionCallsStartedFrame):
+                self._record_llm_route(frame)
+
+        await self.push_frame(frame, direction)
+
+    def would_route(self, text: str) -> bool:
+        """Whether ``text`` would be routed locally in the current node.
+
+        Used by the speculative LLM (speculative_llm.py) to skip requests the
+        router would make unnecessary.
+        """
+        if self._mode != "on":
+            return False
+        flow_manager = self._flow_manager()
+        if flow_manager is None or flow_manager.current_node != ENTRY_NODE:
+            return False
+        decision = classify(text)
+        return decision.route in self._routes and decision.confidence >= self._threshold
+
+    async def _maybe_route(self, frame: LLMContextFrame) -> bool:
+        flow_manager = self._flow_manager()
+        if flow_manager is None or flow_manager.current_node != ENTRY_NODE:
+            return False
+
+        text = _last_user_text(frame.context)
+        if not text:
+            return False
+
+        decision = classify(text)
+        self._prediction = decision
+        route_label = decision.route or "none"
+        CONFIDENCE.observe(decision.confidence, route=route_label)
+
+        confident = (
+            decision.route in self._routes and decision.confidence >= self._threshold
+        )
+        if self._mode == "on" and confident:
+            DECISIONS.inc(decision="routed", route=route_label)
+            logger.debug(
+                "Intent router: {} (confidence {}) for {!r}", decision.route, decision.confidence, text
+            )
+            self._prediction = None
+            await flow_manager.set_node_from_config(self._routes[decision.route]())
+            return True
+
+        DECISIONS.inc(decision="shadow" if self._mode == "shadow" else "fallback", route=route_label)
+        return False
+
+    def _record_llm_route(self, frame: FunctionCallsStartedFrame):
+        prediction = self._prediction
+        if prediction is None:
+            return
+        routes = [c.function_name for c in frame.function_calls if c.function_name in self._routes]
+        if not routes:
+            return
+        self._prediction = None
+        agree = prediction.route == routes[0]
+        AGREEMENT.inc(agree=str(agree).lower(), route=routes[0])
+        logger.debug(
+            "Intent router {}: predicted {} ({}), LLM chose {}",
+            "agreed" if agree else "disagreed",
+            prediction.route,
+            prediction.confidence,
+            routes[0],
+        )
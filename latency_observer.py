@@ -0,0 +1,178 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Per-stage turn latency instrumentation for the bot pipeline.
+
+``TurnLatencyObserver`` watches frames as they move between processors and
+timestamps each user turn at:
+
+- ``vad_stop``: the transport's VAD decides the user stopped speaking
+- ``stt_final``: the STT service emits the final transcript
+- ``llm_first_token``: the LLM emits its first text token
+- ``llm_function_call``: the LLM starts a function call
+- ``tts_first_audio``: the TTS service emits its first audio chunk
+- ``transport_write``: the output transport starts playing bot audio
+
+Every stage is reported relative to ``vad_stop`` into the
+``nivest_turn_stage_seconds`` histogram (labels: stage, node, provider) and as a
+structured loguru record. The record also carries the prompt tokens of the
+node that produced the turn's first LLM output (prompt_budget.py), also
+recorded in ``nivest_node_prompt_tokens``. Being an observer, it needs no
+changes to the pipeline itself and is switched on with ``LATENCY_METRICS=1``.
+"""
+
+import os
+from typing import Callable, Dict, Optional
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    FunctionCallInProgressFrame,
+    LLMTextFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.observers.base_observer import BaseObserver, FramePushed
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.services.llm_service import LLMService
+from pipecat.services.stt_service import STTService
+from pipecat.services.tts_service import TTSService
+from pipecat.transports.base_input import BaseInputTransport
+from pipecat.transports.base_output import BaseOutputTransport
+
+from metrics import counter, histogram
+from prompt_budget import NODE_PROMPT_TOKENS, PROMPTS
+
+STAGES = (
+    "stt_final",
+    "llm_first_token",
+    "llm_function_call",
+    "tts_first_audio",
+    "transport_write",
+)
+
+TURN_STAGE_SECONDS = histogram(
+    "nivest_turn_stage_seconds",
+    "Time from VAD end-of-speech to each pipeline stage of a user turn.",
+    ["stage", "node", "provider"],
+)
+TURNS_TOTAL = counter(
+    "nivest_turns_total",
+    "User turns seen by the latency observer.",
+    ["outcome", "provider"],
+)
+
+
+def latency_metrics_enabled() -> bool:
+    """Return True when ``LATENCY_METRICS`` is set to a truthy value."""
+    return os.getenv("LATENCY_METRICS", "").lower() in ("1", "true", "yes", "on")
+
+
+class TurnLatencyObserver(BaseObserver):
+    """Timestamps each user turn as it crosses the pipeline stages."""
+
+    def __init__(
+        self,
+        provider: str,
+        node_getter: Optional[Callable[[], Optional[str]]] = None,
+        **kwargs,
+    ):
+        """Initialize the observer.
+
+        Args:
+            provider: LLM provider label (e.g. "openai").
+            node_getter: Returns the current flow node name; called whenever a
+                stage is reached so each stage is labelled with the node that
+                handled it.
+        """
+        super().__init__(**kwargs)
+        self._provider = provider
+        self._node_getter = node_getter or (lambda: None)
+        self._turn_start: Optional[int] = None
+        self._marks: Dict[str, tuple[int, str]] = {}
+        self._turn_id = 0
+
+    def _node(self) -> str:
+        return self._node_getter() or "unknown"
+
+    async def on_push_frame(self, data: FramePushed):
+        frame = data.frame
+        src = data.source
+
+        if isinstance(frame, UserStartedSpeakingFrame):
+            if isinstance(src, BaseInputTransport) and data.direction == FrameDirection.DOWNSTREAM:
+                if self._turn_start is not None:
+                    self._finish("abandoned")
+                self._marks = {}
+            return
+
+        if isinstance(frame, UserStoppedSpeakingFrame):
+            if isinstance(src, BaseInputTransport) and data.direction == FrameDirection.DOWNSTREAM:
+                self._turn_id += 1
+                self._turn_start = data.timestamp
+            return
+
+        stage = None
+        if isinstance(frame, TranscriptionFrame) and isinstance(src, STTService):
+            stage = "stt_final"
+        elif isinstance(frame, LLMTextFrame) and isinstance(src, LLMService):
+            stage = "llm_first_token"
+        elif isinstance(frame, FunctionCallInProgressFrame) and isinstance(src, LLMService):
+            stage = "llm_function_call"
+        elif isinstance(frame, TTSAudioRawFrame) and isinstance(src, TTSService):
+            stage = "tts_first_audio"
+        elif (
+            isinstance(frame, BotStartedSpeakingFrame)
+            and isinstance(src, BaseOutputTransport)
+            and data.direction == FrameDirection.DOWNSTREAM
+        ):
+            stage = "transport_write"
+
+        if stage is None or stage in self._marks:
+            return
+
+        # Transcripts usually land before VAD confirms the stop, so they are
+        # kept even when no turn is open yet.
+        if self._turn_start is None and stage != "stt_final":
+            return
+
+        self._marks[stage] = (data.timestamp, self._node())
+        if stage == "transport_write":
+            self._finish("completed")
+
+    def _finish(self, outcome: str):
+        start = self._turn_start
+        self._turn_start = None
+        TURNS_TOTAL.inc(outcome=outcome, provider=self._provider)
+        if start is None:
+            return
+
+        stages_ms = {}
+        for stage, (timestamp, node) in self._marks.items():
+            secs = max(0.0, (timestamp - start) / 1e9)
+            stages_ms[stage] = round(secs * 1000, 1)
+            if outcome == "completed":
+                TURN_STAGE_SECONDS.observe(secs, stage=stage, node=node, provider=self._provider)
+
+        # The node whose prompt the first LLM output was generated from
+        llm_marks = [self._marks[s] for s in ("llm_first_token", "llm_function_call") if s in self._marks]
+        llm_node = min(llm_marks)[1] if llm_marks else None
+        prompt_tokens = PROMPTS.tokens(llm_node, self._provider)
+        if prompt_tokens is not None and outcome == "completed":
+            NODE_PROMPT_TOKENS.observe(prompt_tokens, node=llm_node, provider=self._provider)
+        self._marks = {}
+
+        logger.bind(
+            event="turn_latency",
+            turn=self._turn_id,
+            outcome=outcome,
+            provider=self._provider,
+            node=self._node(),
+            stages_ms=stages_ms,
+            prompt_tokens=prompt_tokens,
+        ).info("Turn {} {}: {}", self._turn_id, outcome, stages_ms)
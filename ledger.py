@@ -0,0 +1,279 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Compact earnings/expenses ledger with running aggregates.
+
+``record_earning`` and ``record_expense`` used to append dicts with ISO
+timestamp strings to ``finance["earnings_log"]`` / ``finance["expenses_log"]``,
+so every summary had to rescan and reparse the whole log. ``Ledger`` stores
+entries column-wise in typed arrays (amount, epoch seconds, kind, category
+code) and updates its aggregates as entries are added:
+
+- running totals, counts and the last amount per kind;
+- income and expenses per day and per week, with days counted in the
+  ledger's timezone (IST by default);
+- the length of the run of consecutive days with a positive net ending at each
+  day, which gives the savings streak.
+
+Queries such as "net today", "average daily income over the last 7 days" and
+"savings streak" therefore take constant time. Entries recorded out of order
+only recompute the runs of the days after them.
+
+``to_dict()``/``from_dict()`` serialize the columns as base64 blobs, which is
+much cheaper than a list of dicts. Aggregates are rebuilt on load.
+
+Configuration:
+    LEDGER_TZ_OFFSET_MINUTES: UTC offset used for day and week boundaries
+        (default 330, India Standard Time).
+"""
+
+import base64
+import os
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+EARNING = 0
+EXPENSE = 1
+KINDS = {"earning": EARNING, "expense": EXPENSE}
+_KIND_NAMES = {EARNING: "income", EXPENSE: "expense"}
+
+SECONDS_PER_DAY = 86400
+# Day 0 of the epoch is a Thursday; shifting by 3 makes weeks start on Monday
+_WEEK_SHIFT = 3
+
+# (attribute, array typecode) of the serialized columns
+_COLUMNS = (("_amounts", "d"), ("_timestamps", "q"), ("_kinds", "b"), ("_categories", "H"))
+
+
+class Ledger:
+    """Column-oriented ledger of earnings and expenses."""
+
+    def __init__(self, tz_offset_minutes: Optional[int] = None):
+        """Initialize an empty ledger.
+
+        Args:
+            tz_offset_minutes: UTC offset for day boundaries. Defaults to
+                LEDGER_TZ_OFFSET_MINUTES.
+        """
+        if tz_offset_minutes is None:
+            tz_offset_minutes = int(os.getenv("LEDGER_TZ_OFFSET_MINUTES", "330"))
+        self.tz_offset = tz_offset_minutes * 60
+        self._amounts = array("d")
+        self._timestamps = array("q")
+        self._kinds = array("b")
+        self._categories = array("H")
+        self._category_names: List[str] = [""]  # code 0: no category
+        self._category_codes: Dict[str, int] = {"": 0}
+        # Aggregates, updated by every append
+        self.version = 0
+        self._first_day: Optional[int] = None
+        self._totals = [0.0, 0.0]
+        self._counts = [0, 0]
+        self._last = [None, None]
+        self._days: Dict[int, List[float]] = {}
+        self._weeks: Dict[int, List[float]] = {}
+        self._runs: Dict[int, int] = {}
+
+    # ----------------------------------------------------------------
+    # Recording
+    # ----------------------------------------------------------------
+
+    def record(
+        self,
+        kind: str,
+        amount: float,
+        category: Optional[str] = None,
+        timestamp: Optional[float] = None,
+    ):
+        """Add an entry.
+
+        Args:
+            kind: "earning" or "expense".
+            amount: Amount in rupees.
+            category: Optional label such as "petrol" or "EMI".
+            timestamp: Epoch seconds. Defaults to now.
+        """
+        code = self._category_code(category)
+        ts = int(time.time() if timestamp is None else timestamp)
+        self._append(KINDS[kind], float(amount), ts, code)
+
+    def _append(self, kind: int, amount: float, ts: int, code: int):
+        self._amounts.append(amount)
+        self._timestamps.append(ts)
+        self._kinds.append(kind)
+        self._categories.append(code)
+
+        self._totals[kind] += amount
+        self._counts[kind] += 1
+        self._last[kind] = amount
+        day = self.day(ts)
+        if self._first_day is None or day < self._first_day:
+            self._first_day = day
+        self.version += 1
+        self._days.setdefault(day, [0.0, 0.0])[kind] += amount
+        self._weeks.setdefault((day + _WEEK_SHIFT) // 7, [0.0, 0.0])[kind] += amount
+        self._update_runs(day)
+
+    def extend(self, other: "Ledger", start: int = 0):
+        """Append ``other``'s entries from index ``start`` on."""
+        for i in range(start, len(other)):
+            code = self._category_code(other._category_names[other._categories[i]])
+            self._append(other._kinds[i], other._amounts[i], other._timestamps[i], code)
+
+    def _category_code(self, category: Optional[str]) -> int:
+        name = (category or "").strip().lower()
+        code = self._category_codes.get(name)
+        if code is None:
+            code = self._category_codes[name] = len(self._category_names)
+            self._category_names.append(name)
+        return code
+
+    def _update_runs(self, day: int):
+        # Recompute the positive-net run ending at ``day``; later recorded days
+        # only change when an entry was backdated
+        while day in self._days:
+            income, expenses = self._days[day]
+            run = self._runs.get(day - 1, 0) + 1 if income > expenses else 0
+            if self._runs.get(day) == run:
+                break
+            self._runs[day] = run
+            day += 1
+
+    # ----------------------------------------------------------------
+    # Queries
+    # ----------------------------------------------------------------
+
+    def day(self, timestamp: Optional[float] = None) -> int:
+        """Day number (days since the epoch in the ledger's timezone)."""
+        ts = time.time() if timestamp is None else timestamp
+        return int(ts + self.tz_offset) // SECONDS_PER_DAY
+
+    def __len__(self) -> int:
+        return len(self._amounts)
+
+    def total(self, kind: str) -> float:
+        return round(self._totals[KINDS[kind]], 2)
+
+    def count(self, kind: str) -> int:
+        return self._counts[KINDS[kind]]
+
+    def last(self, kind: str) -> Optional[float]:
+        return self._last[KINDS[kind]]
+
+    def day_totals(self, day: int) -> tuple:
+        """(income, expenses) recorded on ``day``."""
+        income, expenses = self._days.get(day, (0.0, 0.0))
+        return income, expenses
+
+    def daily_totals(self, days: int, now: Optional[float] = None) -> Tuple[List[float], List[float]]:
+        """Income and expenses per day for up to ``days`` days ending today.
+
+        The series starts no earlier than the first recorded day; days without
+        entries inside it are zeros.
+        """
+        today = self.day(now)
+        if self._first_day is None:
+            return [], []
+        start = max(today - days + 1, min(self._first_day, today))
+        zero = (0.0, 0.0)
+        income, expenses = [], []
+        for d in range(start, today + 1):
+            day_income, day_expenses = self._days.get(d, zero)
+            income.append(day_income)
+            expenses.append(day_expenses)
+        return income, expenses
+
+    def net_today(self, now: Optional[float] = None) -> float:
+        income, expenses = self.day_totals(self.day(now))
+        return round(income - expenses, 2)
+
+    def net_this_week(self, now: Optional[float] = None) -> float:
+        income, expenses = self._weeks.get((self.day(now) + _WEEK_SHIFT) // 7, (0.0, 0.0))
+        return round(income - expenses, 2)
+
+    def average_daily(self, kind: str = "earning", days: int = 7, now: Optional[float] = None) -> float:
+        """Average per calendar day over the last ``days`` days, today included."""
+        index = KINDS[kind]
+        today = self.day(now)
+        total = sum(self._days[d][index] for d in range(today - days + 1, today + 1) if d in self._days)
+        return round(total / days, 2)
+
+    def savings_streak(self, now: Optional[float] = None) -> int:
+        """Consecutive days with income above expenses, up to today.
+
+        Today extends the streak once its net is positive; until then the
+        streak up to yesterday is reported.
+        """
+        today = self.day(now)
+        return self._runs.get(today) or self._runs.get(today - 1, 0)
+
+    def entries(self) -> Iterator[dict]:
+        """Entries as dicts (``type``, ``amount``, ``category``, ``timestamp``)."""
+        tz = timezone(timedelta(seconds=self.tz_offset))
+        for amount, ts, kind, code in zip(self._amounts, self._timestamps, self._kinds, self._categories):
+            yield {
+                "type": _KIND_NAMES[kind],
+                "amount": amount,
+                "category": self._category_names[code] or None,
+                "timestamp": datetime.fromtimestamp(ts, tz).isoformat(),
+            }
+
+    def summary(self, now: Optional[float] = None) -> dict:
+        """Compact aggregate view for prompts and persistence."""
+        facts = {}
+        for kind, key in (("earning", "earnings"), ("expense", "expenses")):
+            if self.count(kind):
+                facts[key] = {"count": self.count(kind), "total": self.total(kind), "last": self.last(kind)}
+        if len(self):
+            facts["net_today"] = self.net_today(now)
+            facts["avg_daily_income_7d"] = self.average_daily("earning", 7, now)
+            facts["savings_streak_days"] = self.savings_streak(now)
+        return facts
+
+    # ----------------------------------------------------------------
+    # Serialization
+    # ----------------------------------------------------------------
+
+    def to_dict(self) -> dict:
+        data = {"v": 1, "tz_offset": self.tz_offset, "category_names": self._category_names[1:]}
+        for name, _ in _COLUMNS:
+            column = getattr(self, name)
+            if sys.byteorder == "big":
+                column = array(column.typecode, column)
+                column.byteswap()
+            data[name.lstrip("_")] = base64.b64encode(column.tobytes()).decode("ascii")
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Ledger":
+        ledger = cls(tz_offset_minutes=data.get("tz_offset", 0) // 60)
+        for category in data.get("category_names", []):
+            ledger._category_code(category)
+        names = len(ledger._category_names)
+        columns = []
+        for name, typecode in _COLUMNS:
+            column = array(typecode)
+            column.frombytes(base64.b64decode(data.get(name.lstrip("_"), "")))
+            if sys.byteorder == "big":
+                column.byteswap()
+            columns.append(column)
+        for amount, ts, kind, code in zip(*columns):
+            # Blobs written before the names had their own key lost them
+            ledger._append(kind, amount, ts, code if code < names else 0)
+        return ledger
+
+
+def finance_ledger(state: dict) -> Ledger:
+    """Return the session's ledger from ``flow_manager.state``, creating it."""
+    finance = state.setdefault("finance", {})
+    ledger = finance.get("ledger")
+    if ledger is None:
+        ledger = finance["ledger"] = Ledger()
+    elif isinstance(ledger, dict):
+        ledger = finance["ledger"] = Ledger.from_dict(ledger)
+    return ledger
@@ -0,0 +1,413 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Composite LLM service with provider failover and hedged requests.
+
+``FailoverLLMService`` is an ``LLMService`` built from an ordered set of
+provider services (anything ``utils.create_llm`` returns). For every context it
+asks one provider to stream the reply and:
+
+- fails over to the next provider when the request errors or produces no first
+  token within ``ttft_timeout`` seconds;
+- optionally *hedges*: if the first token has not arrived after ``hedge_after``
+  seconds it starts the same request on the next provider as well, and keeps
+  whichever one streams first (the other is cancelled);
+- tracks time-to-first-token per provider (EWMA) and, when ``adaptive``, tries
+  the currently fastest healthy provider first. A provider that fails
+  ``max_failures`` times in a row is moved to the back for ``cooldown`` seconds.
+
+Only the winning attempt reaches the pipeline: frames from an attempt are held
+back until it produces its first output (text or a function call), so a losing
+or failing provider never leaks partial output. Function calls requested by
+the winner run on this service, where Pipecat Flows registered them.
+
+The providers are driven through their ``_process_context`` coroutine rather
+than through the pipeline, so each of them must implement it (all of Pipecat's
+streaming LLM services do).
+
+Configuration (see ``utils.create_llm``):
+    LLM_PROVIDERS: Comma-separated provider order, e.g. "openai,google".
+    LLM_HEDGE_AFTER_SECS: Hedge delay; unset or 0 disables hedging.
+    LLM_TTFT_TIMEOUT_SECS: First-token timeout per attempt (default 5).
+    LLM_ADAPTIVE_ORDER: "1" (default) to order providers by measured latency.
+
+Metrics:
+    nivest_llm_ttft_seconds{provider}: time to first output of winning attempts.
+    nivest_llm_attempts_total{provider, outcome}: won / lost / error / timeout.
+    nivest_llm_hedges_total{provider}: hedge requests, by hedged-to provider.
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    CancelFrame,
+    EndFrame,
+    ErrorFrame,
+    Frame,
+    LLMContextFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMUpdateSettingsFrame,
+    MetricsFrame,
+    StartFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessorSetup
+from pipecat.services.llm_service import LLMService
+
+from llm_replay import ReplayLLMMixin
+from metrics import counter, histogram
+
+TTFT = histogram(
+    "nivest_llm_ttft_seconds",
+    "Time to first LLM output for the attempt that won, per provider.",
+    ["provider"],
+)
+ATTEMPTS = counter(
+    "nivest_llm_attempts_total",
+    "LLM requests per provider by outcome (won, lost, error, timeout).",
+    ["provider", "outcome"],
+)
+HEDGES = counter(
+    "nivest_llm_hedges_total",
+    "Hedged LLM requests, labelled with the provider hedged to.",
+    ["provider"],
+)
+
+# Weight of the newest sample in the per-provider TTFT average.
+EWMA_ALPHA = 0.3
+
+
+@dataclass
+class ProviderStats:
+    """Latency and health of one provider."""
+
+    ttft_ewma: Optional[float] = None
+    consecutive_failures: int = 0
+    demoted_until: float = 0.0
+
+    def record_success(self, ttft: float):
+        self.consecutive_failures = 0
+        self.demoted_until = 0.0
+        if self.ttft_ewma is None:
+            self.ttft_ewma = ttft
+        else:
+            self.ttft_ewma = EWMA_ALPHA * ttft + (1 - EWMA_ALPHA) * self.ttft_ewma
+
+    def record_failure(self, max_failures: int, cooldown: float):
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= max_failures:
+            self.demoted_until = time.monotonic() + cooldown
+
+
+@dataclass
+class _Race:
+    """Attempts started for one context; only one of them may win."""
+
+    winner: Optional["_Attempt"] = None
+
+
+@dataclass
+class _Attempt:
+    provider: str
+    service: LLMService
+    race: _Race = field(default_factory=_Race)
+    started: float = field(default_factory=time.monotonic)
+    committed: bool = False
+    failed: Optional[str] = None
+    buffer: List[Tuple[Frame, FrameDirection]] = field(default_factory=list)
+    decided: asyncio.Event = field(default_factory=asyncio.Event)
+    task: Optional[asyncio.Task] = None
+
+
+class FailoverLLMService(ReplayLLMMixin, LLMService):
+    """Streams each reply from the first healthy provider, with optional hedging."""
+
+    def __init__(
+        self,
+        services: Dict[str, LLMService],
+        *,
+        hedge_after: Optional[float] = None,
+        ttft_timeout: float = 5.0,
+        adaptive: bool = True,
+        max_failures: int = 3,
+        cooldown: float = 30.0,
+        **kwargs,
+    ):
+        """Initialize the composite service.
+
+        Args:
+            services: Provider name -> LLM service, in preference order.
+            hedge_after: Seconds without a first token before the next provider
+                is raced against the current one. None or 0 disables hedging.
+            ttft_timeout: Seconds without a first token before an attempt is
+                abandoned and the next provider is tried.
+            adaptive: Order providers by measured TTFT instead of the given order.
+            max_failures: Consecutive failures before a provider is demoted.
+            cooldown: Seconds a demoted provider stays at the back of the order.
+        """
+        super().__init__(**kwargs)
+        if not services:
+            raise ValueError("FailoverLLMService needs at least one provider")
+        self._services = dict(services)
+        self._hedge_after = hedge_after or None
+        self._ttft_timeout = ttft_timeout
+        self._adaptive = adaptive
+        self._max_failures = max_failures
+        self._cooldown = cooldown
+        self.stats: Dict[str, ProviderStats] = {name: ProviderStats() for name in self._services}
+        self._current: Dict[str, _Attempt] = {}
+
+        for name, service in self._services.items():
+            self._attach(name, service)
+
+    # ----------------------------------------------------------------
+    # Provider wiring
+    # ----------------------------------------------------------------
+
+    def _attach(self, name: str, service: LLMService):
+        """Route a provider's output through our attempt gate."""
+
+        async def push_frame(frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM):
+            await self._on_provider_frame(name, frame, direction)
+
+        async def run_function_calls(function_calls):
+            await self._on_provider_function_calls(name, function_calls)
+
+        async def on_completion_timeout(_service):
+            attempt = self._current.get(name)
+            if attempt and not attempt.committed:
+                self._fail(attempt, "timeout")
+
+        service.push_frame = push_frame
+        service.run_function_calls = run_function_calls
+        service.add_event_handler("on_completion_timeout", on_completion_timeout)
+
+    async def _on_provider_frame(self, name: str, frame: Frame, direction: FrameDirection):
+        attempt = self._current.get(name)
+        if attempt is None or attempt.failed:
+            return  # lifecycle frames, or output of an abandoned attempt
+        if isinstance(frame, ErrorFrame) and not attempt.committed:
+            self._fail(attempt, "error", frame.error)
+            return
+        if attempt.committed:
+            await self.push_frame(frame, direction)
+            return
+        attempt.buffer.append((frame, direction))
+        if not isinstance(frame, MetricsFrame):
+            await self._commit(attempt)
+
+    async def _on_provider_function_calls(self, name: str, function_calls):
+        attempt = self._current.get(name)
+        if attempt is None or attempt.failed:
+            return
+        if not attempt.committed:
+            await self._commit(attempt)
+        if attempt.committed:
+            await self.run_function_calls(function_calls)
+
+    # ----------------------------------------------------------------
+    # Lifecycle
+    # ----------------------------------------------------------------
+
+    async def setup(self, setup: FrameProcessorSetup):
+        await super().setup(setup)
+        for service in self._services.values():
+            await service.setup(setup)
+
+    async def cleanup(self):
+        await super().cleanup()
+        for service in self._services.values():
+            await service.cleanup()
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, (StartFrame, EndFrame, CancelFrame, LLMUpdateSettingsFrame)):
+            # Providers only need these for their own state; nothing they push
+            # in response reaches the pipeline.
+            for service in self._services.values():
+                await service.process_frame(frame, direction)
+
+        if isinstance(frame, LLMContextFrame):
+            await self.push_frame(LLMFullResponseStartFrame())
+            await self.start_processing_metrics()
+            try:
+                await self._process_context(frame.context)
+            finally:
+                await self.stop_processing_metrics()
+                await self.push_frame(LLMFullResponseEndFrame())
+        elif not isinstance(frame, LLMUpdateSettingsFrame):
+            await self.push_frame(frame, direction)
+
+    # ----------------------------------------------------------------
+    # Attempts
+    # ----------------------------------------------------------------
+
+    def provider_order(self) -> List[str]:
+        """Providers in the order they will be tried for the next request."""
+        now = time.monotonic()
+        names = list(self._services)
+
+        def key(item):
+            index, name = item
+            stats = self.stats[name]
+            demoted = stats.demoted_until > now
+            if not self._adaptive or stats.ttft_ewma is None:
+                return (demoted, 0.0, index)
+            return (demoted, stats.ttft_ewma, index)
+
+        # Unmeasured providers keep their configured position relative to
+        # each other but sort ahead of measured ones, so they get sampled.
+        return [name for _, name in sorted(enumerate(names), key=key)]
+
+    async def _process_context(self, context):
+        pending = self.provider_order()
+        attempts: List[_Attempt] = []
+        race = _Race()
+        hedged = False
+
+        def launch():
+            name = pending.pop(0)
+            attempt = _Attempt(provider=name, service=self._services[name], race=race)
+            self._current[name] = attempt
+            attempt.task = self.create_task(self._run_attempt(attempt, context))
+            attempts.append(attempt)
+            return attempt
+
+        try:
+            launch()
+            while True:
+                live = [a for a in attempts if not a.failed]
+                winner = next((a for a in live if a.committed), None)
+                if winner:
+                    await self._finish(winner, attempts)
+                    return
+                if not live:
+                    if not pending:
+                        break
+                    launch()
+                    continue
+
+                now = time.monotonic()
+                deadlines = [a.started + self._ttft_timeout for a in live]
+                can_hedge = self._hedge_after and not hedged and pending and len(live) == 1
+                if can_hedge:
+                    deadlines.append(live[0].started + self._hedge_after)
+                timeout = max(0.0, min(deadlines) - now)
+
+                waiters = [asyncio.ensure_future(a.decided.wait()) for a in live]
+                try:
+                    await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for waiter in waiters:
+                        waiter.cancel()
+
+                now = time.monotonic()
+                for attempt in live:
+                    if not attempt.decided.is_set() and now >= attempt.started + self._ttft_timeout:
+                        self._fail(attempt, "timeout")
+                if can_hedge and now >= live[0].started + self._hedge_after:
+                    live = [a for a in attempts if not a.failed and not a.committed]
+                    if live and pending:
+                        hedged = True
+                        HEDGES.inc(provider=pending[0])
+                        logger.debug(f"{self}: no first token from {live[0].provider}, hedging to {pending[0]}")
+                        launch()
+        finally:
+            for attempt in attempts:
+                if attempt.task and not attempt.task.done():
+                    await self.cancel_task(attempt.task)
+                if self._current.get(attempt.provider) is attempt:
+                    del self._current[attempt.provider]
+
+        errors = ", ".join(f"{a.provider}: {a.failed}" for a in attempts)
+        logger.error(f"{self}: all LLM providers failed ({errors})")
+        await self.push_error(ErrorFrame(f"All LLM providers failed ({errors})"))
+
+    async def _run_attempt(self, attempt: _Attempt, context):
+        try:
+            await attempt.service._process_context(context)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if attempt.committed:
+                # Output already reached the user; nothing to fail over to.
+                logger.error(f"{self}: {attempt.provider} failed mid-stream: {e}")
+                await self.push_error(ErrorFrame(f"{attempt.provider} failed mid-stream: {e}"))
+            else:
+                self._fail(attempt, "error", e)
+            return
+        if not attempt.failed and not attempt.committed:
+            # Finished without any output (e.g. an empty reply): still a result.
+            await self._commit(attempt)
+
+    async def _commit(self, attempt: _Attempt):
+        if attempt.race.winner is not None:
+            # Another attempt got there first, possibly while it is still
+            # pushing its buffered frames
+            self._lose(attempt)
+            return
+        # Claimed before the first await, so a hedged attempt can't also win
+        attempt.race.winner = attempt
+        attempt.committed = True
+        ttft = time.monotonic() - attempt.started
+        self.stats[attempt.provider].record_success(ttft)
+        TTFT.observe(ttft, provider=attempt.provider)
+        ATTEMPTS.inc(provider=attempt.provider, outcome="won")
+        buffered, attempt.buffer = attempt.buffer, []
+        attempt.decided.set()
+        for frame, direction in buffered:
+            await self.push_frame(frame, direction)
+
+    def _fail(self, attempt: _Attempt, outcome: str, error=None):
+        if attempt.failed:
+            return
+        attempt.failed = outcome
+        attempt.buffer.clear()
+        attempt.decided.set()
+        self.stats[attempt.provider].record_failure(self._max_failures, self._cooldown)
+        ATTEMPTS.inc(provider=attempt.provider, outcome=outcome)
+        if attempt.task and not attempt.task.done() and attempt.task is not asyncio.current_task():
+            attempt.task.cancel()
+        logger.warning(f"{self}: {attempt.provider} {outcome}" + (f": {error}" if error else ""))
+
+    def _lose(self, attempt: _Attempt):
+        if attempt.failed:
+            return
+        attempt.failed = "lost"
+        attempt.buffer.clear()
+        attempt.decided.set()
+        ATTEMPTS.inc(provider=attempt.provider, outcome="lost")
+
+    async def _finish(self, winner: _Attempt, attempts: List[_Attempt]):
+        for attempt in attempts:
+            if attempt is not winner:
+                self._lose(attempt)
+                if attempt.task and not attempt.task.done():
+                    await self.cancel_task(attempt.task)
+        await winner.task
+
+    # ----------------------------------------------------------------
+    # Out-of-band inference
+    # ----------------------------------------------------------------
+
+    async def run_inference(self, context) -> Optional[str]:
+        """Run a one-shot inference, failing over between providers."""
+        last_error = None
+        for name in self.provider_order():
+            try:
+                return await asyncio.wait_for(
+                    self._services[name].run_inference(context), self._ttft_timeout * 2
+                )
+            except Exception as e:
+                last_error = e
+                logger.warning(f"{self}: run_inference on {name} failed: {e!r}")
+        raise RuntimeError(f"All LLM providers failed: {last_error!r}")
@@ -0,0 +1,82 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Prepared responses played out of an LLM service.
+
+The concept cache (concept_cache.py) answers some turns with a stored
+explanation instead of an LLM request. The rest of the pipeline must see that
+answer exactly like a generated one: text frames between a response start and
+end, and function calls run through the LLM's own function call path, where
+Pipecat Flows registered its handlers.
+
+``ReplayLLMMixin`` gives an LLM service that ability. A processor in front of
+the LLM pushes a ``ReplayedResponseFrame`` downstream; the LLM plays it from
+its own frame handling, in order with everything else it processes, and the
+frame is dropped like any other data frame if the caller interrupts first.
+
+``create_llm`` (utils.py) builds provider services with the mixin through
+``with_replay``; the composite services (llm_failover.py, speculative_llm.py)
+and the offline stand-ins include it directly.
+"""
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List
+
+from pipecat.frames.frames import (
+    DataFrame,
+    Frame,
+    FunctionCallFromLLM,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+
+@dataclass
+class ReplayedResponseFrame(DataFrame):
+    """A response for the next LLM in the pipeline to play as its own.
+
+    Parameters:
+        text: Text of the response.
+        function_calls: Function calls the response makes, run after the text.
+    """
+
+    text: str
+    function_calls: List[FunctionCallFromLLM] = field(default_factory=list)
+
+
+class ReplayLLMMixin:
+    """LLM service mixin that plays ``ReplayedResponseFrame`` as a response.
+
+    List it before the service class, e.g.
+    ``class Service(ReplayLLMMixin, LLMService)``.
+    """
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        if isinstance(frame, ReplayedResponseFrame):
+            # Only the base bookkeeping (observers); the service itself would
+            # pass an unknown frame on
+            await FrameProcessor.process_frame(self, frame, direction)
+            await self.play_response(frame.text, frame.function_calls)
+            return
+        await super().process_frame(frame, direction)
+
+    async def play_response(self, text: str, function_calls: List[FunctionCallFromLLM]):
+        """Push ``text`` and run ``function_calls`` as this service's response."""
+        await self.push_frame(LLMFullResponseStartFrame())
+        await self.push_frame(LLMTextFrame(text))
+        if function_calls:
+            await self.run_function_calls(function_calls)
+        await self.push_frame(LLMFullResponseEndFrame())
+
+
+@lru_cache(maxsize=None)
+def with_replay(service_class: type) -> type:
+    """``service_class`` with ``ReplayLLMMixin``, keeping its name."""
+    if issubclass(service_class, ReplayLLMMixin):
+        return service_class
+    return type(service_class.__name__, (ReplayLLMMixin, service_class), {"__module__": __name__})
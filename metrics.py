@@ -0,0 +1,304 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Minimal in-process metrics registry with Prometheus text exposition.
+
+We only need counters, gauges and histograms, so this avoids pulling in
+``prometheus_client``. Metrics are created once at import time by the modules
+that own them and rendered by the ``/metrics`` endpoint in ``server.py``.
+
+Usage:
+    TURNS = counter("nivest_turns_total", "Completed user turns.", ["outcome"])
+    TURNS.inc(outcome="completed")
+
+    STAGE = histogram("nivest_stage_seconds", "Stage latency.", ["stage"])
+    STAGE.observe(0.42, stage="stt_final")
+
+    text = REGISTRY.render()
+
+Multi-process servers (``server.py --workers N``) set ``METRICS_DIR``: every
+worker periodically writes a JSON snapshot of its registry there with
+``write_snapshot`` and ``/metrics`` renders the sum over all workers with
+``render_multiprocess``. Counters and histograms add up; gauges are summed
+too, which is what we want for things like active sessions.
+"""
+
+import copy
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self) -> List[list]:
+        """Return ``[[label values], value]`` pairs; JSON serializable."""
+        with self._lock:
+            return [[list(key), copy.deepcopy(value)] for key, value in self._values.items()]
+
+    def render(self, others: Iterable[List[list]] = ()) -> List[str]:
+        """Render this metric, adding in snapshots taken in other processes."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = {key: copy.deepcopy(value) for key, value in self._values.items()}
+        for samples in others:
+            for key, value in samples:
+                key = tuple(key)
+                values[key] = self._combine(values[key], value) if key in values else value
+        for key, value in sorted(values.items()):
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _combine(self, a, b):
+        return a + b
+
+    def _render_sample(self, key, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state["count"] if state else 0
+
+    def sum(self, **labels) -> float:
+        state = self._values.get(self._key(labels))
+        return state["sum"] if state else 0.0
+
+    def _combine(self, a, b):
+        return {
+            "buckets": [x + y for x, y in zip(a["buckets"], b["buckets"])],
+            "sum": a["sum"] + b["sum"],
+            "count": a["count"] + b["count"],
+        }
+
+    def _render_sample(self, key, state) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, hits in zip(self.buckets, state["buckets"]):
+            cumulative += hits
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+        lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    """Holds every metric created through ``counter``/``gauge``/``histogram``."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def snapshot(self) -> Dict[str, List[list]]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def render(self, snapshots: Iterable[Dict[str, List[list]]] = ()) -> str:
+        """Render all metrics, summed with ``snapshots`` from other processes."""
+        snapshots = list(snapshots)
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            others = [s[metric.name] for s in snapshots if metric.name in s]
+            lines.extend(metric.render(others))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    return REGISTRY._get_or_create(Counter, name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+    return REGISTRY._get_or_create(Gauge, name, documentation, labelnames)
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Iterable[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+    return REGISTRY._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+# --------------------------------------------------------------------
+# Multi-process aggregation
+# --------------------------------------------------------------------
+
+
+def multiprocess_dir() -> Optional[str]:
+    """Directory shared by all worker processes, from ``METRICS_DIR``."""
+    return os.getenv("METRICS_DIR") or None
+
+
+def _snapshot_path(directory: str, pid: Optional[int] = None) -> str:
+    return os.path.join(directory, f"metrics-{pid or os.getpid()}.json")
+
+
+def write_snapshot(directory: str, registry: Registry = REGISTRY):
+    """Atomically write this process's snapshot into ``directory``."""
+    path = _snapshot_path(directory)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp, path)
+
+
+def remove_snapshot(directory: str):
+    """Delete this process's snapshot, e.g. on worker shutdown."""
+    try:
+        os.remove(_snapshot_path(directory))
+    except FileNotFoundError:
+        pass
+
+
+def read_snapshots(directory: str, max_age: Optional[float] = None) -> List[Dict[str, List[list]]]:
+    """Load the snapshots written by other processes.
+
+    Args:
+        directory: The shared metrics directory.
+        max_age: Ignore snapshots not updated for this many seconds (workers
+            that died without cleaning up).
+    """
+    own = os.path.basename(_snapshot_path(directory))
+    now = time.time()
+    snapshots = []
+    for name in os.listdir(directory):
+        if not name.startswith("metrics-") or not name.endswith(".json") or name == own:
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if max_age is not None and now - os.path.getmtime(path) > max_age:
+                continue
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def render_multiprocess(
+    directory: str, registry: Registry = REGISTRY, max_age: Optional[float] = None
+) -> str:
+    """Render this process's live metrics summed with every other worker's."""
+    return registry.render(read_snapshots(directory, max_age))
@@ -52,12 +52,13 @@ Requirements (same as other Pipecat examples):
 """
 
 import os
+import uuid
 from datetime import datetime, timedelta
+from typing import Optional
 
 from dotenv import load_dotenv
 from loguru import logger
 
-from pipecat.audio.vad.silero import SileroVADAnalyzer
 from pipecat.pipeline.pipeline import Pipeline
 from pipecat.pipeline.runner import PipelineRunner
 from pipecat.pipeline.task import PipelineParams, PipelineTask
@@ -66,15 +67,24 @@ from pipecat.processors.aggregators.llm_response_universal import (
     LLMContextAggregatorPair,
 )
 from pipecat.runner.types import RunnerArguments
-from pipecat.runner.utils import create_transport
-from pipecat.services.sarvam.tts import SarvamTTSService
-from pipecat.services.deepgram.stt import DeepgramSTTService, LiveOptions
 from pipecat.transports.base_transport import BaseTransport, TransportParams
-from pipecat.transports.daily.transport import DailyParams
-from pipecat.transports.websocket.fastapi import FastAPIWebsocketParams
-from pipecat.utils.text.markdown_text_filter import MarkdownTextFilter
 
-from utils import create_llm  # same helper used in the official examples
+from barge_in import BargeInMonitor, barge_in_enabled
+from concept_cache import ConceptCache, concept_cache_enabled
+from context_budget import ContextBudget
+from intent_router import IntentRouter
+from ledger import finance_ledger
+from latency_observer import TurnLatencyObserver, latency_metrics_enabled
+from node_registry import NodeRegistry
+from prompt_budget import PROMPTS
+from savings_planner import plan_savings
+from speculative_llm import SpeculativeLLMService, speculative_llm_enabled
+from speech_chunker import SpeechChunker, speech_chunking_enabled
+from state_store import STATE_STORE
+from tts_cache import TTS_MODEL, TTS_VOICE, CachedSarvamTTSService, session_tts_params
+from turn_detector import AdaptiveTurnAnalyzer, deepgram_endpointing_ms, speech_params
+from user_state import UserHistory
+from utils import create_llm, get_llm_provider  # same helper used in the official examples
 
 from pipecat_flows import (
     FlowArgs,
@@ -89,23 +99,37 @@ load_dotenv(override=True)
 # --------------------------------------------------------------------
 # Transport configuration (same pattern as food-ordering example)
 # --------------------------------------------------------------------
+# Transport, VAD and STT modules are imported where they are used, so that
+# importing this module (server.py, the Lambda handler) only loads what the
+# selected transport and providers need.
+
+
+def _daily_params():
+    from pipecat.transports.daily.transport import DailyParams
+    from vad_pool import create_vad_analyzer
+
+    return DailyParams(audio_in_enabled=True, audio_out_enabled=True, **speech_params(create_vad_analyzer))
+
+
+def _twilio_params():
+    from pipecat.transports.websocket.fastapi import FastAPIWebsocketParams
+    from vad_pool import create_vad_analyzer
+
+    return FastAPIWebsocketParams(
+        audio_in_enabled=True, audio_out_enabled=True, **speech_params(create_vad_analyzer)
+    )
+
+
+def _webrtc_params():
+    from vad_pool import create_vad_analyzer
+
+    return TransportParams(audio_in_enabled=True, audio_out_enabled=True, **speech_params(create_vad_analyzer))
+
 
 transport_params = {
-    "daily": lambda: DailyParams(
-        audio_in_enabled=True,
-        audio_out_enabled=True,
-        vad_analyzer=SileroVADAnalyzer(),
-    ),
-    "twilio": lambda: FastAPIWebsocketParams(
-        audio_in_enabled=True,
-        audio_out_enabled=True,
-        vad_analyzer=SileroVADAnalyzer(),
-    ),
-    "webrtc": lambda: TransportParams(
-        audio_in_enabled=True,
-        audio_out_enabled=True,
-        vad_analyzer=SileroVADAnalyzer(),
-    ),
+    "daily": _daily_params,
+    "twilio": _twilio_params,
+    "webrtc": _webrtc_params,
 }
 
 # --------------------------------------------------------------------
@@ -117,6 +141,8 @@ class SavingsAdviceResult(FlowResult):
     income: float
     expenses: float
     suggested_saving: float
+    # Projected days to each goal at the suggested pace (savings_planner.py)
+    goal_projections: list | None = None
 
 
 class ConceptResult(FlowResult):
@@ -126,6 +152,8 @@ class ConceptResult(FlowResult):
 class GoalResult(FlowResult):
     goal: str
     target_amount: float | None = None
+    recommended_daily: float | None = None
+    days_to_goal: int | None = None
 
 
 class DeliveryEstimateResult(FlowResult):
@@ -145,11 +173,177 @@ async def log_session_context(action: dict, flow_manager: FlowManager) -> None:
 
 
 # --------------------------------------------------------------------
-# Node creation functions (flow states)
+# Function handlers
 # --------------------------------------------------------------------
+# Handlers are module-level so that the node configs referencing them can be
+# built once per process (see node_registry.py). Per-session data lives in
+# flow_manager.state.
 
 
-def create_entry_node() -> NodeConfig:
+async def route_to_daily_advice(
+    args: FlowArgs, flow_manager: FlowManager
+) -> tuple[None, NodeConfig]:
+    return None, create_daily_advice_node()
+
+
+async def route_to_concept_teaching(
+    args: FlowArgs, flow_manager: FlowManager
+) -> tuple[None, NodeConfig]:
+    return None, create_concept_node()
+
+
+async def route_to_stress_support(
+    args: FlowArgs, flow_manager: FlowManager
+) -> tuple[None, NodeConfig]:
+    return None, create_stress_node()
+
+
+async def route_to_goal_setting(
+    args: FlowArgs, flow_manager: FlowManager
+) -> tuple[None, NodeConfig]:
+    return None, create_goal_node()
+
+
+def _open_goals(state: dict) -> list:
+    """Goals from earlier calls (user_state.py) followed by this session's."""
+    goals = {}
+    for goal in (state.get("history") or {}).get("goals", []) + state.get("goals", []):
+        if goal.get("goal"):
+            goals.pop(goal["goal"].lower(), None)
+            goals[goal["goal"].lower()] = goal
+    return list(goals.values())
+
+
+async def compute_savings_advice(
+    args: FlowArgs, flow_manager: FlowManager
+) -> tuple[SavingsAdviceResult, NodeConfig]:
+    income = float(args["income"])
+    expenses = float(args.get("expenses", 0.0))
+
+    # Plan from the user's ledger history and goals; without any history,
+    # fall back to the rule of thumb of saving ~20% of today's net income.
+    plan = plan_savings(
+        finance_ledger(flow_manager.state), _open_goals(flow_manager.state), today=(income, expenses)
+    )
+    if plan is not None:
+        suggested_saving = plan.recommended_daily
+    else:
+        suggested_saving = round(max(0.0, income - expenses) * 0.20, 2)
+
+    # Store into flow state for later reference
+    finance_state = flow_manager.state.setdefault("finance", {})
+    finance_state["last_income"] = income
+    finance_state["last_expenses"] = expenses
+    finance_state["last_suggested_saving"] = suggested_saving
+
+    STATE_STORE.record(flow_manager.state, reason="compute_savings_advice")
+
+    result = SavingsAdviceResult(
+        income=income,
+        expenses=expenses,
+        suggested_saving=suggested_saving,
+        goal_projections=[g.to_dict() for g in plan.goals] if plan else None,
+    )
+
+    # After giving advice, go back to entry to continue open conversation
+    return result, create_entry_node()
+
+
+async def register_concept(
+    args: FlowArgs, flow_manager: FlowManager
+) -> tuple[ConceptResult, NodeConfig]:
+    topic = args["topic"]
+
+    # Optionally track which topics were explained
+    history = flow_manager.state.setdefault("concepts_explained", [])
+    history.append(
+        {
+            "topic": topic,
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+    )
+
+    STATE_STORE.record(flow_manager.state, reason="register_concept")
+
+    result = ConceptResult(topic=topic)
+
+    # After teaching, return to entry for free-form follow-up
+    return result, create_entry_node()
+
+
+async def acknowledge_stress(
+    args: FlowArgs, flow_manager: FlowManager
+) -> tuple[None, NodeConfig]:
+    # We don't need to store anything special here, but we could mark that
+    # the user had a tough day.
+    mood_log = flow_manager.state.setdefault("mood_log", [])
+    mood_log.append(
+        {
+            "type": "stress",
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+    )
+    STATE_STORE.record(flow_manager.state, reason="acknowledge_stress")
+
+    # Go back to entry after a supportive response
+    return None, create_entry_node()
+
+
+async def store_goal(
+    args: FlowArgs, flow_manager: FlowManager
+) -> tuple[GoalResult, NodeConfig]:
+    goal = args["goal"]
+    target_amount = args.get("target_amount")
+
+    goals = flow_manager.state.setdefault("goals", [])
+    goals.append(
+        {
+            "goal": goal,
+            "target_amount": target_amount,
+            "created_at": datetime.utcnow().isoformat(),
+        }
+    )
+
+    STATE_STORE.record(flow_manager.state, reason="store_goal")
+
+    result = GoalResult(goal=goal, target_amount=target_amount)
+    finance = flow_manager.state.get("finance", {})
+    today = (finance["last_income"], finance["last_expenses"]) if "last_income" in finance else None
+    plan = plan_savings(finance_ledger(flow_manager.state), _open_goals(flow_manager.state), today=today)
+    if plan is not None and target_amount:
+        result["recommended_daily"] = plan.recommended_daily
+        result["days_to_goal"] = next(
+            (g.days_median for g in plan.goals if g.goal == goal), None
+        )
+
+    # After setting a goal, we go back to entry so they can talk or plan further
+    return result, create_entry_node()
+
+
+async def record_earning(
+    args: FlowArgs, flow_manager: FlowManager
+) -> tuple[None, None]:
+    amount = float(args["amount"])
+    finance_ledger(flow_manager.state).record("earning", amount, category=args.get("category"))
+    STATE_STORE.record(flow_manager.state, reason="record_earning")
+    return None, None
+
+
+async def record_expense(
+    args: FlowArgs, flow_manager: FlowManager
+) -> tuple[None, None]:
+    amount = float(args["amount"])
+    finance_ledger(flow_manager.state).record("expense", amount, category=args.get("category"))
+    STATE_STORE.record(flow_manager.state, reason="record_expense")
+    return None, None
+
+
+# --------------------------------------------------------------------
+# Node builders (flow states)
+# --------------------------------------------------------------------
+
+
+def _build_entry_node() -> NodeConfig:
     """
     Entry / catch-all node.
 
@@ -160,26 +354,6 @@ def create_entry_node() -> NodeConfig:
     - route_to_goal_setting
     """
 
-    async def route_to_daily_advice(
-        args: FlowArgs, flow_manager: FlowManager
-    ) -> tuple[None, NodeConfig]:
-        return None, create_daily_advice_node()
-
-    async def route_to_concept_teaching(
-        args: FlowArgs, flow_manager: FlowManager
-    ) -> tuple[None, NodeConfig]:
-        return None, create_concept_node()
-
-    async def route_to_stress_support(
-        args: FlowArgs, flow_manager: FlowManager
-    ) -> tuple[None, NodeConfig]:
-        return None, create_stress_node()
-
-    async def route_to_goal_setting(
-        args: FlowArgs, flow_manager: FlowManager
-    ) -> tuple[None, NodeConfig]:
-        return None, create_goal_node()
-
     route_daily_func = FlowsFunctionSchema(
         name="route_to_daily_advice",
         handler=route_to_daily_advice,
@@ -228,29 +402,46 @@ def create_entry_node() -> NodeConfig:
         role_messages=[
             {
                 "role": "system",
-                "content": (
-                    "You are a friendly, practical financial coach for gig workers in India, "
-                    "like ride-hailing drivers and delivery partners.\n\n"
-                    "Your job is to help them feel a little more in control of their money each day. "
-                    "They can talk to you about anything: earnings, expenses, stress, family goals.\n\n"
-                    "You must ALWAYS use the available functions to progress the conversation.\n"
-                    "This is a voice conversation; keep replies short, clear, and conversational. "
-                    "Avoid emojis and special characters."
+                "content": PROMPTS.pick(
+                    "entry",
+                    (
+                        "You are a friendly, practical financial coach for gig workers in India, "
+                        "like ride-hailing drivers and delivery partners.\n\n"
+                        "Your job is to help them feel a little more in control of their money each day. "
+                        "They can talk to you about anything: earnings, expenses, stress, family goals.\n\n"
+                        "You must ALWAYS use the available functions to progress the conversation.\n"
+                        "This is a voice conversation; keep replies short, clear, and conversational. "
+                        "Avoid emojis and special characters."
+                    ),
+                    (
+                        "You are a warm, practical money coach for gig workers in India (drivers, delivery "
+                        "partners). Help them feel more in control of their money each day. Always use the "
+                        "functions to move the conversation on. Voice call: short, conversational replies, no "
+                        "emojis or special characters."
+                    ),
                 ),
             }
         ],
         task_messages=[
             {
                 "role": "system",
-                "content": (
-                    "For this step, listen carefully to what the user is saying. Decide what they need most "
-                    "RIGHT NOW: daily advice, concept explanation, stress support, or goal setting.\n\n"
-                    "Then call ONE of the routing functions:\n"
-                    "- route_to_daily_advice\n"
-                    "- route_to_concept_teaching\n"
-                    "- route_to_stress_support\n"
-                    "- route_to_goal_setting\n\n"
-                    "Do not answer everything here. Use the functions to move into the right skill."
+                "content": PROMPTS.pick(
+                    "entry",
+                    (
+                        "For this step, listen carefully to what the user is saying. Decide what they need most "
+                        "RIGHT NOW: daily advice, concept explanation, stress support, or goal setting.\n\n"
+                        "Then call ONE of the routing functions:\n"
+                        "- route_to_daily_advice\n"
+                        "- route_to_concept_teaching\n"
+                        "- route_to_stress_support\n"
+                        "- route_to_goal_setting\n\n"
+                        "Do not answer everything here. Use the functions to move into the right skill."
+                    ),
+                    (
+                        "Decide what the user needs right now and call ONE function: route_to_daily_advice, "
+                        "route_to_concept_teaching, route_to_stress_support or route_to_goal_setting. Do not "
+                        "answer here."
+                    ),
                 ),
             }
         ],
@@ -269,34 +460,9 @@ def create_entry_node() -> NodeConfig:
     )
 
 
-def create_daily_advice_node() -> NodeConfig:
+def _build_daily_advice_node() -> NodeConfig:
     """Node for computing simple daily savings advice based on earnings/expenses."""
 
-    async def compute_savings_advice(
-        args: FlowArgs, flow_manager: FlowManager
-    ) -> tuple[SavingsAdviceResult, NodeConfig]:
-        income = float(args["income"])
-        expenses = float(args.get("expenses", 0.0))
-
-        # Simple rule-of-thumb: suggest saving ~20% of net income if possible.
-        net = max(0.0, income - expenses)
-        suggested_saving = round(net * 0.20, 2)
-
-        # Store into flow state for later reference
-        finance_state = flow_manager.state.setdefault("finance", {})
-        finance_state["last_income"] = income
-        finance_state["last_expenses"] = expenses
-        finance_state["last_suggested_saving"] = suggested_saving
-
-        result = SavingsAdviceResult(
-            income=income,
-            expenses=expenses,
-            suggested_saving=suggested_saving,
-        )
-
-        # After giving advice, go back to entry to continue open conversation
-        return result, create_entry_node()
-
     compute_savings_func = FlowsFunctionSchema(
         name="compute_savings_advice",
         handler=compute_savings_advice,
@@ -322,14 +488,23 @@ def create_daily_advice_node() -> NodeConfig:
         task_messages=[
             {
                 "role": "system",
-                "content": (
-                    "You are now focusing on daily money decisions. Ask for today's earnings and, if needed, "
-                    "rough expenses. Then call compute_savings_advice with numbers.\n\n"
-                    "When you speak to the user, be concrete:\n"
-                    "- Mention their income\n"
-                    "- Mention their spends (if known)\n"
-                    "- Suggest a realistic saving amount for today\n"
-                    "Keep it short and supportive, not judgemental."
+                "content": PROMPTS.pick(
+                    "daily_advice",
+                    (
+                        "You are now focusing on daily money decisions. Ask for today's earnings and, if needed, "
+                        "rough expenses. Then call compute_savings_advice with numbers.\n\n"
+                        "When you speak to the user, be concrete:\n"
+                        "- Mention their income\n"
+                        "- Mention their spends (if known)\n"
+                        "- Suggest a realistic saving amount for today\n"
+                        "- If they have goals, say roughly when the nearest one is reached at that pace\n"
+                        "Keep it short and supportive, not judgemental."
+                    ),
+                    (
+                        "Get today's earnings and, if needed, rough spends, then call compute_savings_advice. "
+                        "Reply briefly and kindly with their income, spends, a realistic saving for today and, if "
+                        "they have goals, roughly when the nearest one is reached at that pace. Do not judge."
+                    ),
                 ),
             }
         ],
@@ -337,28 +512,9 @@ def create_daily_advice_node() -> NodeConfig:
     )
 
 
-def create_concept_node() -> NodeConfig:
+def _build_concept_node() -> NodeConfig:
     """Node for explaining basic financial literacy concepts."""
 
-    async def register_concept(
-        args: FlowArgs, flow_manager: FlowManager
-    ) -> tuple[ConceptResult, NodeConfig]:
-        topic = args["topic"]
-
-        # Optionally track which topics were explained
-        history = flow_manager.state.setdefault("concepts_explained", [])
-        history.append(
-            {
-                "topic": topic,
-                "timestamp": datetime.utcnow().isoformat(),
-            }
-        )
-
-        result = ConceptResult(topic=topic)
-
-        # After teaching, return to entry for free-form follow-up
-        return result, create_entry_node()
-
     register_concept_func = FlowsFunctionSchema(
         name="register_concept",
         handler=register_concept,
@@ -380,16 +536,24 @@ def create_concept_node() -> NodeConfig:
         task_messages=[
             {
                 "role": "system",
-                "content": (
-                    "You are explaining a financial concept the user asked about. "
-                    "Keep it very simple, relate it to daily life of a gig worker, and avoid jargon.\n\n"
-                    "Examples of topics:\n"
-                    "- emergency fund (3–6 months of basic expenses)\n"
-                    "- small daily saving habits\n"
-                    "- basic budgeting ideas (like fixed vs flexible costs)\n"
-                    "- how compounding works over years\n\n"
-                    "After explaining, call register_concept with the topic name and then let the user react "
-                    "when we return to entry."
+                "content": PROMPTS.pick(
+                    "concept_teaching",
+                    (
+                        "You are explaining a financial concept the user asked about. "
+                        "Keep it very simple, relate it to daily life of a gig worker, and avoid jargon.\n\n"
+                        "Examples of topics:\n"
+                        "- emergency fund (3–6 months of basic expenses)\n"
+                        "- small daily saving habits\n"
+                        "- basic budgeting ideas (like fixed vs flexible costs)\n"
+                        "- how compounding works over years\n\n"
+                        "After explaining, call register_concept with the topic name and then let the user react "
+                        "when we return to entry."
+                    ),
+                    (
+                        "Explain the concept they asked about very simply, with a gig-work example and no jargon "
+                        "(e.g. emergency fund of 3–6 months of basic costs, small daily saving, fixed vs flexible "
+                        "costs, compounding over years). Then call register_concept with the topic."
+                    ),
                 ),
             }
         ],
@@ -397,24 +561,9 @@ def create_concept_node() -> NodeConfig:
     )
 
 
-def create_stress_node() -> NodeConfig:
+def _build_stress_node() -> NodeConfig:
     """Node for stress / emotional support around money."""
 
-    async def acknowledge_stress(
-        args: FlowArgs, flow_manager: FlowManager
-    ) -> tuple[None, NodeConfig]:
-        # We don't need to store anything special here, but we could mark that
-        # the user had a tough day.
-        mood_log = flow_manager.state.setdefault("mood_log", [])
-        mood_log.append(
-            {
-                "type": "stress",
-                "timestamp": datetime.utcnow().isoformat(),
-            }
-        )
-        # Go back to entry after a supportive response
-        return None, create_entry_node()
-
     acknowledge_stress_func = FlowsFunctionSchema(
         name="acknowledge_stress",
         handler=acknowledge_stress,
@@ -431,14 +580,22 @@ def create_stress_node() -> NodeConfig:
         task_messages=[
             {
                 "role": "system",
-                "content": (
-                    "The user sounds stressed, tired, or frustrated about money or work.\n\n"
-                    "Your priorities:\n"
-                    "1. Acknowledge how they feel.\n"
-                    "2. Normalise it (others feel this too).\n"
-                    "3. Offer ONE tiny realistic step (for today or this week).\n\n"
-                    "Do not lecture. Keep it short and kind.\n"
-                    "When you have done this, call acknowledge_stress so we can return to open conversation."
+                "content": PROMPTS.pick(
+                    "stress_support",
+                    (
+                        "The user sounds stressed, tired, or frustrated about money or work.\n\n"
+                        "Your priorities:\n"
+                        "1. Acknowledge how they feel.\n"
+                        "2. Normalise it (others feel this too).\n"
+                        "3. Offer ONE tiny realistic step (for today or this week).\n\n"
+                        "Do not lecture. Keep it short and kind.\n"
+                        "When you have done this, call acknowledge_stress so we can return to open conversation."
+                    ),
+                    (
+                        "The user is stressed about money or work. Acknowledge it, say others feel this too, and "
+                        "offer ONE tiny step for today or this week. Short and kind, no lecture. Then call "
+                        "acknowledge_stress."
+                    ),
                 ),
             }
         ],
@@ -446,29 +603,9 @@ def create_stress_node() -> NodeConfig:
     )
 
 
-def create_goal_node() -> NodeConfig:
+def _build_goal_node() -> NodeConfig:
     """Node for capturing and tracking user financial goals."""
 
-    async def store_goal(
-        args: FlowArgs, flow_manager: FlowManager
-    ) -> tuple[GoalResult, NodeConfig]:
-        goal = args["goal"]
-        target_amount = args.get("target_amount")
-
-        goals = flow_manager.state.setdefault("goals", [])
-        goals.append(
-            {
-                "goal": goal,
-                "target_amount": target_amount,
-                "created_at": datetime.utcnow().isoformat(),
-            }
-        )
-
-        result = GoalResult(goal=goal, target_amount=target_amount)
-
-        # After setting a goal, we go back to entry so they can talk or plan further
-        return result, create_entry_node()
-
     store_goal_func = FlowsFunctionSchema(
         name="store_goal",
         handler=store_goal,
@@ -494,11 +631,18 @@ def create_goal_node() -> NodeConfig:
         task_messages=[
             {
                 "role": "system",
-                "content": (
-                    "Help the user turn their idea into a clear goal. Ask very simple questions, "
-                    "like what they want and roughly how much it might cost. Keep it light.\n\n"
-                    "Then call store_goal with the goal and, if they give it, a target amount. "
-                    "We will go back to entry and keep chatting from there."
+                "content": PROMPTS.pick(
+                    "goal_setting",
+                    (
+                        "Help the user turn their idea into a clear goal. Ask very simple questions, "
+                        "like what they want and roughly how much it might cost. Keep it light.\n\n"
+                        "Then call store_goal with the goal and, if they give it, a target amount. "
+                        "We will go back to entry and keep chatting from there."
+                    ),
+                    (
+                        "Help them turn the idea into a clear goal: what they want and roughly what it costs. "
+                        "Keep it light. Then call store_goal with the goal and any target amount."
+                    ),
                 ),
             }
         ],
@@ -506,16 +650,23 @@ def create_goal_node() -> NodeConfig:
     )
 
 
-def create_end_node() -> NodeConfig:
+def _build_end_node() -> NodeConfig:
     """End node if you ever want to explicitly close the conversation."""
     return NodeConfig(
         name="end",
         task_messages=[
             {
                 "role": "system",
-                "content": (
-                    "Thank the user for chatting with you. Tell them they can come back any day "
-                    "to talk about money again. End the conversation politely and concisely."
+                "content": PROMPTS.pick(
+                    "end",
+                    (
+                        "Thank the user for chatting with you. Tell them they can come back any day "
+                        "to talk about money again. End the conversation politely and concisely."
+                    ),
+                    (
+                        "Thank the user, say they can come back any day to talk about money, and end politely in "
+                        "one sentence."
+                    ),
                 ),
             }
         ],
@@ -523,105 +674,249 @@ def create_end_node() -> NodeConfig:
     )
 
 
+# --------------------------------------------------------------------
+# Node registry
+# --------------------------------------------------------------------
+# Each node config is built once per process; create_*_node() hands out
+# per-session copies (see node_registry.py).
+
+# Node prompts are counted per provider as each node is built (prompt_budget.py)
+NODES = NodeRegistry(on_build=lambda name, node: PROMPTS.measure(name, node, GLOBAL_FUNCTIONS))
+NODES.register("entry", _build_entry_node)
+NODES.register("daily_advice", _build_daily_advice_node)
+NODES.register("concept_teaching", _build_concept_node)
+NODES.register("stress_support", _build_stress_node)
+NODES.register("goal_setting", _build_goal_node)
+NODES.register("end", _build_end_node)
+
+
+def create_entry_node() -> NodeConfig:
+    """Entry / catch-all node."""
+    return NODES.get("entry")
+
+
+def create_daily_advice_node() -> NodeConfig:
+    """Node for computing simple daily savings advice based on earnings/expenses."""
+    return NODES.get("daily_advice")
+
+
+def create_concept_node() -> NodeConfig:
+    """Node for explaining basic financial literacy concepts."""
+    return NODES.get("concept_teaching")
+
+
+def create_stress_node() -> NodeConfig:
+    """Node for stress / emotional support around money."""
+    return NODES.get("stress_support")
+
+
+def create_goal_node() -> NodeConfig:
+    """Node for capturing and tracking user financial goals."""
+    return NODES.get("goal_setting")
+
+
+def create_end_node() -> NodeConfig:
+    """End node if you ever want to explicitly close the conversation."""
+    return NODES.get("end")
+
+
+# --------------------------------------------------------------------
+# Global functions (available at every node)
+# --------------------------------------------------------------------
+
+RECORD_EARNING_FUNC = FlowsFunctionSchema(
+    name="record_earning",
+    handler=record_earning,
+    description=(
+        "Record an earning amount the user mentioned (for example, today's income or a big payment)."
+    ),
+    properties={
+        "amount": {
+            "type": "number",
+            "description": "Amount earned.",
+        },
+        "category": {
+            "type": "string",
+            "description": "Optional source, for example 'rides', 'deliveries' or 'tips'.",
+        },
+    },
+    required=["amount"],
+)
+
+RECORD_EXPENSE_FUNC = FlowsFunctionSchema(
+    name="record_expense",
+    handler=record_expense,
+    description=(
+        "Record an expense amount the user mentioned (for example, petrol, EMI, or other spends)."
+    ),
+    properties={
+        "amount": {
+            "type": "number",
+            "description": "Amount spent.",
+        },
+        "category": {
+            "type": "string",
+            "description": "Optional category, for example 'petrol', 'food' or 'EMI'.",
+        },
+    },
+    required=["amount"],
+)
+
+GLOBAL_FUNCTIONS = [RECORD_EARNING_FUNC, RECORD_EXPENSE_FUNC]
+
+
+# Target node for each entry routing function, used by the local intent router
+INTENT_ROUTES = {
+    "route_to_daily_advice": create_daily_advice_node,
+    "route_to_concept_teaching": create_concept_node,
+    "route_to_stress_support": create_stress_node,
+    "route_to_goal_setting": create_goal_node,
+}
+
+
 # --------------------------------------------------------------------
 # Bot runtime
 # --------------------------------------------------------------------
 
 
-async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
-    """Run the financial coach bot."""
-    
+def _last_message_text(context: LLMContext, role: str) -> str:
+    for message in reversed(context.get_messages()):
+        if isinstance(message, dict) and message.get("role") == role and message.get("content"):
+            content = message["content"]
+            if isinstance(content, list):
+                content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+            return content
+    return ""
+
+
+def create_services():
+    """Create the STT, TTS and LLM services for one session."""
+    from pipecat.services.deepgram.stt import DeepgramSTTService, LiveOptions
+
     stt = DeepgramSTTService(
         api_key=os.getenv("DEEPGRAM_API_KEY"),
         live_options=LiveOptions(
             language="multi",  # ✅ enables automatic multilingual detection
             model="nova-3-general",  # ✅ default multilingual model
+            endpointing=deepgram_endpointing_ms(),  # speech_final for the turn analyzer
         ),
     )
 
-    tts = SarvamTTSService(
+    # Recurring short sentences are served from the phrase cache (tts_cache.py)
+    # With speech chunking on, SpeechChunker decides what to synthesize and
+    # each chunk is flushed to Sarvam right away
+    chunking = speech_chunking_enabled()
+    tts = CachedSarvamTTSService(
         api_key=os.getenv("SARVAM_API_KEY"),
-        model="bulbul:v2",
-        voice_id="manisha",
+        model=TTS_MODEL,
+        voice_id=TTS_VOICE,
+        params=session_tts_params(),
+        aggregate_sentences=not chunking,
+        flush_chunks=chunking,
     )
 
     # LLM service is created using the helper from the examples (utils.create_llm)
     llm = create_llm()
+    return stt, tts, llm
+
+
+async def run_bot(
+    transport: BaseTransport,
+    runner_args: RunnerArguments,
+    turn_analyzer: Optional[AdaptiveTurnAnalyzer] = None,
+):
+    """Run the financial coach bot.
+
+    Args:
+        transport: Transport carrying the caller's audio.
+        runner_args: Runner arguments; ``body["user_id"]`` names a returning caller.
+        turn_analyzer: The transport's adaptive turn analyzer, if
+            ``speech_params`` built one. It is fed the transcripts.
+    """
+
+    # Start loading a returning user's history now; it is added to the
+    # greeting if ready, else at the next turn, so the greeting never waits
+    body = runner_args.body if isinstance(runner_args.body, dict) else {}
+    history = UserHistory(body.get("user_id"))
+
+    stt, tts, llm = create_services()
 
     context = LLMContext()
     context_aggregator = LLMContextAggregatorPair(context)
 
+    # With TURN_DETECTION=adaptive the transport's turn analyzer also reads
+    # the transcripts to decide when the user has finished
+    turn_cues = [turn_analyzer.listener()] if isinstance(turn_analyzer, AdaptiveTurnAnalyzer) else []
+
+    # Starts the LLM on stable interim transcripts and keeps the reply if the
+    # final transcript matches; the listener feeds it the STT output
+    speculation, turn_marker = [], []
+    if speculative_llm_enabled():
+        llm = SpeculativeLLMService(
+            llm,
+            context,
+            provider=get_llm_provider(),
+            should_speculate=lambda text: not intent_router.would_route(text),
+        )
+        speculation, turn_marker = [llm.listener()], [llm.turn_marker()]
+
+    # Compacts older turns into a rolling summary once the context outgrows its budget
+    context_budget = ContextBudget(context=context, llm=llm, state=lambda: flow_manager.state)
+
+    # Picks the entry route locally when confident, skipping one LLM call
+    intent_router = IntentRouter(routes=INTENT_ROUTES, flow_manager=lambda: flow_manager)
+
+    # Answers repeated concept questions from cached explanations; the
+    # recorder after the LLM stores new ones
+    concept = []
+    concept_recorder = []
+    if concept_cache_enabled():
+        concept_cache = ConceptCache(llm=llm, flow_manager=lambda: flow_manager)
+        concept, concept_recorder = [concept_cache], [concept_cache.recorder()]
+
+    # Emits clause/sentence chunks so TTS starts before the first sentence is complete
+    speech = [SpeechChunker()] if speech_chunking_enabled() else []
+
+    # Measures how long the caller still hears the bot after interrupting
+    barge_in = [BargeInMonitor()] if barge_in_enabled() else []
+
     pipeline = Pipeline(
         [
             transport.input(),
             stt,
+            *turn_cues,
+            *speculation,
             context_aggregator.user(),
+            history.processor(),
+            *turn_marker,
+            context_budget,
+            intent_router,
+            *concept,
             llm,
+            *concept_recorder,
+            *speech,
             tts,
             transport.output(),
+            *barge_in,
             context_aggregator.assistant(),
         ]
     )
 
-    task = PipelineTask(pipeline, params=PipelineParams(allow_interruptions=True))
-
-    # Global functions available at every node
-    async def record_earning(
-        args: FlowArgs, flow_manager: FlowManager
-    ) -> tuple[None, None]:
-        amount = float(args["amount"])
-        finance = flow_manager.state.setdefault("finance", {})
-        earnings_log = finance.setdefault("earnings_log", [])
-        earnings_log.append(
-            {
-                "amount": amount,
-                "timestamp": datetime.utcnow().isoformat(),
-            }
+    # Opt-in per-stage latency instrumentation (LATENCY_METRICS=1). The node
+    # getter is resolved lazily because the flow manager is created below.
+    observers = []
+    if latency_metrics_enabled():
+        observers.append(
+            TurnLatencyObserver(
+                provider=get_llm_provider(),
+                node_getter=lambda: flow_manager.current_node,
+            )
         )
-        return None, None
-
-    async def record_expense(
-        args: FlowArgs, flow_manager: FlowManager
-    ) -> tuple[None, None]:
-        amount = float(args["amount"])
-        finance = flow_manager.state.setdefault("finance", {})
-        expenses_log = finance.setdefault("expenses_log", [])
-        expenses_log.append(
-            {
-                "amount": amount,
-                "timestamp": datetime.utcnow().isoformat(),
-            }
-        )
-        return None, None
-
-    record_earning_func = FlowsFunctionSchema(
-        name="record_earning",
-        handler=record_earning,
-        description=(
-            "Record an earning amount the user mentioned (for example, today's income or a big payment)."
-        ),
-        properties={
-            "amount": {
-                "type": "number",
-                "description": "Amount earned.",
-            }
-        },
-        required=["amount"],
-    )
 
-    record_expense_func = FlowsFunctionSchema(
-        name="record_expense",
-        handler=record_expense,
-        description=(
-            "Record an expense amount the user mentioned (for example, petrol, EMI, or other spends)."
-        ),
-        properties={
-            "amount": {
-                "type": "number",
-                "description": "Amount spent.",
-            }
-        },
-        required=["amount"],
+    task = PipelineTask(
+        pipeline,
+        params=PipelineParams(allow_interruptions=True),
+        observers=observers,
     )
 
     # Initialize flow manager
@@ -630,17 +925,28 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
         llm=llm,
         context_aggregator=context_aggregator,
         transport=transport,
-        global_functions=[record_earning_func, record_expense_func],
+        global_functions=list(GLOBAL_FUNCTIONS),
     )
 
     @transport.event_handler("on_client_connected")
     async def on_client_connected(transport, client):
         logger.info("Client connected to financial coach")
-        await flow_manager.initialize(create_entry_node())
+        # Key for the session's rows in the state store (state_store.py)
+        flow_manager.state["session_id"] = str(uuid.uuid4())
+        entry = history.attach(create_entry_node(), flow_manager.state)
+        await flow_manager.initialize(entry)
 
     @transport.event_handler("on_client_disconnected")
     async def on_client_disconnected(transport, client):
         logger.info("Client disconnected from financial coach")
+        STATE_STORE.record(flow_manager.state, reason="session_end")
+        STATE_STORE.record_conversation(
+            flow_manager.state,
+            prompt=_last_message_text(context, "user"),
+            response=_last_message_text(context, "assistant"),
+        )
+        await STATE_STORE.flush()
+        await history.save(flow_manager.state)
         await task.cancel()
 
     runner = PipelineRunner(handle_sigint=runner_args.handle_sigint)
@@ -649,8 +955,20 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
 
 async def bot(runner_args: RunnerArguments):
     """Main bot entry point compatible with Pipecat Cloud."""
-    transport = await create_transport(runner_args, transport_params)
-    await run_bot(transport, runner_args)
+    from pipecat.runner.utils import create_transport
+
+    # Keep the params the transport is built with, for their turn analyzer
+    built = {}
+
+    def keep(factory):
+        def make():
+            built["params"] = factory()
+            return built["params"]
+
+        return make
+
+    transport = await create_transport(runner_args, {name: keep(f) for name, f in transport_params.items()})
+    await run_bot(transport, runner_args, turn_analyzer=getattr(built.get("params"), "turn_analyzer", None))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Process-wide cache of prebuilt flow nodes.
+
+Node configs are mostly static: prompts, function schemas and handlers do not
+depend on the session. ``NodeRegistry`` builds each node once per process and
+hands out cheap per-session instances: a new top-level dict with its own
+message list and message dicts, so a session can never modify the cached
+template, while the ``FlowsFunctionSchema`` objects, handlers and prompt
+strings are shared.
+
+Handlers must therefore be module-level functions that reach session data
+through ``flow_manager.state`` rather than through closures.
+
+An optional ``on_build(name, node)`` hook sees every template as it is built
+(prompt_budget.py uses it to count node prompt tokens).
+
+Usage:
+    NODES = NodeRegistry()
+    NODES.register("entry", _build_entry_node)
+
+    def create_entry_node() -> NodeConfig:
+        return NODES.get("entry")
+"""
+
+import threading
+from typing import Callable, Dict, Optional
+
+from pipecat_flows import NodeConfig
+
+# Keys holding lists of message dicts; these are copied per instance.
+_MESSAGE_KEYS = ("role_messages", "task_messages")
+# Keys holding lists that are shared read-only but get a fresh list object.
+_LIST_KEYS = ("functions", "pre_actions", "post_actions")
+
+
+class NodeRegistry:
+    """Builds each registered node once and returns per-session copies."""
+
+    def __init__(self, on_build: Optional[Callable[[str, NodeConfig], None]] = None):
+        self._on_build = on_build
+        self._builders: Dict[str, Callable[[], NodeConfig]] = {}
+        self._templates: Dict[str, NodeConfig] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, builder: Callable[[], NodeConfig]):
+        """Register the builder for ``name``; it is called at most once."""
+        with self._lock:
+            self._builders[name] = builder
+            self._templates.pop(name, None)
+
+    def template(self, name: str) -> NodeConfig:
+        """Return the cached template, building it on first use."""
+        template = self._templates.get(name)
+        if template is None:
+            with self._lock:
+                template = self._templates.get(name)
+                if template is None:
+                    template = self._builders[name]()
+                    if self._on_build is not None:
+                        self._on_build(name, template)
+                    self._templates[name] = template
+        return template
+
+    def get(self, name: str) -> NodeConfig:
+        """Return a per-session instance of node ``name``."""
+        template = self.template(name)
+        node = dict(template)
+        for key in _MESSAGE_KEYS:
+            if key in node:
+                node[key] = [dict(message) for message in node[key]]
+        for key in _LIST_KEYS:
+            if key in node:
+                node[key] = list(node[key])
+        return node
+
+    def prebuild(self):
+        """Build every registered node now (e.g. at server startup)."""
+        for name in list(self._builders):
+            self.template(name)
+
+    def clear(self):
+        """Drop cached templates so the next ``get`` rebuilds them."""
+        with self._lock:
+            self._templates.clear()
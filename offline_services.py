@@ -0,0 +1,883 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Deterministic stand-ins for the STT, LLM, TTS and transport used by the bot.
+
+These services let us drive ``nivest_bot.run_bot`` end to end without network
+access: the caller, Deepgram, the LLM and Sarvam are all replaced by in-process
+fakes whose delays come from a ``LatencyProfile``. Everything between them (the
+context aggregators, Pipecat Flows transitions and the output transport) is the
+real code that runs in production, so timings taken here move when the flow or
+pipeline changes.
+
+Usage:
+    services = OfflineServices(script=DEFAULT_SCRIPT)
+    transport = InMemoryTransport(services.profile)
+    with use_offline_services(services):
+        await nivest_bot.run_bot(transport, RunnerArguments())
+"""
+
+import asyncio
+import itertools
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Dict, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    BotStoppedSpeakingFrame,
+    CancelFrame,
+    EndFrame,
+    Frame,
+    FunctionCallFromLLM,
+    InputAudioRawFrame,
+    InterimTranscriptionFrame,
+    InterruptionFrame,
+    LLMContextFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    OutputAudioRawFrame,
+    StartFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.services.llm_service import LLMService
+from pipecat.services.stt_service import STTService
+from pipecat.services.tts_service import TTSService
+from pipecat.transports.base_input import BaseInputTransport
+from pipecat.transports.base_output import BaseOutputTransport
+from pipecat.transports.base_transport import BaseTransport, TransportParams
+from pipecat.utils.time import time_now_iso8601
+
+from barge_in import PlaybackClock, StreamingTTSMixin, audio_secs
+from llm_replay import ReplayLLMMixin
+from speech_chunker import speech_chunking_enabled
+
+# --------------------------------------------------------------------
+# Configuration
+# --------------------------------------------------------------------
+
+CALLER_SAMPLE_RATE = 16000
+CALLER_CHUNK_SECS = 0.02
+
+
+@dataclass
+class LatencyProfile:
+    """Delays used by the offline services.
+
+    Parameters:
+        stt_latency_secs: Time from end of speech to the final transcript.
+        stt_interim_secs: Interval between interim transcripts while the
+            caller speaks (0 disables interim results).
+        llm_ttft_secs: Time from a context frame to the first LLM token.
+        llm_token_interval_secs: Time between streamed LLM tokens.
+        tts_ttfb_secs: Time from a TTS request to the first audio chunk.
+        tts_chunk_secs: Duration of audio carried by each TTS chunk.
+        tts_rtf: Synthesis time per second of generated audio.
+        tts_secs_per_char: Spoken duration per character of text.
+        vad_start_secs: VAD start confirmation window.
+        vad_stop_secs: VAD stop confirmation window (Silero default is 0.8).
+        jitter: Relative jitter applied to every delay (0.1 = +/-10%).
+        seed: Seed for the jitter generator, so runs are repeatable.
+    """
+
+    stt_latency_secs: float = 0.15
+    stt_interim_secs: float = 0.0
+    llm_ttft_secs: float = 0.35
+    llm_token_interval_secs: float = 0.02
+    tts_ttfb_secs: float = 0.15
+    tts_chunk_secs: float = 0.1
+    tts_rtf: float = 0.2
+    tts_secs_per_char: float = 0.06
+    vad_start_secs: float = 0.2
+    vad_stop_secs: float = 0.8
+    jitter: float = 0.0
+    seed: int = 7
+
+
+@dataclass
+class ScriptedTurn:
+    """One user turn and the way the fake LLM should handle it.
+
+    Parameters:
+        user_text: What the caller says (returned by the fake STT).
+        route: Routing function the LLM calls from the entry node.
+        node: Name of the node the route leads to.
+        skill: Function the LLM calls once inside ``node``.
+        skill_args: Arguments passed to ``skill``.
+        reply: What the LLM says inside ``node`` before calling ``skill``.
+        follow_up: What the LLM says after returning to the entry node.
+        speech_secs: How long the caller speaks.
+        interims: Interim transcripts the STT emits while the caller speaks,
+            one per ``stt_interim_secs``. The last one repeats if speech
+            lasts longer. Defaults to growing prefixes of ``user_text``
+            (see ``scripted_interims``).
+    """
+
+    user_text: str
+    route: str
+    node: str
+    skill: str
+    skill_args: Dict[str, Any] = field(default_factory=dict)
+    reply: str = "Okay, let us look at that together."
+    follow_up: str = "Anything else on your mind today?"
+    speech_secs: float = 1.2
+    interims: Optional[List[str]] = None
+
+
+def scripted_interims(turn: ScriptedTurn, interval: float) -> List[str]:
+    """Interim transcripts for ``turn`` at one result per ``interval``.
+
+    Uses ``turn.interims`` when given; otherwise word prefixes of
+    ``user_text`` that grow evenly over ``speech_secs`` and reach the full
+    text at the end of speech.
+    """
+    if interval <= 0:
+        return []
+    if turn.interims is not None:
+        return list(turn.interims)
+    words = turn.user_text.split()
+    slots = max(1, int(turn.speech_secs / interval))
+    return [" ".join(words[: -(-len(words) * i // slots)]) for i in range(1, slots + 1)]
+
+
+# --------------------------------------------------------------------
+# Scripts
+# --------------------------------------------------------------------
+
+# A short call that visits every skill node once.
+DEFAULT_SCRIPT: List[ScriptedTurn] = [
+    ScriptedTurn(
+        user_text="Aaj maine eighteen hundred kamaye, petrol mein four hundred gaye.",
+        route="route_to_daily_advice",
+        node="daily_advice",
+        skill="compute_savings_advice",
+        skill_args={"income": 1800, "expenses": 400},
+        reply="Great day. After petrol you have fourteen hundred left. Try to keep aside two eighty today.",
+    ),
+    ScriptedTurn(
+        user_text="Emergency fund kya hota hai?",
+        route="route_to_concept_teaching",
+        node="concept_teaching",
+        skill="register_concept",
+        skill_args={"topic": "emergency fund"},
+        reply="An emergency fund is money kept only for bad days, like a breakdown or illness.",
+    ),
+    ScriptedTurn(
+        user_text="Bahut thak gaya hoon yaar, paise bachte hi nahi.",
+        route="route_to_stress_support",
+        node="stress_support",
+        skill="acknowledge_stress",
+        reply="That sounds tiring, and many drivers feel the same. Just save twenty rupees today.",
+    ),
+    ScriptedTurn(
+        user_text="Mujhe nayi bike leni hai, around eighty thousand.",
+        route="route_to_goal_setting",
+        node="goal_setting",
+        skill="store_goal",
+        skill_args={"goal": "buy a new bike", "target_amount": 80000},
+        reply="A new bike for eighty thousand is a clear goal. Let us break it into daily steps.",
+    ),
+]
+
+
+# --------------------------------------------------------------------
+# Shared clock / jitter
+# --------------------------------------------------------------------
+
+
+class _Delays:
+    """Applies the profile jitter with a seeded generator."""
+
+    def __init__(self, profile: LatencyProfile):
+        self._profile = profile
+        self._rng = random.Random(profile.seed)
+
+    def __call__(self, secs: float) -> float:
+        if secs <= 0 or not self._profile.jitter:
+            return max(0.0, secs)
+        spread = secs * self._profile.jitter
+        return max(0.0, secs + self._rng.uniform(-spread, spread))
+
+    async def sleep(self, secs: float):
+        await asyncio.sleep(self(secs))
+
+
+def _is_voiced(audio: bytes, threshold: float = 500.0) -> bool:
+    samples = np.frombuffer(audio, dtype=np.int16)
+    if samples.size == 0:
+        return False
+    return float(np.sqrt(np.mean(samples.astype(np.float32) ** 2))) >= threshold
+
+
+# --------------------------------------------------------------------
+# VAD
+# --------------------------------------------------------------------
+
+
+class EnergyVADAnalyzer(VADAnalyzer):
+    """RMS-energy VAD, good enough for the synthetic caller audio.
+
+    Runs through the regular ``VADAnalyzer`` state machine so start/stop
+    windows and user-speaking frames behave like Silero in production.
+    """
+
+    def __init__(self, *, threshold: float = 500.0, **kwargs):
+        super().__init__(**kwargs)
+        self._threshold = threshold
+
+    def num_frames_required(self) -> int:
+        return int(self.sample_rate * CALLER_CHUNK_SECS)
+
+    def voice_confidence(self, buffer) -> float:
+        self.last_confidence = 1.0 if _is_voiced(buffer, self._threshold) else 0.0
+        return self.last_confidence
+
+
+# --------------------------------------------------------------------
+# STT
+# --------------------------------------------------------------------
+
+
+class FakeSTTService(STTService):
+    """Energy-endpointed STT that returns queued transcripts.
+
+    Audio is inspected chunk by chunk. While the caller speaks, the queued
+    interim transcripts are pushed every ``stt_interim_secs``. Once voiced
+    audio is followed by silence, the next queued transcript is pushed after
+    ``stt_latency_secs``.
+    """
+
+    def __init__(self, profile: LatencyProfile, delays: _Delays, **kwargs):
+        super().__init__(**kwargs)
+        self._profile = profile
+        self._delays = delays
+        self._transcripts: List[tuple[str, List[str]]] = []
+        self._in_speech = False
+        self._finalize_task: Optional[asyncio.Task] = None
+        self._interim_task: Optional[asyncio.Task] = None
+
+    def queue_transcript(self, text: str, interims: Sequence[str] = ()):
+        """Queue the transcript (and its interim results) for the next utterance."""
+        self._transcripts.append((text, list(interims)))
+
+    async def run_stt(self, audio: bytes) -> AsyncGenerator[Frame, None]:
+        voiced = _is_voiced(audio)
+        if voiced and not self._in_speech:
+            self._in_speech = True
+            if self._transcripts and self._transcripts[0][1] and self._profile.stt_interim_secs > 0:
+                self._interim_task = self.create_task(self._stream_interims(self._transcripts[0][1]))
+        elif not voiced and self._in_speech:
+            self._in_speech = False
+            await self._cancel_interims()
+            if self._transcripts:
+                text, _ = self._transcripts.pop(0)
+                self._finalize_task = self.create_task(self._finalize(text))
+        yield None
+
+    async def _stream_interims(self, interims: List[str]):
+        for i in itertools.count():
+            await self._delays.sleep(self._profile.stt_interim_secs)
+            text = interims[min(i, len(interims) - 1)]
+            await self.push_frame(InterimTranscriptionFrame(text, "", time_now_iso8601()))
+
+    async def _cancel_interims(self):
+        if self._interim_task:
+            await self.cancel_task(self._interim_task)
+            self._interim_task = None
+
+    async def _finalize(self, text: str):
+        await self._delays.sleep(self._profile.stt_latency_secs)
+        await self.push_frame(TranscriptionFrame(text, "", time_now_iso8601()))
+        self._finalize_task = None
+
+    async def _cancel_finalize(self):
+        if self._finalize_task:
+            await self.cancel_task(self._finalize_task)
+            self._finalize_task = None
+
+    async def stop(self, frame: EndFrame):
+        await super().stop(frame)
+        await self._cancel_interims()
+        await self._cancel_finalize()
+
+    async def cancel(self, frame: CancelFrame):
+        await super().cancel(frame)
+        await self._cancel_interims()
+        await self._cancel_finalize()
+
+
+# --------------------------------------------------------------------
+# LLM
+# --------------------------------------------------------------------
+
+
+class FakeLLMService(ReplayLLMMixin, LLMService):
+    """Rule-based LLM that walks the coaching flow from a script.
+
+    - At the entry node, a new user message triggers the scripted route.
+    - Inside a skill node it speaks ``reply`` and calls the scripted skill.
+    - Back at entry without a new user message it speaks ``follow_up``
+      (or a greeting on the very first run) and the turn is complete.
+
+    Function calls go through ``run_function_calls`` so Pipecat Flows handles
+    them exactly as it would for a real provider. A script turn is only
+    consumed once the flow has reached its node, so a request that is
+    discarded (e.g. a speculative one, see speculative_llm.py) and repeated
+    gives the same answer.
+    """
+
+    greeting = "Namaste! How did your day go?"
+
+    def __init__(
+        self,
+        profile: LatencyProfile,
+        delays: _Delays,
+        script: List[ScriptedTurn],
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._profile = profile
+        self._delays = delays
+        self._script = list(script)
+        self._script_index = 0  # index of the next script turn not yet routed
+        self._turn: Optional[ScriptedTurn] = None
+        self._pending_transition: Optional[tuple[str, str, float]] = None
+        self.transitions: List[tuple[str, str, float]] = []
+        self.nodes_seen: List[str] = []
+        self.turn_done = asyncio.Event()
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, LLMContextFrame):
+            await self.push_frame(LLMFullResponseStartFrame())
+            await self.start_processing_metrics()
+            try:
+                await self._process_context(frame.context)
+            finally:
+                await self.stop_processing_metrics()
+                await self.push_frame(LLMFullResponseEndFrame())
+        else:
+            await self.push_frame(frame, direction)
+
+    async def run_inference(self, context) -> Optional[str]:
+        await self._delays.sleep(self._profile.llm_ttft_secs)
+        return "The user is a gig worker talking about daily earnings, expenses and goals."
+
+    async def _process_context(self, context):
+        tools = context.tools
+        names = [t.name for t in getattr(tools, "standard_tools", [])]
+        at_entry = any(name.startswith("route_to_") for name in names)
+        if not at_entry and self._turn is None and self._script_index < len(self._script):
+            # First request inside the skill node: the turn was routed, by our
+            # route call or by the local intent router.
+            self._turn = self._script[self._script_index]
+            self._script_index += 1
+        node = "entry" if at_entry else (self._turn.node if self._turn else "unknown")
+        self.nodes_seen.append(node)
+
+        now = time.perf_counter()
+        if self._pending_transition:
+            source, target, started = self._pending_transition
+            if target == node:  # not a discarded request repeated
+                self.transitions.append((source, node, now - started))
+            self._pending_transition = None
+
+        await self.start_ttfb_metrics()
+        await self._delays.sleep(self._profile.llm_ttft_secs)
+        await self.stop_ttfb_metrics()
+
+        messages = context.get_messages()
+        last_role = messages[-1].get("role") if messages and isinstance(messages[-1], dict) else None
+
+        if at_entry and last_role == "user" and self._script_index < len(self._script):
+            turn = self._script[self._script_index]
+            await self._call(context, turn.route, {}, source="entry", target=turn.node)
+        elif not at_entry and self._turn:
+            await self._speak(self._turn.reply)
+            await self._call(
+                context, self._turn.skill, dict(self._turn.skill_args), source=node, target="entry"
+            )
+        else:
+            await self._speak(self._turn.follow_up if self._turn else self.greeting)
+            self._turn = None
+            self.turn_done.set()
+
+    async def _speak(self, text: str):
+        for i, word in enumerate(text.split()):
+            if i:
+                await self._delays.sleep(self._profile.llm_token_interval_secs)
+            await self.push_frame(LLMTextFrame(f" {word}" if i else word))
+
+    async def _call(self, context, name: str, arguments: dict, *, source: str, target: str):
+        self._pending_transition = (source, target, time.perf_counter())
+        await self.run_function_calls(
+            [
+                FunctionCallFromLLM(
+                    function_name=name,
+                    tool_call_id=f"call_{uuid.uuid4().hex[:12]}",
+                    arguments=arguments,
+                    context=context,
+                )
+            ]
+        )
+
+
+class FakeProviderLLM(ReplayLLMMixin, LLMService):
+    """A single LLM provider with a configurable latency tail and error rate.
+
+    Used to exercise ``llm_failover.FailoverLLMService``: each request waits
+    ``ttft_secs`` (or ``tail_secs`` with probability ``tail_prob``) before
+    streaming ``reply``, or raises with probability ``error_rate``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        ttft_secs: float = 0.35,
+        tail_prob: float = 0.0,
+        tail_secs: float = 3.0,
+        error_rate: float = 0.0,
+        reply: str = "Okay, let us look at that together.",
+        token_interval_secs: float = 0.02,
+        seed: int = 7,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.provider = name
+        self._ttft_secs = ttft_secs
+        self._tail_prob = tail_prob
+        self._tail_secs = tail_secs
+        self._error_rate = error_rate
+        self._reply = reply
+        self._token_interval_secs = token_interval_secs
+        self._rng = random.Random(f"{name}-{seed}")
+        self.requests = 0
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, LLMContextFrame):
+            await self.push_frame(LLMFullResponseStartFrame())
+            try:
+                await self._process_context(frame.context)
+            finally:
+                await self.push_frame(LLMFullResponseEndFrame())
+        else:
+            await self.push_frame(frame, direction)
+
+    async def run_inference(self, context) -> Optional[str]:
+        await self._wait_first_token()
+        return self._reply
+
+    async def _wait_first_token(self):
+        self.requests += 1
+        slow = self._rng.random() < self._tail_prob
+        fail = self._rng.random() < self._error_rate
+        await asyncio.sleep(self._tail_secs if slow else self._ttft_secs)
+        if fail:
+            raise ConnectionError(f"{self.provider}: simulated provider error")
+
+    async def _process_context(self, context):
+        await self._wait_first_token()
+        for i, word in enumerate(self._reply.split()):
+            if i:
+                await asyncio.sleep(self._token_interval_secs)
+            await self.push_frame(LLMTextFrame(f" {word}" if i else word))
+
+
+# --------------------------------------------------------------------
+# TTS
+# --------------------------------------------------------------------
+
+
+class FakeTTSService(TTSService):
+    """TTS that streams a low tone whose length follows the text length."""
+
+    def __init__(self, profile: LatencyProfile, delays: _Delays, **kwargs):
+        super().__init__(**kwargs)
+        self._profile = profile
+        self._delays = delays
+
+    def can_generate_metrics(self) -> bool:
+        return True
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        profile = self._profile
+        await self.start_ttfb_metrics()
+        yield TTSStartedFrame()
+        await self._delays.sleep(profile.tts_ttfb_secs)
+
+        total_secs = max(profile.tts_chunk_secs, len(text) * profile.tts_secs_per_char)
+        chunk = _tone(self.sample_rate, profile.tts_chunk_secs, amplitude=4000)
+        sent = 0.0
+        while sent < total_secs:
+            if sent:
+                await self._delays.sleep(profile.tts_chunk_secs * profile.tts_rtf)
+            else:
+                await self.stop_ttfb_metrics()
+            yield TTSAudioRawFrame(audio=chunk, sample_rate=self.sample_rate, num_channels=1)
+            sent += profile.tts_chunk_secs
+
+        yield TTSStoppedFrame()
+
+
+class FakeWebsocketTTSService(TTSService):
+    """TTS whose audio streams out of band, like Sarvam's WebSocket service.
+
+    ``run_tts`` only queues the text; a background task "receives" the tone
+    and pushes it. Like ``InterruptibleTTSService`` it drops the stream on an
+    interruption only while the bot is speaking.
+    """
+
+    def __init__(self, profile: LatencyProfile, delays: _Delays, **kwargs):
+        super().__init__(push_stop_frames=True, **kwargs)
+        self._profile = profile
+        self._delays = delays
+        self._requests: asyncio.Queue = asyncio.Queue()
+        self._stream_task: Optional[asyncio.Task] = None
+        self._streaming = False
+        self._bot_speaking = False
+
+    def can_generate_metrics(self) -> bool:
+        return True
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        await self.start_ttfb_metrics()
+        if not self._stream_task:
+            self._stream_task = self.create_task(self._stream_task_handler())
+        if not self._streaming:
+            self._streaming = True
+            yield TTSStartedFrame()
+        await self._requests.put(text)
+        yield None
+
+    async def push_frame(self, frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM):
+        await super().push_frame(frame, direction)
+        if isinstance(frame, (TTSStoppedFrame, InterruptionFrame)):
+            self._streaming = False
+
+    async def _handle_interruption(self, frame: InterruptionFrame, direction: FrameDirection):
+        await super()._handle_interruption(frame, direction)
+        if self._bot_speaking:
+            await self._close_stream()
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, BotStartedSpeakingFrame):
+            self._bot_speaking = True
+        elif isinstance(frame, BotStoppedSpeakingFrame):
+            self._bot_speaking = False
+
+    async def stop(self, frame: EndFrame):
+        await super().stop(frame)
+        await self._close_stream()
+
+    async def cancel(self, frame: CancelFrame):
+        await super().cancel(frame)
+        await self._close_stream()
+
+    async def _close_stream(self):
+        if self._stream_task:
+            await self.cancel_task(self._stream_task)
+            self._stream_task = None
+        self._requests = asyncio.Queue()
+
+    async def _stream_task_handler(self):
+        profile = self._profile
+        chunk = _tone(self.sample_rate, profile.tts_chunk_secs, amplitude=4000)
+        while True:
+            text = await self._requests.get()
+            await self._delays.sleep(profile.tts_ttfb_secs)
+            await self.stop_ttfb_metrics()
+            total_secs = max(profile.tts_chunk_secs, len(text) * profile.tts_secs_per_char)
+            sent = 0.0
+            while sent < total_secs:
+                if sent:
+                    await self._delays.sleep(profile.tts_chunk_secs * profile.tts_rtf)
+                await self.push_frame(TTSAudioRawFrame(audio=chunk, sample_rate=self.sample_rate, num_channels=1))
+                sent += profile.tts_chunk_secs
+
+
+class FakeStreamingTTSService(StreamingTTSMixin, FakeWebsocketTTSService):
+    """``FakeWebsocketTTSService`` with barge-in support, like ``CachedSarvamTTSService``."""
+
+    async def drop_pending_audio(self):
+        await self._close_stream()
+
+
+def _tone(sample_rate: int, secs: float, amplitude: int = 8000, freq: float = 220.0) -> bytes:
+    t = np.arange(int(sample_rate * secs)) / sample_rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.int16).tobytes()
+
+
+# --------------------------------------------------------------------
+# Transport
+# --------------------------------------------------------------------
+
+
+class InMemoryInputTransport(BaseInputTransport):
+    """Input side of the in-memory transport: a simulated caller.
+
+    Streams 20 ms chunks in real time, like a microphone would. Silence is
+    sent between utterances so the VAD and STT see a continuous stream.
+    """
+
+    def __init__(self, transport: "InMemoryTransport", params: TransportParams, **kwargs):
+        super().__init__(params, **kwargs)
+        self._transport = transport
+        self._caller_task: Optional[asyncio.Task] = None
+        self._utterances: asyncio.Queue = asyncio.Queue()
+        self._initialized = False
+
+    async def start(self, frame: StartFrame):
+        await super().start(frame)
+        if self._initialized:
+            return
+        self._initialized = True
+        await self.set_transport_ready(frame)
+        if not self._caller_task:
+            self._caller_task = self.create_task(self._caller_task_handler())
+        await self._transport.trigger_client_connected()
+
+    async def stop(self, frame: EndFrame):
+        await super().stop(frame)
+        await self._stop_caller()
+
+    async def cancel(self, frame: CancelFrame):
+        await super().cancel(frame)
+        await self._stop_caller()
+
+    async def _stop_caller(self):
+        if self._caller_task:
+            await self.cancel_task(self._caller_task)
+            self._caller_task = None
+
+    async def say(self, speech_secs: float) -> float:
+        """Speak for ``speech_secs`` and return the end-of-speech timestamp."""
+        done = asyncio.get_running_loop().create_future()
+        await self._utterances.put((speech_secs, done))
+        return await done
+
+    async def _caller_task_handler(self):
+        rate = CALLER_SAMPLE_RATE
+        voiced = _tone(rate, CALLER_CHUNK_SECS)
+        silence = b"\x00" * len(voiced)
+        next_time = time.perf_counter()
+        remaining = 0
+        done: Optional[asyncio.Future] = None
+        while True:
+            if not remaining and not self._utterances.empty():
+                speech_secs, done = self._utterances.get_nowait()
+                remaining = max(1, round(speech_secs / CALLER_CHUNK_SECS))
+
+            audio = voiced if remaining else silence
+            await self.push_audio_frame(
+                InputAudioRawFrame(audio=audio, sample_rate=rate, num_channels=1)
+            )
+            if remaining:
+                remaining -= 1
+                if not remaining and done and not done.done():
+                    done.set_result(time.perf_counter() + CALLER_CHUNK_SECS)
+
+            next_time += CALLER_CHUNK_SECS
+            await asyncio.sleep(max(0.0, next_time - time.perf_counter()))
+
+
+class InMemoryOutputTransport(BaseOutputTransport):
+    """Output side of the in-memory transport; records when audio is written.
+
+    Audio is written as fast as it comes unless ``realtime`` is set, in which
+    case writes are paced like the FastAPI WebSocket transport's and
+    ``clock`` tells when a client playing them would go quiet.
+    """
+
+    def __init__(
+        self, transport: "InMemoryTransport", params: TransportParams, realtime: bool = False, **kwargs
+    ):
+        super().__init__(params, **kwargs)
+        self._transport = transport
+        self._initialized = False
+        self._realtime = realtime
+        self._next_send_time = 0.0
+        self.audio_times: List[float] = []
+        self.audio_bytes = 0
+        self.bot_speaking = False
+        self.clock = PlaybackClock()
+
+    async def start(self, frame: StartFrame):
+        await super().start(frame)
+        if self._initialized:
+            return
+        self._initialized = True
+        await self.set_transport_ready(frame)
+
+    async def write_audio_frame(self, frame: OutputAudioRawFrame) -> bool:
+        now = time.perf_counter()
+        self.audio_times.append(now)
+        self.audio_bytes += len(frame.audio)
+        self.clock.add(audio_secs(frame), now)
+        if self._realtime:
+            # Same clock as FastAPIWebsocketOutputTransport._write_audio_sleep
+            interval = audio_secs(frame)
+            sleep = max(0.0, self._next_send_time - now)
+            await asyncio.sleep(sleep)
+            self._next_send_time = (time.perf_counter() if not sleep else self._next_send_time) + interval
+        return True
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, InterruptionFrame):
+            self._next_send_time = 0.0
+
+    async def push_frame(self, frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM):
+        if direction == FrameDirection.DOWNSTREAM:
+            if isinstance(frame, BotStartedSpeakingFrame):
+                self.bot_speaking = True
+            elif isinstance(frame, BotStoppedSpeakingFrame):
+                self.bot_speaking = False
+        await super().push_frame(frame, direction)
+
+    async def wait_until_quiet(self, quiet_secs: float = 0.6, timeout: float = 30.0):
+        """Wait until no audio has been written for ``quiet_secs``."""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            last = self.audio_times[-1] if self.audio_times else 0.0
+            if not self.bot_speaking and time.perf_counter() - last >= quiet_secs:
+                return
+            await asyncio.sleep(0.05)
+        raise asyncio.TimeoutError("bot did not go quiet")
+
+
+class InMemoryTransport(BaseTransport):
+    """Transport with a simulated caller on the input and a recorder on the output."""
+
+    def __init__(
+        self,
+        profile: Optional[LatencyProfile] = None,
+        params: Optional[TransportParams] = None,
+        realtime_output: bool = False,
+    ):
+        super().__init__()
+        profile = profile or LatencyProfile()
+        self._params = params or TransportParams(
+            audio_in_enabled=True,
+            audio_in_sample_rate=CALLER_SAMPLE_RATE,
+            audio_out_enabled=True,
+            vad_analyzer=EnergyVADAnalyzer(
+                params=VADParams(start_secs=profile.vad_start_secs, stop_secs=profile.vad_stop_secs)
+            ),
+        )
+        self._input = InMemoryInputTransport(self, self._params, name=self._input_name)
+        self._output = InMemoryOutputTransport(
+            self, self._params, realtime=realtime_output, name=self._output_name
+        )
+        self._register_event_handler("on_client_connected")
+        self._register_event_handler("on_client_disconnected")
+
+    def input(self) -> InMemoryInputTransport:
+        return self._input
+
+    def output(self) -> InMemoryOutputTransport:
+        return self._output
+
+    async def trigger_client_connected(self):
+        await self._call_event_handler("on_client_connected", "offline-caller")
+
+    async def disconnect(self):
+        """Simulate the caller hanging up."""
+        await self._call_event_handler("on_client_disconnected", "offline-caller")
+
+
+# --------------------------------------------------------------------
+# Wiring
+# --------------------------------------------------------------------
+
+
+class OfflineServices:
+    """Builds one set of fake services for a single session."""
+
+    def __init__(
+        self,
+        script: List[ScriptedTurn],
+        profile: Optional[LatencyProfile] = None,
+        autoplay: bool = False,
+    ):
+        """Initialize the services.
+
+        Args:
+            script: Turns the fake LLM walks through.
+            profile: Service delays.
+            autoplay: Queue every scripted transcript up front, so the STT
+                answers each utterance without a driver calling
+                ``queue_transcript`` (used when a real client streams audio).
+        """
+        self.profile = profile or LatencyProfile()
+        self.script = list(script)
+        delays = _Delays(self.profile)
+        self.stt = FakeSTTService(self.profile, delays)
+        self.llm = FakeLLMService(self.profile, delays, self.script)
+        self.tts = FakeTTSService(
+            self.profile, delays, aggregate_sentences=not speech_chunking_enabled()
+        )
+        if autoplay:
+            for turn in self.script:
+                self.stt.queue_transcript(turn.user_text, scripted_interims(turn, self.profile.stt_interim_secs))
+
+    def as_tuple(self):
+        """Return ``(stt, tts, llm)`` as ``nivest_bot.create_services`` does."""
+        return self.stt, self.tts, self.llm
+
+
+@contextmanager
+def use_offline_services(services: OfflineServices):
+    """Make ``nivest_bot.run_bot`` build the fakes instead of real services."""
+    import nivest_bot
+
+    from state_store import STATE_STORE
+
+    original = nivest_bot.create_services, STATE_STORE.backend
+    nivest_bot.create_services = services.as_tuple
+    # Scripted sessions are not caller data
+    STATE_STORE.backend = None
+    logger.debug("Using offline STT/LLM/TTS services")
+    try:
+        yield services
+    finally:
+        nivest_bot.create_services, STATE_STORE.backend = original
+
+
+def install_offline_services(
+    profile: Optional[LatencyProfile] = None,
+    script: Optional[List[ScriptedTurn]] = None,
+    repeat: int = 25,
+):
+    """Make every ``run_bot`` call in this process use fresh offline services.
+
+    Used by ``server.py --offline`` so that real websocket clients (e.g. load
+    tests) can talk to the bot without provider keys or network access. Each
+    session replays ``script`` ``repeat`` times, one scripted turn per
+    utterance the client sends. Session state is not persisted.
+    """
+    import nivest_bot
+    from state_store import STATE_STORE
+
+    script = list(script or DEFAULT_SCRIPT) * repeat
+    nivest_bot.create_services = lambda: OfflineServices(script, profile, autoplay=True).as_tuple()
+    STATE_STORE.backend = None
+    logger.info("Offline services installed: sessions use fake STT/LLM/TTS")
@@ -0,0 +1,614 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""PCM frame serializers for the ``/ws`` endpoint.
+
+With ``serializer=None`` the FastAPI websocket transport drops every incoming
+message, so nothing the client sends reaches the pipeline. Two protocols are
+available, chosen per connection with ``/ws?protocol=raw|framed``.
+
+``RawPCMSerializer`` (``raw``) is the simplest useful protocol:
+
+- client -> server: binary messages of 16-bit little-endian mono PCM at the
+  transport's input sample rate (16 kHz by default).
+- server -> client: binary messages of 16-bit mono PCM at the pipeline's
+  output sample rate, one message per output chunk.
+
+Everything else (text messages, non-audio frames) is ignored.
+
+``FramedPCMSerializer`` (``framed``) puts a 16-byte little-endian header in
+front of every binary message::
+
+    offset  size  field
+    0       1     version (1)
+    1       1     kind: 0 audio, 1 control
+    2       1     encoding: 0 pcm16, 1 float32, 2 mu-law (audio only)
+    3       1     channels (audio only, interleaved)
+    4       4     sequence number, per direction, wrapping at 2**32
+    8       4     timestamp: stream position in milliseconds
+    12      4     sample rate in Hz (audio only)
+    16      ...   payload: audio samples, or a UTF-8 JSON object (control)
+
+Audio from the client may use any encoding, channel count and sample rate;
+the header describes it. 16-bit mono audio at the pipeline's input rate is
+copied out of the received message once. Anything else is downmixed,
+resampled and converted with numpy in reused work arrays, and copied out at
+the end. Either way the frame's audio is ``bytes`` that it owns, so
+consumers that keep it (an STT buffering an utterance, a recorder) never see
+it change; the copy is a few hundred bytes per 20 ms.
+
+Bot audio is sent in the encoding and sample rate the client asked for
+(``out_encoding`` / ``out_rate`` query parameters, 16-bit PCM at the pipeline
+output rate by default). Each message is written into a slot of an output ring
+and handed to the websocket as a ``memoryview``, which the websocket library
+copies into its send buffer.
+
+Control messages are JSON objects. The server sends ``{"type": "clear"}``
+when the caller interrupts the bot, so a client drops the audio it has
+buffered but not played yet, and sends pipeline transport messages
+(``OutputTransportMessageFrame``) as ``{"type": "message", "data": ...}``.
+Control messages from the client reach the pipeline as
+``InputTransportMessageFrame``. ``encode_frame`` / ``decode_frame`` build and
+parse messages for clients written in Python.
+
+``python -m benchmarks.ws_framing`` measures CPU time per audio second and
+allocations per frame for both protocols.
+
+Configuration:
+    WS_PROTOCOL: Protocol for connections that don't pass ``protocol``
+        (``raw`` or ``framed``, default ``raw``).
+    WS_RING_SECS: Seconds of audio held by each framed connection's output
+        ring (default ``2``).
+
+Metrics:
+    nivest_ws_input_gaps_total: framed client messages missing from the
+        sequence numbers.
+    nivest_ws_protocol_errors_total: framed client messages that could not be
+        parsed.
+"""
+
+import json
+import math
+import os
+import struct
+from typing import Mapping, NamedTuple, Optional
+
+import numpy as np
+from loguru import logger
+
+from pipecat.frames.frames import (
+    Frame,
+    InputAudioRawFrame,
+    InputTransportMessageFrame,
+    InterruptionFrame,
+    OutputAudioRawFrame,
+    OutputTransportMessageFrame,
+    OutputTransportMessageUrgentFrame,
+    StartFrame,
+)
+from pipecat.serializers.base_serializer import FrameSerializer, FrameSerializerType
+
+from metrics import counter
+
+WS_PROTOCOL = os.getenv("WS_PROTOCOL", "raw")
+WS_RING_SECS = float(os.getenv("WS_RING_SECS", "2"))
+
+INPUT_GAPS = counter(
+    "nivest_ws_input_gaps_total",
+    "Framed websocket messages missing from the client's sequence numbers.",
+)
+PROTOCOL_ERRORS = counter(
+    "nivest_ws_protocol_errors_total",
+    "Framed websocket messages from the client that could not be parsed.",
+)
+
+
+class RawPCMSerializer(FrameSerializer):
+    """Binary serializer that carries bare PCM audio in both directions."""
+
+    def __init__(self, sample_rate: Optional[int] = None):
+        """Initialize the serializer.
+
+        Args:
+            sample_rate: Input sample rate of the client audio. Defaults to the
+                pipeline's input sample rate.
+        """
+        super().__init__()
+        self._init_sample_rate = sample_rate
+        self._sample_rate = sample_rate or 16000
+
+    @property
+    def type(self) -> FrameSerializerType:
+        return FrameSerializerType.BINARY
+
+    async def setup(self, frame: StartFrame):
+        self._sample_rate = self._init_sample_rate or frame.audio_in_sample_rate
+
+    async def serialize(self, frame: Frame) -> bytes | None:
+        if isinstance(frame, OutputAudioRawFrame):
+            return frame.audio
+        return None
+
+    async def deserialize(self, data: str | bytes) -> Frame | None:
+        if not isinstance(data, (bytes, bytearray)) or not data:
+            return None
+        return InputAudioRawFrame(audio=bytes(data), sample_rate=self._sample_rate, num_channels=1)
+
+
+# --------------------------------------------------------------------
+# Framed protocol
+# --------------------------------------------------------------------
+
+VERSION = 1
+HEADER = struct.Struct("<BBBBIII")
+
+KIND_AUDIO = 0
+KIND_CONTROL = 1
+
+ENCODING_PCM16 = 0
+ENCODING_FLOAT32 = 1
+ENCODING_MULAW = 2
+
+ENCODINGS = {"pcm16": ENCODING_PCM16, "float32": ENCODING_FLOAT32, "mulaw": ENCODING_MULAW}
+SAMPLE_WIDTH = {ENCODING_PCM16: 2, ENCODING_FLOAT32: 4, ENCODING_MULAW: 1}
+
+_SEQ_MASK = 0xFFFFFFFF
+
+
+class FramedMessage(NamedTuple):
+    """A parsed framed message; ``payload`` is a view into the message."""
+
+    kind: int
+    encoding: int
+    channels: int
+    seq: int
+    timestamp_ms: int
+    sample_rate: int
+    payload: memoryview
+
+
+def encode_frame(
+    kind: int,
+    payload: bytes,
+    seq: int,
+    timestamp_ms: int = 0,
+    sample_rate: int = 0,
+    encoding: int = ENCODING_PCM16,
+    channels: int = 1,
+) -> bytes:
+    """Build a framed message (for clients and benchmarks)."""
+    return (
+        HEADER.pack(VERSION, kind, encoding, channels, seq & _SEQ_MASK, timestamp_ms & _SEQ_MASK, sample_rate)
+        + payload
+    )
+
+
+def decode_frame(data: bytes) -> FramedMessage:
+    """Parse a framed message without copying its payload.
+
+    Raises:
+        ValueError: If the message is too short or has an unknown version.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError(f"framed message is {len(data)} bytes, shorter than the header")
+    version, kind, encoding, channels, seq, timestamp_ms, sample_rate = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"unsupported framed protocol version {version}")
+    return FramedMessage(kind, encoding, channels, seq, timestamp_ms, sample_rate, memoryview(data)[HEADER.size :])
+
+
+class RingBuffer:
+    """Preallocated byte ring handing out contiguous slots.
+
+    A slot stays valid until the ring wraps around to it again. A request
+    larger than half the ring replaces the ring with a bigger one; views of
+    the old one keep it alive as long as they are in use.
+    """
+
+    def __init__(self, size: int):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self._pos = 0
+
+    def claim(self, nbytes: int) -> int:
+        """Reserve ``nbytes`` and return their offset into ``buffer``."""
+        if nbytes > len(self.buffer) // 2:
+            self.buffer = bytearray(2 * nbytes)
+            self.view = memoryview(self.buffer)
+            self._pos = 0
+        elif self._pos + nbytes > len(self.buffer):
+            self._pos = 0
+        offset = self._pos
+        self._pos += nbytes
+        return offset
+
+
+# --------------------------------------------------------------------
+# Format conversion
+# --------------------------------------------------------------------
+#
+# Samples are converted through float32 arrays on the 16-bit scale
+# (-32768..32767), so 16-bit PCM needs no scaling on either side. Every step
+# writes into work arrays that are reused from message to message; a 20 ms
+# message is a few hundred samples, so allocating per step would cost more
+# than the arithmetic.
+
+
+def _mulaw_tables():
+    """G.711 mu-law decode (256 entries) and encode (65536 entries) tables."""
+    bias = 0x84
+
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (u >> 4) & 0x07
+    magnitude = ((((u & 0x0F) << 3) + bias) << exponent) - bias
+    decode = np.where(u & 0x80, -magnitude, magnitude).astype(np.float32)
+
+    # Same rounding as the reference (14-bit) encoder
+    s = np.arange(-32768, 32768, dtype=np.int32) >> 2
+    mask = np.where(s < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(s), 8159) + (bias >> 2)
+    segment = np.searchsorted(np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF]), magnitude)
+    encoded = np.where(segment > 7, 0x7F, (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F))
+    encoded = (encoded ^ mask).astype(np.uint8)
+    # Indexed by the sample's 16 bits read as unsigned
+    encode = np.concatenate([encoded[32768:], encoded[:32768]])
+    return decode, encode
+
+
+MULAW_DECODE, MULAW_ENCODE = _mulaw_tables()
+
+
+class Scratch:
+    """Named work arrays, reused between calls and grown on demand."""
+
+    def __init__(self):
+        self._arrays = {}
+        self._views = {}
+
+    def __call__(self, name: str, size: int, dtype=np.float32) -> np.ndarray:
+        view = self._views.get((name, size))
+        if view is not None:
+            return view
+        array = self._arrays.get(name)
+        if array is None or len(array) < size:
+            array = self._arrays[name] = np.empty(max(size, 2 * len(array) if array is not None else size), dtype)
+            self._views = {key: v for key, v in self._views.items() if key[0] != name}
+        # Messages of one stream mostly have the same few sizes
+        if len(self._views) >= 64:
+            self._views.clear()
+        view = self._views[(name, size)] = array[:size]
+        return view
+
+
+def decode_samples(payload, encoding: int, channels: int, scratch: Scratch) -> np.ndarray:
+    """Decode a payload to mono samples on the 16-bit scale.
+
+    16-bit mono comes back as an ``int16`` view of ``payload``; everything
+    else as a ``float32`` ``scratch`` array, valid until the next call.
+    """
+    if encoding == ENCODING_PCM16:
+        samples, scale = np.frombuffer(payload, dtype="<i2"), 1.0
+    elif encoding == ENCODING_FLOAT32:
+        samples, scale = np.frombuffer(payload, dtype="<f4"), 32768.0
+    elif encoding == ENCODING_MULAW:
+        samples, scale = np.frombuffer(payload, dtype=np.uint8), 1.0
+        samples = np.take(MULAW_DECODE, samples, out=scratch("mulaw", len(samples)))
+    else:
+        raise ValueError(f"unknown encoding {encoding}")
+
+    if channels > 1:
+        mono = scratch("mono", len(samples) // channels)
+        # Strided adds beat a reduction along a short axis
+        np.add(samples[0::channels], samples[1::channels], out=mono, dtype=np.float32)
+        for channel in range(2, channels):
+            np.add(mono, samples[channel::channels], out=mono)
+        samples, scale = mono, scale / channels
+    if scale == 1.0:
+        return samples
+    scaled = np.multiply(samples, np.float32(scale), out=scratch("scaled", len(samples)))
+    if encoding == ENCODING_FLOAT32:
+        # Integer sources can't leave the 16-bit range; a float source can.
+        # np.clip is several times slower than this on small arrays.
+        np.minimum(scaled, 32767, out=scaled)
+        np.maximum(scaled, -32768, out=scaled)
+    return scaled
+
+
+def encode_samples(samples: np.ndarray, encoding: int, out: memoryview, scratch: Scratch):
+    """Encode samples on the 16-bit scale into ``out``.
+
+    ``float32`` samples must be in range (``decode_samples`` and
+    ``StreamResampler`` keep them there) and are rounded in place for 16-bit
+    output; mu-law quantizes far more coarsely, so it just truncates.
+    """
+    if encoding == ENCODING_FLOAT32:
+        np.multiply(samples, np.float32(1 / 32768.0), out=np.frombuffer(out, dtype="<f4"))
+        return
+    pcm = np.frombuffer(out, dtype="<i2") if encoding == ENCODING_PCM16 else scratch("pcm", len(samples), np.int16)
+    if samples.dtype == np.int16:
+        pcm[:] = samples
+    else:
+        if encoding == ENCODING_PCM16:
+            np.rint(samples, out=samples)
+        np.copyto(pcm, samples, casting="unsafe")
+    if encoding == ENCODING_MULAW:
+        np.take(MULAW_ENCODE, pcm.view(np.uint16), out=np.frombuffer(out, dtype=np.uint8))
+
+
+class StreamResampler:
+    """Stateful, vectorized resampler for a stream of mono sample blocks.
+
+    Integer downsampling ratios (48 kHz -> 16 kHz, 24 kHz -> 8 kHz) average
+    each group of input samples, which also filters most of what would alias.
+    Other ratios interpolate linearly between neighbouring samples; the
+    sample positions for a block depend only on its length and the phase it
+    starts at, so they are computed once per (length, phase) and reused. State
+    carries over between blocks, so block boundaries don't click.
+
+    Blocks may be ``int16`` or ``float32``. ``process`` returns a ``float32``
+    work array that is valid until the next call (or the block itself when
+    the rates match).
+    """
+
+    MAX_PLANS = 64
+
+    def __init__(self, in_rate: int, out_rate: int):
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        common = math.gcd(in_rate, out_rate)
+        # Output sample k falls on input sample k * down / up
+        self._up = out_rate // common
+        self._down = in_rate // common
+        self._scratch = Scratch()
+        # Decimation: input samples still short of a whole group
+        self._carry = np.zeros(self._down, dtype=np.float32)
+        self._carried = 0
+        # Interpolation: the previous block's last sample, and the position
+        # of the next output sample after it, in 1/up input samples
+        self._prev = np.float32(0.0)
+        self._phase = self._up
+        self._plans = {}
+        # Integer upsampling: offsets of each input interval's outputs
+        self._weights = np.arange(1, self._up + 1, dtype=np.float32) / self._up if self._down == 1 else None
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.in_rate == self.out_rate or not len(samples):
+            return samples
+        if self._up == 1:
+            return self._decimate(samples)
+        return self._interpolate(samples)
+
+    def _decimate(self, samples: np.ndarray) -> np.ndarray:
+        factor = self._down
+        if self._carried or len(samples) % factor:
+            ext = self._scratch("ext", self._carried + len(samples))
+            ext[: self._carried] = self._carry[: self._carried]
+            ext[self._carried :] = samples
+            whole = len(ext) // factor * factor
+            self._carried = len(ext) - whole
+            self._carry[: self._carried] = ext[whole:]
+            samples = ext[:whole]
+
+        out = self._scratch("out", len(samples) // factor)
+        np.add(samples[0::factor], samples[1::factor], out=out, dtype=np.float32)
+        for i in range(2, factor):
+            np.add(out, samples[i::factor], out=out)
+        np.multiply(out, np.float32(1 / factor), out=out)
+        return out
+
+    def _plan(self, length: int, phase: int) -> tuple:
+        end = length * self._up
+        count = (end - phase) // self._down + 1 if phase <= end else 0
+        positions = phase + self._down * np.arange(count)
+        # The last position may fall exactly on the final sample
+        index = np.minimum(positions // self._up, length - 1)
+        frac = ((positions - index * self._up) / self._up).astype(np.float32)
+        return index, index + 1, frac, phase + count * self._down - end
+
+    def _interpolate(self, samples: np.ndarray) -> np.ndarray:
+        # ext[0] is the previous block's last sample
+        ext = self._scratch("ext", len(samples) + 1)
+        ext[0] = self._prev
+        ext[1:] = samples
+        self._prev = ext[-1]
+
+        if self._weights is not None and self._phase == 1:
+            # Integer upsampling after the first block: every input interval
+            # gets ``up`` outputs, so no positions need looking up
+            out = self._scratch("out", len(samples) * self._up)
+            grid = out.reshape(len(samples), self._up)
+            step = np.subtract(ext[1:], ext[:-1], out=self._scratch("step", len(samples)))
+            # Column by column: broadcasting over short rows is slower
+            for column, weight in enumerate(self._weights[:-1]):
+                np.multiply(step, weight, out=grid[:, column])
+                np.add(grid[:, column], ext[:-1], out=grid[:, column])
+            grid[:, -1] = ext[1:]
+            return out
+
+        key = (len(samples), self._phase)
+        plan = self._plans.get(key)
+        if plan is None:
+            if len(self._plans) >= self.MAX_PLANS:
+                self._plans.clear()
+            plan = self._plans[key] = self._plan(*key)
+        index, following, frac, self._phase = plan
+        out = self._scratch("out", len(index))
+        step = self._scratch("step", len(index))
+        np.take(ext, index, out=out)
+        np.take(ext, following, out=step)
+        np.subtract(step, out, out=step)
+        np.multiply(step, frac, out=step)
+        np.add(out, step, out=out)
+        return out
+
+
+# --------------------------------------------------------------------
+# Serializer
+# --------------------------------------------------------------------
+
+
+class FramedPCMSerializer(FrameSerializer):
+    """Binary serializer for the framed ``/ws`` protocol."""
+
+    def __init__(self, out_rate: Optional[int] = None, out_encoding: int = ENCODING_PCM16):
+        """Initialize the serializer.
+
+        Args:
+            out_rate: Sample rate of the bot audio sent to the client. Defaults
+                to the pipeline's output sample rate.
+            out_encoding: Encoding of the bot audio sent to the client.
+        """
+        super().__init__()
+        if out_encoding not in SAMPLE_WIDTH:
+            raise ValueError(f"unknown encoding {out_encoding}")
+        self._init_out_rate = out_rate
+        self._out_rate = out_rate or 16000
+        self._out_encoding = out_encoding
+        self._in_rate = 16000
+        self._out_ring = RingBuffer(0)
+        self._scratch = Scratch()
+        self._resamplers = {}
+        self._in_seq: Optional[int] = None
+        self._out_seq = 0
+        self._out_samples = 0
+
+    @property
+    def type(self) -> FrameSerializerType:
+        return FrameSerializerType.BINARY
+
+    async def setup(self, frame: StartFrame):
+        self._in_rate = frame.audio_in_sample_rate
+        self._out_rate = self._init_out_rate or frame.audio_out_sample_rate
+        self._out_ring = RingBuffer(int(WS_RING_SECS * self._out_rate) * SAMPLE_WIDTH[self._out_encoding])
+
+    def _resampler(self, in_rate: int, out_rate: int) -> StreamResampler:
+        key = (in_rate, out_rate)
+        if key not in self._resamplers:
+            self._resamplers[key] = StreamResampler(in_rate, out_rate)
+        return self._resamplers[key]
+
+    def _next_out_seq(self) -> int:
+        seq = self._out_seq
+        self._out_seq = (seq + 1) & _SEQ_MASK
+        return seq
+
+    def _control(self, message: dict) -> bytes:
+        timestamp_ms = self._out_samples * 1000 // self._out_rate
+        return encode_frame(KIND_CONTROL, json.dumps(message).encode(), self._next_out_seq(), timestamp_ms, 0, 0, 0)
+
+    async def serialize(self, frame: Frame) -> bytes | memoryview | None:
+        if isinstance(frame, OutputAudioRawFrame):
+            return self._serialize_audio(frame)
+        if isinstance(frame, InterruptionFrame):
+            return self._control({"type": "clear"})
+        if isinstance(frame, (OutputTransportMessageFrame, OutputTransportMessageUrgentFrame)):
+            return self._control({"type": "message", "data": frame.message})
+        return None
+
+    def _serialize_audio(self, frame: OutputAudioRawFrame) -> memoryview:
+        ring = self._out_ring
+        timestamp_ms = self._out_samples * 1000 // self._out_rate
+        if frame.sample_rate == self._out_rate and self._out_encoding == ENCODING_PCM16 and frame.num_channels == 1:
+            size = HEADER.size + len(frame.audio)
+            offset = ring.claim(size)
+            # A bytearray slice assignment would copy frame.audio first
+            ring.view[offset + HEADER.size : offset + size] = frame.audio
+            self._out_samples += len(frame.audio) // 2
+        else:
+            samples = decode_samples(frame.audio, ENCODING_PCM16, frame.num_channels, self._scratch)
+            samples = self._resampler(frame.sample_rate, self._out_rate).process(samples)
+            size = HEADER.size + len(samples) * SAMPLE_WIDTH[self._out_encoding]
+            offset = ring.claim(size)
+            encode_samples(samples, self._out_encoding, ring.view[offset + HEADER.size : offset + size], self._scratch)
+            self._out_samples += len(samples)
+        HEADER.pack_into(
+            ring.buffer,
+            offset,
+            VERSION,
+            KIND_AUDIO,
+            self._out_encoding,
+            1,
+            self._next_out_seq(),
+            timestamp_ms & _SEQ_MASK,
+            self._out_rate,
+        )
+        return ring.view[offset : offset + size]
+
+    async def deserialize(self, data: str | bytes) -> Frame | None:
+        if not isinstance(data, (bytes, bytearray)) or not data:
+            return None
+        try:
+            if len(data) < HEADER.size:
+                raise ValueError(f"message is {len(data)} bytes, shorter than the header")
+            version, kind, encoding, channels, seq, _, sample_rate = HEADER.unpack_from(data)
+            if version != VERSION:
+                raise ValueError(f"unsupported protocol version {version}")
+
+            if self._in_seq is not None and seq != (self._in_seq + 1) & _SEQ_MASK:
+                missing = (seq - self._in_seq - 1) & _SEQ_MASK
+                # Late or repeated messages show up as huge gaps; only count losses
+                if missing < 1 << 31:
+                    INPUT_GAPS.inc(missing)
+            self._in_seq = seq
+
+            if kind == KIND_AUDIO:
+                return self._deserialize_audio(memoryview(data)[HEADER.size :], encoding, channels, sample_rate)
+            if kind == KIND_CONTROL:
+                return InputTransportMessageFrame(message=json.loads(data[HEADER.size :]))
+            raise ValueError(f"unknown message kind {kind}")
+        except ValueError as e:
+            PROTOCOL_ERRORS.inc()
+            logger.debug(f"{self}: dropping framed message: {e}")
+            return None
+
+    def _deserialize_audio(
+        self, payload: memoryview, encoding: int, channels: int, sample_rate: int
+    ) -> Optional[InputAudioRawFrame]:
+        if encoding == ENCODING_PCM16 and channels == 1 and sample_rate == self._in_rate:
+            if len(payload) % 2:
+                raise ValueError(f"audio payload of {len(payload)} bytes is not whole samples")
+            if not payload:
+                return None
+            return InputAudioRawFrame(audio=bytes(payload), sample_rate=self._in_rate, num_channels=1)
+
+        width = SAMPLE_WIDTH.get(encoding)
+        if width is None or not channels or not sample_rate:
+            raise ValueError(f"bad audio header (encoding {encoding}, {channels} channels, {sample_rate} Hz)")
+        if len(payload) % (width * channels):
+            raise ValueError(f"audio payload of {len(payload)} bytes is not whole samples")
+        samples = decode_samples(payload, encoding, channels, self._scratch)
+        samples = self._resampler(sample_rate, self._in_rate).process(samples)
+        if not len(samples):
+            return None
+        pcm = self._scratch("input", len(samples), np.int16)
+        encode_samples(samples, ENCODING_PCM16, memoryview(pcm), self._scratch)
+        return InputAudioRawFrame(audio=pcm.tobytes(), sample_rate=self._in_rate, num_channels=1)
+
+
+def serializer_for(query_params: Mapping[str, str]) -> FrameSerializer:
+    """Create the serializer a ``/ws`` connection asked for.
+
+    Args:
+        query_params: The connection's query parameters: ``protocol``
+            (``raw`` or ``framed``, default ``WS_PROTOCOL``) and, for
+            ``framed``, ``out_rate`` and ``out_encoding``
+            (``pcm16``, ``float32`` or ``mulaw``).
+
+    Raises:
+        ValueError: If a parameter has an unsupported value.
+    """
+    protocol = query_params.get("protocol", WS_PROTOCOL)
+    if protocol == "raw":
+        return RawPCMSerializer()
+    if protocol != "framed":
+        raise ValueError(f"unknown protocol {protocol!r}")
+
+    encoding = query_params.get("out_encoding", "pcm16")
+    if encoding not in ENCODINGS:
+        raise ValueError(f"unknown out_encoding {encoding!r}")
+    out_rate = query_params.get("out_rate")
+    if out_rate is not None and not (out_rate.isdigit() and 8000 <= int(out_rate) <= 48000):
+        raise ValueError(f"unsupported out_rate {out_rate!r}")
+    return FramedPCMSerializer(out_rate=int(out_rate) if out_rate else None, out_encoding=ENCODINGS[encoding])
@@ -0,0 +1,194 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Per-node prompt variants sized for the LLM in use.
+
+Every LLM request resends the current node's role and task prompts and its
+function schemas. Small, fast models such as ``gpt-5-mini`` or
+``gemini-2.5-flash`` are chosen for their time-to-first-token, and for them
+the prompt is a noticeable part of that time. Each node in ``nivest_bot.py``
+therefore has two versions of its instructions:
+
+- "full": the original wording;
+- "compact": the same instructions in fewer words.
+
+``PROMPTS.pick(node, full, compact)`` returns the version for this process.
+With ``PROMPT_VARIANT=auto``, compact prompts are used when the primary LLM
+(the first of ``LLM_PROVIDERS``, with its default model from ``utils``) is
+in ``COMPACT_MODELS``. The flow graph and function schemas are the same
+either way.
+
+Nodes are built once per process (node_registry.py). At that point
+``PROMPTS.measure`` counts each node's prompt tokens for every configured
+provider. It counts the messages plus the function schemas, using tiktoken
+for OpenAI when it is installed and a characters-per-token ratio otherwise.
+It also logs what the compact version saves. ``TurnLatencyObserver`` adds the
+current node's prompt tokens to every turn record.
+
+Configuration:
+    PROMPT_VARIANT: "auto" (default), "full" or "compact".
+
+Metrics:
+    nivest_node_prompt_tokens{node, provider}: prompt tokens of the node that
+        handled each turn (recorded by the latency observer).
+"""
+
+import json
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from metrics import histogram
+
+NODE_PROMPT_TOKENS = histogram(
+    "nivest_node_prompt_tokens",
+    "Static prompt tokens (node messages and function schemas) of the node handling a turn.",
+    ["node", "provider"],
+    buckets=(100, 200, 300, 400, 500, 600, 800, 1000, 1500, 2000),
+)
+
+VARIANTS = ("full", "compact")
+
+# Models whose time-to-first-token is where their latency budget goes; they
+# get the compact prompts. Matched as substrings, so dated or regional model
+# ids (e.g. "us.anthropic.claude-3-5-haiku-...") match too.
+COMPACT_MODELS = (
+    "gpt-5-mini",
+    "gpt-5-nano",
+    "gpt-4.1-mini",
+    "gpt-4.1-nano",
+    "gpt-4o-mini",
+    "gemini-2.5-flash",
+    "gemini-2.0-flash",
+    "claude-3-5-haiku",
+    "claude-haiku",
+)
+
+# Characters per token of English prompts, for providers without a local tokenizer
+CHARS_PER_TOKEN = {"openai": 4.0, "google": 4.0, "anthropic": 3.5, "aws": 3.5}
+
+_encoding = None
+
+
+def _openai_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:  # not installed, or the encoding cannot be loaded
+            _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str, provider: str) -> int:
+    """Prompt tokens of ``text`` for ``provider``."""
+    if provider == "openai":
+        encoding = _openai_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN.get(provider, 4.0))
+
+
+def _model_prefers_compact(model: str) -> bool:
+    name = model.lower().rsplit("/", 1)[-1]
+    return any(prefix in name for prefix in COMPACT_MODELS)
+
+
+class PromptBudget:
+    """Chooses prompt variants and counts node prompt tokens per provider."""
+
+    def __init__(self, variant: Optional[str] = None, providers: Optional[List[str]] = None):
+        """Initialize the budget.
+
+        Args:
+            variant: "auto", "full" or "compact". Defaults to PROMPT_VARIANT.
+            providers: Providers to count tokens for, primary first. Defaults
+                to ``utils.get_llm_providers()``.
+        """
+        self._requested = (variant or os.getenv("PROMPT_VARIANT", "auto")).lower()
+        if self._requested not in ("auto",) + VARIANTS:
+            raise ValueError(f"Unknown PROMPT_VARIANT {self._requested!r}")
+        self._providers = providers
+        self._variant: Optional[str] = None
+        # node -> [(full, compact)] for every picked prompt
+        self._alternatives: Dict[str, List[Tuple[str, str]]] = {}
+        # (node, provider) -> tokens of the node as built
+        self._tokens: Dict[Tuple[str, str], int] = {}
+
+    @property
+    def providers(self) -> List[str]:
+        if self._providers is None:
+            from utils import get_llm_providers
+
+            self._providers = get_llm_providers()
+        return self._providers
+
+    @property
+    def variant(self) -> str:
+        """The variant used by this process, resolved on first use."""
+        if self._variant is None:
+            if self._requested != "auto":
+                self._variant = self._requested
+            else:
+                from utils import get_llm_model
+
+                model = get_llm_model(self.providers[0])
+                self._variant = "compact" if _model_prefers_compact(model) else "full"
+                logger.info(f"Prompt budget: {self._variant} prompts for {self.providers[0]}/{model}")
+        return self._variant
+
+    def pick(self, node: str, full: str, compact: str) -> str:
+        """Return ``full`` or ``compact`` for ``node``'s prompt."""
+        self._alternatives.setdefault(node, []).append((full, compact))
+        return compact if self.variant == "compact" else full
+
+    def measure(self, node: str, config: dict, extra_functions=()) -> dict:
+        """Count a freshly built node's prompt tokens (messages and functions).
+
+        Used as the node registry's build hook; returns ``config`` unchanged.
+
+        Args:
+            node: Node name.
+            config: The built node config.
+            extra_functions: Functions sent with every node (global functions).
+        """
+        messages = [
+            m.get("content", "") for key in ("role_messages", "task_messages") for m in config.get(key, [])
+        ]
+        functions = list(config.get("functions", [])) + list(extra_functions)
+        schemas = [
+            f.to_function_schema().to_default_dict() for f in functions if hasattr(f, "to_function_schema")
+        ]
+        tools = json.dumps(schemas, ensure_ascii=False) if schemas else ""
+        alternatives = self._alternatives.pop(node, [])
+
+        report = []
+        for provider in self.providers:
+            tokens = sum(count_tokens(text, provider) for text in messages) + count_tokens(tools, provider)
+            self._tokens[(node, provider)] = tokens
+            saved = sum(
+                count_tokens(full, provider) - count_tokens(compact, provider) for full, compact in alternatives
+            )
+            report.append(f"{provider} {tokens}" + (f" (compact saves {saved})" if saved else ""))
+        logger.debug(f"Prompt budget: node {node!r} ({self.variant}): {', '.join(report)} tokens")
+        return config
+
+    def tokens(self, node: Optional[str], provider: str) -> Optional[int]:
+        """Prompt tokens of ``node`` as built for this process, if measured."""
+        return self._tokens.get((node, provider))
+
+    def table(self) -> Dict[str, Dict[str, int]]:
+        """``{node: {provider: tokens}}`` for every measured node."""
+        table: Dict[str, Dict[str, int]] = {}
+        for (node, provider), tokens in self._tokens.items():
+            table.setdefault(node, {})[provider] = tokens
+        return table
+
+
+PROMPTS = PromptBudget()
@@ -0,0 +1,258 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Monte Carlo savings plans from the user's earnings/expenses ledger.
+
+``compute_savings_advice`` used to suggest a flat 20% of today's net, and
+``store_goal`` only wrote down the target. ``plan_savings`` uses the ledger
+(ledger.py) instead:
+
+- The recommended daily amount is ``PLANNER_SAVE_SHARE`` of the user's median
+  net on days with a surplus, rounded to 10 rupees. On a day whose net is
+  below that amount, only the surplus is saved.
+- Income variability is simulated by a block bootstrap: every simulated week
+  is a random 7-day stretch of the user's own history, so days off and weekly
+  patterns are kept. ``PLANNER_PATHS`` paths of weekly savings are summed
+  with NumPy in one shot, and the day each goal is reached is interpolated
+  inside the week that crosses its threshold.
+- Savings are split equally across the open goals, and a finished goal's
+  share moves to the others. With goals sorted by remaining amount, goal k is
+  therefore reached once total savings hit ``sum(r[:k]) + (G - k) * r[k]``,
+  so one pass over the cumulative sums gives every goal's date.
+
+A year of history and 2000 paths take a few milliseconds (see
+``python -m benchmarks.savings_planner``). Plans are cached per ledger and
+reused until the ledger, the goals or today's figures change.
+
+Configuration:
+    PLANNER_PATHS: Simulated paths (default 2000).
+    PLANNER_HORIZON_DAYS: Projection horizon (default 730).
+    PLANNER_HISTORY_DAYS: Ledger days used as history (default 365).
+    PLANNER_SAVE_SHARE: Share of a typical surplus day to save (default 0.2).
+    PLANNER_CONFIDENCE: Percentile reported as the "safe" date (default 0.8).
+
+Metrics:
+    nivest_planner_seconds: time to compute a plan.
+    nivest_planner_requests_total{result}: plans computed ("computed") or
+        served from the per-session cache ("cached").
+"""
+
+import os
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ledger import Ledger
+from metrics import counter, histogram
+
+PLANNER_SECONDS = histogram(
+    "nivest_planner_seconds",
+    "Time to compute a savings plan.",
+    buckets=(0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1),
+)
+REQUESTS = counter("nivest_planner_requests_total", "Savings plans by cache result.", ["result"])
+
+WEEK = 7
+
+
+@dataclass
+class GoalProjection:
+    goal: str
+    target_amount: float
+    # Days until reached: median and at PLANNER_CONFIDENCE; None if beyond
+    # the horizon for that share of paths
+    days_median: Optional[int]
+    days_safe: Optional[int]
+    probability: float  # share of paths reaching the goal within the horizon
+
+    def to_dict(self) -> dict:
+        return {
+            "goal": self.goal,
+            "target_amount": self.target_amount,
+            "days_median": self.days_median,
+            "days_safe": self.days_safe,
+            "probability": self.probability,
+        }
+
+
+@dataclass
+class SavingsPlan:
+    recommended_daily: float
+    expected_daily_saving: float
+    history_days: int
+    goals: List[GoalProjection] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "recommended_daily": self.recommended_daily,
+            "expected_daily_saving": self.expected_daily_saving,
+            "history_days": self.history_days,
+            "goals": [g.to_dict() for g in self.goals],
+        }
+
+
+class SavingsPlanner:
+    """Vectorized Monte Carlo projection of daily savings onto goals."""
+
+    def __init__(
+        self,
+        paths: Optional[int] = None,
+        horizon_days: Optional[int] = None,
+        history_days: Optional[int] = None,
+        save_share: Optional[float] = None,
+        confidence: Optional[float] = None,
+        seed: Optional[int] = None,
+    ):
+        """Initialize the planner.
+
+        Args:
+            paths: Simulated paths. Defaults to PLANNER_PATHS.
+            horizon_days: Projection horizon. Defaults to PLANNER_HORIZON_DAYS.
+            history_days: Ledger history used. Defaults to PLANNER_HISTORY_DAYS.
+            save_share: Share of a typical surplus to save. Defaults to
+                PLANNER_SAVE_SHARE.
+            confidence: Percentile of the "safe" date. Defaults to
+                PLANNER_CONFIDENCE.
+            seed: Random seed, for reproducible plans in tests and benchmarks.
+        """
+        self.paths = paths or int(os.getenv("PLANNER_PATHS", "2000"))
+        self.horizon_days = horizon_days or int(os.getenv("PLANNER_HORIZON_DAYS", "730"))
+        self.history_days = history_days or int(os.getenv("PLANNER_HISTORY_DAYS", "365"))
+        self.save_share = save_share or float(os.getenv("PLANNER_SAVE_SHARE", "0.2"))
+        self.confidence = confidence or float(os.getenv("PLANNER_CONFIDENCE", "0.8"))
+        self._rng = np.random.default_rng(seed)
+        self._cache: "weakref.WeakKeyDictionary[Ledger, tuple]" = weakref.WeakKeyDictionary()
+
+    def plan(
+        self,
+        ledger: Ledger,
+        goals: Sequence[dict] = (),
+        today: Optional[Tuple[float, float]] = None,
+        now: Optional[float] = None,
+    ) -> Optional[SavingsPlan]:
+        """Project ``goals`` from the ledger's history.
+
+        Args:
+            ledger: The session's ledger.
+            goals: Dicts with ``goal`` and ``target_amount`` (goals without a
+                target are skipped).
+            today: (income, expenses) the user just reported, used for today
+                when the ledger has nothing recorded for it.
+            now: Epoch seconds for "today". Defaults to the current time.
+
+        Returns:
+            The plan, or None when there is no income data at all.
+        """
+        key = (
+            ledger.version,
+            ledger.day(now),
+            tuple((g.get("goal"), g.get("target_amount")) for g in goals),
+            today,
+        )
+        cached = self._cache.get(ledger)
+        if cached is not None and cached[0] == key:
+            REQUESTS.inc(result="cached")
+            return cached[1]
+
+        started = time.perf_counter()
+        income, expenses = ledger.daily_totals(self.history_days, now)
+        if today is not None and ledger.day_totals(ledger.day(now)) == (0.0, 0.0):
+            # The series ends with today whenever the ledger has any entries
+            if income:
+                income[-1], expenses[-1] = today
+            else:
+                income, expenses = [today[0]], [today[1]]
+        plan = self._simulate(np.asarray(income), np.asarray(expenses), goals)
+        PLANNER_SECONDS.observe(time.perf_counter() - started)
+        REQUESTS.inc(result="computed")
+        self._cache[ledger] = (key, plan)
+        return plan
+
+    def _simulate(self, income: np.ndarray, expenses: np.ndarray, goals: Sequence[dict]) -> Optional[SavingsPlan]:
+        if not income.size or not income.any():
+            return None
+        surplus = np.maximum(income - expenses, 0.0)
+        positive = surplus[surplus > 0]
+        typical = float(np.median(positive)) if positive.size else 0.0
+        daily = self.save_share * typical
+        daily = round(daily / 10) * 10 if daily >= 10 else round(daily, 2)
+        saved = np.minimum(surplus, daily)
+
+        # Savings of every 7-day stretch of history, wrapping around so that
+        # short histories still give full weeks
+        n = saved.size
+        wrapped = np.resize(saved, n + WEEK - 1)
+        csum = np.concatenate(([0.0], np.cumsum(wrapped)))
+        weekly = (csum[WEEK : WEEK + n] - csum[:n]).astype(np.float32)
+
+        plan = SavingsPlan(
+            recommended_daily=float(daily),
+            expected_daily_saving=round(float(saved.mean()), 2),
+            history_days=int(n),
+        )
+        targets = [
+            (g.get("goal") or "", float(g["target_amount"]))
+            for g in goals
+            if g.get("target_amount") and float(g["target_amount"]) > 0
+        ]
+        if not targets or daily <= 0:
+            plan.goals = [
+                GoalProjection(goal, amount, None, None, 0.0) for goal, amount in targets
+            ]
+            return plan
+
+        weeks = -(-self.horizon_days // WEEK)
+        samples = weekly[self._rng.integers(0, n, size=(weeks, self.paths))]
+        cumulative = np.cumsum(samples, axis=0)  # (weeks, paths)
+
+        # Equal split with spill-over: thresholds on total savings per goal
+        order = sorted(range(len(targets)), key=lambda i: targets[i][1])
+        remaining = np.array([targets[i][1] for i in order])
+        count = len(remaining)
+        thresholds = np.cumsum(remaining) - remaining + remaining * (count - np.arange(count))
+
+        projections = [None] * count
+        for rank, index in enumerate(order):
+            days = self._reach_days(cumulative, samples, thresholds[rank])
+            reached = np.isfinite(days)
+            probability = float(reached.mean())
+            goal, amount = targets[index]
+            projections[index] = GoalProjection(
+                goal=goal,
+                target_amount=amount,
+                days_median=self._percentile(days, 0.5),
+                days_safe=self._percentile(days, self.confidence),
+                probability=round(probability, 3),
+            )
+        plan.goals = projections
+        return plan
+
+    def _reach_days(self, cumulative: np.ndarray, samples: np.ndarray, threshold: float) -> np.ndarray:
+        # Weeks fully below the threshold, then interpolate inside the next one
+        full_weeks = np.count_nonzero(cumulative < threshold, axis=0)
+        reached = full_weeks < cumulative.shape[0]
+        week = np.minimum(full_weeks, cumulative.shape[0] - 1)
+        paths = np.arange(cumulative.shape[1])
+        before = np.where(week > 0, cumulative[week - 1, paths], 0.0)
+        in_week = samples[week, paths]
+        fraction = np.divide(threshold - before, in_week, out=np.ones_like(before), where=in_week > 0)
+        days = full_weeks * WEEK + np.ceil(np.clip(fraction, 0.0, 1.0) * WEEK)
+        return np.where(reached & (days <= self.horizon_days), days, np.inf)
+
+    @staticmethod
+    def _percentile(days: np.ndarray, q: float) -> Optional[int]:
+        value = np.quantile(days, q, method="higher")
+        return int(value) if np.isfinite(value) else None
+
+
+PLANNER = SavingsPlanner()
+
+
+def plan_savings(ledger: Ledger, goals: Sequence[dict] = (), today=None) -> Optional[SavingsPlan]:
+    """Plan with the process-wide planner (results cached per ledger)."""
+    return PLANNER.plan(ledger, goals, today=today)
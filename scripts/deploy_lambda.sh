@@ -83,7 +83,8 @@ fi
 rm -f "$TMP_REQ"
 
 echo "Copying application files..."
-cp -r server.py nivest_bot.py aws_lambda_handler.py pipecat "$BUILD_DIR/" || true
+# server.py and nivest_bot.py import the other top-level modules, so copy them all
+cp -r ./*.py pipecat "$BUILD_DIR/" || true
 
 pushd "$BUILD_DIR" >/dev/null
 echo "Creating zip package $ZIP_FILE"
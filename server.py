@@ -1,7 +1,14 @@
+import argparse
+import asyncio
+import hmac
 import os
+import shutil
 import sys
-import uvicorn
-from fastapi import FastAPI, WebSocket
+import tempfile
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request, WebSocket
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
 
@@ -13,24 +20,99 @@ if os.path.exists(pipecat_src):
     sys.path.insert(0, pipecat_src)
     logger.info(f"Added {pipecat_src} to sys.path")
 
-try:
-    from pipecat.transports.websocket.fastapi import FastAPIWebsocketTransport, FastAPIWebsocketParams
-except ImportError as e:
-    logger.error(f"Failed to import FastAPIWebsocketTransport: {e}")
-    # Fallback to the deprecated path just in case
-    try:
-        from pipecat.transports.network.fastapi_websocket import FastAPIWebsocketTransport, FastAPIWebsocketParams
-    except ImportError:
-        logger.error("Could not import FastAPIWebsocketTransport from any known location.")
-        raise
-
-from pipecat.audio.vad.silero import SileroVADAnalyzer
 from pipecat.runner.types import RunnerArguments
 
-# Import the bot logic
-from nivest_bot import run_bot
+from metrics import REGISTRY, multiprocess_dir, remove_snapshot, render_multiprocess, write_snapshot
+from service_factory import SERVICE_FACTORY
+from session_scheduler import SessionRejected, SessionScheduler
+from state_store import STATE_STORE
+
+
+# Seconds between metric snapshots in multi-worker mode
+METRICS_FLUSH_SECS = float(os.getenv("METRICS_FLUSH_SECS", "2"))
+
+def offline_mode() -> bool:
+    return os.getenv("OFFLINE_SERVICES", "").lower() in ("1", "true", "yes")
+
+_session_modules = None
+
+def session_modules():
+    """Import what a /ws session needs: the websocket transport and the bot.
+
+    These pull in the pipecat pipeline, the STT/TTS/LLM service modules and
+    the VAD, which is most of the process's import time. They are imported on
+    first use so that the HTTP routes (and the Lambda handler) start without
+    them; ``lifespan`` loads them up front for the long-running server.
+
+    Returns:
+        ``(FastAPIWebsocketTransport, FastAPIWebsocketParams, serializer_for, run_bot)``
+    """
+    global _session_modules
+    if _session_modules is None:
+        try:
+            from pipecat.transports.websocket.fastapi import FastAPIWebsocketTransport, FastAPIWebsocketParams
+        except ImportError as e:
+            logger.error(f"Failed to import FastAPIWebsocketTransport: {e}")
+            # Fallback to the deprecated path just in case
+            try:
+                from pipecat.transports.network.fastapi_websocket import (
+                    FastAPIWebsocketTransport,
+                    FastAPIWebsocketParams,
+                )
+            except ImportError:
+                logger.error("Could not import FastAPIWebsocketTransport from any known location.")
+                raise
+
+        # Import the bot logic
+        from nivest_bot import run_bot
+        from pcm_serializer import serializer_for
+
+        _session_modules = (FastAPIWebsocketTransport, FastAPIWebsocketParams, serializer_for, run_bot)
+    return _session_modules
 
-app = FastAPI()
+async def _flush_metrics(directory: str):
+    while True:
+        write_snapshot(directory)
+        await asyncio.sleep(METRICS_FLUSH_SECS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup_task = None
+    session_modules()
+    if offline_mode():
+        # Fake STT/LLM/TTS for load tests; no keys or network needed
+        from offline_services import install_offline_services
+
+        install_offline_services()
+    else:
+        from tts_cache import warmup_from_env
+        from vad_pool import VAD_POOL
+
+        # Load the VAD model once so connections don't pay for it
+        VAD_POOL.prewarm()
+        # Warm provider connections and start health checks
+        await SERVICE_FACTORY.start()
+        if os.getenv("TTS_CACHE_WARMUP", "1") != "0":
+            # Presynthesize stock phrases in the background; sessions can start meanwhile
+            warmup_task = asyncio.create_task(warmup_from_env())
+
+    metrics_dir = multiprocess_dir()
+    flush_task = asyncio.create_task(_flush_metrics(metrics_dir)) if metrics_dir else None
+    yield
+    if flush_task:
+        flush_task.cancel()
+        remove_snapshot(metrics_dir)
+    if warmup_task:
+        warmup_task.cancel()
+    await SERVICE_FACTORY.stop()
+    # Write any session state still queued
+    await STATE_STORE.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Caps concurrent bot sessions (MAX_SESSIONS) with a short wait queue
+scheduler = SessionScheduler()
 
 app.add_middleware(
     CORSMiddleware,
@@ -40,31 +122,158 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of the metrics registry (all workers)."""
+    metrics_dir = multiprocess_dir()
+    text = (
+        render_multiprocess(metrics_dir, max_age=METRICS_FLUSH_SECS * 5)
+        if metrics_dir
+        else REGISTRY.render()
+    )
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+@app.get("/healthz")
+async def healthz():
+    """Readiness probe; fails while draining so load balancers stop routing here."""
+    stats = scheduler.stats()
+    return JSONResponse(stats, status_code=503 if scheduler.draining else 200)
+
+@app.get("/sessions")
+async def sessions():
+    from concept_cache import CONCEPT_CACHE
+
+    return {
+        **scheduler.stats(),
+        "providers": SERVICE_FACTORY.stats(),
+        "concept_cache": CONCEPT_CACHE.stats(),
+    }
+
+_LOOPBACK = ("127.0.0.1", "::1", "localhost")
+
+def _check_admin(request: Request):
+    """Admin routes need ``Authorization: Bearer $ADMIN_TOKEN``.
+
+    Without ``ADMIN_TOKEN`` they are only served to loopback clients (a
+    deploy hook on the same host), never to the network.
+    """
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        if request.client is None or request.client.host not in _LOOPBACK:
+            raise HTTPException(status_code=403, detail="Forbidden")
+        return
+    if not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}"):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+@app.post("/admin/drain")
+async def drain(request: Request, wait: float = 0.0):
+    """Stop admitting sessions; with ?wait=N, block up to N seconds for active calls to end."""
+    _check_admin(request)
+    scheduler.start_drain()
+    idle = await scheduler.wait_idle(wait) if wait > 0 else scheduler.active == 0
+    return {**scheduler.stats(), "idle": idle}
+
+@app.post("/admin/resume")
+async def resume(request: Request):
+    _check_admin(request)
+    scheduler.resume()
+    return scheduler.stats()
+
+def _speech_params():
+    from turn_detector import speech_params
+
+    if offline_mode():
+        # The offline caller streams tones, which Silero does not treat as speech
+        from offline_services import EnergyVADAnalyzer
+
+        return speech_params(EnergyVADAnalyzer)
+    from vad_pool import create_vad_analyzer
+
+    return speech_params(create_vad_analyzer)
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     logger.info("WebSocket connection accepted")
 
-    transport = FastAPIWebsocketTransport(
-        websocket=websocket,
-        params=FastAPIWebsocketParams(
-            audio_in_enabled=True,
-            audio_out_enabled=True,
-            add_wav_header=False, 
-            vad_enabled=True,
-            vad_analyzer=SileroVADAnalyzer(),
-            serializer=None 
+    # Admit (or queue, or shed) the call before building anything for it, so
+    # rejected connections don't cost a VAD, a turn analyzer or a transport
+    try:
+        await scheduler.acquire()
+    except SessionRejected as e:
+        await websocket.close(code=e.code, reason=e.reason)
+        return
+
+    try:
+        FastAPIWebsocketTransport, FastAPIWebsocketParams, serializer_for, run_bot = session_modules()
+        # ?protocol=raw|framed picks the wire format (see pcm_serializer.py)
+        try:
+            serializer = serializer_for(websocket.query_params)
+        except ValueError as e:
+            await websocket.close(code=1008, reason=str(e))
+            return
+
+        speech = _speech_params()
+        transport = FastAPIWebsocketTransport(
+            websocket=websocket,
+            params=FastAPIWebsocketParams(
+                audio_in_enabled=True,
+                audio_out_enabled=True,
+                add_wav_header=False, 
+                vad_enabled=True,
+                **speech,
+                serializer=serializer,
+            )
         )
-    )
 
-    runner_args = RunnerArguments(handle_sigint=False)
+        # ?user=<id> identifies a returning caller (see user_state.py)
+        runner_args = RunnerArguments(body={"user_id": websocket.query_params.get("user")})
+        runner_args.handle_sigint = False
 
-    try:
-        await run_bot(transport, runner_args)
+        await run_bot(transport, runner_args, turn_analyzer=speech.get("turn_analyzer"))
     except Exception as e:
         logger.error(f"Bot execution error: {e}")
     finally:
+        scheduler.release()
         logger.info("WebSocket connection closed")
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nivest voice bot server")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_CONCURRENCY", "1")),
+        help="Worker processes sharing the listening socket (MAX_SESSIONS applies per worker)",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Use the fake STT/LLM/TTS services from offline_services.py",
+    )
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    # Workers re-import this module, so settings are passed via the environment
+    if args.offline:
+        os.environ["OFFLINE_SERVICES"] = "1"
+
+    if args.workers > 1:
+        own_metrics_dir = not multiprocess_dir()
+        if own_metrics_dir:
+            os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="nivest-metrics-")
+        logger.info(f"Starting {args.workers} workers, metrics in {os.environ['METRICS_DIR']}")
+        try:
+            uvicorn.run(
+                "server:app", host=args.host, port=args.port, workers=args.workers, app_dir=current_dir
+            )
+        finally:
+            if own_metrics_dir:
+                shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    main()
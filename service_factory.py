@@ -0,0 +1,390 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Process-wide HTTP connection pools for the provider clients.
+
+Every session builds its own LLM service, and every service builds its own
+SDK client with its own connection pool, so the first turn of every call paid
+for DNS, TCP and TLS to the provider before the first token. ``ServiceFactory``
+keeps one keep-alive pool per provider for the whole process and gives each
+session a lightweight ``httpx.AsyncClient`` on top of it. The per-session
+client carries the session's own hooks, but closing it does not close the
+shared pool.
+
+Pooled providers are the ones whose SDK talks plain HTTP (OpenAI and
+Anthropic). Deepgram STT and Sarvam TTS stream over one WebSocket per session,
+and that stream holds per-call state, so those services stay per session.
+
+A background task checks each pooled provider with a cheap authenticated
+request (list models). It also keeps a warm connection in the pool, so the
+first session after an idle period does not pay for a handshake. Providers
+that fail their check are tried last by ``utils.create_failover_llm``.
+
+Configuration:
+    POOLED_CLIENTS: Set to 0 to give every session its own client again.
+    PROVIDER_MAX_CONNECTIONS: Open connections per provider (default 100);
+        override per provider with e.g. OPENAI_MAX_CONNECTIONS.
+    PROVIDER_KEEPALIVE_CONNECTIONS: Idle connections kept open per provider
+        (default 20).
+    PROVIDER_KEEPALIVE_EXPIRY: Seconds an idle connection is kept (default 120).
+    PROVIDER_HEALTH_INTERVAL: Seconds between health checks (default 30; 0
+        disables them).
+
+Metrics:
+    nivest_provider_requests_total{provider,connection}: requests sent on a
+        "new" or "reused" connection; the reused share is the reuse rate.
+    nivest_provider_connect_seconds{provider}: TCP + TLS setup time of new
+        connections.
+    nivest_provider_first_request_seconds{provider,connection}: time to
+        response headers of each session's first request.
+    nivest_provider_connect_saved_seconds_total{provider}: handshake time
+        saved by first requests that reused a pooled connection (estimated
+        from the mean measured connect time).
+    nivest_provider_connections{provider}: connections currently in the pool.
+    nivest_provider_up{provider}: 1 if the last health check passed.
+    nivest_provider_health_checks_total{provider,outcome}: health checks run.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from loguru import logger
+
+from metrics import counter, gauge, histogram
+
+POOLED_PROVIDERS = {
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+}
+
+REQUESTS = counter(
+    "nivest_provider_requests_total",
+    "Provider HTTP requests by connection reuse.",
+    ["provider", "connection"],
+)
+CONNECT = histogram(
+    "nivest_provider_connect_seconds",
+    "TCP + TLS setup time of new provider connections.",
+    ["provider"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0),
+)
+FIRST_REQUEST = histogram(
+    "nivest_provider_first_request_seconds",
+    "Time to response headers of the first provider request of a session.",
+    ["provider", "connection"],
+)
+SAVED = counter(
+    "nivest_provider_connect_saved_seconds_total",
+    "Estimated handshake time saved by first requests on pooled connections.",
+    ["provider"],
+)
+CONNECTIONS = gauge(
+    "nivest_provider_connections",
+    "Connections currently held in the provider pool.",
+    ["provider"],
+)
+UP = gauge("nivest_provider_up", "1 if the last provider health check passed.", ["provider"])
+HEALTH_CHECKS = counter(
+    "nivest_provider_health_checks_total",
+    "Provider health checks run.",
+    ["provider", "outcome"],
+)
+
+
+def pooling_enabled() -> bool:
+    return os.getenv("POOLED_CLIENTS", "1") != "0"
+
+
+# --------------------------------------------------------------------
+# Connection tracing
+# --------------------------------------------------------------------
+
+
+class _ConnectionTrace:
+    """httpcore trace callback recording whether a request opened a connection."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.connect_started: Optional[float] = None
+        self.connect_secs: Optional[float] = None
+
+    async def __call__(self, event: str, info: dict):
+        if event == "connection.connect_tcp.started":
+            self.connect_started = time.monotonic()
+        elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            if self.connect_started is not None:
+                self.connect_secs = time.monotonic() - self.connect_started
+
+    @property
+    def new_connection(self) -> bool:
+        return self.connect_started is not None
+
+
+class _SharedTransport(httpx.AsyncBaseTransport):
+    """Per-session view of a provider pool; closing it leaves the pool open."""
+
+    def __init__(self, pool: "ProviderPool"):
+        self._pool = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._pool.transport().handle_async_request(request)
+
+    async def aclose(self):
+        pass
+
+
+# --------------------------------------------------------------------
+# Provider pools
+# --------------------------------------------------------------------
+
+
+class ProviderPool:
+    """One keep-alive connection pool shared by every session for a provider."""
+
+    def __init__(
+        self,
+        provider: str,
+        max_connections: Optional[int] = None,
+        max_keepalive: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+    ):
+        """Initialize the pool. Connections are opened lazily.
+
+        Args:
+            provider: Provider name, used in metric labels.
+            max_connections: Open connection cap. Defaults to
+                <PROVIDER>_MAX_CONNECTIONS, then PROVIDER_MAX_CONNECTIONS.
+            max_keepalive: Idle connections kept open. Defaults to
+                PROVIDER_KEEPALIVE_CONNECTIONS.
+            keepalive_expiry: Idle connection lifetime in seconds. Defaults to
+                PROVIDER_KEEPALIVE_EXPIRY.
+        """
+        self.provider = provider
+        self.max_connections = max_connections or int(
+            os.getenv(
+                f"{provider.upper()}_MAX_CONNECTIONS",
+                os.getenv("PROVIDER_MAX_CONNECTIONS", "100"),
+            )
+        )
+        self.max_keepalive = max_keepalive or int(os.getenv("PROVIDER_KEEPALIVE_CONNECTIONS", "20"))
+        self.keepalive_expiry = keepalive_expiry or float(
+            os.getenv("PROVIDER_KEEPALIVE_EXPIRY", "120")
+        )
+        self.healthy = True
+        self._transport: Optional[httpx.AsyncHTTPTransport] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._connect_mean: Optional[float] = None
+        self._requests = {"new": 0, "reused": 0}
+
+    def transport(self) -> httpx.AsyncHTTPTransport:
+        """Return the pool's transport for the running event loop.
+
+        Connections cannot move between event loops. If a different loop asks
+        for the transport (tests or benchmarks that call ``asyncio.run`` more
+        than once), it gets a fresh one.
+        """
+        loop = asyncio.get_running_loop()
+        if self._transport is None or self._loop is not loop:
+            self._transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                    keepalive_expiry=self.keepalive_expiry,
+                )
+            )
+            self._loop = loop
+        return self._transport
+
+    def client(self, session: bool = True) -> httpx.AsyncClient:
+        """Create a lightweight client on top of the shared pool.
+
+        Args:
+            session: Track the first request made through this client as the
+                session's first request.
+        """
+        first = {"pending": session}
+
+        async def on_request(request: httpx.Request):
+            request.extensions["trace"] = _ConnectionTrace()
+
+        async def on_response(response: httpx.Response):
+            trace = response.request.extensions.get("trace")
+            if isinstance(trace, _ConnectionTrace):
+                self._record(trace, first_request=first["pending"])
+                first["pending"] = False
+
+        return httpx.AsyncClient(
+            transport=_SharedTransport(self),
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+
+    def connections(self) -> int:
+        pool = getattr(self._transport, "_pool", None)
+        return len(getattr(pool, "connections", ()))
+
+    def reuse_rate(self) -> float:
+        total = self._requests["new"] + self._requests["reused"]
+        return self._requests["reused"] / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "connections": self.connections(),
+            "max_connections": self.max_connections,
+            "requests": dict(self._requests),
+            "reuse_rate": round(self.reuse_rate(), 3),
+            "connect_mean_secs": self._connect_mean,
+        }
+
+    async def aclose(self):
+        if self._transport is not None:
+            await self._transport.aclose()
+            self._transport = None
+
+    def _record(self, trace: _ConnectionTrace, first_request: bool):
+        connection = "new" if trace.new_connection else "reused"
+        self._requests[connection] += 1
+        REQUESTS.inc(provider=self.provider, connection=connection)
+        if trace.connect_secs is not None:
+            CONNECT.observe(trace.connect_secs, provider=self.provider)
+            self._connect_mean = (
+                trace.connect_secs
+                if self._connect_mean is None
+                else 0.8 * self._connect_mean + 0.2 * trace.connect_secs
+            )
+        if first_request:
+            FIRST_REQUEST.observe(
+                time.monotonic() - trace.started, provider=self.provider, connection=connection
+            )
+            if connection == "reused" and self._connect_mean is not None:
+                SAVED.inc(self._connect_mean, provider=self.provider)
+        CONNECTIONS.set(self.connections(), provider=self.provider)
+
+
+# --------------------------------------------------------------------
+# Factory
+# --------------------------------------------------------------------
+
+
+class ServiceFactory:
+    """Owns the provider pools and attaches per-session clients to services."""
+
+    def __init__(self, health_interval: Optional[float] = None):
+        """Initialize the factory.
+
+        Args:
+            health_interval: Seconds between health checks. Defaults to
+                PROVIDER_HEALTH_INTERVAL; 0 disables them.
+        """
+        self.health_interval = (
+            health_interval
+            if health_interval is not None
+            else float(os.getenv("PROVIDER_HEALTH_INTERVAL", "30"))
+        )
+        self._pools: Dict[str, ProviderPool] = {}
+        self._health_task: Optional[asyncio.Task] = None
+
+    def pool(self, provider: str) -> ProviderPool:
+        if provider not in self._pools:
+            self._pools[provider] = ProviderPool(provider)
+        return self._pools[provider]
+
+    def healthy(self, provider: str) -> bool:
+        pool = self._pools.get(provider)
+        return pool.healthy if pool else True
+
+    def wrap_llm(self, provider: str, service: Any) -> Any:
+        """Point an LLM service at the shared pool for its provider.
+
+        The service keeps its own SDK client settings (key, base URL,
+        timeouts). Only the HTTP client underneath is swapped for a
+        per-session client on the shared pool. Services for providers that
+        are not pooled, or built outside an event loop, are returned as is.
+        """
+        client = getattr(service, "_client", None)
+        if (
+            not pooling_enabled()
+            or provider not in POOLED_PROVIDERS
+            or not hasattr(client, "with_options")
+        ):
+            return service
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return service
+        service._client = client.with_options(http_client=self.pool(provider).client())
+        return service
+
+    def stats(self) -> dict:
+        return {name: pool.stats() for name, pool in self._pools.items()}
+
+    async def start(self, providers: Optional[list] = None):
+        """Open a warm connection to each configured provider and start health checks.
+
+        Args:
+            providers: Provider names. Defaults to LLM_PROVIDERS / LLM_PROVIDER.
+        """
+        if not pooling_enabled():
+            return
+        from utils import get_llm_providers
+
+        providers = [
+            p
+            for p in (providers or get_llm_providers())
+            if p in POOLED_PROVIDERS and os.getenv(POOLED_PROVIDERS[p])
+        ]
+        if not providers:
+            return
+        await asyncio.gather(*(self.check(p) for p in providers))
+        if self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop(providers))
+
+    async def stop(self):
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        for pool in self._pools.values():
+            await pool.aclose()
+
+    async def check(self, provider: str, timeout: float = 5.0) -> bool:
+        """Run one health check against ``provider`` over its shared pool."""
+        pool = self.pool(provider)
+        try:
+            client = self._sdk_client(provider, pool.client(session=False), timeout)
+            await client.models.list()
+            ok = True
+        except Exception as e:
+            logger.warning(f"Health check for {provider} failed: {e}")
+            ok = False
+        if ok != pool.healthy:
+            logger.info(f"Provider {provider} is {'healthy' if ok else 'unhealthy'}")
+        pool.healthy = ok
+        UP.set(1 if ok else 0, provider=provider)
+        HEALTH_CHECKS.inc(provider=provider, outcome="ok" if ok else "failed")
+        return ok
+
+    async def _health_loop(self, providers: list):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for provider in providers:
+                await self.check(provider)
+
+    def _sdk_client(self, provider: str, http_client: httpx.AsyncClient, timeout: float):
+        api_key = os.getenv(POOLED_PROVIDERS[provider])
+        if provider == "openai":
+            from openai import AsyncOpenAI
+
+            return AsyncOpenAI(
+                api_key=api_key, http_client=http_client, timeout=timeout, max_retries=0
+            )
+        from anthropic import AsyncAnthropic
+
+        return AsyncAnthropic(api_key=api_key, http_client=http_client, timeout=timeout, max_retries=0)
+
+
+SERVICE_FACTORY = ServiceFactory()
@@ -0,0 +1,232 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Admission control for bot sessions.
+
+Every session runs a full real-time pipeline, so past a certain number of
+concurrent calls every call misses its audio deadlines. ``SessionScheduler``
+caps the number of active sessions, lets a few extra connections wait briefly
+for a slot, and sheds the rest with a WebSocket close code the client can act
+on:
+
+- 1013 (Try Again Later): the server is full (queue full or wait timed out).
+- 1012 (Service Restart): the server is draining for a deploy.
+
+Drain mode stops admitting new sessions (queued ones are released with 1012)
+while active calls run to completion.
+
+Configuration:
+    MAX_SESSIONS: Concurrent sessions per process (default 20).
+    SESSION_QUEUE_SIZE: Connections allowed to wait for a slot (default 10).
+    SESSION_QUEUE_TIMEOUT: Seconds a connection may wait (default 5).
+
+Metrics:
+    nivest_sessions_active: sessions currently running.
+    nivest_sessions_queued: connections waiting for a slot.
+    nivest_sessions_admitted_total: sessions started.
+    nivest_sessions_shed_total{reason}: connections rejected (queue_full,
+        queue_timeout, draining).
+    nivest_session_queue_wait_seconds: time admitted sessions spent queued.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from loguru import logger
+
+from metrics import counter, gauge, histogram
+
+CLOSE_TRY_AGAIN_LATER = 1013
+CLOSE_SERVICE_RESTART = 1012
+
+ACTIVE = gauge("nivest_sessions_active", "Bot sessions currently running.")
+QUEUED = gauge("nivest_sessions_queued", "Connections waiting for a session slot.")
+ADMITTED = counter("nivest_sessions_admitted_total", "Bot sessions started.")
+SHED = counter(
+    "nivest_sessions_shed_total",
+    "Connections rejected by admission control.",
+    ["reason"],
+)
+QUEUE_WAIT = histogram(
+    "nivest_session_queue_wait_seconds",
+    "Time admitted sessions waited for a slot.",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+
+class SessionRejected(Exception):
+    """Raised when a connection cannot be admitted.
+
+    Attributes:
+        reason: "queue_full", "queue_timeout" or "draining".
+        code: WebSocket close code to send to the client.
+    """
+
+    def __init__(self, reason: str, code: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.code = code
+
+
+class SessionScheduler:
+    """Concurrency cap with a short FIFO wait queue and a drain mode."""
+
+    def __init__(
+        self,
+        max_sessions: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            max_sessions: Concurrent session cap. Defaults to MAX_SESSIONS.
+            max_queue: Wait queue length. Defaults to SESSION_QUEUE_SIZE.
+            queue_timeout: Maximum wait in seconds. Defaults to
+                SESSION_QUEUE_TIMEOUT.
+        """
+        self.max_sessions = max_sessions or int(os.getenv("MAX_SESSIONS", "20"))
+        self.max_queue = (
+            max_queue if max_queue is not None else int(os.getenv("SESSION_QUEUE_SIZE", "10"))
+        )
+        self.queue_timeout = (
+            queue_timeout
+            if queue_timeout is not None
+            else float(os.getenv("SESSION_QUEUE_TIMEOUT", "5"))
+        )
+        self._active = 0
+        self._waiters: deque = deque()
+        self._draining = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def draining(self) -> bool:
+        return self._draining
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": self.queued,
+            "max_sessions": self.max_sessions,
+            "max_queue": self.max_queue,
+            "draining": self._draining,
+        }
+
+    async def acquire(self):
+        """Wait for a session slot.
+
+        Raises:
+            SessionRejected: If the server is draining, the queue is full or
+                the wait timed out.
+        """
+        if self._draining:
+            self._shed("draining", CLOSE_SERVICE_RESTART)
+        if self._active < self.max_sessions and not self._waiters:
+            self._admit(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._shed("queue_full", CLOSE_TRY_AGAIN_LATER)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        QUEUED.set(self.queued)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+        except asyncio.CancelledError:
+            # The connection went away while queued; give back a slot that
+            # may have been handed over in the meantime.
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                self.release()
+            waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            QUEUED.set(self.queued)
+
+        if waiter.cancelled():
+            self._shed("queue_timeout", CLOSE_TRY_AGAIN_LATER)
+        if not waiter.result():
+            self._shed("draining", CLOSE_SERVICE_RESTART)
+        # The slot was already counted by release() when it was handed over.
+        QUEUE_WAIT.observe(time.monotonic() - start)
+        ADMITTED.inc()
+
+    def release(self):
+        """Free a slot, handing it straight to the next waiter if any."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                QUEUED.set(self.queued)
+                return
+        self._active -= 1
+        ACTIVE.set(self._active)
+        if self._active == 0:
+            self._idle.set()
+
+    @asynccontextmanager
+    async def session(self):
+        """Hold a session slot for the duration of the ``async with`` block."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def start_drain(self):
+        """Stop admitting sessions and turn away everyone still queued."""
+        if self._draining:
+            return
+        self._draining = True
+        logger.info(f"Draining: {self._active} active session(s), {self.queued} queued")
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(False)
+        QUEUED.set(0)
+
+    def resume(self):
+        """Leave drain mode."""
+        self._draining = False
+
+    async def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait until no session is active. Returns False on timeout."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _admit(self, waited: float):
+        self._active += 1
+        self._idle.clear()
+        ACTIVE.set(self._active)
+        ADMITTED.inc()
+        QUEUE_WAIT.observe(waited)
+
+    def _shed(self, reason: str, code: int):
+        SHED.inc(reason=reason)
+        logger.warning(
+            f"Rejecting session ({reason}): {self._active} active, {self.queued} queued"
+        )
+        raise SessionRejected(reason, code)
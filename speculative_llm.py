@@ -0,0 +1,501 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Speculative LLM requests on interim STT transcripts.
+
+The LLM normally starts only once ``context_aggregator.user()`` has the final
+transcript and the VAD has decided the user stopped speaking. With Deepgram,
+the last transcript is usually there a good half second before that.
+``SpeculativeLLMService`` wraps the session's LLM service and uses that time:
+
+- The processor returned by ``listener()`` sits between the STT and the user
+  aggregator. It sees every interim and final transcript. The one returned
+  by ``turn_marker()`` sits right after the aggregator and ends the user
+  turn when its context frame goes by, whether or not a processor before the
+  LLM then answers it. Once the user's
+  text is stable, it starts a speculative request: a copy of the context with
+  the text appended as the user message. "Stable" means a final segment, or
+  the same interim text ``SPECULATIVE_STABLE_INTERIMS`` times in a row.
+- The request is driven through the wrapped service's ``_process_context``,
+  as ``llm_failover.FailoverLLMService`` does. Its frames and function calls
+  are held back, so nothing is spoken and no handler runs while it is
+  speculative.
+- When the real context frame arrives, the speculation is committed if two
+  things hold. First, the context is otherwise unchanged (same earlier
+  messages and tools). Second, the final user text matches the speculated
+  text within ``SPECULATIVE_MATCH_THRESHOLD`` (word-level similarity). On a
+  commit, the buffered output is released and the function calls run against
+  the real context. Whatever is still streaming then passes straight
+  through.
+- Otherwise the speculation is cancelled and the request is made as usual.
+  A speculation is also cancelled when newer text becomes stable. At most
+  ``SPECULATIVE_MAX_ATTEMPTS`` speculations are made per user turn.
+
+A hit saves up to the LLM's time to first token. A miss costs the tokens of
+the cancelled request(s). Both are reported below. Text that a processor
+before the LLM would answer on its own (the intent router at the entry
+node) is not speculated on; ``should_speculate`` makes that call. Speculation
+is off unless ``SPECULATIVE_LLM=1``.
+
+Configuration:
+    SPECULATIVE_LLM: Set to 1 to enable speculation.
+    SPECULATIVE_MIN_WORDS: Shortest text speculated on (default 2).
+    SPECULATIVE_STABLE_INTERIMS: Identical interims in a row that count as
+        stable (default 2; 0 speculates on final segments only).
+    SPECULATIVE_MATCH_THRESHOLD: Word similarity needed to commit (default 0.9).
+    SPECULATIVE_MAX_ATTEMPTS: Speculations per user turn (default 3).
+
+Metrics:
+    nivest_speculative_turns_total{result}: user turns answered by a committed
+        speculation ("hit"), by a fresh request after discarded speculations
+        ("miss"), or without speculating ("none").
+    nivest_speculative_requests_total{outcome}: speculative requests by
+        outcome ("committed", "mismatch", "superseded", "abandoned").
+    nivest_speculative_wasted_tokens_total{kind}: prompt and completion
+        tokens of discarded speculations (provider usage when reported,
+        estimated otherwise).
+    nivest_speculative_saved_seconds: LLM latency saved per hit (the head
+        start of the request, up to its time to first output).
+"""
+
+import asyncio
+import copy
+import difflib
+import json
+import os
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    CancelFrame,
+    EndFrame,
+    Frame,
+    InterimTranscriptionFrame,
+    InterruptionFrame,
+    LLMContextFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    LLMUpdateSettingsFrame,
+    MetricsFrame,
+    StartFrame,
+    TranscriptionFrame,
+)
+from pipecat.metrics.metrics import LLMUsageMetricsData
+from pipecat.processors.aggregators.llm_context import LLMContext
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor, FrameProcessorSetup
+from pipecat.services.llm_service import LLMService
+
+from llm_replay import ReplayLLMMixin
+from metrics import counter, histogram
+from prompt_budget import count_tokens
+
+TURNS = counter("nivest_speculative_turns_total", "User turns by speculation result.", ["result"])
+REQUESTS = counter("nivest_speculative_requests_total", "Speculative LLM requests by outcome.", ["outcome"])
+WASTED_TOKENS = counter(
+    "nivest_speculative_wasted_tokens_total", "Tokens spent on discarded speculative requests.", ["kind"]
+)
+SAVED_SECONDS = histogram(
+    "nivest_speculative_saved_seconds",
+    "LLM latency saved by committed speculative requests.",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0),
+)
+
+
+def speculative_llm_enabled() -> bool:
+    return os.getenv("SPECULATIVE_LLM", "0").lower() in ("1", "true", "yes")
+
+
+def _words(text: str) -> List[str]:
+    # Punctuation and case differ between interim and final results
+    kept = "".join(" " if unicodedata.category(ch).startswith("P") else ch for ch in text.lower())
+    return kept.split()
+
+
+def text_similarity(a: str, b: str) -> float:
+    """Word-level similarity of two transcripts, from 0 to 1."""
+    wa, wb = _words(a), _words(b)
+    if not wa and not wb:
+        return 1.0
+    return difflib.SequenceMatcher(None, wa, wb, autojunk=False).ratio()
+
+
+def _message_text(message) -> str:
+    content = message.get("content", "") if isinstance(message, dict) else ""
+    if isinstance(content, list):
+        content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+    return content or ""
+
+
+@dataclass
+class _Speculation:
+    """One speculative request and its held-back output."""
+
+    text: str
+    context: LLMContext
+    base_messages: list  # the real context's messages when speculation started
+    tools: object
+    started: float
+    task: Optional[asyncio.Task] = None
+    buffer: List[Tuple[Frame, FrameDirection]] = field(default_factory=list)
+    calls: list = field(default_factory=list)
+    committed: bool = False
+    first_output: Optional[float] = None
+    completion: List[str] = field(default_factory=list)
+    usage: Optional[Tuple[int, int]] = None  # (prompt, completion) reported by the provider
+
+
+class SpeculativeLLMService(ReplayLLMMixin, LLMService):
+    """Starts LLM requests on stable interim transcripts and commits matching ones.
+
+    Use it in place of the session's LLM everywhere (pipeline, flow manager,
+    context budget, concept cache). Put the processor returned by
+    ``listener()`` between the STT and the user context aggregator, and the
+    one returned by ``turn_marker()`` right after the aggregator.
+    """
+
+    def __init__(
+        self,
+        service: LLMService,
+        context: LLMContext,
+        *,
+        provider: str = "openai",
+        min_words: Optional[int] = None,
+        stable_interims: Optional[int] = None,
+        match_threshold: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        should_speculate: Optional[Callable[[str], bool]] = None,
+        **kwargs,
+    ):
+        """Initialize the service.
+
+        Args:
+            service: The LLM service to speculate with (any service with a
+                streaming ``_process_context``, including the failover one).
+            context: The session's context, as held by the aggregators.
+            provider: Provider name, for token estimates.
+            min_words: Shortest text speculated on. Defaults to
+                SPECULATIVE_MIN_WORDS.
+            stable_interims: Identical interims that count as stable.
+                Defaults to SPECULATIVE_STABLE_INTERIMS.
+            match_threshold: Similarity needed to commit. Defaults to
+                SPECULATIVE_MATCH_THRESHOLD.
+            max_attempts: Speculations per user turn. Defaults to
+                SPECULATIVE_MAX_ATTEMPTS.
+            should_speculate: Returns False for text that will not reach the
+                LLM (e.g. routed locally). Defaults to always speculating.
+        """
+        super().__init__(**kwargs)
+        self._service = service
+        self._context = context
+        self._provider = provider
+        self._min_words = min_words if min_words is not None else int(os.getenv("SPECULATIVE_MIN_WORDS", "2"))
+        self._stable_interims = (
+            stable_interims
+            if stable_interims is not None
+            else int(os.getenv("SPECULATIVE_STABLE_INTERIMS", "2"))
+        )
+        self._match_threshold = match_threshold or float(os.getenv("SPECULATIVE_MATCH_THRESHOLD", "0.9"))
+        self._max_attempts = max_attempts or int(os.getenv("SPECULATIVE_MAX_ATTEMPTS", "3"))
+        self._should_speculate = should_speculate
+
+        # Transcript state of the current user turn
+        self._finals: List[str] = []
+        self._interim = ""
+        self._interim_repeats = 0
+        self._attempts = 0
+        self._turn_attempted = False  # whether the last ended turn speculated
+        self._speculation: Optional[_Speculation] = None
+        self._live = False
+        self._forwarding = False
+
+        service.push_frame = self._on_service_frame
+        service.run_function_calls = self._on_service_function_calls
+
+    def listener(self) -> "SpeculationListener":
+        return SpeculationListener(self)
+
+    def turn_marker(self) -> "SpeculationTurnMarker":
+        return SpeculationTurnMarker(self)
+
+    # ----------------------------------------------------------------
+    # Wrapped service output
+    # ----------------------------------------------------------------
+
+    async def _on_service_frame(self, frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM):
+        # A speculation is discarded (and its task awaited) before a live
+        # request starts, and none starts while one is live, so the state
+        # tells whose output this is
+        spec = self._speculation
+        if self._forwarding or (spec is None and not self._live):
+            return  # the wrapped service echoing lifecycle frames
+        if self._live or spec.committed:
+            await self.push_frame(frame, direction)
+            return
+        if isinstance(frame, MetricsFrame):
+            for data in frame.data:
+                if isinstance(data, LLMUsageMetricsData):
+                    spec.usage = (data.value.prompt_tokens, data.value.completion_tokens)
+        elif isinstance(frame, LLMTextFrame):
+            spec.completion.append(frame.text)
+        if spec.first_output is None and not isinstance(frame, MetricsFrame):
+            spec.first_output = time.monotonic()
+        spec.buffer.append((frame, direction))
+
+    async def _on_service_function_calls(self, function_calls):
+        spec = self._speculation
+        if self._live:
+            await self.run_function_calls(function_calls)
+            return
+        if spec is None:
+            return
+        if spec.first_output is None:
+            spec.first_output = time.monotonic()
+        if spec.committed:
+            await self._run_committed_calls(list(function_calls))
+        else:
+            spec.calls.extend(function_calls)
+
+    async def _run_committed_calls(self, function_calls):
+        # They were requested for the speculative copy; results belong to the real context
+        for call in function_calls:
+            call.context = self._context
+        await self.run_function_calls(function_calls)
+
+    # ----------------------------------------------------------------
+    # Transcripts (from the listener)
+    # ----------------------------------------------------------------
+
+    async def on_transcript(self, text: str, final: bool):
+        """Track the user's text and speculate once it is stable."""
+        text = text.strip()
+        if not text:
+            return
+        if final:
+            self._finals.append(text)
+            self._interim, self._interim_repeats = "", 0
+            stable = True
+        else:
+            if _words(text) == _words(self._interim):
+                self._interim_repeats += 1
+            else:
+                self._interim, self._interim_repeats = text, 1
+            stable = self._stable_interims > 0 and self._interim_repeats == self._stable_interims
+
+        if stable:
+            # The user aggregator joins final segments with spaces
+            await self._speculate(" ".join(self._finals + ([self._interim] if self._interim else [])))
+
+    async def _speculate(self, text: str):
+        if self._live or len(_words(text)) < self._min_words:
+            return
+        current = self._speculation
+        if current and (current.committed or text_similarity(current.text, text) >= 1.0):
+            return
+        if self._attempts >= self._max_attempts:
+            return
+        if current:
+            await self._discard("superseded")
+        if self._should_speculate and not self._should_speculate(text):
+            return
+
+        messages = list(self._context.get_messages())
+        context = LLMContext(
+            messages=copy.deepcopy(messages) + [{"role": "user", "content": text}],
+            tools=self._context.tools,
+            tool_choice=self._context.tool_choice,
+        )
+        spec = _Speculation(
+            text=text,
+            context=context,
+            base_messages=messages,
+            tools=self._context.tools,
+            started=time.monotonic(),
+        )
+        self._speculation = spec
+        self._attempts += 1
+        spec.task = self.create_task(self._run_speculation(spec))
+        logger.debug(f"{self}: speculating on {text!r}")
+
+    async def _run_speculation(self, spec: _Speculation):
+        try:
+            await self._service._process_context(spec.context)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"{self}: speculative request failed: {e}")
+            if self._speculation is spec and not spec.committed:
+                await self._discard("abandoned", cancel=False)
+
+    async def _discard(self, outcome: str, cancel: bool = True):
+        spec, self._speculation = self._speculation, None
+        if spec is None:
+            return
+        if cancel and spec.task and not spec.task.done():
+            await self.cancel_task(spec.task)
+        if spec.committed:
+            return
+        REQUESTS.inc(outcome=outcome)
+        prompt, completion = spec.usage or (None, None)
+        if prompt is None:
+            prompt = count_tokens(json.dumps(spec.context.get_messages(), ensure_ascii=False), self._provider)
+        if completion is None:
+            completion = count_tokens("".join(spec.completion), self._provider) if spec.completion else 0
+        WASTED_TOKENS.inc(prompt, kind="prompt")
+        WASTED_TOKENS.inc(completion, kind="completion")
+        logger.debug(f"{self}: discarded speculation on {spec.text!r} ({outcome})")
+
+    def end_turn(self):
+        """Forget the user turn's text once the aggregator has sent it."""
+        self._turn_attempted = self._attempts > 0
+        self._finals = []
+        self._interim, self._interim_repeats = "", 0
+        self._attempts = 0
+
+    # ----------------------------------------------------------------
+    # Pipeline
+    # ----------------------------------------------------------------
+
+    async def setup(self, setup: FrameProcessorSetup):
+        await super().setup(setup)
+        await self._service.setup(setup)
+
+    async def cleanup(self):
+        await super().cleanup()
+        await self._service.cleanup()
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, (StartFrame, EndFrame, CancelFrame, LLMUpdateSettingsFrame)):
+            # The wrapped service only needs these for its own state
+            self._forwarding = True
+            try:
+                await self._service.process_frame(frame, direction)
+            finally:
+                self._forwarding = False
+        if isinstance(frame, (EndFrame, CancelFrame)):
+            await self._discard("abandoned")
+
+        if isinstance(frame, LLMContextFrame):
+            await self._handle_context(frame.context)
+        elif isinstance(frame, InterruptionFrame):
+            # Only a committed speculation is output the user can interrupt
+            if self._speculation and self._speculation.committed:
+                await self._discard("committed")
+            await self.push_frame(frame, direction)
+        elif not isinstance(frame, LLMUpdateSettingsFrame):
+            await self.push_frame(frame, direction)
+
+    async def _handle_context(self, context: LLMContext):
+        messages = context.get_messages()
+        user_turn = bool(messages) and isinstance(messages[-1], dict) and messages[-1].get("role") == "user"
+        spec = self._speculation
+
+        if spec and not spec.committed and user_turn and self._matches(spec, context):
+            TURNS.inc(result="hit")
+            await self._commit(spec, context)
+            return
+
+        if spec:
+            await self._discard("mismatch")
+        if user_turn:
+            TURNS.inc(result="miss" if self._turn_attempted else "none")
+        await self.push_frame(LLMFullResponseStartFrame())
+        await self.start_processing_metrics()
+        self._live = True
+        try:
+            await self._service._process_context(context)
+        finally:
+            self._live = False
+            await self.stop_processing_metrics()
+            await self.push_frame(LLMFullResponseEndFrame())
+
+    def _matches(self, spec: _Speculation, context: LLMContext) -> bool:
+        messages = context.get_messages()
+        earlier = messages[:-1]
+        if context.tools is not spec.tools or len(earlier) != len(spec.base_messages):
+            return False
+        if any(a is not b and a != b for a, b in zip(earlier, spec.base_messages)):
+            return False
+        return text_similarity(_message_text(messages[-1]), spec.text) >= self._match_threshold
+
+    async def _commit(self, spec: _Speculation, context: LLMContext):
+        now = time.monotonic()
+        # Without speculation the first output would have come one time to
+        # first output after now
+        saved = (spec.first_output or now) - spec.started
+        SAVED_SECONDS.observe(saved)
+        REQUESTS.inc(outcome="committed")
+        logger.debug(f"{self}: committed speculation on {spec.text!r}, saved {saved * 1000:.0f} ms")
+
+        spec.committed = True
+        buffered, spec.buffer = spec.buffer, []
+        calls, spec.calls = spec.calls, []
+        await self.push_frame(LLMFullResponseStartFrame())
+        try:
+            for frame, direction in buffered:
+                await self.push_frame(frame, direction)
+            if calls:
+                await self._run_committed_calls(calls)
+            await spec.task
+        finally:
+            if spec.task and not spec.task.done():
+                await self.cancel_task(spec.task)
+            if self._speculation is spec:
+                self._speculation = None
+            await self.push_frame(LLMFullResponseEndFrame())
+
+    # ----------------------------------------------------------------
+    # Out-of-band inference
+    # ----------------------------------------------------------------
+
+    async def _process_context(self, context):
+        await self._service._process_context(context)
+
+    async def run_inference(self, context) -> Optional[str]:
+        return await self._service.run_inference(context)
+
+
+class SpeculationListener(FrameProcessor):
+    """Passes STT output through and feeds transcripts to the speculative LLM."""
+
+    def __init__(self, service: SpeculativeLLMService, **kwargs):
+        super().__init__(**kwargs)
+        self._owner = service
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if direction == FrameDirection.DOWNSTREAM and isinstance(
+            frame, (TranscriptionFrame, InterimTranscriptionFrame)
+        ):
+            await self.push_frame(frame, direction)
+            await self._owner.on_transcript(frame.text, final=isinstance(frame, TranscriptionFrame))
+            return
+
+        await self.push_frame(frame, direction)
+
+
+class SpeculationTurnMarker(FrameProcessor):
+    """Ends the speculative LLM's user turn when the user aggregator emits it."""
+
+    def __init__(self, service: SpeculativeLLMService, **kwargs):
+        super().__init__(**kwargs)
+        self._owner = service
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if direction == FrameDirection.DOWNSTREAM and isinstance(frame, LLMContextFrame):
+            messages = frame.context.get_messages()
+            if messages and isinstance(messages[-1], dict) and messages[-1].get("role") == "user":
+                self._owner.end_turn()
+
+        await self.push_frame(frame, direction)
@@ -0,0 +1,205 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Splits streamed LLM text into speakable chunks for TTS.
+
+By default the TTS service collects LLM tokens until NLTK finds the end of a
+sentence, so the first audio of a reply waits for the whole first sentence.
+Our replies often open with a long Hinglish sentence held together by commas
+and connectives ("Aaj aapne achha kamaya, toh ..."). ``SpeechChunker`` sits
+between the LLM and the TTS service, which is built with
+``aggregate_sentences=False``, and emits text as soon as a chunk is worth
+speaking:
+
+- Sentence boundaries (. ! ? ; … and the danda । ॥, plus line breaks) always
+  end a chunk. "Rs.", "e.g.", decimals and numbered-list markers do not.
+- Clause boundaries (commas, colons, dashes, and Hinglish/Hindi connectives
+  such as "lekin", "kyunki", "toh", "क्योंकि") end a chunk once it has enough
+  words. The first chunk of a reply may be shorter than later ones, so audio
+  starts early and the rest of the reply keeps natural phrasing.
+
+Each chunk goes through ``MarkdownTextFilter`` before it is emitted, so the
+TTS service only sees filtered text. Boundaries are found on the raw stream
+because the filter folds line breaks, which are the only separator between
+markdown list items.
+
+Configuration:
+    TTS_CHUNKING: Set to 0 to go back to sentence aggregation in the TTS
+        service.
+    TTS_CHUNK_FIRST_MIN_WORDS: Words before a clause boundary may end the
+        first chunk of a reply (default 3).
+    TTS_CHUNK_MIN_WORDS: Same for later chunks (default 8).
+    TTS_CHUNK_CLAUSES: Set to 0 to split at sentence boundaries only.
+
+Metrics:
+    nivest_tts_chunks_total{boundary}: chunks emitted at a "sentence" or
+        "clause" boundary, or flushed at the end of a reply ("flush").
+    nivest_tts_first_chunk_seconds: time from the start of an LLM reply to
+        its first chunk.
+"""
+
+import os
+import re
+import time
+from typing import Optional, Tuple
+
+from pipecat.frames.frames import (
+    EndFrame,
+    Frame,
+    InterruptionFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.utils.text.base_text_filter import BaseTextFilter
+from pipecat.utils.text.markdown_text_filter import MarkdownTextFilter
+
+from metrics import counter, histogram
+
+CHUNKS = counter("nivest_tts_chunks_total", "Text chunks sent to TTS.", ["boundary"])
+FIRST_CHUNK = histogram(
+    "nivest_tts_first_chunk_seconds",
+    "Time from the start of an LLM reply to its first TTS chunk.",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0),
+)
+
+_CLOSERS = "\"'”’)\\]"
+_CONNECTIVES = (
+    "lekin", "magar", "kyunki", "kyonki", "isliye", "toh", "phir", "but", "because",
+    "लेकिन", "मगर", "क्योंकि", "इसलिए", "तो", "फिर",
+)  # fmt: skip
+
+_BOUNDARY = re.compile(
+    rf"(?P<sentence>[.!?;…]+[{_CLOSERS}]*(?=\s)|[।॥]+[{_CLOSERS}]*|\n)"
+    rf"|(?P<clause>[,:،—–]+(?=\s)|\s(?=(?:{'|'.join(_CONNECTIVES)})[\s,]))",
+    re.IGNORECASE,
+)
+_ABBREVIATIONS = {"rs", "mr", "mrs", "ms", "dr", "e.g", "i.e", "vs", "approx", "sr", "jr", "st"}
+_LIST_MARKER = re.compile(r"(?:^|\n)\s*\d+$")
+_SPEAKABLE = re.compile(r"\w")
+
+
+def speech_chunking_enabled() -> bool:
+    return os.getenv("TTS_CHUNKING", "1") != "0"
+
+
+def _word_count(text: str) -> int:
+    return len(text.split())
+
+
+def _is_abbreviation(before: str) -> bool:
+    words = before.split()
+    return bool(words) and words[-1].lower().lstrip("(\"'") in _ABBREVIATIONS
+
+
+def find_split(text: str, min_words: int, clauses: bool = True) -> Optional[Tuple[int, str]]:
+    """Find where the first speakable chunk of ``text`` ends.
+
+    Args:
+        text: Buffered text that has not been emitted yet.
+        min_words: Words a chunk needs before a clause boundary may end it.
+        clauses: Whether clause boundaries may end a chunk at all.
+
+    Returns:
+        ``(end, boundary)`` with ``text[:end]`` the chunk and ``boundary``
+        either "sentence" or "clause", or None if no chunk is complete yet.
+    """
+    for match in _BOUNDARY.finditer(text):
+        if match.group("sentence"):
+            before = text[: match.start()]
+            if match.group().startswith(".") and (
+                _is_abbreviation(before) or _LIST_MARKER.search(before)
+            ):
+                continue
+            end = match.end()
+            if _SPEAKABLE.search(text[:end]):
+                return end, "sentence"
+        elif clauses:
+            # Punctuation stays with the chunk; a connective starts the next one
+            end = match.start() if match.group().isspace() else match.end()
+            if _word_count(text[:end]) >= min_words:
+                return end, "clause"
+    return None
+
+
+class SpeechChunker(FrameProcessor):
+    """Turns streamed ``LLMTextFrame`` tokens into clause/sentence-sized frames."""
+
+    def __init__(
+        self,
+        first_min_words: Optional[int] = None,
+        min_words: Optional[int] = None,
+        clauses: Optional[bool] = None,
+        text_filter: Optional[BaseTextFilter] = None,
+        **kwargs,
+    ):
+        """Initialize the chunker.
+
+        Args:
+            first_min_words: Minimum words before a clause boundary ends the
+                first chunk of a reply. Defaults to TTS_CHUNK_FIRST_MIN_WORDS.
+            min_words: Same for later chunks. Defaults to TTS_CHUNK_MIN_WORDS.
+            clauses: Split at clause boundaries. Defaults to TTS_CHUNK_CLAUSES.
+            text_filter: Filter applied to every chunk. Defaults to
+                ``MarkdownTextFilter``.
+            **kwargs: Passed to ``FrameProcessor``.
+        """
+        super().__init__(**kwargs)
+        self._first_min_words = first_min_words or int(os.getenv("TTS_CHUNK_FIRST_MIN_WORDS", "3"))
+        self._min_words = min_words or int(os.getenv("TTS_CHUNK_MIN_WORDS", "8"))
+        self._clauses = (
+            clauses if clauses is not None else os.getenv("TTS_CHUNK_CLAUSES", "1") != "0"
+        )
+        self._filter = text_filter or MarkdownTextFilter()
+        self._buffer = ""
+        self._first = True
+        self._reply_started: Optional[float] = None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, LLMTextFrame) and not frame.skip_tts:
+            self._buffer += frame.text
+            await self._drain()
+        elif isinstance(frame, LLMFullResponseStartFrame):
+            self._buffer = ""
+            self._first = True
+            self._reply_started = time.monotonic()
+            await self.push_frame(frame, direction)
+        elif isinstance(frame, (LLMFullResponseEndFrame, EndFrame)):
+            await self._flush()
+            await self.push_frame(frame, direction)
+        elif isinstance(frame, InterruptionFrame):
+            self._buffer = ""
+            await self._filter.handle_interruption()
+            await self.push_frame(frame, direction)
+        else:
+            await self.push_frame(frame, direction)
+
+    async def _drain(self):
+        while True:
+            min_words = self._first_min_words if self._first else self._min_words
+            split = find_split(self._buffer, min_words, self._clauses)
+            if split is None:
+                return
+            end, boundary = split
+            chunk, self._buffer = self._buffer[:end], self._buffer[end:]
+            await self._emit(chunk, boundary)
+
+    async def _flush(self):
+        chunk, self._buffer = self._buffer, ""
+        await self._emit(chunk, "flush")
+
+    async def _emit(self, chunk: str, boundary: str):
+        await self._filter.reset_interruption()
+        text = (await self._filter.filter(chunk)).strip()
+        if not _SPEAKABLE.search(text):
+            return
+        CHUNKS.inc(boundary=boundary)
+        if self._first and self._reply_started is not None:
+            FIRST_CHUNK.observe(time.monotonic() - self._reply_started)
+        self._first = False
+        await self.push_frame(LLMTextFrame(text))
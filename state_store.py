@@ -0,0 +1,391 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Write-behind persistence of session state.
+
+Everything the finance handlers capture (earnings, expenses, savings advice,
+goals, concepts, mood) lives in ``flow_manager.state`` and used to be lost
+when the socket closed. Writing to a database inside a handler would add a
+round trip to the voice turn, so handlers only call ``StateStore.record``,
+which is a dictionary update:
+
+- Updates are coalesced per session. A session with ten updates waiting in the
+  queue is written once, with its latest state.
+- A background task flushes the queue every ``STATE_STORE_FLUSH_INTERVAL``
+  seconds, or sooner once ``STATE_STORE_BATCH`` sessions are waiting, in one
+  batched upsert per table.
+- The queue is bounded (``STATE_STORE_QUEUE``). When it is full the oldest
+  update is dropped and counted.
+- ``flush()`` writes everything still queued. The bot calls it when a client
+  disconnects and the server calls ``stop()`` at shutdown.
+
+Rows follow the Supabase tables from the README. ``financial_snapshots`` holds
+one row per session (``id`` is the session id) that is updated in place, and
+``conversations`` gets one row per session when it ends. The SQLite backend
+creates the same tables locally. The Postgres backend writes to any Postgres
+database, including Supabase's, with asyncpg.
+
+Configuration:
+    STATE_STORE: "off" (default), "sqlite" or "postgres". Offline runs
+        (server.py --offline, the benchmarks) always use "off".
+    STATE_STORE_PATH: SQLite database file (default nivest_state.db).
+    STATE_STORE_URL: Postgres DSN for the postgres backend (falls back to
+        DATABASE_URL).
+    STATE_STORE_QUEUE: Pending session updates kept in memory (default 1000).
+    STATE_STORE_BATCH: Pending updates that trigger an early flush (default 100).
+    STATE_STORE_FLUSH_INTERVAL: Seconds between flushes (default 1.0).
+
+Metrics:
+    nivest_state_store_queue_depth: session updates waiting to be written.
+    nivest_state_store_flush_seconds: duration of each batched write.
+    nivest_state_store_rows_total{table}: rows written.
+    nivest_state_store_coalesced_total: updates merged into one already queued.
+    nivest_state_store_dropped_total: updates dropped because the queue was full.
+    nivest_state_store_errors_total: failed flushes.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from metrics import counter, gauge, histogram
+
+QUEUE_DEPTH = gauge("nivest_state_store_queue_depth", "Session updates waiting to be written.")
+FLUSH_SECONDS = histogram(
+    "nivest_state_store_flush_seconds",
+    "Duration of batched state writes.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+ROWS = counter("nivest_state_store_rows_total", "Rows written by the state store.", ["table"])
+COALESCED = counter(
+    "nivest_state_store_coalesced_total", "State updates merged into one already queued."
+)
+DROPPED = counter("nivest_state_store_dropped_total", "State updates dropped on a full queue.")
+ERRORS = counter("nivest_state_store_errors_total", "State store flushes that failed.")
+
+# Keys of flow_manager.state that are not user data
+_INTERNAL_KEYS = ("session_id", "user_id", "user_phone", "history")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# --------------------------------------------------------------------
+# Row builders
+# --------------------------------------------------------------------
+
+
+def snapshot_row(session_id: str, state: Dict[str, Any], reason: str) -> Dict[str, Any]:
+    """Build a ``financial_snapshots`` row from ``flow_manager.state``."""
+    finance = state.get("finance", {})
+    ledger = finance.get("ledger")
+    transactions = list(ledger.entries()) if ledger is not None else []
+    summary = {
+        "total_income": ledger.total("earning") if ledger is not None else 0.0,
+        "total_expenses": ledger.total("expense") if ledger is not None else 0.0,
+        "net_today": ledger.net_today() if ledger is not None else 0.0,
+        "savings_streak_days": ledger.savings_streak() if ledger is not None else 0,
+        "last_income": finance.get("last_income"),
+        "last_expenses": finance.get("last_expenses"),
+        "last_suggested_saving": finance.get("last_suggested_saving"),
+        "concepts_explained": state.get("concepts_explained", []),
+        "mood_log": state.get("mood_log", []),
+    }
+    return {
+        "id": session_id,
+        "captured_at": _now(),
+        "user_phone": state.get("user_phone") or state.get("user_id"),
+        "reason": reason,
+        "summary": summary,
+        "transactions": transactions,
+        "goals": state.get("goals", []),
+    }
+
+
+def conversation_row(
+    session_id: str, state: Dict[str, Any], prompt: str, response: str
+) -> Dict[str, Any]:
+    """Build a ``conversations`` row for a finished session."""
+    context = {k: v for k, v in state.items() if k not in _INTERNAL_KEYS}
+    finance = context.get("finance") or {}
+    if finance.get("ledger") is not None:
+        context["finance"] = {**finance, "ledger": finance["ledger"].summary()}
+    return {
+        "id": session_id,
+        "created_at": _now(),
+        "user_phone": state.get("user_phone") or state.get("user_id"),
+        "prompt": prompt,
+        "response": response,
+        "context": context,
+    }
+
+
+TABLES = {
+    "financial_snapshots": ("id", "captured_at", "user_phone", "reason", "summary", "transactions", "goals"),
+    "conversations": ("id", "created_at", "user_phone", "prompt", "response", "context"),
+}
+_JSON_COLUMNS = {"summary", "transactions", "goals", "context"}
+
+
+def _encode(row: Dict[str, Any]) -> Dict[str, Any]:
+    # Runs on the event loop: the state lists are still being appended to there
+    return {c: json.dumps(v, default=str) if c in _JSON_COLUMNS else v for c, v in row.items()}
+
+
+# --------------------------------------------------------------------
+# Backends
+# --------------------------------------------------------------------
+
+
+class SQLiteBackend:
+    """Local SQLite database with the README's tables (JSON stored as text).
+
+    Rows are written from a worker thread so the event loop never waits on disk.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")  # worker processes share the file
+            for table, columns in TABLES.items():
+                rest = ", ".join(f"{c} TEXT" for c in columns[1:])
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, {rest})")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _write(self, batches: Dict[str, List[Dict[str, Any]]]):
+        conn = self._connect()
+        with conn:
+            for table, rows in batches.items():
+                columns = TABLES[table]
+                updates = ", ".join(f"{c} = excluded.{c}" for c in columns[1:])
+                conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' for _ in columns)}) "
+                    f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                    [tuple(row[c] for c in columns) for row in rows],
+                )
+
+    async def write(self, batches: Dict[str, List[Dict[str, Any]]]):
+        await asyncio.to_thread(self._write, batches)
+
+    async def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class PostgresBackend:
+    """Postgres (including Supabase) through an asyncpg pool.
+
+    The tables must exist with the column types given in the README; ``id``
+    must be the primary key so that snapshot updates are upserts.
+    """
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._pool = None
+
+    async def _connect(self):
+        if self._pool is None:
+            try:
+                import asyncpg
+            except ImportError as e:
+                raise RuntimeError("STATE_STORE=postgres requires asyncpg (pip install asyncpg)") from e
+            self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=2)
+        return self._pool
+
+    async def write(self, batches: Dict[str, List[Dict[str, Any]]]):
+        pool = await self._connect()
+        async with pool.acquire() as conn, conn.transaction():
+            for table, rows in batches.items():
+                columns = TABLES[table]
+                placeholders = ", ".join(
+                    f"${i}::jsonb" if c in _JSON_COLUMNS else f"${i}"
+                    for i, c in enumerate(columns, start=1)
+                )
+                updates = ", ".join(f"{c} = excluded.{c}" for c in columns[1:])
+                await conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+                    f"ON CONFLICT (id) DO UPDATE SET {updates}",
+                    [
+                        tuple(
+                            datetime.fromisoformat(row[c]) if c in ("captured_at", "created_at") else row[c]
+                            for c in columns
+                        )
+                        for row in rows
+                    ],
+                )
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+def backend_from_env():
+    """Create the backend selected by STATE_STORE, or None when it is off."""
+    kind = os.getenv("STATE_STORE", "off").lower()
+    if kind == "off":
+        return None
+    if kind == "postgres":
+        dsn = os.getenv("STATE_STORE_URL") or os.getenv("DATABASE_URL")
+        if not dsn:
+            raise ValueError("STATE_STORE=postgres requires STATE_STORE_URL or DATABASE_URL")
+        return PostgresBackend(dsn)
+    if kind == "sqlite":
+        return SQLiteBackend(os.getenv("STATE_STORE_PATH", "nivest_state.db"))
+    raise ValueError(f"Unknown STATE_STORE {kind!r}")
+
+
+# --------------------------------------------------------------------
+# Write-behind queue
+# --------------------------------------------------------------------
+
+
+class StateStore:
+    """Bounded, coalescing write-behind queue in front of a backend."""
+
+    def __init__(
+        self,
+        backend=None,
+        max_queue: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+    ):
+        """Initialize the store.
+
+        Args:
+            backend: ``SQLiteBackend``/``PostgresBackend``; None disables
+                persistence. Defaults to ``backend_from_env()``.
+            max_queue: Pending updates kept. Defaults to STATE_STORE_QUEUE.
+            batch_size: Pending updates that trigger an early flush. Defaults
+                to STATE_STORE_BATCH.
+            flush_interval: Seconds between flushes. Defaults to
+                STATE_STORE_FLUSH_INTERVAL.
+        """
+        self.backend = backend if backend is not None else backend_from_env()
+        self.max_queue = max_queue or int(os.getenv("STATE_STORE_QUEUE", "1000"))
+        self.batch_size = batch_size or int(os.getenv("STATE_STORE_BATCH", "100"))
+        self.flush_interval = flush_interval or float(os.getenv("STATE_STORE_FLUSH_INTERVAL", "1.0"))
+        # (table, session id) -> (row builder, builder args). Rows are built at
+        # flush time, so a coalesced update always writes the latest state.
+        self._pending: "OrderedDict[Tuple[str, str], Tuple[Any, tuple]]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def record(self, state: Dict[str, Any], reason: str):
+        """Queue a snapshot of a session's state. Never blocks."""
+        session_id = state.get("session_id")
+        if not self.enabled or not session_id:
+            return
+        self._enqueue(("financial_snapshots", session_id), (snapshot_row, (session_id, state, reason)))
+
+    def record_conversation(self, state: Dict[str, Any], prompt: str, response: str):
+        """Queue the ``conversations`` row for a finished session."""
+        session_id = state.get("session_id")
+        if not self.enabled or not session_id:
+            return
+        self._enqueue(
+            ("conversations", session_id), (conversation_row, (session_id, state, prompt, response))
+        )
+
+    def _enqueue(self, key: Tuple[str, str], item: Tuple[Any, tuple]):
+        if key in self._pending:
+            COALESCED.inc()
+            self._pending[key] = item
+        else:
+            while len(self._pending) >= self.max_queue:
+                dropped, _ = self._pending.popitem(last=False)
+                DROPPED.inc()
+                logger.warning(f"State store queue full, dropped update for {dropped}")
+            self._pending[key] = item
+        QUEUE_DEPTH.set(len(self._pending))
+        self._ensure_task()
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def _ensure_task(self):
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # flushed by the next record() or flush() inside a loop
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write every queued update in one batch per table."""
+        if not self._pending:
+            return
+        if self._flush_lock is None:
+            self._ensure_task()
+        async with self._flush_lock:
+            pending, self._pending = self._pending, OrderedDict()
+            QUEUE_DEPTH.set(0)
+            batches: Dict[str, List[Dict[str, Any]]] = {}
+            for (table, _), (build, args) in pending.items():
+                batches.setdefault(table, []).append(_encode(build(*args)))
+
+            started = time.perf_counter()
+            try:
+                await self.backend.write(batches)
+            except Exception as e:
+                ERRORS.inc()
+                logger.error(f"State store flush failed, requeueing {len(pending)} updates: {e}")
+                # Newer updates queued during the write win over the failed ones
+                for key, item in pending.items():
+                    if key not in self._pending and len(self._pending) < self.max_queue:
+                        self._pending[key] = item
+                QUEUE_DEPTH.set(len(self._pending))
+                return
+            FLUSH_SECONDS.observe(time.perf_counter() - started)
+            for table, rows in batches.items():
+                ROWS.inc(len(rows), table=table)
+
+    async def stop(self):
+        """Flush what is left and close the backend."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.enabled:
+            await self.flush()
+            await self.backend.close()
+
+
+STATE_STORE = StateStore()
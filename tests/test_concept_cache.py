@@ -0,0 +1,194 @@
+import asyncio
+
+from pipecat.frames.frames import (
+    Frame,
+    FunctionCallFromLLM,
+    FunctionCallsStartedFrame,
+    LLMContextFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    StartFrame,
+)
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineTask
+from pipecat.processors.aggregators.llm_context import LLMContext
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.llm_service import LLMService
+
+from concept_cache import (
+    CONCEPT_FUNCTION,
+    CONCEPT_NODE,
+    ConceptCache,
+    ConceptResponseCache,
+    detect_language,
+    is_personal,
+    normalize_topic,
+)
+from ledger import Ledger
+from llm_replay import ReplayLLMMixin
+
+EXPLANATIONS = [
+    "An emergency fund is money kept aside for surprises.",
+    "It is a small pot of savings for bad days.",
+    "Keep some money apart so a surprise does not become a loan.",
+]
+
+
+class FlowManager:
+    def __init__(self, node=CONCEPT_NODE, state=None):
+        self.current_node = node
+        self.state = state or {}
+
+
+class ReplayLLM(ReplayLLMMixin, LLMService):
+    """Plays cached responses; answers anything else with a fixed reply."""
+
+    def __init__(self, reply="LLM answer"):
+        super().__init__()
+        self.reply = reply
+        self.calls = []
+        self.contexts = 0
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, LLMContextFrame):
+            self.contexts += 1
+            await self.push_frame(LLMFullResponseStartFrame())
+            await self.push_frame(LLMTextFrame(self.reply))
+            await self.push_frame(
+                FunctionCallsStartedFrame(
+                    function_calls=[
+                        FunctionCallFromLLM(
+                            function_name=CONCEPT_FUNCTION,
+                            tool_call_id="1",
+                            arguments={"topic": "emergency fund"},
+                            context=frame.context,
+                        )
+                    ]
+                )
+            )
+            await self.push_frame(LLMFullResponseEndFrame())
+        elif not isinstance(frame, StartFrame):
+            await self.push_frame(frame, direction)
+
+    async def run_function_calls(self, function_calls):
+        self.calls.extend(function_calls)
+
+
+class Collector(FrameProcessor):
+    def __init__(self):
+        super().__init__()
+        self.started = asyncio.Event()
+        self.done = asyncio.Event()
+        self.frames = []
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, StartFrame):
+            self.started.set()
+        elif isinstance(frame, (LLMFullResponseStartFrame, LLMTextFrame, LLMFullResponseEndFrame)):
+            self.frames.append(frame)
+            if isinstance(frame, LLMFullResponseEndFrame):
+                self.done.set()
+        await self.push_frame(frame, direction)
+
+
+def ask(question, cache, llm, flow_manager):
+    async def main():
+        concept = ConceptCache(llm=llm, flow_manager=lambda: flow_manager, cache=cache)
+        collector = Collector()
+        task = PipelineTask(Pipeline([concept, llm, concept.recorder(), collector]))
+        runner = asyncio.create_task(PipelineRunner(handle_sigint=False).run(task))
+        await asyncio.wait_for(collector.started.wait(), 10)
+        await task.queue_frame(LLMContextFrame(LLMContext([{"role": "user", "content": question}])))
+        await asyncio.wait_for(collector.done.wait(), 10)
+        await task.cancel()
+        await runner
+        return collector.frames
+
+    return asyncio.run(main())
+
+
+def full_cache():
+    cache = ConceptResponseCache(variants=3, ttl=3600, max_keys=8)
+    for text in EXPLANATIONS:
+        cache.add("emergency_fund", "hinglish", text)
+    return cache
+
+
+def test_topics_and_languages():
+    assert normalize_topic("Emergency fund kya hota hai?") == "emergency_fund"
+    assert normalize_topic("byaaj pe byaaj samjhao") == "compounding"
+    assert normalize_topic("budget aur emergency fund") is None
+    assert detect_language("इमरजेंसी फंड क्या है") == "hi"
+    assert detect_language("emergency fund kya hai") == "hinglish"
+    assert detect_language("what is an emergency fund") == "en"
+
+
+def test_personal_explanations():
+    assert not is_personal(EXPLANATIONS[0], {})
+    assert is_personal("Since you earned 1800 today, keep 200 aside.", {})
+    assert is_personal("Keep a few hundred rupees aside.", {})
+    assert is_personal("₹ बचाइए", {})
+    assert is_personal("Aaj ke ३०० bachao", {})
+
+    ledger = Ledger(tz_offset_minutes=330)
+    ledger.record("expense", 300, category="petrol")
+    state = {
+        "goals": [{"goal": "new bike", "target_amount": 60000}],
+        "history": {"goals": [{"goal": "Shaadi"}]},
+        "finance": {"ledger": ledger},
+        "user_id": "caller-77",
+    }
+    assert is_personal("It helps with your New Bike plan too.", state)
+    assert is_personal("Then the shaadi costs won't hurt.", state)
+    assert is_personal("Even a petrol price jump is covered.", state)
+    assert not is_personal("It covers repairs and doctor visits.", state)
+
+
+def test_hit_is_played_by_the_llm():
+    llm = ReplayLLM()
+    frames = ask("Emergency fund kya hota hai?", full_cache(), llm, FlowManager())
+    assert [type(f) for f in frames] == [LLMFullResponseStartFrame, LLMTextFrame, LLMFullResponseEndFrame]
+    assert frames[1].text in EXPLANATIONS
+    assert llm.contexts == 0
+    (call,) = llm.calls
+    assert call.function_name == CONCEPT_FUNCTION
+    assert call.arguments == {"topic": "emergency fund"}
+
+
+def test_miss_is_recorded():
+    cache = ConceptResponseCache(variants=3, ttl=3600, max_keys=8)
+    llm = ReplayLLM(reply="A fund for surprises.")
+    ask("Emergency fund kya hota hai?", cache, llm, FlowManager())
+    assert llm.contexts == 1
+    assert cache.stats()["variants"] == 1
+
+
+def test_personal_answer_is_not_recorded():
+    cache = ConceptResponseCache(variants=3, ttl=3600, max_keys=8)
+    state = {"goals": [{"goal": "bike", "target_amount": 60000}]}
+    ask("Emergency fund kya hota hai?", cache, ReplayLLM(reply="Like your bike savings."), FlowManager(state=state))
+    ask("Emergency fund kya hota hai?", cache, ReplayLLM(reply="Since you earned ₹1800 today..."), FlowManager())
+    assert cache.stats()["variants"] == 0
+
+
+def test_questions_with_numbers_go_to_the_llm():
+    llm = ReplayLLM()
+    frames = ask("Emergency fund mein 5000 rakhu?", full_cache(), llm, FlowManager())
+    assert llm.contexts == 1
+    assert frames[1].text == "LLM answer"
+
+
+def test_llm_without_replay_answers_itself():
+    class PlainLLM(ReplayLLM):
+        pass
+
+    PlainLLM.__bases__ = (LLMService,)
+    llm = PlainLLM.__new__(PlainLLM)
+    LLMService.__init__(llm)
+    llm.reply, llm.calls, llm.contexts = "LLM answer", [], 0
+    frames = ask("Emergency fund kya hota hai?", full_cache(), llm, FlowManager())
+    assert frames[1].text == "LLM answer"
@@ -0,0 +1,172 @@
+import asyncio
+
+from pipecat.processors.aggregators.llm_context import LLMContext
+
+from context_budget import (
+    PINNED_PREFIX,
+    SUMMARY_PREFIX,
+    ContextBudget,
+    estimate_tokens,
+    extractive_summary,
+    pinned_facts,
+)
+
+
+class FakeLLM:
+    def __init__(self, reply="They earned 1800 today.", error=None, delay=0):
+        self.reply = reply
+        self.error = error
+        self.delay = delay
+        self.calls = []
+
+    async def run_inference(self, context):
+        self.calls.append(context.get_messages())
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.reply
+
+
+def conversation(turns):
+    messages = [{"role": "system", "content": "persona"}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"user {i}"})
+        messages.append({"role": "assistant", "content": f"coach {i}"})
+    return messages
+
+
+def budget(messages, llm=None, state=None, **kwargs):
+    kwargs.setdefault("max_messages", 10)
+    kwargs.setdefault("keep_recent", 4)
+    context = LLMContext(messages)
+    return context, ContextBudget(context, llm or FakeLLM(), lambda: state, **kwargs)
+
+
+def compact(processor, context):
+    messages = context.get_messages()
+    start, end = processor._compaction_span(messages)
+    asyncio.run(processor._compact(start, messages[start:end]))
+
+
+def test_estimate_tokens_counts_text_and_tool_calls():
+    assert estimate_tokens([{"role": "user", "content": "x" * 40}]) == 10
+    assert estimate_tokens([{"role": "user", "content": [{"type": "text", "text": "x" * 8}]}]) == 2
+    with_call = {"role": "assistant", "content": "", "tool_calls": [{"id": "1", "function": {"name": "f"}}]}
+    assert estimate_tokens([with_call]) > 0
+
+
+def test_pinned_facts():
+    assert pinned_facts({}) is None
+    state = {
+        "finance": {"last_earnings": 1800, "other": 1},
+        "goals": [{"goal": "bike", "target_amount": 60000, "notes": "x"}],
+        "mood_log": [{"type": "stress", "timestamp": "t1"}, {"type": "ok", "timestamp": "t2"}],
+        "concepts_explained": [{"topic": "sip"}, {"topic": "sip"}, {"topic": "fd"}],
+    }
+    facts = pinned_facts(state)
+    assert facts.startswith(PINNED_PREFIX)
+    assert '"latest_day":{"last_earnings":1800}' in facts
+    assert '"goals":[{"goal":"bike","target_amount":60000}]' in facts
+    assert '"mood":{"stressful_moments":1,"last":"t2"}' in facts
+    assert '"concepts_explained":["fd","sip"]' in facts
+
+
+def test_extractive_summary_keeps_turns_and_earlier_summaries():
+    messages = [
+        {"role": "system", "content": f"{SUMMARY_PREFIX} Earlier stuff."},
+        {"role": "system", "content": "node task prompt"},
+        {"role": "user", "content": "Aaj   1800 kamaye"},
+        {"role": "tool", "content": "{}"},
+        {"role": "assistant", "content": "x" * 500},
+    ]
+    summary = extractive_summary(messages)
+    assert summary.startswith("Earlier stuff. User: Aaj 1800 kamaye Coach: ")
+    assert "node task" not in summary
+    assert len(summary) < 250
+
+
+def test_no_compaction_within_budget():
+    context, processor = budget(conversation(3))
+    processor._check_budget()
+    assert processor._task is None
+
+
+def test_span_keeps_persona_recent_messages_and_node_prompt():
+    messages = conversation(8)
+    messages.insert(9, {"role": "system", "content": "current node task"})
+    _, processor = budget(messages)
+    start, end = processor._compaction_span(messages)
+    assert start == 1
+    assert end == 9
+    assert messages[end]["content"] == "current node task"
+
+
+def test_span_never_splits_a_tool_call_from_its_result():
+    messages = conversation(6)
+    messages[-4:] = [
+        {"role": "assistant", "tool_calls": [{"id": "1"}], "content": ""},
+        {"role": "tool", "tool_call_id": "1", "content": "{}"},
+        {"role": "assistant", "content": "done"},
+        {"role": "assistant", "content": "more"},
+    ]
+    # keep_recent=3 would cut right after the tool call
+    _, processor = budget(messages, keep_recent=3)
+    start, end = processor._compaction_span(messages)
+    assert (start, end) == (1, 7)
+    assert messages[end]["content"] == "user 3"
+
+
+def test_span_too_short_to_compact():
+    _, processor = budget(conversation(3), keep_recent=4)
+    assert processor._compaction_span(conversation(3)) is None
+
+
+def test_llm_compaction_replaces_old_messages():
+    state = {"goals": [{"goal": "bike", "target_amount": 60000}]}
+    llm = FakeLLM()
+    context, processor = budget(conversation(8), llm=llm, state=state)
+    compact(processor, context)
+
+    messages = context.get_messages()
+    assert messages[0]["content"] == "persona"
+    assert messages[1]["content"] == f"{SUMMARY_PREFIX} They earned 1800 today."
+    assert messages[2]["content"].startswith(PINNED_PREFIX)
+    assert [m["content"] for m in messages[3:]] == ["user 6", "coach 6", "user 7", "coach 7"]
+    assert "User: user 0" in llm.calls[0][1]["content"]
+
+
+def test_failed_llm_falls_back_to_extractive_summary():
+    context, processor = budget(conversation(8), llm=FakeLLM(error=RuntimeError("down")))
+    compact(processor, context)
+    summary = context.get_messages()[1]["content"]
+    assert summary.startswith(f"{SUMMARY_PREFIX} User: user 0 Coach: coach 0")
+
+
+def test_slow_llm_falls_back_to_extractive_summary():
+    context, processor = budget(conversation(8), llm=FakeLLM(delay=1), summary_timeout=0.05)
+    compact(processor, context)
+    assert context.get_messages()[1]["content"].startswith(f"{SUMMARY_PREFIX} User:")
+
+
+def test_summary_is_dropped_if_the_context_changed():
+    context, processor = budget(conversation(8))
+    messages = context.get_messages()
+    start, end = processor._compaction_span(messages)
+    old = messages[start:end]
+    context.set_messages([{"role": "system", "content": "reset"}] + conversation(8)[1:])
+    processor._apply(start, old, "stale", "llm")
+    assert all("stale" not in m["content"] for m in context.get_messages())
+
+
+def test_repeated_compaction_carries_the_previous_summary():
+    llm = FakeLLM()
+    context, processor = budget(conversation(8), llm=llm)
+    compact(processor, context)
+    for i in range(8, 12):
+        context.add_message({"role": "user", "content": f"user {i}"})
+        context.add_message({"role": "assistant", "content": f"coach {i}"})
+    compact(processor, context)
+    assert "Previous summary: They earned 1800 today." in llm.calls[1][1]["content"]
+    summaries = [m for m in context.get_messages() if m["content"].startswith(SUMMARY_PREFIX)]
+    assert len(summaries) == 1
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from pipecat.frames.frames import LLMContextFrame
+from pipecat.processors.aggregators.llm_context import LLMContext
+
+from intent_router import SMOOTHING, IntentRouter, _last_user_text, classify
+
+ROUTES = {
+    "route_to_daily_advice": lambda: {"name": "daily_advice"},
+    "route_to_concept_teaching": lambda: {"name": "concept_teaching"},
+    "route_to_stress_support": lambda: {"name": "stress_support"},
+    "route_to_goal_setting": lambda: {"name": "goal_setting"},
+}
+
+
+class FakeFlowManager:
+    def __init__(self, node="entry"):
+        self.current_node = node
+        self.nodes = []
+
+    async def set_node_from_config(self, node):
+        self.nodes.append(node)
+
+
+@pytest.mark.parametrize(
+    "text, route",
+    [
+        ("Aaj maine 1800 kamaye, petrol mein 400 gaye", "route_to_daily_advice"),
+        ("Emergency fund kya hota hai?", "route_to_concept_teaching"),
+        ("Bahut thak gaya hoon, tension ho rahi hai", "route_to_stress_support"),
+        ("Mujhe ek bike leni hai, goal set karna hai", "route_to_goal_setting"),
+        ("आज मैंने 900 कमाए", "route_to_daily_advice"),
+        ("ब्याज का मतलब समझाओ", "route_to_concept_teaching"),
+    ],
+)
+def test_classify_routes(text, route):
+    decision = classify(text)
+    assert decision.route == route
+    assert 0 < decision.confidence <= 1
+
+
+def test_classify_without_keywords():
+    decision = classify("hello there")
+    assert decision.route is None
+    assert decision.confidence == 0.0
+    assert decision.scores == {}
+
+
+def test_confidence_is_winning_share_with_smoothing():
+    decision = classify("income")
+    assert decision.scores == {"route_to_daily_advice": 2.0}
+    assert decision.confidence == round(2.0 / (2.0 + SMOOTHING), 3)
+
+
+def test_keywords_match_whole_words_only():
+    # "rs" is a keyword; "hours" must not match it
+    assert "route_to_daily_advice" not in classify("hours").scores
+
+
+def test_case_and_spacing_are_normalized():
+    assert classify("WHAT   IS  an  SIP").route == "route_to_concept_teaching"
+
+
+def test_last_user_text():
+    context = LLMContext([{"role": "system", "content": "x"}, {"role": "user", "content": "hi"}])
+    assert _last_user_text(context) == "hi"
+    context.add_message({"role": "user", "content": [{"type": "text", "text": "a"}, {"type": "text", "text": "b"}]})
+    assert _last_user_text(context) == "a b"
+    context.add_message({"role": "assistant", "content": "ok"})
+    assert _last_user_text(context) is None
+
+
+def test_would_route_only_at_the_entry_node():
+    flow_manager = FakeFlowManager()
+    router = IntentRouter(routes=ROUTES, flow_manager=lambda: flow_manager, mode="on", threshold=0.7)
+    assert router.would_route("Aaj 1800 kamaye, petrol 300")
+    assert not router.would_route("hello")
+    flow_manager.current_node = "daily_advice"
+    assert not router.would_route("Aaj 1800 kamaye, petrol 300")
+
+
+def test_would_route_is_off_in_shadow_mode():
+    router = IntentRouter(routes=ROUTES, flow_manager=FakeFlowManager, mode="shadow")
+    assert not router.would_route("Aaj 1800 kamaye, petrol 300")
+
+
+def test_confident_turn_moves_the_flow():
+    flow_manager = FakeFlowManager()
+    router = IntentRouter(routes=ROUTES, flow_manager=lambda: flow_manager, mode="on", threshold=0.7)
+    frame = LLMContextFrame(LLMContext([{"role": "user", "content": "Emergency fund kya hota hai?"}]))
+    assert asyncio.run(router._maybe_route(frame))
+    assert flow_manager.nodes == [{"name": "concept_teaching"}]
+
+
+def test_unsure_turn_is_left_to_the_llm():
+    flow_manager = FakeFlowManager()
+    router = IntentRouter(routes=ROUTES, flow_manager=lambda: flow_manager, mode="on", threshold=0.7)
+    # Earning and a goal in one sentence: neither route is confident
+    frame = LLMContextFrame(LLMContext([{"role": "user", "content": "Aaj kamaya, bike leni hai"}]))
+    assert not asyncio.run(router._maybe_route(frame))
+    assert flow_manager.nodes == []
+
+
+def test_shadow_mode_never_routes():
+    flow_manager = FakeFlowManager()
+    router = IntentRouter(routes=ROUTES, flow_manager=lambda: flow_manager, mode="shadow")
+    frame = LLMContextFrame(LLMContext([{"role": "user", "content": "Emergency fund kya hota hai?"}]))
+    assert not asyncio.run(router._maybe_route(frame))
+    assert flow_manager.nodes == []
@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ledger import Ledger, finance_ledger
+
+IST = timezone(timedelta(minutes=330))
+# Monday 2025-01-06, 00:00 IST
+MONDAY = datetime(2025, 1, 6, tzinfo=IST).timestamp()
+DAY = 86400
+HOUR = 3600
+
+
+def at(day, hour=12):
+    return MONDAY + day * DAY + hour * HOUR
+
+
+def ledger_with(*entries):
+    ledger = Ledger(tz_offset_minutes=330)
+    for kind, amount, day in entries:
+        ledger.record(kind, amount, timestamp=at(day))
+    return ledger
+
+
+def test_totals_counts_and_last():
+    ledger = ledger_with(("earning", 1000, 0), ("earning", 800, 1), ("expense", 300, 1))
+    assert len(ledger) == 3
+    assert ledger.total("earning") == 1800
+    assert ledger.count("earning") == 2
+    assert ledger.last("earning") == 800
+    assert ledger.total("expense") == 300
+    assert ledger.last("expense") == 300
+
+
+def test_days_follow_the_ledger_timezone():
+    ledger = Ledger(tz_offset_minutes=330)
+    # 23:30 IST on Monday and 00:30 IST on Tuesday are different days
+    ledger.record("earning", 100, timestamp=at(0, 23.5))
+    ledger.record("earning", 200, timestamp=at(1, 0.5))
+    assert ledger.day_totals(ledger.day(at(0))) == (100, 0)
+    assert ledger.day_totals(ledger.day(at(1))) == (200, 0)
+
+
+def test_net_today_and_this_week():
+    ledger = ledger_with(
+        ("earning", 1000, -1),  # previous Sunday
+        ("earning", 900, 0),
+        ("expense", 400, 0),
+        ("earning", 700, 2),
+    )
+    assert ledger.net_today(at(2)) == 700
+    assert ledger.net_today(at(3)) == 0
+    assert ledger.net_this_week(at(3)) == 900 - 400 + 700
+    assert ledger.net_this_week(at(-1)) == 1000
+
+
+def test_average_daily_counts_calendar_days():
+    ledger = ledger_with(("earning", 700, 0), ("earning", 1400, 6), ("earning", 5000, -1))
+    assert ledger.average_daily("earning", 7, now=at(6)) == 300
+    assert ledger.average_daily("expense", 7, now=at(6)) == 0
+
+
+def test_daily_totals_start_at_the_first_recorded_day():
+    ledger = ledger_with(("earning", 500, 2), ("expense", 100, 4))
+    income, expenses = ledger.daily_totals(7, now=at(4))
+    assert income == [500, 0, 0]
+    assert expenses == [0, 0, 100]
+    assert Ledger(tz_offset_minutes=330).daily_totals(7) == ([], [])
+
+
+def test_savings_streak():
+    ledger = ledger_with(
+        ("earning", 500, 0),
+        ("earning", 500, 1),
+        ("expense", 600, 1),  # day 1 breaks the run
+        ("earning", 500, 2),
+        ("earning", 500, 3),
+    )
+    assert ledger.savings_streak(at(3)) == 2
+    # Nothing recorded yet today: yesterday's streak still counts
+    assert ledger.savings_streak(at(4)) == 2
+    assert ledger.savings_streak(at(6)) == 0
+
+
+def test_backdated_entry_recomputes_later_runs():
+    ledger = ledger_with(("earning", 500, 0), ("expense", 100, 1), ("earning", 500, 2))
+    assert ledger.savings_streak(at(2)) == 1
+    ledger.record("earning", 1000, timestamp=at(1))
+    assert ledger.savings_streak(at(2)) == 3
+    ledger.record("expense", 5000, timestamp=at(0))
+    assert ledger.savings_streak(at(2)) == 2
+
+
+def test_entries_and_categories():
+    ledger = Ledger(tz_offset_minutes=330)
+    ledger.record("expense", 250, category=" Petrol ", timestamp=at(0, 9))
+    ledger.record("earning", 900, timestamp=at(0, 10))
+    assert list(ledger.entries()) == [
+        {"type": "expense", "amount": 250, "category": "petrol", "timestamp": "2025-01-06T09:00:00+05:30"},
+        {"type": "income", "amount": 900, "category": None, "timestamp": "2025-01-06T10:00:00+05:30"},
+    ]
+
+
+def test_summary():
+    assert Ledger(tz_offset_minutes=330).summary() == {}
+    ledger = ledger_with(("earning", 1400, 0), ("expense", 400, 0))
+    assert ledger.summary(now=at(0)) == {
+        "earnings": {"count": 1, "total": 1400, "last": 1400},
+        "expenses": {"count": 1, "total": 400, "last": 400},
+        "net_today": 1000,
+        "avg_daily_income_7d": 200,
+        "savings_streak_days": 1,
+    }
+
+
+def test_round_trip_rebuilds_aggregates():
+    ledger = ledger_with(("earning", 1000.5, 0), ("expense", 300, 1), ("earning", 800, 2))
+    ledger.record("expense", 50, category="tea", timestamp=at(2))
+    restored = Ledger.from_dict(ledger.to_dict())
+    assert restored.tz_offset == ledger.tz_offset
+    assert list(restored.entries()) == list(ledger.entries())
+    assert restored.summary(now=at(2)) == ledger.summary(now=at(2))
+
+
+def test_extend_appends_from_an_index():
+    source = ledger_with(("earning", 100, 0), ("expense", 40, 0))
+    source.record("expense", 10, category="tea", timestamp=at(0))
+    target = ledger_with(("earning", 5, 0))
+    target.extend(source, start=1)
+    assert len(target) == 3
+    assert target.total("expense") == 50
+    assert [e["category"] for e in target.entries()] == [None, None, "tea"]
+
+
+def test_unknown_kind():
+    with pytest.raises(KeyError):
+        Ledger().record("loan", 100)
+
+
+def test_finance_ledger_creates_or_restores():
+    state = {}
+    ledger = finance_ledger(state)
+    assert state["finance"]["ledger"] is ledger
+    assert finance_ledger(state) is ledger
+
+    ledger.record("earning", 700, timestamp=at(0))
+    state = {"finance": {"ledger": ledger.to_dict()}}
+    assert finance_ledger(state).total("earning") == 700
+    assert isinstance(state["finance"]["ledger"], Ledger)
+
+
+def test_blob_without_category_names_still_loads():
+    ledger = ledger_with(("earning", 100, 0))
+    ledger.record("expense", 10, category="tea", timestamp=at(0))
+    data = ledger.to_dict()
+    del data["category_names"]
+    restored = Ledger.from_dict(data)
+    assert [e["category"] for e in restored.entries()] == [None, None]
+    assert restored.total("expense") == 10
@@ -0,0 +1,246 @@
+import asyncio
+import time
+
+import pytest
+
+from pipecat.frames.frames import (
+    ErrorFrame,
+    Frame,
+    LLMContextFrame,
+    LLMFullResponseEndFrame,
+    LLMTextFrame,
+    StartFrame,
+)
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineTask
+from pipecat.processors.aggregators.llm_context import LLMContext
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.llm_service import LLMService
+
+from llm_failover import EWMA_ALPHA, FailoverLLMService, ProviderStats
+
+
+class ScriptedLLM(LLMService):
+    """Provider that streams ``words`` after ``delay``, or fails."""
+
+    def __init__(self, words=("hello", "there"), delay=0.0, error=None, error_frame=False, gate=None,
+                 function_call=False):
+        super().__init__()
+        self.words = words
+        self.delay = delay
+        self.error = error
+        self.error_frame = error_frame
+        self.gate = gate
+        self.function_call = function_call
+        self.requests = 0
+        self.finished = 0
+
+    async def _process_context(self, context):
+        self.requests += 1
+        if self.gate:
+            await self.gate.wait()
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        if self.error_frame:
+            await self.push_frame(ErrorFrame("rate limited"))
+            return
+        if self.function_call:
+            await self.run_function_calls([self.words[0]])
+        for word in self.words:
+            await self.push_frame(LLMTextFrame(word))
+            await asyncio.sleep(0)
+        self.finished += 1
+
+
+class Collector(FrameProcessor):
+    def __init__(self):
+        super().__init__()
+        self.started = asyncio.Event()
+        self.done = asyncio.Event()
+        self.texts = []
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, StartFrame):
+            self.started.set()
+        elif isinstance(frame, LLMTextFrame):
+            self.texts.append(frame.text)
+        elif isinstance(frame, LLMFullResponseEndFrame):
+            self.done.set()
+        await self.push_frame(frame, direction)
+
+
+def complete(service, before=None):
+    """Send one context through ``service``; returns the text that came out."""
+
+    async def main():
+        collector = Collector()
+        task = PipelineTask(Pipeline([service, collector]))
+        runner = asyncio.create_task(PipelineRunner(handle_sigint=False).run(task))
+        await asyncio.wait_for(collector.started.wait(), 10)
+        if before:
+            before()
+        await task.queue_frame(LLMContextFrame(LLMContext([{"role": "user", "content": "hi"}])))
+        await asyncio.wait_for(collector.done.wait(), 10)
+        # Let cancelled attempts wind down before looking at them
+        await asyncio.sleep(0.05)
+        await task.cancel()
+        await runner
+        return collector.texts
+
+    return asyncio.run(main())
+
+
+def failover(*names, **kwargs):
+    return FailoverLLMService({name: LLMService() for name in names}, **kwargs)
+
+
+def test_needs_a_provider():
+    with pytest.raises(ValueError):
+        FailoverLLMService({})
+
+
+def test_configured_order_until_measured():
+    service = failover("openai", "google", "groq")
+    assert service.provider_order() == ["openai", "google", "groq"]
+
+
+def test_fastest_provider_first():
+    service = failover("openai", "google", "groq")
+    service.stats["openai"].record_success(0.9)
+    service.stats["google"].record_success(0.4)
+    service.stats["groq"].record_success(0.6)
+    assert service.provider_order() == ["google", "groq", "openai"]
+
+
+def test_unmeasured_providers_are_sampled_first():
+    service = failover("openai", "google", "groq")
+    service.stats["openai"].record_success(0.2)
+    assert service.provider_order() == ["google", "groq", "openai"]
+
+
+def test_fixed_order_when_not_adaptive():
+    service = failover("openai", "google", adaptive=False)
+    service.stats["openai"].record_success(2.0)
+    service.stats["google"].record_success(0.1)
+    assert service.provider_order() == ["openai", "google"]
+
+
+def test_failing_provider_is_demoted_for_the_cooldown():
+    service = failover("openai", "google", max_failures=2, cooldown=30)
+    stats = service.stats["openai"]
+    stats.record_failure(2, 30)
+    assert service.provider_order()[0] == "openai"
+    stats.record_failure(2, 30)
+    assert service.provider_order() == ["google", "openai"]
+
+    # Demotion applies even with a fixed order
+    service._adaptive = False
+    assert service.provider_order() == ["google", "openai"]
+
+    stats.demoted_until = time.monotonic() - 1
+    assert service.provider_order() == ["openai", "google"]
+
+
+def test_success_clears_failures_and_averages_latency():
+    stats = ProviderStats()
+    stats.record_failure(3, 30)
+    stats.record_success(1.0)
+    assert stats.consecutive_failures == 0
+    assert stats.ttft_ewma == 1.0
+    stats.record_success(2.0)
+    assert stats.ttft_ewma == pytest.approx(EWMA_ALPHA * 2.0 + (1 - EWMA_ALPHA) * 1.0)
+
+
+def test_success_lifts_a_demotion():
+    stats = ProviderStats()
+    stats.record_failure(1, 30)
+    assert stats.demoted_until > time.monotonic()
+    stats.record_success(0.5)
+    assert stats.demoted_until == 0.0
+
+
+# --------------------------------------------------------------------
+# Failover behaviour
+# --------------------------------------------------------------------
+
+
+def test_fails_over_on_error():
+    primary = ScriptedLLM(("primary",), error=ConnectionError("reset"))
+    backup = ScriptedLLM(("backup",))
+    service = FailoverLLMService({"primary": primary, "backup": backup})
+    assert complete(service) == ["backup"]
+    assert service.stats["primary"].consecutive_failures == 1
+    assert service.stats["backup"].ttft_ewma is not None
+
+
+def test_fails_over_on_an_error_frame():
+    primary = ScriptedLLM(("primary",), error_frame=True)
+    service = FailoverLLMService({"primary": primary, "backup": ScriptedLLM(("backup",))})
+    assert complete(service) == ["backup"]
+    assert service.stats["primary"].consecutive_failures == 1
+
+
+def test_fails_over_when_the_first_token_is_late():
+    primary = ScriptedLLM(("primary",), delay=2.0)
+    backup = ScriptedLLM(("backup",))
+    service = FailoverLLMService({"primary": primary, "backup": backup}, ttft_timeout=0.1)
+    assert complete(service) == ["backup"]
+    assert service.stats["primary"].consecutive_failures == 1
+    assert primary.finished == 0
+
+
+def test_hedge_keeps_the_first_to_stream():
+    primary = ScriptedLLM(("slow", "primary"), delay=1.0)
+    backup = ScriptedLLM(("fast", "backup"), delay=0.05)
+    service = FailoverLLMService({"primary": primary, "backup": backup}, hedge_after=0.05, ttft_timeout=5)
+    assert complete(service) == ["fast", "backup"]
+    assert backup.requests == 1
+    # The losing attempt is cancelled and counts as neither success nor failure
+    assert primary.finished == 0
+    assert service.stats["primary"].ttft_ewma is None
+    assert service.stats["primary"].consecutive_failures == 0
+
+
+def test_simultaneous_first_tokens_have_one_winner():
+    gate = asyncio.Event()
+    primary = ScriptedLLM(("a1", "a2", "a3"), gate=gate)
+    backup = ScriptedLLM(("b1", "b2", "b3"), gate=gate)
+    service = FailoverLLMService({"primary": primary, "backup": backup}, hedge_after=0.05, ttft_timeout=5)
+
+    def open_gate_after_the_hedge():
+        asyncio.get_running_loop().call_later(0.2, gate.set)
+
+    texts = complete(service, before=open_gate_after_the_hedge)
+    assert texts in (["a1", "a2", "a3"], ["b1", "b2", "b3"])
+    measured = [name for name, stats in service.stats.items() if stats.ttft_ewma is not None]
+    assert len(measured) == 1
+
+
+def test_late_attempt_function_calls_are_dropped():
+    gate = asyncio.Event()
+    primary = ScriptedLLM(("primary_call",), gate=gate, function_call=True)
+    backup = ScriptedLLM(("backup_call",), gate=gate, function_call=True)
+    service = FailoverLLMService({"primary": primary, "backup": backup}, hedge_after=0.05, ttft_timeout=5)
+    calls = []
+
+    async def run_function_calls(function_calls):
+        calls.extend(function_calls)
+
+    service.run_function_calls = run_function_calls
+
+    def open_gate_after_the_hedge():
+        asyncio.get_running_loop().call_later(0.2, gate.set)
+
+    complete(service, before=open_gate_after_the_hedge)
+    assert calls in (["primary_call"], ["backup_call"])
+
+
+def test_all_providers_failing():
+    service = FailoverLLMService(
+        {"primary": ScriptedLLM(error=ConnectionError("a")), "backup": ScriptedLLM(error=ConnectionError("b"))}
+    )
+    assert complete(service) == []
+    assert all(stats.consecutive_failures == 1 for stats in service.stats.values())
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import warnings
+
+import numpy as np
+import pytest
+
+from pipecat.frames.frames import (
+    InputAudioRawFrame,
+    InputTransportMessageFrame,
+    InterruptionFrame,
+    OutputAudioRawFrame,
+    StartFrame,
+)
+
+from pcm_serializer import (
+    ENCODING_FLOAT32,
+    ENCODING_MULAW,
+    ENCODING_PCM16,
+    HEADER,
+    KIND_AUDIO,
+    KIND_CONTROL,
+    MULAW_DECODE,
+    MULAW_ENCODE,
+    FramedPCMSerializer,
+    RawPCMSerializer,
+    Scratch,
+    StreamResampler,
+    decode_frame,
+    decode_samples,
+    encode_frame,
+    serializer_for,
+)
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    audioop = pytest.importorskip("audioop")
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def tone(rate, secs=0.5, freq=440.0):
+    t = np.arange(int(rate * secs)) / rate
+    return (8000 * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+# --------------------------------------------------------------------
+# Message framing
+# --------------------------------------------------------------------
+
+
+def test_encode_decode_round_trip():
+    data = encode_frame(KIND_AUDIO, b"\x01\x02\x03\x04", seq=2**32 + 5, timestamp_ms=40, sample_rate=48000,
+                        encoding=ENCODING_FLOAT32, channels=2)
+    assert len(data) == HEADER.size + 4
+    message = decode_frame(data)
+    assert message.kind == KIND_AUDIO
+    assert message.encoding == ENCODING_FLOAT32
+    assert message.channels == 2
+    assert message.seq == 5
+    assert message.timestamp_ms == 40
+    assert message.sample_rate == 48000
+    assert bytes(message.payload) == b"\x01\x02\x03\x04"
+
+
+def test_decode_rejects_bad_messages():
+    with pytest.raises(ValueError):
+        decode_frame(b"\x01\x00")
+    with pytest.raises(ValueError):
+        decode_frame(b"\x02" + encode_frame(KIND_AUDIO, b"", 0)[1:])
+
+
+# --------------------------------------------------------------------
+# Format conversion
+# --------------------------------------------------------------------
+
+
+def test_mulaw_tables_match_audioop():
+    every_sample = np.arange(-32768, 32768, dtype=np.int16)
+    expected = np.frombuffer(audioop.lin2ulaw(every_sample.tobytes(), 2), dtype=np.uint8)
+    assert np.array_equal(MULAW_ENCODE[every_sample.view(np.uint16)], expected)
+
+    every_code = np.arange(256, dtype=np.uint8).tobytes()
+    expected = np.frombuffer(audioop.ulaw2lin(every_code, 2), dtype=np.int16)
+    assert np.array_equal(MULAW_DECODE.astype(np.int16), expected)
+
+
+def test_decode_samples_downmixes_and_scales():
+    scratch = Scratch()
+    stereo = np.array([100, 300, -200, -400], dtype="<i2").tobytes()
+    assert decode_samples(stereo, ENCODING_PCM16, 2, scratch).tolist() == [200, -300]
+
+    floats = np.array([0.5, -1.0, 2.0, -3.0], dtype="<f4").tobytes()
+    assert decode_samples(floats, ENCODING_FLOAT32, 1, scratch).tolist() == [16384, -32768, 32767, -32768]
+
+    mono = np.array([1, 2, 3], dtype="<i2").tobytes()
+    samples = decode_samples(mono, ENCODING_PCM16, 1, scratch)
+    assert samples.dtype == np.int16 and samples.tolist() == [1, 2, 3]
+
+    with pytest.raises(ValueError):
+        decode_samples(mono, 9, 1, scratch)
+
+
+# --------------------------------------------------------------------
+# Resampling
+# --------------------------------------------------------------------
+
+
+@pytest.mark.parametrize("in_rate, out_rate", [(48000, 16000), (16000, 48000), (16000, 24000), (44100, 16000)])
+def test_resampling_does_not_depend_on_block_boundaries(in_rate, out_rate):
+    signal = tone(in_rate)
+    whole = StreamResampler(in_rate, out_rate).process(signal).copy()
+
+    streaming = StreamResampler(in_rate, out_rate)
+    blocks, start, sizes = [], 0, [160, 333, 480, 1, 7, 960]
+    while start < len(signal):
+        size = sizes[len(blocks) % len(sizes)]
+        # Outputs are work arrays, valid until the next call
+        blocks.append(streaming.process(signal[start : start + size]).copy())
+        start += size
+    streamed = np.concatenate(blocks)
+
+    # Upsampling holds back the samples after the last input until the next block
+    assert 0 <= len(signal) * out_rate / in_rate - len(whole) < 3
+    assert len(streamed) == len(whole)
+    np.testing.assert_allclose(streamed, whole, atol=1e-2)
+
+
+def test_resampled_tone_keeps_its_frequency():
+    out = StreamResampler(48000, 16000).process(tone(48000, secs=1.0, freq=1000.0))
+    spectrum = np.abs(np.fft.rfft(out))
+    assert np.argmax(spectrum) * 16000 / len(out) == pytest.approx(1000, abs=2)
+
+
+def test_same_rate_passes_blocks_through():
+    signal = tone(16000, 0.02)
+    assert StreamResampler(16000, 16000).process(signal) is signal
+
+
+# --------------------------------------------------------------------
+# Serializers
+# --------------------------------------------------------------------
+
+
+async def framed(**kwargs):
+    serializer = FramedPCMSerializer(**kwargs)
+    await serializer.setup(StartFrame(audio_in_sample_rate=16000, audio_out_sample_rate=24000))
+    return serializer
+
+
+def test_pcm16_at_the_input_rate_is_copied_once():
+    async def main():
+        serializer = await framed()
+        audio = tone(16000, 0.02).tobytes()
+        message = bytearray(encode_frame(KIND_AUDIO, audio, 0, sample_rate=16000))
+        frame = await serializer.deserialize(message)
+        assert isinstance(frame, InputAudioRawFrame)
+        assert type(frame.audio) is bytes and frame.audio == audio
+        message[HEADER.size :] = bytes(len(audio))
+        assert frame.audio == audio
+
+    run(main())
+
+
+def test_converted_input_frames_own_their_audio():
+    async def main():
+        serializer = await framed()
+        signal = tone(48000, 0.1).astype(np.float32) / 32768
+        chunks = np.split(signal, 5)
+        frames = [
+            await serializer.deserialize(
+                encode_frame(KIND_AUDIO, chunk.tobytes(), seq, sample_rate=48000, encoding=ENCODING_FLOAT32)
+            )
+            for seq, chunk in enumerate(chunks)
+        ]
+        assert all(type(f.audio) is bytes and f.sample_rate == 16000 for f in frames)
+        audio = np.frombuffer(b"".join(f.audio for f in frames), dtype=np.int16)
+        expected = StreamResampler(48000, 16000).process(tone(48000, 0.1).astype(np.float32))
+        np.testing.assert_allclose(audio, np.rint(expected), atol=1)
+        # Later messages reuse the work arrays, never the frames' audio
+        assert len({f.audio for f in frames}) == len(frames)
+
+    run(main())
+
+
+def test_mulaw_input():
+    async def main():
+        serializer = await framed()
+        pcm = tone(8000, 0.02).tobytes()
+        frame = await serializer.deserialize(
+            encode_frame(KIND_AUDIO, audioop.lin2ulaw(pcm, 2), 0, sample_rate=8000, encoding=ENCODING_MULAW)
+        )
+        assert frame.sample_rate == 16000
+        # 160 samples at 8 kHz, less the one held back for the next message
+        assert len(frame.audio) == 2 * 319
+
+    run(main())
+
+
+def test_control_and_malformed_messages():
+    async def main():
+        serializer = await framed()
+        frame = await serializer.deserialize(encode_frame(KIND_CONTROL, b'{"type": "ping"}', 0))
+        assert isinstance(frame, InputTransportMessageFrame) and frame.message == {"type": "ping"}
+        assert await serializer.deserialize(b"\x01\x00") is None
+        assert await serializer.deserialize(encode_frame(KIND_AUDIO, b"\x00" * 3, 1, sample_rate=16000)) is None
+        assert await serializer.deserialize(encode_frame(KIND_AUDIO, b"\x00" * 4, 2, sample_rate=0, channels=2)) is None
+        assert await serializer.deserialize(encode_frame(7, b"", 3)) is None
+        assert await serializer.deserialize("text") is None
+
+    run(main())
+
+
+def test_output_audio_is_framed_and_sequenced():
+    async def main():
+        serializer = await framed()
+        audio = tone(24000, 0.02).tobytes()
+        first = decode_frame(bytes(await serializer.serialize(OutputAudioRawFrame(audio, 24000, 1))))
+        second = decode_frame(bytes(await serializer.serialize(OutputAudioRawFrame(audio, 24000, 1))))
+        assert (first.kind, first.encoding, first.sample_rate) == (KIND_AUDIO, ENCODING_PCM16, 24000)
+        assert bytes(first.payload) == audio
+        assert (first.seq, second.seq) == (0, 1)
+        assert (first.timestamp_ms, second.timestamp_ms) == (0, 20)
+
+        clear = decode_frame(await serializer.serialize(InterruptionFrame()))
+        assert clear.kind == KIND_CONTROL and clear.seq == 2
+        assert json.loads(bytes(clear.payload)) == {"type": "clear"}
+
+    run(main())
+
+
+def test_output_audio_in_the_client_format():
+    async def main():
+        serializer = await framed(out_rate=8000, out_encoding=ENCODING_MULAW)
+        audio = tone(24000, 0.02).tobytes()
+        message = decode_frame(bytes(await serializer.serialize(OutputAudioRawFrame(audio, 24000, 1))))
+        assert (message.encoding, message.sample_rate, len(message.payload)) == (ENCODING_MULAW, 8000, 160)
+        decoded = np.frombuffer(audioop.ulaw2lin(bytes(message.payload), 2), dtype=np.int16)
+        expected = StreamResampler(24000, 8000).process(tone(24000, 0.02))
+        assert np.max(np.abs(decoded - expected)) < 300
+
+    run(main())
+
+
+def test_raw_serializer():
+    async def main():
+        serializer = RawPCMSerializer()
+        await serializer.setup(StartFrame(audio_in_sample_rate=8000))
+        frame = await serializer.deserialize(bytearray(b"\x01\x00"))
+        assert frame.audio == b"\x01\x00" and frame.sample_rate == 8000
+        assert await serializer.serialize(OutputAudioRawFrame(b"\x02\x00", 24000, 1)) == b"\x02\x00"
+        assert await serializer.serialize(InterruptionFrame()) is None
+
+    run(main())
+
+
+def test_serializer_for():
+    assert isinstance(serializer_for({"protocol": "raw"}), RawPCMSerializer)
+    assert isinstance(serializer_for({"protocol": "framed", "out_rate": "8000", "out_encoding": "mulaw"}),
+                      FramedPCMSerializer)
+    for params in ({"protocol": "grpc"}, {"protocol": "framed", "out_encoding": "opus"},
+                   {"protocol": "framed", "out_rate": "96000"}, {"protocol": "framed", "out_rate": "fast"}):
+        with pytest.raises(ValueError):
+            serializer_for(params)
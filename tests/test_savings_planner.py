@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta, timezone
+
+from ledger import Ledger
+from savings_planner import SavingsPlanner
+
+IST = timezone(timedelta(minutes=330))
+START = datetime(2025, 1, 6, 12, tzinfo=IST).timestamp()
+DAY = 86400
+
+
+def history(days, income=1000, expenses=500):
+    """Ledger with the same income and expenses every day; returns (ledger, now)."""
+    ledger = Ledger(tz_offset_minutes=330)
+    for day in range(days):
+        ledger.record("earning", income, timestamp=START + day * DAY)
+        ledger.record("expense", expenses, timestamp=START + day * DAY)
+    return ledger, START + (days - 1) * DAY
+
+
+def planner(**kwargs):
+    kwargs.setdefault("paths", 200)
+    kwargs.setdefault("horizon_days", 365)
+    kwargs.setdefault("save_share", 0.2)
+    kwargs.setdefault("confidence", 0.8)
+    return SavingsPlanner(seed=7, **kwargs)
+
+
+def test_no_income_no_plan():
+    assert planner().plan(Ledger(tz_offset_minutes=330)) is None
+    ledger, now = history(5, income=0, expenses=100)
+    assert planner().plan(ledger, now=now) is None
+
+
+def test_recommended_daily_is_a_share_of_the_median_surplus():
+    ledger, now = history(30)
+    plan = planner().plan(ledger, now=now)
+    assert plan.recommended_daily == 100
+    assert plan.expected_daily_saving == 100
+    assert plan.history_days == 30
+
+
+def test_recommended_daily_is_rounded_to_ten_rupees():
+    ledger, now = history(10, income=833, expenses=500)
+    assert planner().plan(ledger, now=now).recommended_daily == 70
+
+
+def test_thin_days_save_only_their_surplus():
+    ledger, now = history(10)
+    for day in range(0, 10, 2):
+        ledger.record("expense", 460, timestamp=START + day * DAY)  # surplus 40
+    plan = planner().plan(ledger, now=now)
+    # Median surplus over 10 days is (40 + 500) / 2 = 270, 20% of it 54 -> 50
+    assert plan.recommended_daily == 50
+    assert plan.expected_daily_saving == 45
+
+
+def test_steady_savings_reach_a_goal_on_a_fixed_day():
+    ledger, now = history(28)
+    plan = planner().plan(ledger, [{"goal": "phone", "target_amount": 1000}], now=now)
+    (goal,) = plan.goals
+    assert (goal.goal, goal.target_amount) == ("phone", 1000)
+    assert goal.days_median == goal.days_safe == 10
+    assert goal.probability == 1.0
+
+
+def test_goals_share_savings_until_one_is_done():
+    ledger, now = history(28)
+    goals = [{"goal": "bike", "target_amount": 1000}, {"goal": "phone", "target_amount": 700}]
+    bike, phone = planner().plan(ledger, goals, now=now).goals
+    # 100/day split in two: phone needs 1400 saved in total, bike 700 + 1000
+    assert phone.days_median == 14
+    assert bike.days_median == 17
+
+
+def test_goal_beyond_the_horizon():
+    ledger, now = history(28)
+    (goal,) = planner(horizon_days=30).plan(ledger, [{"goal": "house", "target_amount": 500000}], now=now).goals
+    assert goal.days_median is None
+    assert goal.days_safe is None
+    assert goal.probability == 0.0
+
+
+def test_goals_without_a_target_are_skipped():
+    ledger, now = history(7)
+    plan = planner().plan(ledger, [{"goal": "someday"}, {"goal": "bike", "target_amount": 0}], now=now)
+    assert plan.goals == []
+
+
+def test_no_surplus_gives_no_dates():
+    ledger, now = history(14, income=500, expenses=600)
+    (goal,) = planner().plan(ledger, [{"goal": "bike", "target_amount": 1000}], now=now).goals
+    assert goal.days_median is None and goal.probability == 0.0
+
+
+def test_variable_income_spreads_the_dates():
+    ledger = Ledger(tz_offset_minutes=330)
+    for day in range(28):
+        # Works three days out of four
+        income = 0 if day % 4 == 3 else 1200
+        ledger.record("earning", income, timestamp=START + day * DAY)
+        ledger.record("expense", 400, timestamp=START + day * DAY)
+    now = START + 27 * DAY
+    (goal,) = planner().plan(ledger, [{"goal": "bike", "target_amount": 5000}], now=now).goals
+    assert goal.probability == 1.0
+    assert goal.days_median <= goal.days_safe
+
+
+def test_figures_reported_today_fill_an_empty_day():
+    ledger = Ledger(tz_offset_minutes=330)
+    plan = planner().plan(ledger, today=(1500.0, 500.0), now=START)
+    assert plan.recommended_daily == 200
+    assert plan.history_days == 1
+
+
+def test_plans_are_cached_until_the_ledger_changes():
+    ledger, now = history(14)
+    savings = planner()
+    goals = [{"goal": "bike", "target_amount": 1000}]
+    plan = savings.plan(ledger, goals, now=now)
+    assert savings.plan(ledger, goals, now=now) is plan
+    assert savings.plan(ledger, [{"goal": "bike", "target_amount": 2000}], now=now) is not plan
+    ledger.record("earning", 100, timestamp=now)
+    assert savings.plan(ledger, goals, now=now) is not plan
+
+
+def test_seeded_plans_are_reproducible():
+    ledger = Ledger(tz_offset_minutes=330)
+    for day in range(21):
+        ledger.record("earning", 600 + (day * 137) % 900, timestamp=START + day * DAY)
+    now = START + 20 * DAY
+    goals = [{"goal": "bike", "target_amount": 8000}]
+    first = planner().plan(ledger, goals, now=now).to_dict()
+    assert planner().plan(ledger, goals, now=now).to_dict() == first
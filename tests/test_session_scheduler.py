@@ -0,0 +1,173 @@
+import asyncio
+
+import pytest
+
+from session_scheduler import (
+    CLOSE_SERVICE_RESTART,
+    CLOSE_TRY_AGAIN_LATER,
+    SessionRejected,
+    SessionScheduler,
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def settle():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_admits_up_to_the_cap():
+    async def main():
+        scheduler = SessionScheduler(max_sessions=2, max_queue=0, queue_timeout=1)
+        await scheduler.acquire()
+        await scheduler.acquire()
+        assert scheduler.active == 2
+        with pytest.raises(SessionRejected) as rejected:
+            await scheduler.acquire()
+        assert rejected.value.reason == "queue_full"
+        assert rejected.value.code == CLOSE_TRY_AGAIN_LATER
+        scheduler.release()
+        await scheduler.acquire()
+        assert scheduler.active == 2
+
+    run(main())
+
+
+def test_waiters_are_admitted_in_fifo_order():
+    async def main():
+        scheduler = SessionScheduler(max_sessions=1, max_queue=3, queue_timeout=5)
+        await scheduler.acquire()
+        admitted = []
+
+        async def connect(name):
+            await scheduler.acquire()
+            admitted.append(name)
+
+        tasks = [asyncio.create_task(connect(name)) for name in "abc"]
+        await settle()
+        assert scheduler.queued == 3
+
+        for expected in (["a"], ["a", "b"], ["a", "b", "c"]):
+            scheduler.release()
+            await settle()
+            assert admitted == expected
+            # The slot is handed over, never freed in between
+            assert scheduler.active == 1
+        await asyncio.gather(*tasks)
+
+    run(main())
+
+
+def test_new_connection_does_not_jump_the_queue():
+    async def main():
+        scheduler = SessionScheduler(max_sessions=1, max_queue=2, queue_timeout=5)
+        await scheduler.acquire()
+        first = asyncio.create_task(scheduler.acquire())
+        await settle()
+        scheduler.release()
+        # The slot now belongs to the waiter, even before it has run
+        late = asyncio.create_task(scheduler.acquire())
+        await settle()
+        assert first.done() and not late.done()
+        late.cancel()
+
+    run(main())
+
+
+def test_queue_timeout():
+    async def main():
+        scheduler = SessionScheduler(max_sessions=1, max_queue=1, queue_timeout=0.05)
+        await scheduler.acquire()
+        with pytest.raises(SessionRejected) as rejected:
+            await scheduler.acquire()
+        assert rejected.value.reason == "queue_timeout"
+        assert rejected.value.code == CLOSE_TRY_AGAIN_LATER
+        assert scheduler.queued == 0
+        scheduler.release()
+        assert scheduler.active == 0
+
+    run(main())
+
+
+def test_drain_rejects_new_and_queued_connections():
+    async def main():
+        scheduler = SessionScheduler(max_sessions=1, max_queue=2, queue_timeout=5)
+        await scheduler.acquire()
+        queued = asyncio.create_task(scheduler.acquire())
+        await settle()
+
+        scheduler.start_drain()
+        with pytest.raises(SessionRejected) as rejected:
+            await queued
+        assert rejected.value.reason == "draining"
+        assert rejected.value.code == CLOSE_SERVICE_RESTART
+        with pytest.raises(SessionRejected) as rejected:
+            await scheduler.acquire()
+        assert rejected.value.code == CLOSE_SERVICE_RESTART
+
+        # Active calls run to completion
+        assert scheduler.active == 1
+        assert not await scheduler.wait_idle(timeout=0.01)
+        scheduler.release()
+        assert await scheduler.wait_idle(timeout=0.01)
+
+        scheduler.resume()
+        await scheduler.acquire()
+        assert scheduler.active == 1
+
+    run(main())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        scheduler = SessionScheduler(max_sessions=1, max_queue=1, queue_timeout=5)
+        await scheduler.acquire()
+        waiter = asyncio.create_task(scheduler.acquire())
+        await settle()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.queued == 0
+        scheduler.release()
+        assert scheduler.active == 0
+
+    run(main())
+
+
+def test_slot_handed_to_a_cancelled_waiter_is_not_lost():
+    async def main():
+        scheduler = SessionScheduler(max_sessions=1, max_queue=1, queue_timeout=5)
+        await scheduler.acquire()
+        waiter = asyncio.create_task(scheduler.acquire())
+        await settle()
+        scheduler.release()
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # acquire() gave the slot back
+            assert scheduler.active == 0
+        else:
+            # wait_for() let the admission win over the cancellation; the
+            # caller owns the slot
+            assert scheduler.active == 1
+            scheduler.release()
+            assert scheduler.active == 0
+
+    run(main())
+
+
+def test_session_context_manager_releases_on_error():
+    async def main():
+        scheduler = SessionScheduler(max_sessions=1, max_queue=0, queue_timeout=1)
+        with pytest.raises(RuntimeError):
+            async with scheduler.session():
+                assert scheduler.active == 1
+                raise RuntimeError("bot crashed")
+        assert scheduler.active == 0
+        assert scheduler.stats()["active"] == 0
+
+    run(main())
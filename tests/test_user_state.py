@@ -0,0 +1,293 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from pipecat.frames.frames import Frame, LLMContextFrame, StartFrame
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineTask
+from pipecat.processors.aggregators.llm_context import LLMContext
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from ledger import Ledger
+from user_state import (
+    HISTORY_PREFIX,
+    MAX_GOALS,
+    UserHistory,
+    UserStateCache,
+    merge_session,
+    seed_ledger,
+)
+
+NOW = datetime(2025, 1, 6, 12, tzinfo=timezone(timedelta(minutes=330))).timestamp()
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setenv("USER_STATE_CACHE", "1")
+
+
+def session_ledger(*amounts):
+    ledger = Ledger(tz_offset_minutes=330)
+    for amount in amounts:
+        ledger.record("earning", amount, timestamp=NOW)
+    return ledger
+
+
+def session(*amounts, goals=(), concepts=(), stress=0):
+    return {
+        "finance": {"ledger": session_ledger(*amounts)} if amounts else {},
+        "goals": [{"goal": g, "target_amount": t} for g, t in goals],
+        "concepts_explained": [{"topic": topic} for topic in concepts],
+        "mood_log": [{"type": "stress"}] * stress + [{"type": "calm"}],
+    }
+
+
+# --------------------------------------------------------------------
+# merge_session / seed_ledger
+# --------------------------------------------------------------------
+
+
+def test_first_session_creates_a_profile():
+    profile = merge_session(None, session(1800, goals=[("Bike", 60000)], concepts=["sip"], stress=2))
+    assert profile["calls"] == 1
+    assert profile["earnings"] == {"count": 1, "total": 1800, "last": 1800}
+    assert "net_today" not in profile
+    assert profile["goals"] == [{"goal": "Bike", "target_amount": 60000}]
+    assert profile["concepts_explained"] == ["sip"]
+    assert profile["stressful_moments"] == 2
+    assert Ledger.from_dict(profile["ledger"]).total("earning") == 1800
+
+
+def test_later_sessions_accumulate():
+    profile = merge_session(None, session(1000, goals=[("bike", 50000)], concepts=["sip", "fd"], stress=1))
+    profile = merge_session(profile, session(500, goals=[("Bike", 60000), ("phone", 15000)], concepts=["sip"]))
+    assert profile["calls"] == 2
+    assert profile["earnings"]["total"] == 1500
+    # Goals are matched case-insensitively; the latest version wins
+    assert profile["goals"] == [
+        {"goal": "Bike", "target_amount": 60000},
+        {"goal": "phone", "target_amount": 15000},
+    ]
+    # Re-explained concepts move to the end
+    assert profile["concepts_explained"] == ["fd", "sip"]
+    assert profile["stressful_moments"] == 1
+
+
+def test_profile_lists_are_bounded():
+    goals = [(f"goal {i}", i * 1000) for i in range(MAX_GOALS + 3)]
+    profile = merge_session(None, session(goals=goals))
+    assert [g["goal"] for g in profile["goals"]] == [g for g, _ in goals[-MAX_GOALS:]]
+
+
+def test_merge_does_not_modify_the_profile():
+    profile = merge_session(None, session(100))
+    before = dict(profile)
+    merge_session(profile, session(200))
+    assert profile == before
+
+
+def test_seed_ledger_then_merge_counts_each_entry_once():
+    profile = merge_session(None, session(1000, 500))
+    state = session(300)  # recorded before the profile arrived
+    seed_ledger(profile, state)
+    finance = state["finance"]
+    assert finance["ledger_base"] == 2
+    assert finance["ledger"].total("earning") == 1800
+
+    finance["ledger"].record("earning", 200, timestamp=NOW)
+    profile = merge_session(profile, state)
+    assert profile["earnings"] == {"count": 4, "total": 2000, "last": 200}
+
+
+def test_seed_ledger_twice_keeps_session_entries():
+    profile = merge_session(None, session(1000))
+    state = session(50)
+    seed_ledger(profile, state)
+    seed_ledger(profile, state)
+    assert state["finance"]["ledger"].total("earning") == 1050
+    assert merge_session(profile, state)["earnings"]["total"] == 1050
+
+
+def test_seed_ledger_without_saved_entries():
+    state = session(50)
+    ledger = state["finance"]["ledger"]
+    seed_ledger({"calls": 1}, state)
+    assert state["finance"]["ledger"] is ledger
+    assert "ledger_base" not in state["finance"]
+
+
+# --------------------------------------------------------------------
+# UserStateCache
+# --------------------------------------------------------------------
+
+
+def test_save_then_load(tmp_path):
+    async def main():
+        cache = UserStateCache(directory=str(tmp_path), max_users=2)
+        assert await cache.load("+91 98765 43210") is None
+        await cache.save_session("+91 98765 43210", session(700, goals=[("bike", 1)]))
+
+        fresh = UserStateCache(directory=str(tmp_path), max_users=2)
+        profile = await fresh.load("+91 98765 43210")
+        assert profile["calls"] == 1
+        assert profile["goals"] == [{"goal": "bike", "target_amount": 1}]
+
+    asyncio.run(main())
+
+
+def test_memory_cache_is_bounded(tmp_path):
+    async def main():
+        cache = UserStateCache(directory=str(tmp_path), max_users=1)
+        await cache.save_session("a", session(1))
+        await cache.save_session("b", session(2))
+        assert list(cache._profiles) == ["b"]
+        assert (await cache.load("a"))["calls"] == 1
+
+        uncached = UserStateCache(directory=str(tmp_path), max_users=0)
+        await uncached.save_session("a", session(1))
+        assert not uncached._profiles
+
+    asyncio.run(main())
+
+
+def test_concurrent_saves_are_all_merged(tmp_path):
+    async def main():
+        cache = UserStateCache(directory=str(tmp_path), max_users=0)
+        await asyncio.gather(
+            *(cache.save_session("u", session(100, goals=[(f"goal {i}", i)])) for i in range(MAX_GOALS))
+        )
+        profile = await cache.load("u")
+        assert profile["calls"] == MAX_GOALS
+        assert profile["earnings"]["total"] == 100 * MAX_GOALS
+        assert len(profile["goals"]) == MAX_GOALS
+        assert not cache._locks
+
+    asyncio.run(main())
+
+
+def test_unreadable_profile_is_treated_as_new(tmp_path):
+    async def main():
+        cache = UserStateCache(directory=str(tmp_path), max_users=0)
+        path = tmp_path / "profile.json"
+        cache._path = lambda user_id: str(path)
+        path.write_text("{not json")
+        assert await cache.load("u") is None
+
+    asyncio.run(main())
+
+
+# --------------------------------------------------------------------
+# UserHistory
+# --------------------------------------------------------------------
+
+
+async def saved_cache(tmp_path):
+    cache = UserStateCache(directory=str(tmp_path), max_users=4)
+    await cache.save_session("u", session(900, goals=[("bike", 60000)]))
+    return cache
+
+
+def test_profile_ready_before_the_greeting(tmp_path):
+    async def main():
+        history = UserHistory("u", await saved_cache(tmp_path))
+        await asyncio.sleep(0)
+        state = {}
+        node = history.attach({"name": "entry"}, state)
+        assert node["task_messages"][-1]["content"].startswith(HISTORY_PREFIX)
+        assert state["history"]["calls"] == 1
+        assert state["finance"]["ledger"].total("earning") == 900
+        assert history.apply_late(LLMContext()) is True
+
+    asyncio.run(main())
+
+
+def test_late_profile_is_added_at_the_next_turn(tmp_path):
+    async def main():
+        cache = await saved_cache(tmp_path)
+        loaded = asyncio.Event()
+        load = cache.load
+
+        async def slow_load(user_id):
+            await loaded.wait()
+            return await load(user_id)
+
+        cache.load = slow_load
+        history = UserHistory("u", cache)
+        state = {}
+        node = history.attach({"name": "entry"}, state)
+        assert "task_messages" not in node
+        assert state == {"user_id": "u"}
+
+        context = LLMContext([{"role": "system", "content": "persona"}, {"role": "user", "content": "hi"}])
+        assert history.apply_late(context) is False
+        loaded.set()
+        await asyncio.sleep(0.05)
+
+        assert history.apply_late(context) is True
+        messages = context.get_messages()
+        assert messages[1]["content"].startswith(HISTORY_PREFIX)
+        # The turn still ends with the caller's message for the processors
+        # after this one
+        assert messages[-1] == {"role": "user", "content": "hi"}
+        assert state["finance"]["ledger"].total("earning") == 900
+        # Applied once
+        assert history.apply_late(context) is True
+        assert len(context.get_messages()) == 3
+
+    asyncio.run(main())
+
+
+def test_anonymous_callers_have_no_history(tmp_path):
+    async def main():
+        cache = UserStateCache(directory=str(tmp_path))
+        history = UserHistory(None, cache)
+        state = {}
+        assert history.attach({"name": "entry"}, state) == {"name": "entry"}
+        assert state == {}
+        await history.save(session(100))
+        assert not list(tmp_path.iterdir())
+
+    asyncio.run(main())
+
+
+class LastRole(FrameProcessor):
+    """Records the last message role of each context, as the router sees it."""
+
+    def __init__(self):
+        super().__init__()
+        self.started = asyncio.Event()
+        self.roles = []
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, StartFrame):
+            self.started.set()
+        elif isinstance(frame, LLMContextFrame):
+            self.roles.append(frame.context.get_messages()[-1]["role"])
+        await self.push_frame(frame, direction)
+
+
+def test_late_history_processor_keeps_the_user_turn_last(tmp_path):
+    async def main():
+        cache = await saved_cache(tmp_path)
+        history = UserHistory("u", cache)
+        state = {}
+        history.attach({"name": "entry"}, state)  # before the load finished
+        await asyncio.sleep(0.05)
+
+        downstream = LastRole()
+        task = PipelineTask(Pipeline([history.processor(), downstream]))
+        runner = asyncio.create_task(PipelineRunner(handle_sigint=False).run(task))
+        await asyncio.wait_for(downstream.started.wait(), 10)
+        context = LLMContext([{"role": "user", "content": "hi"}])
+        await task.queue_frame(LLMContextFrame(context))
+        await asyncio.sleep(0.05)
+        await task.cancel()
+        await runner
+
+        assert downstream.roles == ["user"]
+        assert context.get_messages()[0]["content"].startswith(HISTORY_PREFIX)
+
+    asyncio.run(main())
@@ -0,0 +1,571 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Phrase-level TTS audio cache.
+
+The coach says the same short sentences again and again ("Got it.", stock
+empathy openers, the goodbye in the end node), and every one used to be
+synthesized over the network. ``TTSCacheMixin`` sits in front of a TTS
+service's ``run_tts``: a sentence whose audio is cached streams straight from
+memory, and anything else goes to the provider as before.
+
+Entries are keyed by normalized text, voice, model, sample rate and the
+voice settings that change the audio (language, pitch, pace, loudness,
+preprocessing). They live
+in an in-memory LRU and, with ``TTS_CACHE_DIR`` set, in an on-disk store of raw
+PCM files that are memory-mapped on first use. The disk store is shared by
+worker processes and survives restarts.
+
+A sentence is cached once it has been requested ``TTS_CACHE_PROMOTE_AFTER``
+times. Sentences with digits are never cached: amounts are specific to a user
+and rarely repeat. Text pinned with ``TTSCache.pin`` (cached concept
+explanations, see concept_cache.py) is the exception: any sentence of it is
+cached on its first request, digits or not. Services that return audio inline from ``run_tts`` cache
+what they produced. The Sarvam WebSocket service delivers audio out of band,
+so ``CachedSarvamTTSService`` fills the cache with a separate request to
+Sarvam's HTTP API. For the same reason it serves a hit only while nothing is
+still being streamed for the current response; otherwise the cached audio
+could overtake earlier sentences.
+
+Sessions and warmup take their voice settings from ``session_tts_params()``,
+so warmed-up entries are the ones sessions look up.
+
+The phrase list in ``TTS_CACHE_PHRASES`` (one per line; defaults to
+``DEFAULT_PHRASES``) is presynthesized at server startup, or ahead of time
+with::
+
+    python tts_cache.py warmup --dir /var/cache/nivest-tts
+
+Configuration:
+    TTS_CACHE: Set to 0 to disable the cache.
+    TTS_CACHE_DIR: Directory for the on-disk store (default: memory only).
+    TTS_CACHE_MEMORY_MB: In-memory LRU size (default 32).
+    TTS_CACHE_MAX_CHARS: Longest cacheable sentence (default 120).
+    TTS_CACHE_PROMOTE_AFTER: Requests before a sentence is cached (default 2).
+    TTS_CACHE_PHRASES: File with phrases to presynthesize, one per line.
+    TTS_CACHE_WARMUP: Set to 0 to skip the startup warmup.
+    TTS_SAMPLE_RATE: Sample rate used for warmup (default 24000, the
+        pipeline's output rate).
+    TTS_LANGUAGE: Language of the session TTS as a Pipecat language code
+        ("en", "hi", "ta", ...; default en).
+    TTS_PACE: Speaking pace of the session TTS (default 1.0).
+
+Metrics:
+    nivest_tts_cache_requests_total{result}: sentences served from the cache
+        ("hit") or sent to the provider ("miss").
+    nivest_tts_cache_fills_total{source}: entries added ("warmup", "inline",
+        "synthesized").
+    nivest_tts_cache_memory_bytes: audio held in the in-memory LRU.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import mmap
+import os
+import re
+import unicodedata
+from collections import OrderedDict
+from abc import ABC, abstractmethod
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    ErrorFrame,
+    Frame,
+    InterruptionFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.services.sarvam.tts import SarvamTTSService, language_to_sarvam_language
+from pipecat.transcriptions.language import Language
+
+from barge_in import StreamingTTSMixin
+from metrics import counter, gauge
+
+TTS_MODEL = "bulbul:v2"
+TTS_VOICE = "manisha"
+SARVAM_HTTP_URL = "https://api.sarvam.ai"
+
+DEFAULT_PHRASES = [
+    "Got it.",
+    "Okay.",
+    "Okay, got it.",
+    "I understand.",
+    "That makes sense.",
+    "Thank you for sharing that with me.",
+    "That sounds really stressful.",
+    "It's completely normal to feel this way.",
+    "A lot of people feel the same way.",
+    "You're not alone in this.",
+    "Let's take it one small step at a time.",
+    "Thanks for chatting with me today.",
+    "You can come back any day to talk about money again.",
+    "Take care!",
+]
+
+REQUESTS = counter(
+    "nivest_tts_cache_requests_total",
+    "Sentences served from the TTS cache or sent to the provider.",
+    ["result"],
+)
+FILLS = counter("nivest_tts_cache_fills_total", "Entries added to the TTS cache.", ["source"])
+MEMORY_BYTES = gauge("nivest_tts_cache_memory_bytes", "Audio held in the TTS cache LRU.")
+
+_WHITESPACE = re.compile(r"\s+")
+_DIGIT = re.compile(r"\d")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a sentence for cache lookups (case, width and spacing)."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+
+def cache_enabled() -> bool:
+    return os.getenv("TTS_CACHE", "1") != "0"
+
+
+# Entries of ``SarvamTTSService._settings`` that change the audio
+VOICE_SETTINGS = ("target_language_code", "pitch", "pace", "loudness", "enable_preprocessing")
+
+
+def voice_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """The audio-changing part of a TTS service's settings, for cache keys."""
+    return {name: settings.get(name) for name in VOICE_SETTINGS}
+
+
+def session_tts_params() -> SarvamTTSService.InputParams:
+    """Voice parameters of the session TTS service (TTS_LANGUAGE, TTS_PACE)."""
+    language = Language(os.getenv("TTS_LANGUAGE", "en"))
+    if language_to_sarvam_language(language) is None:
+        raise ValueError(f"TTS_LANGUAGE={language.value!r} is not supported by Sarvam")
+    return SarvamTTSService.InputParams(language=language, pace=float(os.getenv("TTS_PACE", "1.0")))
+
+
+def sarvam_settings(params: SarvamTTSService.InputParams) -> Dict[str, Any]:
+    """``voice_settings`` of a ``SarvamTTSService`` (bulbul:v2) built with ``params``."""
+    return {
+        "target_language_code": language_to_sarvam_language(params.language) if params.language else "en-IN",
+        "pitch": params.pitch,
+        "pace": params.pace,
+        "loudness": params.loudness,
+        "enable_preprocessing": params.enable_preprocessing,
+    }
+
+
+# --------------------------------------------------------------------
+# Cache store
+# --------------------------------------------------------------------
+
+
+class TTSCache:
+    """In-memory LRU of PCM audio with an optional memory-mapped disk store."""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        memory_bytes: Optional[int] = None,
+        max_chars: Optional[int] = None,
+        promote_after: Optional[int] = None,
+    ):
+        """Initialize the cache.
+
+        Args:
+            directory: On-disk store. Defaults to TTS_CACHE_DIR; None keeps
+                entries in memory only.
+            memory_bytes: LRU capacity in bytes. Defaults to TTS_CACHE_MEMORY_MB.
+            max_chars: Longest cacheable sentence. Defaults to TTS_CACHE_MAX_CHARS.
+            promote_after: Requests before a sentence is cached. Defaults to
+                TTS_CACHE_PROMOTE_AFTER.
+        """
+        self.directory = directory or os.getenv("TTS_CACHE_DIR") or None
+        self.memory_bytes = memory_bytes or int(float(os.getenv("TTS_CACHE_MEMORY_MB", "32")) * 2**20)
+        self.max_chars = max_chars or int(os.getenv("TTS_CACHE_MAX_CHARS", "120"))
+        self.promote_after = promote_after or int(os.getenv("TTS_CACHE_PROMOTE_AFTER", "2"))
+        self._entries: "OrderedDict[str, bytes | mmap.mmap]" = OrderedDict()
+        self._size = 0
+        self._requests: "OrderedDict[str, int]" = OrderedDict()
+        self._filling = set()
+        self._pinned: "OrderedDict[str, None]" = OrderedDict()
+
+    @staticmethod
+    def key(
+        text: str, voice: str, model: str, sample_rate: int, settings: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Cache key of a sentence; ``settings`` are the ``voice_settings``."""
+        encoded = json.dumps(settings or {}, sort_keys=True, separators=(",", ":"))
+        raw = f"{model}|{voice}|{sample_rate}|{encoded}|{normalize_text(text)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def cacheable(self, text: str) -> bool:
+        normalized = normalize_text(text)
+        return 0 < len(normalized) <= self.max_chars and (
+            not _DIGIT.search(normalized) or self.pinned(text)
+        )
+
+    def pin(self, text: str):
+        """Mark text that is known to repeat; its sentences are cached right away."""
+        normalized = normalize_text(text)
+        self._pinned.pop(normalized, None)
+        self._pinned[normalized] = None
+        while len(self._pinned) > 256:
+            self._pinned.popitem(last=False)
+
+    def pinned(self, text: str) -> bool:
+        normalized = normalize_text(text)
+        return bool(normalized) and any(normalized in pinned for pinned in self._pinned)
+
+    def get(self, key: str) -> Optional[bytes | mmap.mmap]:
+        """Return cached PCM for ``key`` from memory or disk, or None."""
+        audio = self._entries.get(key)
+        if audio is not None:
+            self._entries.move_to_end(key)
+            return audio
+        audio = self._load(key)
+        if audio is not None:
+            self._remember(key, audio)
+        return audio
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries or (
+            self.directory is not None and os.path.exists(self._path(key))
+        )
+
+    def put(self, key: str, audio: bytes, source: str):
+        """Store PCM for ``key`` in memory and, if configured, on disk."""
+        if not audio:
+            return
+        if self.directory:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(audio)
+            os.replace(tmp, path)
+        self._remember(key, bytes(audio))
+        self._requests.pop(key, None)
+        FILLS.inc(source=source)
+
+    def note_request(self, key: str) -> bool:
+        """Count a miss for ``key``; True once it should be cached."""
+        count = self._requests.pop(key, 0) + 1
+        self._requests[key] = count
+        while len(self._requests) > 10_000:
+            self._requests.popitem(last=False)
+        return count >= self.promote_after
+
+    async def fill(self, key: str, text: str, synthesize: Callable[[str], Awaitable[bytes]], source: str):
+        """Synthesize ``text`` into the cache unless a fill is already running."""
+        if key in self._filling or key in self._entries:
+            return
+        self._filling.add(key)
+        try:
+            self.put(key, await synthesize(text), source=source)
+        except Exception as e:
+            logger.warning(f"TTS cache fill failed for {text!r}: {e}")
+        finally:
+            self._filling.discard(key)
+
+    async def warmup(
+        self,
+        phrases: Iterable[str],
+        synthesize: Callable[[str], Awaitable[bytes]],
+        voice: str = TTS_VOICE,
+        model: str = TTS_MODEL,
+        sample_rate: int = 24000,
+        settings: Optional[Dict[str, Any]] = None,
+        concurrency: int = 4,
+    ) -> int:
+        """Presynthesize ``phrases`` that are not cached yet.
+
+        ``voice``, ``model``, ``sample_rate`` and ``settings`` must be what
+        ``synthesize`` uses, so that the entries get the right keys.
+
+        Returns:
+            Number of phrases cached (already present or newly synthesized).
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(phrase: str):
+            key = self.key(phrase, voice, model, sample_rate, settings)
+            if self.get(key) is None:
+                async with semaphore:
+                    await self.fill(key, phrase, synthesize, source="warmup")
+            return key in self
+
+        results = await asyncio.gather(*(one(p) for p in phrases))
+        return sum(results)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.pcm")
+
+    def _load(self, key: str) -> Optional[mmap.mmap]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # missing or empty file
+            return None
+
+    def _remember(self, key: str, audio: bytes | mmap.mmap):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = audio
+        self._size += len(audio)
+        while self._size > self.memory_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+        MEMORY_BYTES.set(self._size)
+
+
+TTS_CACHE = TTSCache()
+
+
+def load_phrases(path: Optional[str] = None) -> List[str]:
+    """Read the warmup phrase list (TTS_CACHE_PHRASES, else DEFAULT_PHRASES)."""
+    path = path or os.getenv("TTS_CACHE_PHRASES")
+    if not path:
+        return list(DEFAULT_PHRASES)
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+# --------------------------------------------------------------------
+# TTS services
+# --------------------------------------------------------------------
+
+
+class TTSCacheMixin:
+    """Serves cached sentences from ``run_tts`` and fills the cache on repeats.
+
+    Mix in before a ``TTSService`` subclass whose ``run_tts`` returns the
+    audio. Services whose audio arrives outside ``run_tts`` (WebSocket
+    streaming) use ``StreamingTTSCacheMixin``.
+    """
+
+    streams_out_of_band = False
+    cache_chunk_secs = 0.5
+
+    def __init__(self, *args, tts_cache: Optional[TTSCache] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tts_cache = tts_cache or TTS_CACHE
+        self._remote_pending = False
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        if not cache_enabled():
+            async for frame in super().run_tts(text):
+                yield frame
+            return
+
+        cache = self._tts_cache
+        key = cache.key(text, self._voice_id, self.model_name, self.sample_rate, voice_settings(self._settings))
+        audio = None if self._remote_pending else cache.get(key)
+        if audio is not None:
+            REQUESTS.inc(result="hit")
+            logger.debug(f"{self}: TTS cache hit [{text}]")
+            async for frame in self._stream_cached(audio):
+                yield frame
+            return
+
+        REQUESTS.inc(result="miss")
+        promote = cache.cacheable(text) and (cache.pinned(text) or cache.note_request(key))
+        if self.streams_out_of_band:
+            self._remote_pending = True
+            if promote:
+                self.create_task(cache.fill(key, text, self.synthesize, source="synthesized"))
+            async for frame in super().run_tts(text):
+                yield frame
+            return
+
+        produced = bytearray()
+        failed = False
+        async for frame in super().run_tts(text):
+            if isinstance(frame, TTSAudioRawFrame):
+                produced.extend(frame.audio)
+            elif isinstance(frame, ErrorFrame):
+                failed = True
+            yield frame
+        if promote and not failed:
+            cache.put(key, bytes(produced), source="inline")
+
+    async def push_frame(self, frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM):
+        await super().push_frame(frame, direction)
+        if isinstance(frame, (TTSStoppedFrame, InterruptionFrame)):
+            # Nothing is streaming any more, so cached audio cannot overtake it
+            self._remote_pending = False
+
+    async def _stream_cached(self, audio) -> AsyncGenerator[Frame, None]:
+        yield TTSStartedFrame()
+        chunk = int(self.sample_rate * self.cache_chunk_secs) * 2
+        for start in range(0, len(audio), chunk):
+            yield TTSAudioRawFrame(bytes(audio[start : start + chunk]), self.sample_rate, 1)
+        if not self._push_stop_frames:
+            yield TTSStoppedFrame()
+
+
+
+class StreamingTTSCacheMixin(TTSCacheMixin, ABC):
+    """``TTSCacheMixin`` for services whose audio arrives outside ``run_tts``.
+
+    Misses are streamed by the service as usual; repeated sentences are
+    filled with a separate ``synthesize`` request.
+    """
+
+    streams_out_of_band = True
+
+    @abstractmethod
+    async def synthesize(self, text: str) -> bytes:
+        """Return PCM for ``text`` at the service's sample rate and voice settings."""
+
+async def sarvam_synthesize(
+    session,
+    text: str,
+    *,
+    api_key: str,
+    sample_rate: int,
+    voice: str = TTS_VOICE,
+    model: str = TTS_MODEL,
+    language: str = "en-IN",
+    pitch: float = 0.0,
+    pace: float = 1.0,
+    loudness: float = 1.0,
+    enable_preprocessing: bool = False,
+    base_url: str = SARVAM_HTTP_URL,
+) -> bytes:
+    """Synthesize ``text`` with Sarvam's HTTP API and return raw PCM16 mono."""
+    payload = {
+        "text": text,
+        "target_language_code": language,
+        "speaker": voice,
+        "pitch": pitch,
+        "pace": pace,
+        "loudness": loudness,
+        "sample_rate": sample_rate,
+        "enable_preprocessing": enable_preprocessing,
+        "model": model,
+    }
+    headers = {"api-subscription-key": api_key, "Content-Type": "application/json"}
+    async with session.post(f"{base_url}/text-to-speech", json=payload, headers=headers) as response:
+        if response.status != 200:
+            raise RuntimeError(f"Sarvam API error {response.status}: {await response.text()}")
+        data = await response.json()
+    audio = base64.b64decode(data["audios"][0])
+    # Strip the WAV header if present
+    return audio[44:] if audio.startswith(b"RIFF") else audio
+
+
+class CachedSarvamTTSService(StreamingTTSMixin, StreamingTTSCacheMixin, SarvamTTSService):
+    """Sarvam WebSocket TTS with the phrase cache in front of it and barge-in support."""
+
+    def __init__(self, *, flush_chunks: bool = False, **kwargs):
+        """Initialize the service.
+
+        Args:
+            flush_chunks: Ask Sarvam to synthesize each text chunk right away
+                instead of buffering it (use with ``aggregate_sentences=False``
+                behind ``speech_chunker.SpeechChunker``).
+            **kwargs: Passed to ``SarvamTTSService``.
+        """
+        super().__init__(**kwargs)
+        self._flush_chunks = flush_chunks
+        self._http_session = None
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        async for frame in super().run_tts(text):
+            yield frame
+        if self._flush_chunks and self._remote_pending:
+            await self.flush_audio()
+
+    async def drop_pending_audio(self):
+        # SarvamTTSService already reconnected if the bot was speaking
+        if not self._bot_speaking:
+            await self._disconnect()
+            await self._connect()
+
+    async def synthesize(self, text: str) -> bytes:
+        import aiohttp
+
+        if self._http_session is None:
+            self._http_session = aiohttp.ClientSession()
+        return await sarvam_synthesize(
+            self._http_session,
+            text,
+            api_key=self._api_key,
+            sample_rate=self.sample_rate,
+            voice=self._voice_id,
+            model=self.model_name,
+            language=self._settings["target_language_code"],
+            pitch=self._settings.get("pitch", 0.0),
+            pace=self._settings.get("pace", 1.0),
+            loudness=self._settings.get("loudness", 1.0),
+            enable_preprocessing=self._settings["enable_preprocessing"],
+        )
+
+    async def cleanup(self):
+        await super().cleanup()
+        if self._http_session is not None:
+            await self._http_session.close()
+            self._http_session = None
+
+
+# --------------------------------------------------------------------
+# Warmup
+# --------------------------------------------------------------------
+
+
+async def warmup_from_env(cache: Optional[TTSCache] = None, phrases_path: Optional[str] = None) -> int:
+    """Presynthesize the configured phrase list with Sarvam's HTTP API."""
+    import aiohttp
+
+    cache = cache or TTS_CACHE
+    api_key = os.getenv("SARVAM_API_KEY")
+    if not cache_enabled() or not api_key:
+        return 0
+    phrases = load_phrases(phrases_path)
+    sample_rate = int(os.getenv("TTS_SAMPLE_RATE", "24000"))
+    # The settings the session service is created with (nivest_bot.create_services)
+    settings = sarvam_settings(session_tts_params())
+    async with aiohttp.ClientSession() as session:
+
+        async def synthesize(text: str) -> bytes:
+            return await sarvam_synthesize(
+                session,
+                text,
+                api_key=api_key,
+                sample_rate=sample_rate,
+                language=settings["target_language_code"],
+                pitch=settings["pitch"],
+                pace=settings["pace"],
+                loudness=settings["loudness"],
+                enable_preprocessing=settings["enable_preprocessing"],
+            )
+
+        cached = await cache.warmup(phrases, synthesize, sample_rate=sample_rate, settings=settings)
+    logger.info(f"TTS cache warmup: {cached}/{len(phrases)} phrases cached")
+    return cached
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Presynthesize the TTS phrase cache.")
+    parser.add_argument("command", choices=["warmup"])
+    parser.add_argument("--phrases", help="Phrase file, one per line (default: TTS_CACHE_PHRASES)")
+    parser.add_argument("--dir", help="On-disk store (default: TTS_CACHE_DIR)")
+    args = parser.parse_args(argv)
+    directory = args.dir or os.getenv("TTS_CACHE_DIR")
+    if not directory:
+        parser.error("an on-disk store is needed: pass --dir or set TTS_CACHE_DIR")
+    asyncio.run(warmup_from_env(TTSCache(directory=directory), args.phrases))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Adaptive end-of-turn detection from VAD, STT endpointing and transcript cues.
+
+With a fixed ``VADParams.stop_secs`` every turn waits the same silence (0.8 s
+by default) before the bot answers. That is too long for a caller who has
+clearly finished ("Emergency fund kya hota hai?"). It is too short for a
+caller on a noisy road who speaks in short bursts. ``AdaptiveTurnAnalyzer``
+is a pipecat turn analyzer (``TransportParams.turn_analyzer``). The VAD runs
+with a short ``stop_secs`` and only reports speech and silence. The analyzer
+decides how much silence ends the turn, recomputing it on every audio frame
+from:
+
+- the caller's pace: the pauses they leave inside their own turns. The wait
+  starts at ``TURN_DEFAULT_WAIT_SECS`` and after a few turns becomes the
+  90th percentile of those pauses plus a margin;
+- Deepgram endpointing: a final result with ``speech_final`` set after the
+  silence began (Deepgram runs with ``endpointing`` when this detector is on);
+- the transcript: the text received since the silence began. Sentence-final
+  punctuation, a question ending in its verb, or a number with its unit
+  ("four hundred rupaye") shorten the wait. A trailing connective, filler or
+  comma ("aur", "lekin", "umm", "because") lengthens it;
+- the VAD's speech probability during the silence: a silence that stays
+  close to the threshold (breathing, murmuring, road noise) waits longer than
+  a clean one.
+
+If the caller starts speaking again within ``TURN_CUTOFF_WINDOW_SECS`` of an
+ended turn, the turn was cut off. This is counted, and the whole pause is
+learned as an in-turn pause, so the next waits grow.
+
+Transcripts come from the processor returned by ``listener()``, which sits
+right after the STT. ``speech_params()`` builds the transport's VAD and
+turn analyzer for ``TURN_DETECTION``; whoever builds the transport passes
+the analyzer on to ``run_bot(..., turn_analyzer=...)``, which adds its
+listener to the pipeline.
+
+Configuration:
+    TURN_DETECTION: "vad" (default: fixed Silero stop_secs) or "adaptive".
+    TURN_VAD_STOP_SECS: VAD stop_secs with the adaptive detector (default 0.2).
+    TURN_MIN_WAIT_SECS: Shortest silence that ends a turn (default 0.3).
+    TURN_MAX_WAIT_SECS: Longest silence before a turn ends anyway (default 1.2).
+    TURN_DEFAULT_WAIT_SECS: Wait before the caller's pace is known (default 0.8).
+    TURN_CUTOFF_WINDOW_SECS: Speech this soon after an ended turn counts as a
+        cut-off (default 1.0).
+    DEEPGRAM_ENDPOINTING_MS: Deepgram endpointing with the adaptive detector
+        (default 300).
+
+Metrics:
+    nivest_turn_end_wait_seconds{cue}: silence waited before ending a turn, by
+        the strongest cue at that moment ("endpoint", "complete",
+        "incomplete" or "none").
+    nivest_turn_cutoffs_total: turns the caller continued right after they
+        were ended.
+"""
+
+import os
+import re
+from collections import deque
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from pipecat.audio.turn.base_turn_analyzer import BaseTurnAnalyzer, BaseTurnParams, EndOfTurnState
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams
+from pipecat.frames.frames import Frame, InterimTranscriptionFrame, TranscriptionFrame
+from pipecat.metrics.metrics import MetricsData
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from metrics import counter, histogram
+
+WAIT_SECONDS = histogram(
+    "nivest_turn_end_wait_seconds",
+    "Silence waited before ending a user turn.",
+    ["cue"],
+    buckets=(0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 1.0, 1.2, 1.5),
+)
+CUTOFFS = counter("nivest_turn_cutoffs_total", "User turns continued right after they were ended.")
+
+# Silences shorter than this inside a turn are gaps between words, not pauses
+MIN_PAUSE_SECS = 0.1
+# In-turn pauses needed before the pace replaces the default wait
+MIN_PAUSES = 3
+PAUSE_HISTORY = 20
+
+# Wait multipliers per cue
+ENDPOINT_FACTOR = 0.5
+COMPLETE_FACTOR = 0.75
+INCOMPLETE_FACTOR = 1.5
+# Up to this much longer when the silence's speech probability sits just
+# under the VAD threshold
+MURMUR_FACTOR = 0.5
+
+
+def adaptive_turn_detection_enabled() -> bool:
+    return os.getenv("TURN_DETECTION", "vad").lower() == "adaptive"
+
+
+def deepgram_endpointing_ms() -> Optional[int]:
+    """Deepgram ``endpointing`` for ``LiveOptions``, or None to keep its default."""
+    if not adaptive_turn_detection_enabled():
+        return None
+    return int(os.getenv("DEEPGRAM_ENDPOINTING_MS", "300"))
+
+
+# --------------------------------------------------------------------
+# Transcript cues
+# --------------------------------------------------------------------
+
+# Words a sentence does not end on (English, Hinglish and Hindi)
+CONTINUATIONS = {
+    "and", "but", "or", "so", "because", "if", "then", "the", "a", "an", "to", "of", "for", "with",
+    "my", "i", "is", "was", "like", "um", "umm", "uh", "uhh", "hmm", "matlab", "aur", "lekin", "par",
+    "magar", "toh", "kyunki", "ki", "ke", "ka", "ko", "se", "mein", "main", "mai", "jo", "ya",
+    "phir", "fir", "bhi", "woh", "wo", "ye", "yeh", "mera", "meri", "mere", "और", "लेकिन", "पर",
+    "तो", "क्योंकि", "कि", "के", "का", "को", "से", "में", "या", "फिर",
+}
+QUESTION_WORDS = {
+    "what", "how", "why", "when", "where", "which", "who", "should", "can", "kya", "kaise", "kyun",
+    "kyon", "kab", "kahan", "kitna", "kitne", "kitni", "kaun", "kaunsa", "क्या", "कैसे", "क्यों",
+    "कब", "कहाँ", "कितना", "कौन",
+}
+# Words Hinglish/Hindi sentences (and questions) usually end on
+SENTENCE_ENDINGS = {
+    "hai", "hain", "tha", "thi", "nahi", "nahin", "hoga", "hogi", "hoon", "hu", "hun", "karu", "karun",
+    "karoon", "chahiye", "na", "yaar", "please", "thanks", "okay", "ok", "है", "हैं", "था", "थी",
+    "होगा", "हूँ", "चाहिए",
+}
+UNITS = {
+    "rupaye", "rupay", "rupees", "rupee", "rs", "inr", "hundred", "thousand", "lakh", "lakhs",
+    "crore", "hazaar", "hazar", "sau", "percent", "रुपये", "सौ", "हज़ार", "हजार", "लाख",
+}
+NUMBER_WORDS = {
+    "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven", "twelve",
+    "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen", "twenty",
+    "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety", "ek", "do", "teen", "char",
+    "paanch", "das", "bees", "pachas",
+}
+
+_WORD = re.compile(r"[^\W_]+|[₹]?\d[\d,.]*", re.UNICODE)
+
+
+def _is_number(word: str) -> bool:
+    return word[:1].isdigit() or word.startswith("₹") or word in NUMBER_WORDS
+
+
+def transcript_cue(text: str) -> str:
+    """Classify how a transcript ends: "complete", "incomplete" or "none".
+
+    Args:
+        text: The user's text so far in this turn.
+    """
+    stripped = text.strip()
+    words = _WORD.findall(stripped.lower())
+    if not words:
+        return "none"
+    last = words[-1]
+    if stripped.endswith((",", "…", "...", "-", ":")) or last in CONTINUATIONS:
+        return "incomplete"
+    if last in UNITS and len(words) > 1 and (_is_number(words[-2]) or words[-2] in UNITS):
+        return "complete"
+    if _is_number(last):
+        return "none"  # may be followed by its unit
+    if stripped.endswith((".", "?", "!", "।", "॥")):
+        return "complete"
+    if last in QUESTION_WORDS and len(words) > 1:
+        return "complete"  # tag question ("theek hai kya")
+    if last in SENTENCE_ENDINGS:
+        return "complete"  # verb-final, questions included ("kya hota hai")
+    return "none"
+
+
+# --------------------------------------------------------------------
+# Turn analyzer
+# --------------------------------------------------------------------
+
+
+class AdaptiveTurnParams(BaseTurnParams):
+    """Waits of the adaptive turn analyzer, in seconds of silence."""
+
+    min_wait_secs: float = 0.3
+    max_wait_secs: float = 1.2
+    default_wait_secs: float = 0.8
+    pause_margin_secs: float = 0.15
+    cutoff_window_secs: float = 1.0
+
+    @classmethod
+    def from_env(cls) -> "AdaptiveTurnParams":
+        return cls(
+            min_wait_secs=float(os.getenv("TURN_MIN_WAIT_SECS", "0.3")),
+            max_wait_secs=float(os.getenv("TURN_MAX_WAIT_SECS", "1.2")),
+            default_wait_secs=float(os.getenv("TURN_DEFAULT_WAIT_SECS", "0.8")),
+            cutoff_window_secs=float(os.getenv("TURN_CUTOFF_WINDOW_SECS", "1.0")),
+        )
+
+
+class AdaptiveTurnAnalyzer(BaseTurnAnalyzer):
+    """Ends user turns after a silence sized by pace, endpointing and transcript.
+
+    Time is measured in audio (the frames passed to ``append_audio``), so the
+    analyzer behaves the same live and when a recording is replayed faster
+    than real time.
+    """
+
+    def __init__(
+        self,
+        *,
+        vad: Optional[VADAnalyzer] = None,
+        params: Optional[AdaptiveTurnParams] = None,
+        sample_rate: Optional[int] = None,
+    ):
+        """Initialize the analyzer.
+
+        Args:
+            vad: The transport's VAD analyzer. The transport reports silence
+                only after its ``stop_secs``, which are counted in; its
+                ``last_confidence`` (see vad_pool.py) is read during silences.
+            params: Waits. Defaults to ``AdaptiveTurnParams.from_env()``.
+            sample_rate: Audio sample rate; set by the transport otherwise.
+        """
+        super().__init__(sample_rate=sample_rate)
+        self._vad = vad
+        self._params = params or AdaptiveTurnParams.from_env()
+        self._pauses = deque(maxlen=PAUSE_HISTORY)
+
+        self._clock = 0.0
+        self._speech_triggered = False
+        self._silence = 0.0
+        self._silence_confidence: list = []
+        self._text = ""
+        self._text_at: Optional[float] = None
+        self._speech_final_at: Optional[float] = None
+        self._ended_at: Optional[float] = None
+        self._ended_wait = 0.0
+
+    @property
+    def speech_triggered(self) -> bool:
+        return self._speech_triggered
+
+    @property
+    def params(self) -> AdaptiveTurnParams:
+        return self._params
+
+    @property
+    def pace_secs(self) -> float:
+        """Silence that ends a turn for this caller before any cues."""
+        if len(self._pauses) < MIN_PAUSES:
+            return self._params.default_wait_secs
+        return float(np.quantile(self._pauses, 0.9)) + self._params.pause_margin_secs
+
+    def listener(self) -> "TurnCueListener":
+        return TurnCueListener(self)
+
+    def on_transcript(self, text: str, final: bool, speech_final: bool = False):
+        """Record the user's latest text (and Deepgram's endpoint flag)."""
+        text = text.strip()
+        if not text:
+            return
+        self._text = text
+        self._text_at = self._clock
+        if final and speech_final:
+            self._speech_final_at = self._clock
+
+    def wait_secs(self) -> Tuple[float, str]:
+        """Silence that ends the current turn, and the cue that sized it."""
+        silence_started = self._clock - self._silence
+        factor, cue = 1.0, "none"
+        if self._text_at is not None and self._text_at >= silence_started:
+            cue = transcript_cue(self._text)
+            speech_final = self._speech_final_at is not None and self._speech_final_at >= silence_started
+            # Deepgram endpoints on most pauses longer than its endpointing,
+            # so it only counts together with text that reads as finished
+            if cue == "complete" and speech_final:
+                factor, cue = ENDPOINT_FACTOR, "endpoint"
+            elif cue == "complete":
+                factor = COMPLETE_FACTOR
+            elif cue == "incomplete":
+                factor = INCOMPLETE_FACTOR
+
+        if self._silence_confidence and self._vad is not None:
+            threshold = self._vad.params.confidence
+            murmur = float(np.mean(self._silence_confidence)) / threshold if threshold else 0.0
+            factor *= 1.0 + MURMUR_FACTOR * min(1.0, max(0.0, murmur - 0.3) / 0.7)
+
+        wait = min(self._params.max_wait_secs, max(self._params.min_wait_secs, self.pace_secs * factor))
+        return wait, cue
+
+    def append_audio(self, buffer: bytes, is_speech: bool) -> EndOfTurnState:
+        secs = len(buffer) / (2 * self.sample_rate) if self.sample_rate else 0.0
+        self._clock += secs
+
+        if is_speech:
+            if self._ended_at is not None and self._clock - self._ended_at <= self._params.cutoff_window_secs:
+                CUTOFFS.inc()
+                self._pauses.append(self._ended_wait + self._clock - self._ended_at)
+                logger.debug(f"Turn analyzer: turn cut off, pace now {self.pace_secs:.2f}s")
+            self._ended_at = None
+            if self._speech_triggered and self._silence >= MIN_PAUSE_SECS:
+                self._pauses.append(self._silence)
+            self._speech_triggered = True
+            self._silence = 0.0
+            self._silence_confidence = []
+            return EndOfTurnState.INCOMPLETE
+
+        if not self._speech_triggered:
+            return EndOfTurnState.INCOMPLETE
+        if not self._silence and self._vad is not None:
+            self._silence = self._vad.params.stop_secs
+        confidence = getattr(self._vad, "last_confidence", None)
+        if confidence is not None:
+            if confidence >= self._vad.params.confidence:
+                # Voice again, not yet long enough for the VAD's start_secs:
+                # the caller is probably going on, so the clock stops
+                return EndOfTurnState.INCOMPLETE
+            self._silence_confidence.append(confidence)
+        self._silence += secs
+        return self._check_end()
+
+    async def analyze_end_of_turn(self) -> Tuple[EndOfTurnState, Optional[MetricsData]]:
+        if not self._speech_triggered:
+            return EndOfTurnState.INCOMPLETE, None
+        return self._check_end(), None
+
+    def _check_end(self) -> EndOfTurnState:
+        wait, cue = self.wait_secs()
+        if self._silence < wait:
+            return EndOfTurnState.INCOMPLETE
+        WAIT_SECONDS.observe(self._silence, cue=cue)
+        logger.debug(f"Turn analyzer: end of turn after {self._silence:.2f}s of silence ({cue})")
+        self._ended_at = self._clock
+        self._ended_wait = self._silence
+        self._reset_turn()
+        return EndOfTurnState.COMPLETE
+
+    def _reset_turn(self):
+        self._speech_triggered = False
+        self._silence = 0.0
+        self._silence_confidence = []
+        self._text = ""
+        self._text_at = None
+        self._speech_final_at = None
+
+    def clear(self):
+        self._reset_turn()
+        self._ended_at = None
+
+
+class TurnCueListener(FrameProcessor):
+    """Passes STT output through and feeds transcripts to the turn analyzer."""
+
+    def __init__(self, analyzer: AdaptiveTurnAnalyzer, **kwargs):
+        super().__init__(**kwargs)
+        self._analyzer = analyzer
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if direction == FrameDirection.DOWNSTREAM and isinstance(
+            frame, (TranscriptionFrame, InterimTranscriptionFrame)
+        ):
+            final = isinstance(frame, TranscriptionFrame)
+            speech_final = bool(getattr(frame.result, "speech_final", False)) if final else False
+            self._analyzer.on_transcript(frame.text, final=final, speech_final=speech_final)
+
+        await self.push_frame(frame, direction)
+
+
+# --------------------------------------------------------------------
+# Transport wiring
+# --------------------------------------------------------------------
+
+
+def speech_params(create_vad: Callable[..., VADAnalyzer]) -> dict:
+    """``vad_analyzer`` (and ``turn_analyzer``) transport params for TURN_DETECTION.
+
+    Args:
+        create_vad: VAD factory accepting ``params=VADParams(...)``, e.g.
+            ``vad_pool.create_vad_analyzer``.
+    """
+    if not adaptive_turn_detection_enabled():
+        return {"vad_analyzer": create_vad()}
+    vad = create_vad(params=VADParams(stop_secs=float(os.getenv("TURN_VAD_STOP_SECS", "0.2"))))
+    return {"vad_analyzer": vad, "turn_analyzer": AdaptiveTurnAnalyzer(vad=vad)}
@@ -0,0 +1,402 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Per-user history cache for returning callers.
+
+Every call used to start from an empty ``flow_manager.state``, so the coach
+forgot the caller's goals and earnings as soon as they hung up. ``UserStateCache``
+keeps a compact profile per user: the serialized earnings/expenses ledger
+(ledger.py) with its totals, active goals, concepts already explained and how
+many calls were stressful. Profiles live in an in-process
+LRU backed by one JSON file per user on local disk.
+
+The user is identified by the ``user`` query parameter of the ``/ws``
+WebSocket (or ``user_id`` in the runner's request body). ``run_bot`` starts
+loading the profile before it builds the pipeline and never waits for it:
+
+- If the profile is ready when the client connects, a short summary is added
+  to the first entry node's task messages.
+- If it arrives later, it is applied at the next user turn by the processor
+  from ``UserHistory.processor()``, which sits right after the user context
+  aggregator. Once the context ends with the caller's message, the summary
+  is inserted just before that message, so it never lands between a tool
+  call and its result, later processors still see a turn that ends with
+  the caller, and the ledger is seeded between turns rather than under a
+  running function handler.
+
+The summary is also kept in ``flow_manager.state["history"]``, so the pinned
+facts of a context compaction (context_budget.py) include it, and the
+session's ledger starts from the saved entries, so streaks and averages cover
+earlier calls. When the call ends, the session's data is merged into the
+profile and written back.
+
+Configuration:
+    USER_STATE_CACHE: Set to 0 to disable per-user history.
+    USER_STATE_DIR: Directory for the on-disk profiles (default nivest_users).
+    USER_STATE_CACHE_SIZE: Profiles kept in memory (default 1024). With
+        several worker processes (server.py --workers) nothing is kept in
+        memory: every load reads the file, and saves are serialized with a
+        lock file next to the profile.
+
+Metrics:
+    nivest_user_state_loads_total{source}: profiles loaded from "memory",
+        "disk", or not found ("new").
+    nivest_user_state_load_seconds: time to load a profile.
+    nivest_user_state_injected_total{when}: summaries added to the first entry
+        node ("initial") or to a running conversation ("late").
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from pipecat.frames.frames import Frame, LLMContextFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from ledger import Ledger
+from metrics import counter, histogram, multiprocess_dir
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are only ordered within a process
+    fcntl = None
+
+LOADS = counter("nivest_user_state_loads_total", "User profiles loaded, by source.", ["source"])
+LOAD_SECONDS = histogram(
+    "nivest_user_state_load_seconds",
+    "Time to load a user profile.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+INJECTED = counter(
+    "nivest_user_state_injected_total",
+    "User history summaries added to a session's context.",
+    ["when"],
+)
+
+HISTORY_PREFIX = "Returning user, data saved from earlier calls:"
+
+# Items kept per list in a profile
+MAX_GOALS = 5
+MAX_CONCEPTS = 10
+
+
+def user_state_enabled() -> bool:
+    return os.getenv("USER_STATE_CACHE", "1") != "0"
+
+
+# --------------------------------------------------------------------
+# Profiles
+# --------------------------------------------------------------------
+
+
+def merge_session(profile: Optional[Dict[str, Any]], state: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold one session's ``flow_manager.state`` into a user profile."""
+    profile = dict(profile or {})
+    finance = state.get("finance") or {}
+
+    profile["calls"] = profile.get("calls", 0) + 1
+    profile["last_call"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    # The session ledger may start with the profile's entries (see seed_ledger);
+    # only the ones recorded during the call are new
+    ledger = Ledger.from_dict(profile["ledger"]) if profile.get("ledger") else Ledger()
+    session = finance.get("ledger")
+    if session is not None:
+        ledger.extend(session, start=finance.get("ledger_base", 0))
+    if len(ledger):
+        profile["ledger"] = ledger.to_dict()
+        # "Net today" would be stale by the next call
+        profile.update({k: v for k, v in ledger.summary().items() if k != "net_today"})
+    if finance.get("last_suggested_saving") is not None:
+        profile["last_suggested_saving"] = finance["last_suggested_saving"]
+
+    goals = {g["goal"].lower(): g for g in profile.get("goals", [])}
+    for goal in state.get("goals") or []:
+        if goal.get("goal"):
+            goals.pop(goal["goal"].lower(), None)
+            goals[goal["goal"].lower()] = {
+                "goal": goal["goal"],
+                "target_amount": goal.get("target_amount"),
+            }
+    profile["goals"] = list(goals.values())[-MAX_GOALS:]
+
+    concepts = list(profile.get("concepts_explained", []))
+    for concept in state.get("concepts_explained") or []:
+        topic = concept.get("topic")
+        if topic:
+            if topic in concepts:
+                concepts.remove(topic)
+            concepts.append(topic)
+    profile["concepts_explained"] = concepts[-MAX_CONCEPTS:]
+
+    stressful = sum(1 for m in state.get("mood_log") or [] if m.get("type") == "stress")
+    profile["stressful_moments"] = profile.get("stressful_moments", 0) + stressful
+    return profile
+
+
+def seed_ledger(profile: Dict[str, Any], state: Dict[str, Any]):
+    """Start the session's ledger from the user's saved entries.
+
+    Entries the session already recorded are kept after the saved ones, and
+    ``finance["ledger_base"]`` marks where the session's own entries begin.
+    """
+    if not profile.get("ledger"):
+        return
+    ledger = Ledger.from_dict(profile["ledger"])
+    base = len(ledger)
+    finance = state.setdefault("finance", {})
+    if finance.get("ledger") is not None:
+        ledger.extend(finance["ledger"], start=finance.get("ledger_base", 0))
+    finance["ledger"] = ledger
+    finance["ledger_base"] = base
+
+
+def compact(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """The profile without its serialized ledger, for prompts."""
+    return {k: v for k, v in profile.items() if k != "ledger"}
+
+
+def history_message(profile: Dict[str, Any]) -> dict:
+    """System message summarizing a profile for the entry node."""
+    body = json.dumps(compact(profile), ensure_ascii=False, separators=(",", ":"))
+    return {"role": "system", "content": f"{HISTORY_PREFIX} {body}"}
+
+
+# --------------------------------------------------------------------
+# Cache store
+# --------------------------------------------------------------------
+
+
+class UserStateCache:
+    """In-memory LRU of user profiles backed by JSON files on disk."""
+
+    def __init__(self, directory: Optional[str] = None, max_users: Optional[int] = None):
+        """Initialize the cache.
+
+        Args:
+            directory: On-disk store. Defaults to USER_STATE_DIR.
+            max_users: Profiles kept in memory. Defaults to USER_STATE_CACHE_SIZE,
+                or 0 with several worker processes (``METRICS_DIR`` set).
+        """
+        self.directory = directory or os.getenv("USER_STATE_DIR", "nivest_users")
+        if max_users is None:
+            # Another worker may have saved a newer profile since this one
+            # cached it, so workers sharing the directory read it every time
+            max_users = 0 if multiprocess_dir() else int(os.getenv("USER_STATE_CACHE_SIZE", "1024"))
+        self.max_users = max_users
+        self._profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._locks: Dict[str, list] = {}
+
+    async def load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Return the profile for ``user_id``, or None for a new user."""
+        started = time.perf_counter()
+        profile = self._profiles.get(user_id)
+        if profile is not None:
+            self._profiles.move_to_end(user_id)
+            source = "memory"
+        else:
+            profile = await asyncio.to_thread(self._read, user_id)
+            source = "disk" if profile is not None else "new"
+            if profile is not None:
+                self._remember(user_id, profile)
+        LOADS.inc(source=source)
+        LOAD_SECONDS.observe(time.perf_counter() - started)
+        return profile
+
+    async def save_session(self, user_id: str, state: Dict[str, Any]):
+        """Merge a finished session into the user's profile and persist it.
+
+        Sessions of one user that end together are merged one after the
+        other, so neither overwrites the other's changes.
+        """
+        async with self._locked(user_id):
+            try:
+                profile = await asyncio.to_thread(self._merge_and_write, user_id, state, self._profiles.get(user_id))
+            except OSError as e:
+                logger.warning(f"Could not save user state for {user_id!r}: {e}")
+                return
+            self._remember(user_id, profile)
+
+    @asynccontextmanager
+    async def _locked(self, user_id: str):
+        entry = self._locks.get(user_id)
+        if entry is None:
+            entry = self._locks[user_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[user_id]
+
+    def _merge_and_write(self, user_id: str, state: Dict[str, Any], cached: Optional[Dict[str, Any]]):
+        path = self._path(user_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Worker processes share the directory; the file lock orders their saves
+        with open(f"{path}.lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            previous = cached if cached is not None else self._read(user_id)
+            profile = merge_session(previous, state)
+            self._write(user_id, profile)
+        return profile
+
+    def _path(self, user_id: str) -> str:
+        # Hashed so that arbitrary identifiers are safe file names
+        key = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _read(self, user_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(user_id), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read user state for {user_id!r}: {e}")
+            return None
+
+    def _write(self, user_id: str, profile: Dict[str, Any]):
+        path = self._path(user_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(profile, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _remember(self, user_id: str, profile: Dict[str, Any]):
+        self._profiles.pop(user_id, None)
+        self._profiles[user_id] = profile
+        while len(self._profiles) > self.max_users:
+            self._profiles.popitem(last=False)
+
+
+USER_STATE = UserStateCache()
+
+
+# --------------------------------------------------------------------
+# Session helpers
+# --------------------------------------------------------------------
+
+
+class UserHistory:
+    """Prefetches one session's user profile and injects it when ready."""
+
+    def __init__(self, user_id: Optional[str], cache: Optional[UserStateCache] = None):
+        self.user_id = user_id or None
+        self._cache = cache or USER_STATE
+        self._task: Optional[asyncio.Task] = None
+        self._late_state: Optional[Dict[str, Any]] = None
+        if self.user_id and user_state_enabled():
+            self._task = asyncio.create_task(self._cache.load(self.user_id))
+
+    def attach(self, node: dict, state: Dict[str, Any]) -> dict:
+        """Add the user's history to the first entry node, or to a later turn.
+
+        Args:
+            node: The entry node about to be passed to ``flow_manager.initialize``.
+            state: ``flow_manager.state``.
+
+        Returns:
+            ``node``, with the history appended to its task messages if the
+            profile has already loaded.
+        """
+        if self._task is None:
+            return node
+        state["user_id"] = self.user_id
+        if self._task.done():
+            profile = self._result()
+            if profile:
+                state["history"] = compact(profile)
+                seed_ledger(profile, state)
+                node.setdefault("task_messages", []).append(history_message(profile))
+                INJECTED.inc(when="initial")
+            return node
+
+        # Applied by processor() at a turn boundary once the load finishes
+        self._late_state = state
+        return node
+
+    def processor(self) -> "LateHistoryProcessor":
+        """Processor that applies a late profile; place it after the user aggregator."""
+        return LateHistoryProcessor(self)
+
+    def apply_late(self, context) -> bool:
+        """Add a profile that loaded after the greeting to ``context``.
+
+        Only called between turns: ``context`` must end with the caller's
+        message, which stays last.
+
+        Returns:
+            Whether nothing is pending any more.
+        """
+        if self._late_state is None:
+            return True
+        if not self._task.done():
+            return False
+        state, self._late_state = self._late_state, None
+        profile = self._result()
+        if profile:
+            state["history"] = compact(profile)
+            seed_ledger(profile, state)
+            # Just before the caller's message: the processors after this one
+            # (speculation, intent router, concept cache) look for a context
+            # that ends with it
+            messages = context.get_messages()
+            context.set_messages(messages[:-1] + [history_message(profile)] + messages[-1:])
+            INJECTED.inc(when="late")
+        return True
+
+    async def save(self, state: Dict[str, Any]):
+        """Merge the finished session into the user's profile."""
+        if self._task is None:
+            return
+        if not self._task.done():
+            self._task.cancel()
+        await self._cache.save_session(self.user_id, state)
+
+    def _result(self) -> Optional[Dict[str, Any]]:
+        if self._task.cancelled():
+            return None
+        error = self._task.exception()
+        if error is not None:
+            logger.warning(f"Loading user state for {self.user_id!r} failed: {error}")
+            return None
+        return self._task.result()
+
+
+class LateHistoryProcessor(FrameProcessor):
+    """Applies a ``UserHistory`` profile that loaded after the greeting.
+
+    The user context aggregator pushes an ``LLMContextFrame`` once it has
+    added the caller's message; the profile is added to that context before
+    the LLM sees it.
+    """
+
+    def __init__(self, history: UserHistory, **kwargs):
+        super().__init__(**kwargs)
+        self._history = history
+        self._pending = True
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if self._pending and isinstance(frame, LLMContextFrame) and direction == FrameDirection.DOWNSTREAM:
+            messages = frame.context.get_messages()
+            last = messages[-1] if messages else None
+            if isinstance(last, dict) and last.get("role") == "user":
+                self._pending = not self._history.apply_late(frame.context)
+
+        await self.push_frame(frame, direction)
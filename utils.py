@@ -14,11 +14,88 @@ import os
 from typing import Any
 
 
+def get_llm_provider(provider: str = None) -> str:
+    """Return the normalised LLM provider name.
+
+    Args:
+        provider: Explicit provider name. If None, uses LLM_PROVIDER env var (defaults to 'openai')
+
+    Returns:
+        Lower-cased provider name, as used by create_llm and in metric labels
+    """
+    if provider is None:
+        provider = os.getenv("LLM_PROVIDER") or get_llm_providers()[0]
+    return provider.lower()
+
+
+def get_llm_providers() -> list:
+    """Return the ordered provider list from LLM_PROVIDERS (e.g. "openai,google").
+
+    Returns:
+        Lower-cased provider names; a single-item list with LLM_PROVIDER (or
+        'openai') when LLM_PROVIDERS is not set
+    """
+    providers = [p.strip().lower() for p in os.getenv("LLM_PROVIDERS", "").split(",") if p.strip()]
+    return providers or [os.getenv("LLM_PROVIDER", "openai").lower()]
+
+
+# Model used by create_llm for each provider when none is given
+DEFAULT_LLM_MODELS = {
+    "openai": "gpt-5-mini",
+    "anthropic": "claude-sonnet-4-20250514",
+    "google": "gemini-2.5-flash",
+    "aws": "us.anthropic.claude-3-7-sonnet-20250219-v1:0",
+}
+
+
+def get_llm_model(provider: str = None) -> str:
+    """Return the model create_llm uses for ``provider`` by default.
+
+    Args:
+        provider: Provider name. If None, uses get_llm_provider()
+
+    Returns:
+        Model name, or an empty string for an unknown provider
+    """
+    return DEFAULT_LLM_MODELS.get(get_llm_provider(provider), "")
+
+
+def create_failover_llm(providers: list = None) -> Any:
+    """Create a composite LLM service that fails over (and optionally hedges) between providers.
+
+    Args:
+        providers: Ordered provider names. If None, uses LLM_PROVIDERS
+
+    Returns:
+        A FailoverLLMService wrapping one service per provider
+
+    Environment:
+        LLM_HEDGE_AFTER_SECS: Start the next provider in parallel after this many
+            seconds without a first token (unset or 0 disables hedging)
+        LLM_TTFT_TIMEOUT_SECS: Abandon an attempt without a first token after this
+            many seconds (defaults to 5)
+        LLM_ADAPTIVE_ORDER: Set to 0 to always try providers in the given order
+    """
+    from llm_failover import FailoverLLMService
+    from service_factory import SERVICE_FACTORY
+
+    providers = providers or get_llm_providers()
+    # Providers failing their health check go last
+    providers = sorted(providers, key=lambda name: not SERVICE_FACTORY.healthy(name))
+    return FailoverLLMService(
+        {name: create_llm(name) for name in providers},
+        hedge_after=float(os.getenv("LLM_HEDGE_AFTER_SECS", "0")),
+        ttft_timeout=float(os.getenv("LLM_TTFT_TIMEOUT_SECS", "5")),
+        adaptive=os.getenv("LLM_ADAPTIVE_ORDER", "1") != "0",
+    )
+
+
 def create_llm(provider: str = None, model: str = None) -> Any:
     """Create an LLM service instance based on environment configuration.
 
     Args:
-        provider: LLM provider name. If None, uses LLM_PROVIDER env var (defaults to 'openai')
+        provider: LLM provider name. If None, uses LLM_PROVIDER env var (defaults to 'openai'),
+            or a failover service over LLM_PROVIDERS when that lists several providers
         model: Model name. If None, uses provider's default model
 
     Returns:
@@ -46,33 +123,36 @@ def create_llm(provider: str = None, model: str = None) -> Any:
 
         # Use AWS Bedrock (requires AWS credentials via SSO, env vars, or IAM)
         llm = create_llm("aws")
+
+        # Fail over between providers (LLM_PROVIDERS=openai,google)
+        llm = create_llm()
     """
-    if provider is None:
-        provider = os.getenv("LLM_PROVIDER", "openai").lower()
-    else:
-        provider = provider.lower()
+    if provider is None and len(get_llm_providers()) > 1:
+        return create_failover_llm()
+
+    provider = get_llm_provider(provider)
 
     # Provider configurations
     configs = {
         "openai": {
             "service": "pipecat.services.openai.llm.OpenAILLMService",
             "api_key_env": "OPENAI_API_KEY",
-            "default_model": "gpt-5-mini",
+            "default_model": DEFAULT_LLM_MODELS["openai"],
         },
         "anthropic": {
             "service": "pipecat.services.anthropic.llm.AnthropicLLMService",
             "api_key_env": "ANTHROPIC_API_KEY",
-            "default_model": "claude-sonnet-4-20250514",
+            "default_model": DEFAULT_LLM_MODELS["anthropic"],
         },
         "google": {
             "service": "pipecat.services.google.llm.GoogleLLMService",
             "api_key_env": "GOOGLE_API_KEY",
-            "default_model": "gemini-2.5-flash",
+            "default_model": DEFAULT_LLM_MODELS["google"],
         },
         "aws": {
             "service": "pipecat.services.aws.llm.AWSBedrockLLMService",
             "api_key_env": None,  # AWS uses default credential chain
-            "default_model": "us.anthropic.claude-3-7-sonnet-20250219-v1:0",
+            "default_model": DEFAULT_LLM_MODELS["aws"],
             "region": "us-west-2",
         },
     }
@@ -85,7 +165,10 @@ def create_llm(provider: str = None, model: str = None) -> Any:
     # Dynamic import of the LLM service
     module_path, class_name = config["service"].rsplit(".", 1)
     module = __import__(module_path, fromlist=[class_name])
-    service_class = getattr(module, class_name)
+    # Concept cache hits are played out of the LLM (llm_replay.py)
+    from llm_replay import with_replay
+
+    service_class = with_replay(getattr(module, class_name))
 
     # Get API key (skip for AWS which uses default credential chain)
     if provider == "aws" or config["api_key_env"] is None:
@@ -108,4 +191,7 @@ def create_llm(provider: str = None, model: str = None) -> Any:
         # Remove the generic api_key since AWS uses default credential chain
         del kwargs["api_key"]
 
-    return service_class(**kwargs)
+    # Per-session client on the process-wide connection pool for this provider
+    from service_factory import SERVICE_FACTORY
+
+    return SERVICE_FACTORY.wrap_llm(provider, service_class(**kwargs))
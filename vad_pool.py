@@ -0,0 +1,156 @@
+#
+# Copyright (c) 2024-2025
+# SPDX-License-Identifier: BSD 2-Clause License
+#
+
+"""Process-wide pool of Silero VAD model sessions.
+
+``SileroVADAnalyzer()`` loads the ONNX model into a fresh
+``onnxruntime.InferenceSession`` every time it is constructed, i.e. on every
+connection. The model itself is stateless: the recurrent state and audio
+context live in numpy arrays that are passed into each ``session.run`` call,
+and ``InferenceSession.run`` is thread-safe. So the session can be shared and
+only the streaming state has to stay per call.
+
+``VADModelPool`` loads ``VAD_POOL_SIZE`` sessions once (at startup via
+``prewarm()``, or lazily on first use) and hands out ``PooledSileroVADAnalyzer``
+instances that share a session round-robin while keeping their own state.
+More than one session only helps when many calls run VAD at the same instant
+on a multi-core host.
+
+Usage:
+    from vad_pool import VAD_POOL, create_vad_analyzer
+
+    VAD_POOL.prewarm()                      # at process startup
+    params = TransportParams(vad_analyzer=create_vad_analyzer())
+"""
+
+import itertools
+import os
+import threading
+import time
+from importlib import resources
+from typing import List, Optional
+
+import numpy as np
+from loguru import logger
+
+from pipecat.audio.vad.silero import SileroOnnxModel, SileroVADAnalyzer
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams
+
+MODEL_PACKAGE = "pipecat.audio.vad.data"
+MODEL_NAME = "silero_vad.onnx"
+
+
+def _model_path() -> str:
+    return str(resources.files(MODEL_PACKAGE).joinpath(MODEL_NAME))
+
+
+def _session_model(session) -> SileroOnnxModel:
+    """Wrap a shared session in a ``SileroOnnxModel`` with its own state."""
+    model = SileroOnnxModel.__new__(SileroOnnxModel)
+    model.session = session
+    model.sample_rates = [8000, 16000]
+    model.reset_states()
+    return model
+
+
+class PooledSileroVADAnalyzer(SileroVADAnalyzer):
+    """Silero VAD analyzer backed by a shared ONNX session.
+
+    Behaves exactly like ``SileroVADAnalyzer`` but skips the model load.
+    """
+
+    def __init__(
+        self,
+        session,
+        *,
+        sample_rate: Optional[int] = None,
+        params: Optional[VADParams] = None,
+    ):
+        """Initialize the analyzer.
+
+        Args:
+            session: Shared ``onnxruntime.InferenceSession`` for the Silero model.
+            sample_rate: Audio sample rate (8000 or 16000 Hz). If None, will be
+                set later.
+            params: VAD parameters for detection thresholds and timing.
+        """
+        # Skip SileroVADAnalyzer.__init__, which would load another session.
+        VADAnalyzer.__init__(self, sample_rate=sample_rate, params=params)
+        self._model = _session_model(session)
+        self._last_reset_time = 0
+        self.last_confidence = 0.0
+
+    def voice_confidence(self, buffer) -> float:
+        # Kept for the adaptive turn analyzer (turn_detector.py)
+        self.last_confidence = super().voice_confidence(buffer)
+        return self.last_confidence
+
+
+class VADModelPool:
+    """Loads Silero sessions once per process and shares them across calls."""
+
+    def __init__(self, size: Optional[int] = None):
+        """Initialize the pool.
+
+        Args:
+            size: Number of ONNX sessions. Defaults to VAD_POOL_SIZE (1).
+        """
+        self._size = max(1, size or int(os.getenv("VAD_POOL_SIZE", "1")))
+        self._sessions: List = []
+        self._cycle = None
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._sessions)
+
+    def prewarm(self):
+        """Load every session and run one inference through each.
+
+        The first ``run`` on a new session is several times slower than the
+        following ones, so this keeps that cost off the first call too.
+        """
+        with self._lock:
+            if self._sessions:
+                return
+            start = time.perf_counter()
+            path = _model_path()
+            sessions = []
+            for _ in range(self._size):
+                model = SileroOnnxModel(path, force_onnx_cpu=True)
+                model(np.zeros(512, dtype=np.float32), 16000)
+                sessions.append(model.session)
+            self._sessions = sessions
+            self._cycle = itertools.cycle(sessions)
+        logger.info(
+            f"Loaded {self._size} Silero VAD session(s) in {time.perf_counter() - start:.2f}s"
+        )
+
+    def session(self):
+        """Return the next shared session, loading the pool if needed."""
+        if not self._sessions:
+            self.prewarm()
+        with self._lock:
+            return next(self._cycle)
+
+    def analyzer(
+        self, *, sample_rate: Optional[int] = None, params: Optional[VADParams] = None
+    ) -> PooledSileroVADAnalyzer:
+        """Create a per-call analyzer backed by a pooled session."""
+        return PooledSileroVADAnalyzer(self.session(), sample_rate=sample_rate, params=params)
+
+
+VAD_POOL = VADModelPool()
+
+
+def create_vad_analyzer(
+    *, sample_rate: Optional[int] = None, params: Optional[VADParams] = None
+) -> PooledSileroVADAnalyzer:
+    """Drop-in replacement for ``SileroVADAnalyzer()`` using ``VAD_POOL``."""
+    return VAD_POOL.analyzer(sample_rate=sample_rate, params=params)